@@ -1,27 +1,34 @@
 import os
 import time
+import threading
 import streamlit as st
 import sqlite3
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import importlib
-from scipy.interpolate import interp1d
-from scipy.spatial import ConvexHull
-import shift_optimizer
-importlib.reload(shift_optimizer)
-from shift_optimizer import ShiftOptimizer
+import telemetry_store
+import telemetry_lod
+import telemetry_derived
+import channel_math
+import lap_align
+import telemetry_plot
+import db_backup
+import telemetry_export
+import db_maintenance
+import telemetry_archive
+import scoring_engine
+import fleet_compare
+import telemetry_analysis
+from telemetry_analysis import (generate_virtual_run, torque_envelope, extract_shift_events, traction_points, sync_to_speed,
+                                normalize_run, time_to_speed, interval_time, gear_accel, sector_kpi, run_sectors)
 
 st.set_page_config(page_title="LMU Analyzer", layout="wide", page_icon="🏎️")
 
+@st.cache_resource
 def init_state_db():
+    # Einmal pro Prozess statt bei jedem Rerun (Schema-Migration, Indizes, FTS)
     try:
-        conn = sqlite3.connect("lmu_telemetry.db", timeout=5.0)
-        cursor = conn.cursor()
-        cursor.execute("CREATE TABLE IF NOT EXISTS logger_state (id INTEGER PRIMARY KEY, state TEXT)")
-        cursor.execute("INSERT OR IGNORE INTO logger_state (id, state) VALUES (1, 'IDLE')")
-        conn.commit()
-        conn.close()
+        telemetry_store.init_db("lmu_telemetry.db")
     except Exception:
         pass
 
@@ -50,184 +57,148 @@ def set_logger_state(state):
 
 DB_PATH = "lmu_telemetry.db"
 
-def load_runs():
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query("SELECT * FROM runs ORDER BY timestamp DESC", conn)
-        conn.close()
-        if not df.empty and 'run_type' not in df.columns:
-            df['run_type'] = 'DRAG'
-            
-        if not df.empty and 'notes' not in df.columns:
+def get_run_archived_flags(runs_df):
+    if 'archive_path' not in runs_df:
+        return [False] * len(runs_df)
+    return runs_df['archive_path'].notna().tolist()
+
+@st.cache_resource
+def get_purge_worker():
+    # Ein einziger Hintergrund-Thread pro Prozess, geweckt über ein Event (mehrere Klicks -> ein Durchlauf).
+    # Bereinigt gelöschte und archivierte Runs batchweise, pausiert sobald der Logger aufzeichnet.
+    worker = {'wake': threading.Event(), 'error': None}
+
+    def run():
+        while True:
+            worker['wake'].wait()
+            worker['wake'].clear()
             try:
-                conn_tmp = sqlite3.connect(DB_PATH)
-                conn_tmp.cursor().execute("ALTER TABLE runs ADD COLUMN notes TEXT DEFAULT ''")
-                conn_tmp.commit()
-                conn_tmp.close()
-            except sqlite3.OperationalError:
-                pass
-            df['notes'] = ''
-            
-        if df.empty:
-            return pd.DataFrame(columns=['id', 'vehicle_name', 'vehicle_class', 'track_name', 'timestamp', 'run_type', 'notes'])
-            
-        return df
-    except Exception:
-        return pd.DataFrame(columns=['id', 'vehicle_name', 'vehicle_class', 'track_name', 'timestamp', 'run_type', 'notes'])
+                while not get_logger_state().startswith("RECORDING"):
+                    if db_maintenance.purge_step(DB_PATH) == 0:
+                        break
+                worker['error'] = None
+            except Exception as e:
+                # Für die Garage merken; der nächste Auftrag (oder der Logger im Leerlauf) versucht es erneut
+                worker['error'] = str(e)
+
+    threading.Thread(target=run, daemon=True, name="purge-worker").start()
+    return worker
+
+def purge_deleted_runs_in_background():
+    get_purge_worker()['wake'].set()
+
+@st.cache_resource
+def get_telemetry_cache():
+    # Prozessweit geteilt: alle Sessions/Tabs nutzen denselben LRU-Cache
+    return telemetry_store.TelemetryCache()
+
+@st.cache_resource
+def get_export_jobs():
+    # Laufende/fertige Export-Jobs (Hintergrund-Threads), über Reruns hinweg erhalten
+    return {}
 
 def load_telemetry(run_id):
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(f"SELECT * FROM telemetry_data WHERE run_id = {run_id}", conn)
-    conn.close()
-    return df
+    return telemetry_store.load_telemetry(run_id, DB_PATH, cache=get_telemetry_cache())
 
-def analyze_run_quality(df):
-    if df.empty:
-        return df, 50.0, False
-        
-    # 1. Cleaning & Trimming
-    start_mask = (df['speed_kmh'] > 60) & (df['throttle'] > 0.8)
-    if start_mask.any():
-        start_idx = start_mask.idxmax()
-        df_clean = df.loc[start_idx:].copy()
-    else:
-        df_clean = df.copy()
-        
-    end_mask = df_clean['speed_kmh'] < 10
-    if end_mask.any():
-        end_idx = end_mask.idxmax()
-        df_clean = df_clean.loc[:end_idx].copy()
-        
-    if len(df_clean) < 10:
-        df_clean = df.copy()
-        
-    # A. Fake Peaks & Crash Detection
-    if 'lat_g' in df_clean.columns and 'lon_g' in df_clean.columns:
-        df_clean['lat_g_smooth'] = df_clean['lat_g'].rolling(10, min_periods=1).mean()
-        df_clean['lon_g_smooth'] = df_clean['lon_g'].rolling(10, min_periods=1).mean()
-        
-        max_safe_g = 4.0
-        max_lat = df_clean['lat_g_smooth'].abs().max()
-        max_lon = df_clean['lon_g_smooth'].abs().max()
-        crash_detected = (max_lat > max_safe_g) or (max_lon > max_safe_g)
-        
-        # Clip absurd peaks to avoid fake scores if we proceed
-        df_clean['lat_g_smooth'] = df_clean['lat_g_smooth'].clip(-max_safe_g, max_safe_g)
-        df_clean['lon_g_smooth'] = df_clean['lon_g_smooth'].clip(-max_safe_g, max_safe_g)
-    else:
-        crash_detected = False
-
-    # 3. Stability Metrics (CSI)
-    stability_score = 50.0
-    confidence_ratio = 50.0
-    counter_steer_bonus = 0.0
-    unrecoverable_spin_penalty = 0.0
-    spin_count = 0
-    max_yaw_accel = 0.0
-    
-    if 'lat_g' in df_clean.columns and 'steering_angle' in df_clean.columns:
-        # Calculate derived metrics
-        # Yaw rate approximation from lat_g and speed
-        df_clean['yaw_rate'] = df_clean.apply(lambda row: (row['lat_g'] * 9.81) / (row['speed_kmh'] / 3.6) if row['speed_kmh'] > 10 else 0, axis=1)
-        df_clean['yaw_accel'] = df_clean['yaw_rate'].diff().abs() / df_clean['time_elapsed'].diff()
-        
-        # Approximate Slip Angle: very rough proxy using steering vs actual lateral G curve
-        # A simple proxy: when steering angle changes faster than lat_g changes, or steering is opposite
-        
-        corners = df_clean[df_clean['lat_g'].abs() > 0.5]
-        if not corners.empty:
-            steering_noise = corners['steering_angle'].diff().abs().mean()
-            # Factor heuristic: steering_noise of 0.05 is bad, 0.005 is good.
-            stability_score = max(0.0, 100.0 - (steering_noise * 1000.0))
-            
-            max_yaw_accel = corners['yaw_accel'].max()
-            
-        hard_corners = df_clean[df_clean['lat_g'].abs() > 0.8]
-        if not hard_corners.empty:
-            peak_g = hard_corners['lat_g'].abs().max()
-            avg_g = hard_corners['lat_g'].abs().mean()
-            if peak_g > 0:
-                confidence_ratio = (avg_g / peak_g) * 100.0
-                
-        # Counter-steer detection
-        # lat_g is e.g., positive for left corner, negative for right corner
-        # steering is e.g., positive for left, negative for right
-        # We detect counter steer when lat_g and steering have opposite signs and both are somewhat significant
-        df_clean['is_counter_steering'] = (df_clean['lat_g'] * df_clean['steering_angle'] < 0) & (df_clean['lat_g'].abs() > 0.5) & (df_clean['steering_angle'].abs() > 0.05)
-        
-        counter_steer_events = df_clean[df_clean['is_counter_steering']]
-        
-        # For each counter steer event, check if recovered
-        # We define an event grouped by sequential frames
-        if not counter_steer_events.empty:
-            # We will use simple heuristics: scan the time after the event
-            # If speed drops > 30% without brake, or yaw accel explodes = unrecoverable
-            # Else recovered = bonus
-            indices = counter_steer_events.index.tolist()
-            # Group contiguous indices
-            event_starts = []
-            current_event = [indices[0]]
-            for i in range(1, len(indices)):
-                if indices[i] == indices[i-1] + 1:
-                    current_event.append(indices[i])
-                else:
-                    event_starts.append(current_event[0])
-                    current_event = [indices[i]]
-            event_starts.append(current_event[0])
-            
-            for start_idx in event_starts:
-                start_time = df_clean.loc[start_idx, 'time_elapsed']
-                window = df_clean[(df_clean['time_elapsed'] > start_time) & (df_clean['time_elapsed'] <= start_time + 2.0)]
-                
-                if not window.empty:
-                    max_yaw = window['yaw_rate'].abs().max()
-                    start_speed = df_clean.loc[start_idx, 'speed_kmh']
-                    min_speed = window['speed_kmh'].min()
-                    max_brake = window['throttle'].min() if 'throttle' in window.columns else 0 # proxy check if they didn't just brake
-                    # Or we just check if speed dropped 30%
-                    
-                    if max_yaw > 2.0 or (min_speed < start_speed * 0.7 and 'throttle' in window.columns and window['brake'].max() < 0.2 if 'brake' in window.columns else False):
-                        unrecoverable_spin_penalty += 10.0
-                        spin_count += 1
-                    else:
-                        counter_steer_bonus += 2.0
+def load_derived(run_id, channels):
+    return telemetry_derived.load_derived(run_id, channels, DB_PATH, cache=get_telemetry_cache())
 
-        # Hard slip angle proxy detection (Spins)
-        # Fast rotation + speed loss
-        potential_spins = df_clean[(df_clean['yaw_rate'].abs() > 2.5) & (df_clean['speed_kmh'].diff() < -10)]
-        spin_count += len(potential_spins) // 10 # very rough grouping
+def load_channels(run_id, channels, window=None, window_channel='time_elapsed', filters=None):
+    return telemetry_store.load_channels(run_id, channels, window=window, window_channel=window_channel,
+                                         filters=filters, db_path=DB_PATH, cache=get_telemetry_cache())
 
-    # Base CSI
-    csi = (stability_score * 0.6) + (confidence_ratio * 0.4)
-    
-    # Apply Counter-steer modifiers
-    csi += min(15.0, counter_steer_bonus)  # Cap bonus at 15
-    csi -= unrecoverable_spin_penalty
-    
-    # Critical failure penalty
-    csi -= (spin_count * 5.0)
-    
-    # Yaw Accel Penalty
-    if max_yaw_accel > 5.0:
-        csi -= min(15.0, (max_yaw_accel - 5.0) * 2.0)
-        
-    csi = max(0.0, min(100.0, csi))
-    
-    # Over-Rev filter penalty
-    max_rpm = 9000
-    if 'rpm' in df_clean.columns:
-        over_rev_count = (df_clean['rpm'] > max_rpm).sum()
-        if over_rev_count > 10: # > 0.2s over rev
-            csi -= 10.0
-            csi = max(0.0, csi)
-            
-    return df_clean, csi, crash_detected
+def load_trace(run_id, x_channel, y_channel, window=None):
+    # Downsampling-Stufe passend zum Pixel-Budget des Charts (min/max-erhaltend, siehe telemetry_lod)
+    return telemetry_lod.load_trace(run_id, x_channel, y_channel, window=window, db_path=DB_PATH, cache=get_telemetry_cache())
+
+def load_lap_grids(run_id):
+    # Runden auf dem gemeinsamen Distanz-Raster (siehe lap_align), pro Run-Revision gecacht
+    return lap_align.load_lap_grids(run_id, db_path=DB_PATH, cache=get_telemetry_cache())
+
+LAP_REFERENCES = {"Rolling Best (schnellste Runde davor)": 'rolling', "Schnellste Runde": 'best'}
+
+MATH_NONE = "—"
+
+def math_channel_options():
+    return [MATH_NONE] + list(channel_math.load_math_channels(DB_PATH))
+
+def render_math_channel_chart(name, runs):
+    # Math-Kanal (channel_math) über der Zeit für mehrere Runs: runs = [(run_id, Label, Farbe), ...]
+    channel = channel_math.load_math_channels(DB_PATH).get(name)
+    if channel is None:
+        return
+    st.subheader(f"🧮 Math-Kanal: {name}")
+    st.caption(f"`{channel['expression']}` – {channel['description']}")
+    fig = go.Figure()
+    try:
+        for run_id, label, color in runs:
+            values = channel_math.evaluate_run(run_id, {name: channel['expression']}, DB_PATH, cache=get_telemetry_cache())
+            fig.add_trace(telemetry_plot.make_trace(values['time_elapsed'], values[name], name=label, mode='lines', line=dict(color=color)))
+    except channel_math.ChannelExpressionError as e:
+        st.error(f"Math-Kanal '{name}' kann nicht berechnet werden: {e}")
+        return
+    fig.update_layout(xaxis_title="Time (s)", yaxis_title=f"{name} [{channel['unit']}]" if channel['unit'] else name, template="plotly_dark")
+    st.plotly_chart(fig, width='stretch')
+
+# Benötigte Kanäle pro Ansicht (projizierte Loads statt SELECT *)
+DRAG_CHANNELS = ['time_elapsed', 'speed_kmh', 'gear', 'torque']
+SHIFT_CHANNELS = ['time_elapsed', 'speed_kmh', 'gear', 'rpm', 'torque', 'throttle']
+HANDLING_CHANNELS = ['time_elapsed', 'speed_kmh', 'lat_g', 'lon_g', 'lap_distance', 'sector']
+# Farben für den Flotten-Vergleich (die ersten beiden wie Auto A / B)
+FLEET_COLORS = ['#00ff88', '#ff0055', '#00ccff', '#ffaa00', '#cc66ff', '#ffff66', '#ff66cc', '#66ffcc', '#ff7f50', '#9999ff']
+
+# Run-Auswahl der Analyse-Tabs (Filter für telemetry_store.query_runs)
+DRAG_RUN_FILTERS = {'run_type': ['DRAG', 'QUICK_SHIFT%'], 'selectable': True}
+HANDLING_RUN_FILTERS = {'run_type': 'HANDLING', 'selectable': True}
+SCORE_DRAG_RUN_FILTERS = {'run_type': 'DRAG', 'selectable': True}
+
+def get_vehicle_run_ids(runs_df, run_id, filters):
+    # Alle Runs desselben Fahrzeugs per SQL, ohne die komplette Run-Liste zu laden
+    vehicle = runs_df.loc[runs_df['id'] == run_id, 'vehicle_name'].iloc[0]
+    return telemetry_store.query_run_values('id', filters={**filters, 'vehicle_name': vehicle}, db_path=DB_PATH)
+
+def get_vehicle_envelope(runs_df, run_id):
+    # Envelope über alle Runs desselben Fahrzeugs (Kanäle kommen aus dem Telemetrie-Cache)
+    run_ids = get_vehicle_run_ids(runs_df, run_id, DRAG_RUN_FILTERS)
+    return torque_envelope(pd.concat([load_channels(rid, DRAG_CHANNELS) for rid in run_ids], ignore_index=True))
+
+def get_vehicle_traction_envelope(runs_df, run_id):
+    # Grip-Limit über die gestapelten G-G Punkte aller Runs desselben Fahrzeugs
+    points = [telemetry_analysis.traction_points(load_channels(rid, telemetry_analysis.TRACTION_CHANNELS))
+              for rid in get_vehicle_run_ids(runs_df, run_id, HANDLING_RUN_FILTERS)]
+    polygon = telemetry_analysis.traction_envelope(np.concatenate([p[0] for p in points]), np.concatenate([p[1] for p in points]))
+    return pd.DataFrame(polygon if polygon is not None else np.empty((0, 2)), columns=['lat_g', 'lon_g'])
 
 def get_run_options(df):
+    if df.empty:
+        return pd.Series([], dtype=str)
     notes_str = df['notes'].apply(lambda x: f" | 📝 {x}" if pd.notna(x) and str(x).strip() != "" else "")
     return df['id'].astype(str) + " - [" + df['run_type'] + "] " + df['vehicle_name'] + " (" + df['timestamp'] + ")" + notes_str
 
-runs_df = load_runs()
+def get_run_choices(filters, search_key, select_keys):
+    """
+    Runs für die Auswahl-Listen eines Analyse-Tabs: die neuesten RUN_PAGE_SIZE Treffer der Suche in `search_key`
+    (SQL, siehe telemetry_store.query_runs) plus die in `select_keys` gewählten Runs, damit die Auswahl eine
+    geänderte Suche übersteht. Ohne Treffer werden die neuesten Runs gezeigt.
+    :return: (DataFrame der Runs, Anzahl der Treffer der Suche)
+    """
+    search = st.session_state.get(search_key, "")
+    runs, total = telemetry_store.query_runs(search, filters, db_path=DB_PATH)
+    if runs.empty and search:
+        runs, _ = telemetry_store.query_runs(None, filters, db_path=DB_PATH)
+    selected_ids = [int(st.session_state[key].split(" - ")[0]) for key in select_keys if st.session_state.get(key)]
+    missing_ids = [rid for rid in selected_ids if rid not in set(runs['id'])]
+    if missing_ids:
+        selected, _ = telemetry_store.query_runs(None, {**filters, 'ids': missing_ids}, page_size=None, db_path=DB_PATH)
+        runs = pd.concat([runs, selected], ignore_index=True)
+    return runs, total
+
+def render_run_search(search_key, n_found):
+    st.text_input("🔎 Runs suchen (Fahrzeug, Strecke, Notizen)", key=search_key, placeholder="z.B. porsche monza")
+    if n_found == 0 and st.session_state.get(search_key):
+        st.caption("Keine Treffer für die Suche, die Auswahl zeigt die neuesten Runs.")
+    elif n_found > telemetry_store.RUN_PAGE_SIZE:
+        st.caption(f"{n_found} Runs gefunden, die Auswahl zeigt die neuesten {telemetry_store.RUN_PAGE_SIZE}. Suche eingrenzen für ältere Runs.")
 
 st.title("🏎️ LMU Performance & Telemetry Analyzer")
 
@@ -256,1258 +227,1307 @@ def on_car_change(key_a, key_b, df):
         st.session_state.car_b_name = vname
 
 
-tab_rec, tab_laengs, tab_quer, tab_score, tab_garage = st.tabs([
+def lazy_tabs(labels, key):
+    # Tabs mit Zustand: nur der offene Tab wird gerechnet (siehe tab_open). Streamlit-Versionen ohne
+    # on_change bei st.tabs rendern wie bisher alle Tabs.
+    try:
+        return st.tabs(labels, on_change="rerun", key=key)
+    except TypeError:
+        return st.tabs(labels)
+
+def tab_open(tab, keep_keys=()):
+    """
+    True, wenn der Tab angezeigt wird (oder die Tabs keinen Zustand haben). Für geschlossene Tabs werden die
+    Widget-Werte in `keep_keys` gesichert, sonst verwirft Streamlit sie am Ende des Runs.
+    """
+    if getattr(tab, 'open', None) is not False:
+        return True
+    for key in keep_keys:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+    return False
+
+
+tab_rec, tab_laengs, tab_quer, tab_score, tab_garage = lazy_tabs([
     "🏁 Aufnahme", 
     "🚀 Längsdynamik", 
     "🏎️ Querdynamik", 
     "⚖️ Gesamt-Vergleich", 
     "📂 Garage"
-])
+], key="main_tab")
 with tab_rec:
-    # Platzhalter für dynamische Inhalte
-    status_placeholder = st.empty()
-    st.markdown("---")
+    if tab_open(tab_rec):
+        # Platzhalter für dynamische Inhalte
+        status_placeholder = st.empty()
+        st.markdown("---")
     
-    # 2. UI-Komponenten & Aufbau
-    col_mode, col_light, col_monitor = st.columns([1.5, 1, 1.5])
+        # 2. UI-Komponenten & Aufbau
+        col_mode, col_light, col_monitor = st.columns([1.5, 1, 1.5])
     
-    with col_mode:
-        st.subheader("🎛️ Modus-Selektor & Steuerung")
+        with col_mode:
+            st.subheader("🎛️ Modus-Selektor & Steuerung")
         
-        state_for_buttons = get_logger_state()
+            state_for_buttons = get_logger_state()
         
-        # DRAG RUN
-        st.markdown("#### 🏁 Drag Run Recording")
-        st.caption("Optimiert für Beschleunigung (Drehmoment, 0-100, Vmax). Trigger: Vorwärtsbewegung aus dem Stand.")
-        d_col1, d_col2 = st.columns(2)
-        with d_col1:
-            if st.button("🚀 DRAG START", width='stretch', type="primary", disabled=state_for_buttons.startswith("ARMED") or state_for_buttons.startswith("RECORDING")):
-                set_logger_state("ARMED_DRAG")
-                st.rerun()
-        with d_col2:
-            if st.button("⏹️ DRAG STOPP", width='stretch', disabled=not (state_for_buttons.startswith("ARMED_DRAG") or state_for_buttons.startswith("RECORDING_DRAG"))):
-                set_logger_state("FINISHED")
-                st.rerun()
+            # DRAG RUN
+            st.markdown("#### 🏁 Drag Run Recording")
+            st.caption("Optimiert für Beschleunigung (Drehmoment, 0-100, Vmax). Trigger: Vorwärtsbewegung aus dem Stand.")
+            d_col1, d_col2 = st.columns(2)
+            with d_col1:
+                if st.button("🚀 DRAG START", width='stretch', type="primary", disabled=state_for_buttons.startswith("ARMED") or state_for_buttons.startswith("RECORDING")):
+                    set_logger_state("ARMED_DRAG")
+                    st.rerun()
+            with d_col2:
+                if st.button("⏹️ DRAG STOPP", width='stretch', disabled=not (state_for_buttons.startswith("ARMED_DRAG") or state_for_buttons.startswith("RECORDING_DRAG"))):
+                    set_logger_state("FINISHED")
+                    st.rerun()
                 
-        st.markdown("<br>", unsafe_allow_html=True)
+            st.markdown("<br>", unsafe_allow_html=True)
         
-        # HANDLING RUN
-        st.markdown("#### 🏎️ Handling Run Recording")
-        st.caption("Optimiert für Kurvenfahrten (G-Force, Sektoren). Trigger: Sobald das Auto fährt.")
-        h_col1, h_col2 = st.columns(2)
-        with h_col1:
-            if st.button("🏎️ HANDLING START", width='stretch', type="primary", disabled=state_for_buttons.startswith("ARMED") or state_for_buttons.startswith("RECORDING")):
-                set_logger_state("ARMED_HANDLING")
-                st.rerun()
-        with h_col2:
-            if st.button("⏹️ HANDLING STOPP", width='stretch', disabled=not (state_for_buttons.startswith("ARMED_HANDLING") or state_for_buttons.startswith("RECORDING_HANDLING"))):
-                set_logger_state("FINISHED")
-                st.rerun()
+            # HANDLING RUN
+            st.markdown("#### 🏎️ Handling Run Recording")
+            st.caption("Optimiert für Kurvenfahrten (G-Force, Sektoren). Trigger: Sobald das Auto fährt.")
+            h_col1, h_col2 = st.columns(2)
+            with h_col1:
+                if st.button("🏎️ HANDLING START", width='stretch', type="primary", disabled=state_for_buttons.startswith("ARMED") or state_for_buttons.startswith("RECORDING")):
+                    set_logger_state("ARMED_HANDLING")
+                    st.rerun()
+            with h_col2:
+                if st.button("⏹️ HANDLING STOPP", width='stretch', disabled=not (state_for_buttons.startswith("ARMED_HANDLING") or state_for_buttons.startswith("RECORDING_HANDLING"))):
+                    set_logger_state("FINISHED")
+                    st.rerun()
                 
-        st.markdown("---")
-        if state_for_buttons != "IDLE" and state_for_buttons != "FINISHED":
-            if st.button("🔴 Not-Stopp / System Reset", width='stretch', type='secondary'):
-                set_logger_state("FINISHED")
-                st.rerun()
+            st.markdown("---")
+            if state_for_buttons != "IDLE" and state_for_buttons != "FINISHED":
+                if st.button("🔴 Not-Stopp / System Reset", width='stretch', type='secondary'):
+                    set_logger_state("FINISHED")
+                    st.rerun()
                 
-    ampel_placeholder = col_light.empty()
+        ampel_placeholder = col_light.empty()
     
-    @st.fragment(run_every=0.5)
-    def render_auto_updating_status():
-        state = get_logger_state()
+        @st.fragment(run_every=0.5)
+        def render_auto_updating_status():
+            state = get_logger_state()
         
-        with status_placeholder.container():
-            st.markdown("### 📡 SYSTEM STATUS")
-            if state == "IDLE":
-                st.error("🔴 STANDBY / KEINE AUFZEICHNUNG")
-            elif state.startswith("ARMED"):
-                st.warning(f"🟡 BEREIT ({state}) - WARTET AUF TRIGGER (Gaspedal / Bewegung)...")
-            elif state.startswith("RECORDING"):
-                st.success(f"🟢 AUFZEICHNUNG LÄUFT! ({state}) - DATEN WERDEN GESAMMELT...")
-            elif state == "FINISHED":
-                st.info("✅ RUN ERFOLGREICH GESPEICHERT! (Datenbank aktualisiert)")
-
-        with ampel_placeholder.container():
-            st.subheader("🚥 Status Ampel")
-            color_red = "#ff3333" if state == "IDLE" or state == "FINISHED" else "#330000"
-            color_yellow = "#ffcc00" if state.startswith("ARMED") else "#333300"
-            color_green = "#33cc33" if state.startswith("RECORDING") else "#003300"
+            with status_placeholder.container():
+                st.markdown("### 📡 SYSTEM STATUS")
+                if state == "IDLE":
+                    st.error("🔴 STANDBY / KEINE AUFZEICHNUNG")
+                elif state.startswith("ARMED"):
+                    st.warning(f"🟡 BEREIT ({state}) - WARTET AUF TRIGGER (Gaspedal / Bewegung)...")
+                elif state.startswith("RECORDING"):
+                    st.success(f"🟢 AUFZEICHNUNG LÄUFT! ({state}) - DATEN WERDEN GESAMMELT...")
+                elif state == "FINISHED":
+                    st.info("✅ RUN ERFOLGREICH GESPEICHERT! (Datenbank aktualisiert)")
+
+            with ampel_placeholder.container():
+                st.subheader("🚥 Status Ampel")
+                color_red = "#ff3333" if state == "IDLE" or state == "FINISHED" else "#330000"
+                color_yellow = "#ffcc00" if state.startswith("ARMED") else "#333300"
+                color_green = "#33cc33" if state.startswith("RECORDING") else "#003300"
             
-            ampel_html = f"""
-            <div style='background-color: #222; border-radius: 20px; padding: 20px; width: 120px; margin: 0 auto; display: flex; flex-direction: column; align-items: center; gap: 15px; border: 3px solid #444; box-shadow: 0px 0px 15px rgba(0,0,0,0.5);'>
-                <div style='width: 60px; height: 60px; border-radius: 50%; background-color: {color_red}; box-shadow: 0 0 {"20px" if color_red=="#ff3333" else "0px"} {color_red};'></div>
-                <div style='width: 60px; height: 60px; border-radius: 50%; background-color: {color_yellow}; box-shadow: 0 0 {"20px" if color_yellow=="#ffcc00" else "0px"} {color_yellow};'></div>
-                <div style='width: 60px; height: 60px; border-radius: 50%; background-color: {color_green}; box-shadow: 0 0 {"20px" if color_green=="#33cc33" else "0px"} {color_green};'></div>
-            </div>
-            """
-            st.markdown(ampel_html, unsafe_allow_html=True)
+                ampel_html = f"""
+                <div style='background-color: #222; border-radius: 20px; padding: 20px; width: 120px; margin: 0 auto; display: flex; flex-direction: column; align-items: center; gap: 15px; border: 3px solid #444; box-shadow: 0px 0px 15px rgba(0,0,0,0.5);'>
+                    <div style='width: 60px; height: 60px; border-radius: 50%; background-color: {color_red}; box-shadow: 0 0 {"20px" if color_red=="#ff3333" else "0px"} {color_red};'></div>
+                    <div style='width: 60px; height: 60px; border-radius: 50%; background-color: {color_yellow}; box-shadow: 0 0 {"20px" if color_yellow=="#ffcc00" else "0px"} {color_yellow};'></div>
+                    <div style='width: 60px; height: 60px; border-radius: 50%; background-color: {color_green}; box-shadow: 0 0 {"20px" if color_green=="#33cc33" else "0px"} {color_green};'></div>
+                </div>
+                """
+                st.markdown(ampel_html, unsafe_allow_html=True)
             
-    render_auto_updating_status()        
-    with col_monitor:
-        st.subheader("⏱️ Echtzeit-Monitor")
+        render_auto_updating_status()        
+        with col_monitor:
+            st.subheader("⏱️ Echtzeit-Monitor")
         
-        # Integriertes Live-Gauge
-        import sys
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        if current_dir not in sys.path:
-            sys.path.append(current_dir)
+            # Integriertes Live-Gauge
+            import sys
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            if current_dir not in sys.path:
+                sys.path.append(current_dir)
             
-        try:
-            from pyRfactor2SharedMemory.sharedMemoryAPI import SimInfoAPI
-            info = SimInfoAPI()
-            live_active = info.isRF2running() and info.isSharedMemoryAvailable()
-        except:
-            live_active = False
+            try:
+                from pyRfactor2SharedMemory.sharedMemoryAPI import SimInfoAPI
+                info = SimInfoAPI()
+                live_active = info.isRF2running() and info.isSharedMemoryAvailable()
+            except:
+                live_active = False
             
-        if not live_active:
-            st.info("Keine aktive Verbindung zu LMU / rFactor 2 Shareld Memory gefunden.")
-            # Dummy Gauge
-            fig_gauge = go.Figure(go.Indicator(
-                mode="gauge+number", value=0, title={'text': "Speed (km/h)"},
-                gauge={'axis': {'range': [None, 350]}, 'bar': {'color': "#ff0055"}}
-            ))
-            fig_gauge.update_layout(height=250, margin=dict(l=20, r=20, t=30, b=20), template="plotly_dark")
-            st.plotly_chart(fig_gauge, width='stretch')
-        else:
-            speed_placeholder = st.empty()
-            st.caption("Livedaten-Stream (Aktualisiert automatisch alle 0.5s wenn aktiv)")
+            if not live_active:
+                st.info("Keine aktive Verbindung zu LMU / rFactor 2 Shareld Memory gefunden.")
+                # Dummy Gauge
+                fig_gauge = go.Figure(go.Indicator(
+                    mode="gauge+number", value=0, title={'text': "Speed (km/h)"},
+                    gauge={'axis': {'range': [None, 350]}, 'bar': {'color': "#ff0055"}}
+                ))
+                fig_gauge.update_layout(height=250, margin=dict(l=20, r=20, t=30, b=20), template="plotly_dark")
+                st.plotly_chart(fig_gauge, width='stretch')
+            else:
+                speed_placeholder = st.empty()
+                st.caption("Livedaten-Stream (Aktualisiert automatisch alle 0.5s wenn aktiv)")
             
-            # Um das UI-Blockieren zu verhindern, initialisieren wir ein Gauge, und machen ein Optionales Auto Update
-            update_live = st.toggle("Live Telemetrie Update aktivieren", value=state_for_buttons.startswith("ARMED") or state_for_buttons.startswith("RECORDING"))
+                # Um das UI-Blockieren zu verhindern, initialisieren wir ein Gauge, und machen ein Optionales Auto Update
+                update_live = st.toggle("Live Telemetrie Update aktivieren", value=state_for_buttons.startswith("ARMED") or state_for_buttons.startswith("RECORDING"))
             
-            if update_live:
-                @st.fragment(run_every=0.5)
-                def render_live_gauge():
-                    try:
-                        if info.isRF2running() and info.isOnTrack():
-                            telemetry = info.playersVehicleTelemetry()
-                            speed_kmh = abs(telemetry.mLocalVel.z) * 3.6
-                            rpm = telemetry.mEngineRPM
-                        else:
-                            speed_kmh = 0
-                            rpm = 0
+                if update_live:
+                    @st.fragment(run_every=0.5)
+                    def render_live_gauge():
+                        try:
+                            if info.isRF2running() and info.isOnTrack():
+                                telemetry = info.playersVehicleTelemetry()
+                                speed_kmh = abs(telemetry.mLocalVel.z) * 3.6
+                                rpm = telemetry.mEngineRPM
+                            else:
+                                speed_kmh = 0
+                                rpm = 0
                             
-                        fig_gauge = go.Figure(go.Indicator(
-                            mode="gauge+number",
-                            value=speed_kmh,
-                            title={'text': f"Speed<br><span style='font-size:0.8em;color:gray'>RPM: {rpm:.0f}</span>"},
-                            gauge={
-                                'axis': {'range': [None, 350]},
-                                'bar': {'color': "#00ff88"},
-                                'steps': [{'range': [0, 100], 'color': '#222'}, {'range': [100, 200], 'color': '#333'}],
-                                'threshold': {'line': {'color': "red", 'width': 4}, 'thickness': 0.75, 'value': speed_kmh}
-                            }
-                        ))
-                        fig_gauge.update_layout(height=280, margin=dict(l=20, r=20, t=10, b=10), template="plotly_dark")
-                        speed_placeholder.plotly_chart(fig_gauge, width='stretch')
-                    except Exception as e:
-                        st.warning("Echtzeit-Verbindungsfehler.")
+                            fig_gauge = go.Figure(go.Indicator(
+                                mode="gauge+number",
+                                value=speed_kmh,
+                                title={'text': f"Speed<br><span style='font-size:0.8em;color:gray'>RPM: {rpm:.0f}</span>"},
+                                gauge={
+                                    'axis': {'range': [None, 350]},
+                                    'bar': {'color': "#00ff88"},
+                                    'steps': [{'range': [0, 100], 'color': '#222'}, {'range': [100, 200], 'color': '#333'}],
+                                    'threshold': {'line': {'color': "red", 'width': 4}, 'thickness': 0.75, 'value': speed_kmh}
+                                }
+                            ))
+                            fig_gauge.update_layout(height=280, margin=dict(l=20, r=20, t=10, b=10), template="plotly_dark")
+                            speed_placeholder.plotly_chart(fig_gauge, width='stretch')
+                        except Exception as e:
+                            st.warning("Echtzeit-Verbindungsfehler.")
                 
-                render_live_gauge()
-            else:
-                fig_gauge = go.Figure(go.Indicator(
-                    mode="gauge+number", value=0, title={'text': "Speed (km/h)"},
-                    gauge={'axis': {'range': [None, 350]}, 'bar': {'color': "#555"}}
-                ))
-                fig_gauge.update_layout(height=280, margin=dict(l=20, r=20, t=10, b=10), template="plotly_dark")
-                speed_placeholder.plotly_chart(fig_gauge, width='stretch')
+                    render_live_gauge()
+                else:
+                    fig_gauge = go.Figure(go.Indicator(
+                        mode="gauge+number", value=0, title={'text': "Speed (km/h)"},
+                        gauge={'axis': {'range': [None, 350]}, 'bar': {'color': "#555"}}
+                    ))
+                    fig_gauge.update_layout(height=280, margin=dict(l=20, r=20, t=10, b=10), template="plotly_dark")
+                    speed_placeholder.plotly_chart(fig_gauge, width='stretch')
 
 
 with tab_laengs:
-    st.header("🚀 Längsdynamik (Motor, Drag, Schalten, Optimierung)")
+    if tab_open(tab_laengs, ["laengs_search", "laengs_car_a", "laengs_car_b", "virtual_fleet_envelope", "sync_speed_bench", "drag_math", "sync_speed", "shift_zoom"]):
+        st.header("🚀 Längsdynamik (Motor, Drag, Schalten, Optimierung)")
     
-    drag_runs = runs_df[(runs_df['run_type'] == 'DRAG') | (runs_df['run_type'].str.startswith('QUICK_SHIFT'))]
+        drag_runs, n_drag_found = get_run_choices(DRAG_RUN_FILTERS, "laengs_search", ["laengs_car_a", "laengs_car_b"])
     
-    if drag_runs.empty:
-        st.warning("Keine Drag-Daten zum Vergleichen vorhanden.")
-    else:
-        run_options = get_run_options(drag_runs).tolist()
+        if drag_runs.empty:
+            st.warning("Keine Drag-Daten zum Vergleichen vorhanden.")
+        else:
+            render_run_search("laengs_search", n_drag_found)
+            run_options = get_run_options(drag_runs).tolist()
         
-        col1, col2 = st.columns(2)
-        idx_a = get_default_run_index(run_options, st.session_state.car_a_name)
-        car_a_str = col1.selectbox("Fahrzeug/Setup A (Referenz)", run_options, index=idx_a, key="laengs_car_a", on_change=on_car_change, args=("laengs_car_a", "laengs_car_b", drag_runs))
+            col1, col2 = st.columns(2)
+            idx_a = get_default_run_index(run_options, st.session_state.car_a_name)
+            car_a_str = col1.selectbox("Fahrzeug/Setup A (Referenz)", run_options, index=idx_a, key="laengs_car_a", on_change=on_car_change, args=("laengs_car_a", "laengs_car_b", drag_runs))
         
-        idx_b = get_default_run_index(run_options, st.session_state.car_b_name)
-        if idx_b == 0 and len(run_options) > 1: idx_b = 1
-        car_b_str = col2.selectbox("Fahrzeug/Setup B (Vergleich)", run_options, index=idx_b, key="laengs_car_b", on_change=on_car_change, args=("laengs_car_a", "laengs_car_b", drag_runs))
+            idx_b = get_default_run_index(run_options, st.session_state.car_b_name)
+            if idx_b == 0 and len(run_options) > 1: idx_b = 1
+            car_b_str = col2.selectbox("Fahrzeug/Setup B (Vergleich)", run_options, index=idx_b, key="laengs_car_b", on_change=on_car_change, args=("laengs_car_a", "laengs_car_b", drag_runs))
         
-        run_a_id = int(car_a_str.split(" - ")[0])
-        run_b_id = int(car_b_str.split(" - ")[0])
+            run_a_id = int(car_a_str.split(" - ")[0])
+            run_b_id = int(car_b_str.split(" - ")[0])
         
-        sub_drag, sub_shift, sub_opt = st.tabs(["🚀 Performance Vergleich", "⚙️ Getriebe-Analyse", "🔧 Optimierung (Torque)"])
+            sub_drag, sub_shift, sub_opt = lazy_tabs(["🚀 Performance Vergleich", "⚙️ Getriebe-Analyse", "🔧 Optimierung (Torque)"], key="laengs_tab")
 
-        with sub_drag:
-            st.markdown("Vergleiche Beschleunigungszeiten und Vmax zwischen Fahrzeugen/Setups.")
-            mode = st.radio("Analyse-Modus:", ["Original-Telemetrie (Rohdaten)", "Virtual Best-Run (Mathematisch korrigiert)"], 
-                            help="Virtual Best-Run berechnet die Zeiten iterativ anhand der maximalen Beschleunigungskraft pro km/h ('Envelope'). Verlorene Zeit im Begrenzer ('Treppchen') wird mathematisch gelöscht und Schaltvorgänge auf 0.08s standardisiert. Dies ist der Goldstandard für reine Performance-Vergleiche!")
-            use_virtual_run = "Virtual Best-Run" in mode
+            with sub_drag:
+                if tab_open(sub_drag, ["virtual_fleet_envelope", "sync_speed_bench", "drag_math"]):
+                    st.markdown("Vergleiche Beschleunigungszeiten und Vmax zwischen Fahrzeugen/Setups.")
+                    mode = st.radio("Analyse-Modus:", ["Original-Telemetrie (Rohdaten)", "Virtual Best-Run (Mathematisch korrigiert)"], 
+                                    help="Virtual Best-Run berechnet die Zeiten iterativ anhand der maximalen Beschleunigungskraft pro km/h ('Envelope'). Verlorene Zeit im Begrenzer ('Treppchen') wird mathematisch gelöscht und Schaltvorgänge auf 0.08s standardisiert. Dies ist der Goldstandard für reine Performance-Vergleiche!")
+                    use_virtual_run = "Virtual Best-Run" in mode
+                    st.checkbox("Envelope aus allen Runs des Fahrzeugs", value=False, key="virtual_fleet_envelope", disabled=not use_virtual_run,
+                                help="Die Beschleunigungs-Envelope wird aus allen Drag-Runs des jeweiligen Fahrzeugs gebildet statt nur aus dem gewählten Run.")
             
-            st.number_input("Speed-Trigger für Synchronisation (km/h)", min_value=1, max_value=200, value=50, step=5, key="sync_speed_bench", help="Die Läufe werden exakt an dem Punkt ausgerichtet (Zeit=0), an dem sie diese Geschwindigkeit überschreiten. Ein Wert > 50 km/h eliminiert Fehler durch Schlupf oder unterschiedliche Reaktionszeiten am Start.")
+                    st.number_input("Speed-Trigger für Synchronisation (km/h)", min_value=1, max_value=200, value=50, step=5, key="sync_speed_bench", help="Die Läufe werden exakt an dem Punkt ausgerichtet (Zeit=0), an dem sie diese Geschwindigkeit überschreiten. Ein Wert > 50 km/h eliminiert Fehler durch Schlupf oder unterschiedliche Reaktionszeiten am Start.")
+                    st.selectbox("🧮 Math-Kanal (Overlay)", math_channel_options(), key="drag_math",
+                                 help="Zusätzlicher Chart mit einem Math-Kanal beider Runs (Rohdaten über der Run-Zeit). Eigene Kanäle werden in der Garage definiert.")
             
-            if st.button("Vergleich Starten"):
-                tele_a = load_telemetry(run_a_id)
-                tele_b = load_telemetry(run_b_id)
-                sync_speed_bench_val = st.session_state.sync_speed_bench
+                    if st.button("Vergleich Starten"):
+                        tele_a = load_channels(run_a_id, DRAG_CHANNELS)
+                        tele_b = load_channels(run_b_id, DRAG_CHANNELS)
+                        sync_speed_bench_val = st.session_state.sync_speed_bench
                 
-                if use_virtual_run:
-                    def generate_virtual_run(df):
-                        df_valid = df[df['torque'] > 0].copy()
-                        if df_valid.empty: return df
-                        
-                        df_valid['speed_bin'] = df_valid['speed_kmh'].round()
-                        envelope = df_valid.groupby('speed_bin')['torque'].quantile(0.95).reset_index()
-                        if len(envelope) < 5: return df
-                        
-                        min_bin = int(envelope['speed_bin'].min())
-                        max_bin = int(envelope['speed_bin'].max())
-                        envelope = envelope.set_index('speed_bin').reindex(range(min_bin, max_bin + 1)).interpolate(method='linear').reset_index()
-                        
-                        start_speed = max(0.0, df['speed_kmh'].iloc[0])
-                        max_speed = df['speed_kmh'].max()
-                        
-                        accels_m_s2 = np.maximum(envelope['torque'].values / 1000.0, 0.05)
-                        accel_interp = interp1d(envelope['speed_bin'].values, accels_m_s2, kind='linear', fill_value="extrapolate")
-                        
-                        sim_speeds = np.arange(start_speed, max_speed, 0.1)
-                        sim_times = []
-                        current_time = df['time_elapsed'].iloc[0]
-                        
-                        shift_speeds = []
-                        last_gear = df_valid['gear'].iloc[0]
-                        for i in range(1, len(df_valid)):
-                            if df_valid['gear'].iloc[i] > last_gear:
-                                shift_speeds.append(df_valid['speed_kmh'].iloc[i])
-                                last_gear = df_valid['gear'].iloc[i]
-                                
-                        shift_delay = 0.08
-                        shifts_applied = sum(1 for s in shift_speeds if s < start_speed)
-                        
-                        for v in sim_speeds:
-                            a = accel_interp(v)
-                            if a < 0.05: a = 0.05
-                            dt = (0.1 / 3.6) / a
-                            
-                            while shifts_applied < len(shift_speeds) and v >= shift_speeds[shifts_applied]:
-                                current_time += shift_delay
-                                shifts_applied += 1
-                                
-                            current_time += dt
-                            sim_times.append(current_time)
-                            
-                        return pd.DataFrame({
-                            'time_elapsed': sim_times,
-                            'speed_kmh': sim_speeds
-                        })
-                    
-                    tele_a = generate_virtual_run(tele_a)
-                    tele_b = generate_virtual_run(tele_b)
+                        if use_virtual_run:
+                            if st.session_state.virtual_fleet_envelope:
+                                tele_a = generate_virtual_run(tele_a, envelope=get_vehicle_envelope(drag_runs, run_a_id))
+                                tele_b = generate_virtual_run(tele_b, envelope=get_vehicle_envelope(drag_runs, run_b_id))
+                            else:
+                                tele_a = generate_virtual_run(tele_a)
+                                tele_b = generate_virtual_run(tele_b)
                 
-                def normalize_bench_run(df, target_sync_speed):
-                    df_start = df[df['speed_kmh'] >= target_sync_speed]
-                    if not df_start.empty:
-                        t0 = df_start.iloc[0]['time_elapsed']
-                        df_norm = df[df['time_elapsed'] >= t0].copy()
-                        df_norm['time_elapsed'] = df_norm['time_elapsed'] - t0
-                        return df_norm
-                    return df
-    
-                tele_a = normalize_bench_run(tele_a, sync_speed_bench_val)
-                tele_b = normalize_bench_run(tele_b, sync_speed_bench_val)
+                        tele_a = sync_to_speed(tele_a, sync_speed_bench_val)
+                        tele_b = sync_to_speed(tele_b, sync_speed_bench_val)
     
-                def calculate_0_to_x(df, target_speed):
-                    filtered = df[df['speed_kmh'] >= target_speed]
-                    if filtered.empty:
-                        return None
-                    return filtered.iloc[0]['time_elapsed'] - df.iloc[0]['time_elapsed']
-    
-                metrics_a = {
-                    f"{sync_speed_bench_val}-100 km/h": calculate_0_to_x(tele_a, 100),
-                    f"{sync_speed_bench_val}-200 km/h": calculate_0_to_x(tele_a, 200),
-                    f"{sync_speed_bench_val}-300 km/h": calculate_0_to_x(tele_a, 300),
-                    "Vmax": tele_a['speed_kmh'].max()
-                }
+                        metrics_a = {
+                            f"{sync_speed_bench_val}-100 km/h": time_to_speed(tele_a, 100),
+                            f"{sync_speed_bench_val}-200 km/h": time_to_speed(tele_a, 200),
+                            f"{sync_speed_bench_val}-300 km/h": time_to_speed(tele_a, 300),
+                            "Vmax": tele_a['speed_kmh'].max()
+                        }
                 
-                metrics_b = {
-                    f"{sync_speed_bench_val}-100 km/h": calculate_0_to_x(tele_b, 100),
-                    f"{sync_speed_bench_val}-200 km/h": calculate_0_to_x(tele_b, 200),
-                    f"{sync_speed_bench_val}-300 km/h": calculate_0_to_x(tele_b, 300),
-                    "Vmax": tele_b['speed_kmh'].max()
-                }
+                        metrics_b = {
+                            f"{sync_speed_bench_val}-100 km/h": time_to_speed(tele_b, 100),
+                            f"{sync_speed_bench_val}-200 km/h": time_to_speed(tele_b, 200),
+                            f"{sync_speed_bench_val}-300 km/h": time_to_speed(tele_b, 300),
+                            "Vmax": tele_b['speed_kmh'].max()
+                        }
                 
-                st.subheader("📊 Performance KPIs")
+                        st.subheader("📊 Performance KPIs")
                 
-                m_col1, m_col2, m_col3, m_col4 = st.columns(4)
+                        m_col1, m_col2, m_col3, m_col4 = st.columns(4)
                 
-                def render_metric(col, label, key):
-                    val_a = metrics_a[key]
-                    val_b = metrics_b[key]
+                        def render_metric(col, label, key):
+                            val_a = metrics_a[key]
+                            val_b = metrics_b[key]
                     
-                    if val_a is None: val_a_str = "N/A"
-                    elif key == "Vmax": val_a_str = f"{val_a:.1f} km/h"
-                    else: val_a_str = f"{val_a:.2f} s"
+                            if val_a is None: val_a_str = "N/A"
+                            elif key == "Vmax": val_a_str = f"{val_a:.1f} km/h"
+                            else: val_a_str = f"{val_a:.2f} s"
                     
-                    if val_a is not None and val_b is not None:
-                        delta = val_a - val_b
-                        # Für Vmax ist positiv besser, für Beschleunigung ist negativ besser
-                        if key == "Vmax":
-                            delta_str = f"{delta:+.1f} km/h (A vs B)"
-                            color = "normal" if delta == 0 else "inverse"  # invert colors natively in streamlit is tricky, let's just show string
-                        else:
-                            delta_str = f"{delta:+.2f} s (A vs B)"
-                    else:
-                        delta_str = "N/A"
+                            if val_a is not None and val_b is not None:
+                                delta = val_a - val_b
+                                # Für Vmax ist positiv besser, für Beschleunigung ist negativ besser
+                                if key == "Vmax":
+                                    delta_str = f"{delta:+.1f} km/h (A vs B)"
+                                    color = "normal" if delta == 0 else "inverse"  # invert colors natively in streamlit is tricky, let's just show string
+                                else:
+                                    delta_str = f"{delta:+.2f} s (A vs B)"
+                            else:
+                                delta_str = "N/A"
                         
-                    col.metric(label=f"A: {label}", value=val_a_str, delta=delta_str, delta_color="inverse" if key != "Vmax" else "normal")
+                            col.metric(label=f"A: {label}", value=val_a_str, delta=delta_str, delta_color="inverse" if key != "Vmax" else "normal")
                 
-                render_metric(m_col1, f"{sync_speed_bench_val}-100 km/h", f"{sync_speed_bench_val}-100 km/h")
-                render_metric(m_col2, f"{sync_speed_bench_val}-200 km/h", f"{sync_speed_bench_val}-200 km/h")
-                render_metric(m_col3, f"{sync_speed_bench_val}-300 km/h", f"{sync_speed_bench_val}-300 km/h")
-                render_metric(m_col4, "Vmax", "Vmax")
+                        render_metric(m_col1, f"{sync_speed_bench_val}-100 km/h", f"{sync_speed_bench_val}-100 km/h")
+                        render_metric(m_col2, f"{sync_speed_bench_val}-200 km/h", f"{sync_speed_bench_val}-200 km/h")
+                        render_metric(m_col3, f"{sync_speed_bench_val}-300 km/h", f"{sync_speed_bench_val}-300 km/h")
+                        render_metric(m_col4, "Vmax", "Vmax")
                 
-                st.subheader("Geschwindigkeit über Zeit / Speed-Curve Overlay")
+                        st.subheader("Geschwindigkeit über Zeit / Speed-Curve Overlay")
                 
-                # Beschneide die längere Linie auf die Zeit der kürzeren Linie für einen optisch fairen Vergleich
-                max_plot_time = min(tele_a['time_elapsed'].max(), tele_b['time_elapsed'].max())
-                tele_a_plot = tele_a[tele_a['time_elapsed'] <= max_plot_time]
-                tele_b_plot = tele_b[tele_b['time_elapsed'] <= max_plot_time]
+                        # Beschneide die längere Linie auf die Zeit der kürzeren Linie für einen optisch fairen Vergleich
+                        max_plot_time = min(tele_a['time_elapsed'].max(), tele_b['time_elapsed'].max())
+                        tele_a_plot = tele_a[tele_a['time_elapsed'] <= max_plot_time]
+                        tele_b_plot = tele_b[tele_b['time_elapsed'] <= max_plot_time]
                 
-                fig_speed = go.Figure()
-                fig_speed.add_trace(go.Scatter(x=tele_a_plot['time_elapsed'], y=tele_a_plot['speed_kmh'], name=f"A: {car_a_str.split(' - ')[1]}", mode='lines', line=dict(color='#00ff88')))
-                fig_speed.add_trace(go.Scatter(x=tele_b_plot['time_elapsed'], y=tele_b_plot['speed_kmh'], name=f"B: {car_b_str.split(' - ')[1]}", mode='lines', line=dict(color='#ff0055')))
+                        fig_speed = go.Figure()
+                        fig_speed.add_trace(telemetry_plot.make_trace(tele_a_plot['time_elapsed'], tele_a_plot['speed_kmh'], name=f"A: {car_a_str.split(' - ')[1]}", mode='lines', line=dict(color='#00ff88')))
+                        fig_speed.add_trace(telemetry_plot.make_trace(tele_b_plot['time_elapsed'], tele_b_plot['speed_kmh'], name=f"B: {car_b_str.split(' - ')[1]}", mode='lines', line=dict(color='#ff0055')))
                 
-                fig_speed.update_layout(xaxis_title="Time (s)", yaxis_title="Speed (km/h)", template="plotly_dark")
-                st.plotly_chart(fig_speed, width='stretch')
+                        fig_speed.update_layout(xaxis_title="Time (s)", yaxis_title="Speed (km/h)", template="plotly_dark")
+                        st.plotly_chart(fig_speed, width='stretch')
+
+                        if st.session_state.drag_math != MATH_NONE:
+                            render_math_channel_chart(st.session_state.drag_math, [(run_a_id, f"A: {car_a_str.split(' - ')[1]}", '#00ff88'),
+                                                                                   (run_b_id, f"B: {car_b_str.split(' - ')[1]}", '#ff0055')])
     
     
-        with sub_shift:
-            st.markdown("Vergleiche zwei Beschleunigungsfahrten hochpräzise. Analysiere Schaltlatenzen, RPM Tipps.")
-            st.number_input("Speed-Trigger für Synchronisation (km/h)", min_value=1, max_value=200, value=50, step=5, key="sync_speed", help="Die Läufe werden exakt an dem Punkt ausgerichtet (Zeit=0), an dem sie diese Geschwindigkeit überschreiten. Ein Wert > 50 km/h eliminiert Fehler durch Schlupf oder unterschiedliche Reaktionszeiten am Start.")
+            with sub_shift:
+                if tab_open(sub_shift, ["sync_speed", "shift_zoom"]):
+                    st.markdown("Vergleiche zwei Beschleunigungsfahrten hochpräzise. Analysiere Schaltlatenzen, RPM Tipps.")
+                    st.number_input("Speed-Trigger für Synchronisation (km/h)", min_value=1, max_value=200, value=50, step=5, key="sync_speed", help="Die Läufe werden exakt an dem Punkt ausgerichtet (Zeit=0), an dem sie diese Geschwindigkeit überschreiten. Ein Wert > 50 km/h eliminiert Fehler durch Schlupf oder unterschiedliche Reaktionszeiten am Start.")
+            
+                    st.slider("Zoom-Bereich (% der Zeitachse)", min_value=0, max_value=100, value=(0, 100), step=1, key="shift_zoom",
+                              help="Lädt für den gewählten Ausschnitt eine feinere Auflösung der Telemetrie (Shift Gap & Distanz-Delta).")
             
-            if st.button("🏁 Analyse Starten", type="primary", width='stretch'):
-                tele_a_raw = load_telemetry(run_a_id)
-                tele_b_raw = load_telemetry(run_b_id)
+                    if st.button("🏁 Analyse Starten", type="primary", width='stretch'):
+                        from scipy.interpolate import interp1d
+                        tele_a_raw = load_channels(run_a_id, SHIFT_CHANNELS)
+                        tele_b_raw = load_channels(run_b_id, SHIFT_CHANNELS)
                 
-                sync_speed = st.session_state.sync_speed
+                        sync_speed = st.session_state.sync_speed
                 
-                def normalize_run(df, target_sync_speed):
-                    df_start = df[df['speed_kmh'] >= target_sync_speed]
-                    if not df_start.empty:
-                        t0 = df_start.iloc[0]['time_elapsed']
-                        df_norm = df[df['time_elapsed'] >= t0].copy()
-                        df_norm['time_elapsed'] = df_norm['time_elapsed'] - t0
-                    else:
-                        df_norm = df.copy()
-                        
-                    # Berechne zurückgelegte Strecke (ds = v * dt)
-                    df_norm['distance_m'] = (df_norm['speed_kmh'] / 3.6) * df_norm['time_elapsed'].diff().fillna(0)
-                    df_norm['distance_cum'] = df_norm['distance_m'].cumsum()
-                    
-                    return df_norm
-                    
-                tele_a = normalize_run(tele_a_raw, sync_speed)
-                tele_b = normalize_run(tele_b_raw, sync_speed)
+                        tele_a = normalize_run(tele_a_raw, sync_speed, load_derived(run_a_id, ['distance_m']))
+                        tele_b = normalize_run(tele_b_raw, sync_speed, load_derived(run_b_id, ['distance_m']))
                 
-                def extract_shift_metrics(df):
-                    metrics = []
-                    # Shift detection: changing gear
-                    df = df.reset_index(drop=True)
-                    gear_changes = df[df['gear'].diff() > 0]
-                    
-                    for idx, row in gear_changes.iterrows():
-                        if idx == 0: continue
-                        gear_from = df.loc[idx-1, 'gear']
-                        gear_to = row['gear']
-                        shift_time = row['time_elapsed']
-                        
-                        # Window +/- 0.4s
-                        window = df[(df['time_elapsed'] >= shift_time - 0.4) & (df['time_elapsed'] <= shift_time + 0.4)]
-                        if window.empty: continue
-                        
-                        # Berechne avg torque im gelernten Gang (zur Referenz für Dips)
-                        avg_torque = 2000
-                        target_gear_data = df[(df['gear'] == gear_to) & (df['throttle'] > 0.9)]
-                        if not target_gear_data.empty:
-                            avg_t = target_gear_data['torque'].quantile(0.8)
-                            if avg_t > 0: avg_torque = avg_t
-                            
-                        drop_threshold = avg_torque * 0.4 # Einbruch unter 40% der Zugkraft = Shift Phase
-                        
-                        dip_window = window[window['torque'] < drop_threshold]
-                        
-                        if not dip_window.empty:
-                            latency = dip_window['time_elapsed'].max() - dip_window['time_elapsed'].min()
-                            latency_ms = latency * 1000
-                            # RPM landepunkt = first point after latency where torque >= threshold
-                            recover_df = window[(window['time_elapsed'] > dip_window['time_elapsed'].max()) & (window['torque'] >= drop_threshold)]
-                            rpm_land = recover_df.iloc[0]['rpm'] if not recover_df.empty else row['rpm']
-                        else:
-                            latency_ms = 0.0
-                            rpm_land = row['rpm']
-                            
-                        metrics.append({
-                            'gear_from': int(gear_from),
-                            'gear_to': int(gear_to),
-                            'time': shift_time,
-                            'latency_ms': latency_ms,
-                            'rpm_land': rpm_land
-                        })
-                    return metrics
-                    
-                shifts_a = extract_shift_metrics(tele_a)
-                shifts_b = extract_shift_metrics(tele_b)
+                        shifts_a = extract_shift_events(tele_a)
+                        shifts_b = extract_shift_events(tele_b)
                 
-                def calculate_0_to_x(df, target_speed):
-                    filtered = df[df['speed_kmh'] >= target_speed]
-                    if filtered.empty: return None
-                    return filtered.iloc[0]['time_elapsed'] - df.iloc[0]['time_elapsed']
-    
-                # --- Layout: KPIs ---
-                st.subheader("📊 Beschleunigungs-Intervalle & Vmax")
-                c1, c2, c3, c4 = st.columns(4)
+                        # --- Layout: KPIs ---
+                        st.subheader("📊 Beschleunigungs-Intervalle & Vmax")
+                        c1, c2, c3, c4 = st.columns(4)
                 
-                def render_accel_kpi(col, label, speed_start, speed_target):
-                    df_start_a = tele_a[tele_a['speed_kmh'] >= speed_start]
-                    df_start_b = tele_b[tele_b['speed_kmh'] >= speed_start]
-                    
-                    df_end_a = tele_a[tele_a['speed_kmh'] >= speed_target]
-                    df_end_b = tele_b[tele_b['speed_kmh'] >= speed_target]
+                        def render_accel_kpi(col, label, speed_start, speed_target):
+                            val_a = interval_time(tele_a, speed_start, speed_target)
+                            val_b = interval_time(tele_b, speed_start, speed_target)
                     
-                    val_a = (df_end_a.iloc[0]['time_elapsed'] - df_start_a.iloc[0]['time_elapsed']) if not df_end_a.empty and not df_start_a.empty else None
-                    val_b = (df_end_b.iloc[0]['time_elapsed'] - df_start_b.iloc[0]['time_elapsed']) if not df_end_b.empty and not df_start_b.empty else None
-                    
-                    val_a_str = f"{val_a:.2f} s" if val_a else "N/A"
-                    if val_a and val_b:
-                        delta = val_a - val_b
-                        col.metric(label, val_a_str, delta=f"{delta:+.2f} s", delta_color="inverse")
-                    else:
-                        col.metric(label, val_a_str)
+                            val_a_str = f"{val_a:.2f} s" if val_a else "N/A"
+                            if val_a and val_b:
+                                delta = val_a - val_b
+                                col.metric(label, val_a_str, delta=f"{delta:+.2f} s", delta_color="inverse")
+                            else:
+                                col.metric(label, val_a_str)
                         
-                render_accel_kpi(c1, "0-100 km/h", sync_speed, 100) # Normed to sync_speed because of t=0 shift
-                render_accel_kpi(c2, "0-200 km/h", sync_speed, 200)
-                render_accel_kpi(c3, "100-250 km/h", 100, 250)
+                        render_accel_kpi(c1, "0-100 km/h", sync_speed, 100) # Normed to sync_speed because of t=0 shift
+                        render_accel_kpi(c2, "0-200 km/h", sync_speed, 200)
+                        render_accel_kpi(c3, "100-250 km/h", 100, 250)
                 
-                vmax_a = tele_a['speed_kmh'].max()
-                vmax_b = tele_b['speed_kmh'].max()
-                c4.metric("Vmax", f"{vmax_a:.1f} km/h", delta=f"{vmax_a - vmax_b:+.1f} km/h", delta_color="normal")
+                        vmax_a = tele_a['speed_kmh'].max()
+                        vmax_b = tele_b['speed_kmh'].max()
+                        c4.metric("Vmax", f"{vmax_a:.1f} km/h", delta=f"{vmax_a - vmax_b:+.1f} km/h", delta_color="normal")
                 
-                st.markdown("---")
+                        st.markdown("---")
                 
-                st.subheader("⚙️ Shift-Performance Tabelle")
-                col_t1, col_t2 = st.columns(2)
+                        st.subheader("⚙️ Shift-Performance Tabelle")
+                        col_t1, col_t2 = st.columns(2)
                 
-                with col_t1:
-                    st.markdown("**Auto A: Schaltanalyse**")
-                    if shifts_a:
-                        df_sa = pd.DataFrame(shifts_a)
-                        df_sa['Gangwechsel'] = df_sa['gear_from'].astype(str) + " ➡️ " + df_sa['gear_to'].astype(str)
-                        df_sa['Latenz (Zugkraftunterbrechung)'] = df_sa['latency_ms'].map("{:.0f} ms".format)
-                        df_sa['RPM Landepunkt'] = df_sa['rpm_land'].map("{:.0f} RPM".format)
-                        st.dataframe(df_sa[['Gangwechsel', 'Latenz (Zugkraftunterbrechung)', 'RPM Landepunkt']], hide_index=True, width='stretch')
-                    else:
-                        st.info("Keine Schaltvorgänge gefunden.")
+                        with col_t1:
+                            st.markdown("**Auto A: Schaltanalyse**")
+                            if not shifts_a.empty:
+                                df_sa = shifts_a.copy()
+                                df_sa['Gangwechsel'] = df_sa['gear_from'].astype(str) + " ➡️ " + df_sa['gear_to'].astype(str)
+                                df_sa['Latenz (Zugkraftunterbrechung)'] = df_sa['latency_ms'].map("{:.0f} ms".format)
+                                df_sa['RPM Landepunkt'] = df_sa['rpm_land'].map("{:.0f} RPM".format)
+                                df_sa['Speed-Verlust'] = df_sa['speed_loss_kmh'].map("{:.1f} km/h".format)
+                                st.dataframe(df_sa[['Gangwechsel', 'Latenz (Zugkraftunterbrechung)', 'RPM Landepunkt', 'Speed-Verlust']], hide_index=True, width='stretch')
+                            else:
+                                st.info("Keine Schaltvorgänge gefunden.")
                         
-                with col_t2:
-                    st.markdown("**Auto B: Schaltanalyse**")
-                    if shifts_b:
-                        df_sb = pd.DataFrame(shifts_b)
-                        df_sb['Gangwechsel'] = df_sb['gear_from'].astype(str) + " ➡️ " + df_sb['gear_to'].astype(str)
-                        df_sb['Latenz (Zugkraftunterbrechung)'] = df_sb['latency_ms'].map("{:.0f} ms".format)
-                        df_sb['RPM Landepunkt'] = df_sb['rpm_land'].map("{:.0f} RPM".format)
-                        st.dataframe(df_sb[['Gangwechsel', 'Latenz (Zugkraftunterbrechung)', 'RPM Landepunkt']], hide_index=True, width='stretch')
-                    else:
-                        st.info("Keine Schaltvorgänge gefunden.")
+                        with col_t2:
+                            st.markdown("**Auto B: Schaltanalyse**")
+                            if not shifts_b.empty:
+                                df_sb = shifts_b.copy()
+                                df_sb['Gangwechsel'] = df_sb['gear_from'].astype(str) + " ➡️ " + df_sb['gear_to'].astype(str)
+                                df_sb['Latenz (Zugkraftunterbrechung)'] = df_sb['latency_ms'].map("{:.0f} ms".format)
+                                df_sb['RPM Landepunkt'] = df_sb['rpm_land'].map("{:.0f} RPM".format)
+                                df_sb['Speed-Verlust'] = df_sb['speed_loss_kmh'].map("{:.1f} km/h".format)
+                                st.dataframe(df_sb[['Gangwechsel', 'Latenz (Zugkraftunterbrechung)', 'RPM Landepunkt', 'Speed-Verlust']], hide_index=True, width='stretch')
+                            else:
+                                st.info("Keine Schaltvorgänge gefunden.")
                         
-                # Gear by gear accel
-                def gear_accel(df):
-                    res = []
-                    for g in sorted(df['gear'].unique()):
-                        if g < 1: continue
-                        d = df[(df['gear'] == g) & (df['throttle'] > 0.9) & (df['torque'] > 0)]
-                        if not d.empty:
-                            res.append({'Gang': int(g), 'Accel': d['torque'].mean() / 1000.0})
-                    return pd.DataFrame(res)
+                        # Gear by gear accel
+                        ga_a = gear_accel(tele_a)
+                        ga_b = gear_accel(tele_b)
+                        if not ga_a.empty and not ga_b.empty:
+                            ga_merged = pd.merge(ga_a, ga_b, on='Gang', how='outer', suffixes=(' Auto A', ' Auto B')).fillna(0)
+                            fig_bar = go.Figure(data=[
+                                go.Bar(name='Auto A', x=ga_merged['Gang'], y=ga_merged['Accel Auto A'], marker_color='#00ff88'),
+                                go.Bar(name='Auto B', x=ga_merged['Gang'], y=ga_merged['Accel Auto B'], marker_color='#ff0055')
+                            ])
+                            fig_bar.update_layout(title="Durchschnittliche Beschleunigung pro Gang (Volllast) [m/s²]", barmode='group', template='plotly_dark')
+                            st.plotly_chart(fig_bar, width='stretch')
                     
-                ga_a = gear_accel(tele_a)
-                ga_b = gear_accel(tele_b)
-                if not ga_a.empty and not ga_b.empty:
-                    ga_merged = pd.merge(ga_a, ga_b, on='Gang', how='outer', suffixes=(' Auto A', ' Auto B')).fillna(0)
-                    fig_bar = go.Figure(data=[
-                        go.Bar(name='Auto A', x=ga_merged['Gang'], y=ga_merged['Accel Auto A'], marker_color='#00ff88'),
-                        go.Bar(name='Auto B', x=ga_merged['Gang'], y=ga_merged['Accel Auto B'], marker_color='#ff0055')
-                    ])
-                    fig_bar.update_layout(title="Durchschnittliche Beschleunigung pro Gang (Volllast) [m/s²]", barmode='group', template='plotly_dark')
-                    st.plotly_chart(fig_bar, width='stretch')
-                    
-                st.markdown("---")
+                        st.markdown("---")
+                
+                        st.subheader("📈 The Shift Gap - Speed Delta Overlay")
+                        st.markdown("Zoome in die Kurve rein, um den Geschwindigkeits-Dip bei jedem Gangwechsel ('Time Lost due to Over-Revving' / Latenz) genau zu sehen.")
                 
-                st.subheader("📈 The Shift Gap - Speed Delta Overlay")
-                st.markdown("Zoome in die Kurve rein, um den Geschwindigkeits-Dip bei jedem Gangwechsel ('Time Lost due to Over-Revving' / Latenz) genau zu sehen.")
+                        max_t = min(tele_a['time_elapsed'].max(), tele_b['time_elapsed'].max())
+                        ta_plot = tele_a[tele_a['time_elapsed'] <= max_t]
+                        tb_plot = tele_b[tele_b['time_elapsed'] <= max_t]
+                        # Zoom: Ausschnitt wird serverseitig in höherer Auflösung geladen bzw. ausgedünnt
+                        zoom_t = telemetry_plot.zoom_window(0.0, float(max_t), st.session_state.shift_zoom)
+                        ta_zoom = telemetry_plot.clip_window(ta_plot, 'time_elapsed', zoom_t)
+                        tb_zoom = telemetry_plot.clip_window(tb_plot, 'time_elapsed', zoom_t)
+                        zoom_end = float(max_t) if zoom_t is None else zoom_t[1]
                 
-                max_t = min(tele_a['time_elapsed'].max(), tele_b['time_elapsed'].max())
-                ta_plot = tele_a[tele_a['time_elapsed'] <= max_t]
-                tb_plot = tele_b[tele_b['time_elapsed'] <= max_t]
+                        from plotly.subplots import make_subplots
+                        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.08)
                 
-                from plotly.subplots import make_subplots
-                fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.08)
+                        def speed_trace(run_id, df_norm, df_raw):
+                            # Speed-Trace aus der LOD-Pyramide, zurückverschoben auf die synchronisierte Zeitachse
+                            if df_norm.empty:
+                                return df_norm['time_elapsed'], df_norm['speed_kmh']
+                            t0 = float(df_raw.loc[df_norm.index[0], 'time_elapsed'] - df_norm['time_elapsed'].iloc[0])
+                            trace = load_trace(run_id, 'time_elapsed', 'speed_kmh', window=(t0 + float(df_norm['time_elapsed'].iloc[0]), t0 + zoom_end))
+                            return trace['time_elapsed'] - t0, trace['speed_kmh']
                 
-                fig.add_trace(go.Scatter(x=ta_plot['time_elapsed'], y=ta_plot['speed_kmh'], name="Speed Auto A", mode='lines', line=dict(color='#00ff88')), row=1, col=1)
-                fig.add_trace(go.Scatter(x=tb_plot['time_elapsed'], y=tb_plot['speed_kmh'], name="Speed Auto B", mode='lines', line=dict(color='#ff0055')), row=1, col=1)
+                        trace_a_t, trace_a_v = speed_trace(run_a_id, ta_zoom, tele_a_raw)
+                        trace_b_t, trace_b_v = speed_trace(run_b_id, tb_zoom, tele_b_raw)
+                        fig.add_trace(telemetry_plot.make_trace(trace_a_t, trace_a_v, name="Speed Auto A", mode='lines', line=dict(color='#00ff88')), row=1, col=1)
+                        fig.add_trace(telemetry_plot.make_trace(trace_b_t, trace_b_v, name="Speed Auto B", mode='lines', line=dict(color='#ff0055')), row=1, col=1)
                 
-                # Delta
-                if len(tb_plot) > 5 and len(ta_plot) > 5:
-                    interp_b = interp1d(tb_plot['time_elapsed'], tb_plot['speed_kmh'], kind='linear', fill_value="extrapolate")
-                    delta_speed = ta_plot['speed_kmh'] - interp_b(ta_plot['time_elapsed'])
-                    fig.add_trace(go.Scatter(x=ta_plot['time_elapsed'], y=delta_speed, name='Delta (A - B) [km/h]', mode='lines', line=dict(color='#00bfff', width=1), fill='tozeroy'), row=2, col=1)
+                        # Delta
+                        if len(tb_plot) > 5 and len(ta_plot) > 5:
+                            interp_b = interp1d(tb_plot['time_elapsed'], tb_plot['speed_kmh'], kind='linear', fill_value="extrapolate")
+                            delta_speed = ta_zoom['speed_kmh'] - interp_b(ta_zoom['time_elapsed'])
+                            fig.add_trace(telemetry_plot.make_trace(ta_zoom['time_elapsed'], delta_speed, name='Delta (A - B) [km/h]', mode='lines', line=dict(color='#00bfff', width=1), fill='tozeroy'), row=2, col=1)
                 
-                # Shift Markers
-                for s in shifts_a:
-                    fig.add_vline(x=s['time'], line_dash="dash", line_color="rgba(0, 255, 136, 0.8)", row=1, col=1)
-                for s in shifts_b:
-                    fig.add_vline(x=s['time'], line_dash="dash", line_color="rgba(255, 0, 85, 0.8)", row=1, col=1)
+                        # Shift Markers
+                        for shift_time in shifts_a['time']:
+                            fig.add_vline(x=shift_time, line_dash="dash", line_color="rgba(0, 255, 136, 0.8)", row=1, col=1)
+                        for shift_time in shifts_b['time']:
+                            fig.add_vline(x=shift_time, line_dash="dash", line_color="rgba(255, 0, 85, 0.8)", row=1, col=1)
                     
-                fig.update_layout(height=600, template="plotly_dark", hovermode="x unified")
-                fig.update_xaxes(title_text="Zeit (s)", row=2, col=1)
-                fig.update_yaxes(title_text="Geschw. (km/h)", row=1, col=1)
-                fig.update_yaxes(title_text="Delta km/h", row=2, col=1)
-                st.plotly_chart(fig, width='stretch')
+                        fig.update_layout(height=600, template="plotly_dark", hovermode="x unified")
+                        fig.update_xaxes(title_text="Zeit (s)", row=2, col=1)
+                        fig.update_yaxes(title_text="Geschw. (km/h)", row=1, col=1)
+                        fig.update_yaxes(title_text="Delta km/h", row=2, col=1)
+                        st.plotly_chart(fig, width='stretch')
                 
-                st.markdown("---")
-                st.subheader("🏎️ Virtual Drag Race (Distanz-Delta)")
-                st.markdown("Das Distanz-Delta zeigt an, um wie viele Meter ein Auto voraus ist. Ein positiver Wert bedeutet, Auto A führt.")
+                        st.markdown("---")
+                        st.subheader("🏎️ Virtual Drag Race (Distanz-Delta)")
+                        st.markdown("Das Distanz-Delta zeigt an, um wie viele Meter ein Auto voraus ist. Ein positiver Wert bedeutet, Auto A führt.")
                 
-                if len(tb_plot) > 5 and len(ta_plot) > 5:
-                    interp_dist_b = interp1d(tb_plot['time_elapsed'], tb_plot['distance_cum'], kind='linear', fill_value="extrapolate")
-                    dist_delta = ta_plot['distance_cum'] - interp_dist_b(ta_plot['time_elapsed'])
+                        if len(tb_plot) > 5 and len(ta_plot) > 5:
+                            interp_dist_b = interp1d(tb_plot['time_elapsed'], tb_plot['distance_cum'], kind='linear', fill_value="extrapolate")
+                            dist_delta = ta_plot['distance_cum'] - interp_dist_b(ta_plot['time_elapsed'])
                     
-                    fig_dist = go.Figure()
-                    fig_dist.add_trace(go.Scatter(x=ta_plot['time_elapsed'], y=dist_delta, name='Vorsprung Auto A (Meter)', mode='lines', line=dict(color='#e0e0e0', width=3), fill='tozeroy'))
-                    fig_dist.update_layout(height=350, template="plotly_dark", xaxis_title="Zeit (s)", yaxis_title="Vorsprung Auto A [Meter]")
+                            fig_dist = go.Figure()
+                            dist_zoom = telemetry_plot.clip_window(ta_plot.assign(dist_delta=dist_delta), 'time_elapsed', zoom_t)
+                            fig_dist.add_trace(telemetry_plot.make_trace(dist_zoom['time_elapsed'], dist_zoom['dist_delta'], name='Vorsprung Auto A (Meter)', mode='lines', line=dict(color='#e0e0e0', width=3), fill='tozeroy'))
+                            fig_dist.update_layout(height=350, template="plotly_dark", xaxis_title="Zeit (s)", yaxis_title="Vorsprung Auto A [Meter]")
                     
-                    # Highlight Shifts im Distanzgraphen um zu sehen, wie sich der Abstand beim Schalten aufbaut
-                    for s in shifts_a:
-                        fig_dist.add_vline(x=s['time'], line_dash="dash", line_color="rgba(0, 255, 136, 0.5)")
+                            # Highlight Shifts im Distanzgraphen um zu sehen, wie sich der Abstand beim Schalten aufbaut
+                            for shift_time in shifts_a['time']:
+                                fig_dist.add_vline(x=shift_time, line_dash="dash", line_color="rgba(0, 255, 136, 0.5)")
                         
-                    st.plotly_chart(fig_dist, width='stretch')
+                            st.plotly_chart(fig_dist, width='stretch')
                     
-                    final_gap = dist_delta.iloc[-1]
-                    distance_driven = ta_plot['distance_cum'].iloc[-1]
-                    if final_gap > 0:
-                        st.success(f"🏁 **Zielkreuzung (nach {distance_driven:.0f} Metern):** Auto A gewinnt mit **{final_gap:.2f} Metern** Vorsprung!")
-                    elif final_gap < 0:
-                        st.error(f"🏁 **Zielkreuzung (nach {distance_driven:.0f} Metern):** Auto B gewinnt mit **{abs(final_gap):.2f} Metern** Vorsprung!")
-                    else:
-                        st.info(f"🏁 **Zielkreuzung (nach {distance_driven:.0f} Metern):** Unentschieden!")
+                            final_gap = dist_delta.iloc[-1]
+                            distance_driven = ta_plot['distance_cum'].iloc[-1]
+                            if final_gap > 0:
+                                st.success(f"🏁 **Zielkreuzung (nach {distance_driven:.0f} Metern):** Auto A gewinnt mit **{final_gap:.2f} Metern** Vorsprung!")
+                            elif final_gap < 0:
+                                st.error(f"🏁 **Zielkreuzung (nach {distance_driven:.0f} Metern):** Auto B gewinnt mit **{abs(final_gap):.2f} Metern** Vorsprung!")
+                            else:
+                                st.info(f"🏁 **Zielkreuzung (nach {distance_driven:.0f} Metern):** Unentschieden!")
+
+                            # Zeitabstand über der Distanz (beide Läufe auf dasselbe Distanz-Raster gelegt, siehe lap_align)
+                            gap_d, gap_t = lap_align.time_delta_over_distance(tele_a['distance_cum'], tele_a['time_elapsed'],
+                                                                              tele_b['distance_cum'], tele_b['time_elapsed'])
+                            if len(gap_d):
+                                fig_gap = go.Figure()
+                                fig_gap.add_trace(telemetry_plot.make_trace(gap_d, gap_t, name='Zeit-Delta (A - B)', mode='lines', line=dict(color='#00bfff', width=2), fill='tozeroy'))
+                                fig_gap.update_layout(height=300, template="plotly_dark", xaxis_title="Distanz seit Sync [m]", yaxis_title="Zeit-Delta A - B [s] (+ = A langsamer)")
+                                st.plotly_chart(fig_gap, width='stretch')
     
     
-        with sub_opt:
-            st.info("Die Optimierung wird für **Fahrzeug A** durchgeführt.")
-            selected_run_id = run_a_id
-            st.subheader("Getriebe-Daten & Übersetzung")
-            detection_mode = st.radio("Gear Ratio Detection Mode", ["Auto-Detect aus Telemetrie (Empfohlen)", "Manuelle Eingabe"])
+            with sub_opt:
+                if tab_open(sub_opt):
+                    st.info("Die Optimierung wird für **Fahrzeug A** durchgeführt.")
+                    selected_run_id = run_a_id
+                    st.subheader("Getriebe-Daten & Übersetzung")
+                    detection_mode = st.radio("Gear Ratio Detection Mode", ["Auto-Detect aus Telemetrie (Empfohlen)", "Manuelle Eingabe"])
             
-            gear_ratios = []
-            final_drive_input = 1.0
-            opt = ShiftOptimizer(DB_PATH)
+                    gear_ratios = []
+                    final_drive_input = 1.0
+                    from shift_optimizer import ShiftOptimizer, wheel_speed_kmh  # scipy erst laden, wenn der Tab geöffnet ist
+                    opt = ShiftOptimizer(DB_PATH)
             
-            if detection_mode == "Auto-Detect aus Telemetrie (Empfohlen)":
-                st.info("Das Tool berechnet das Verhältnis von Speed zu RPM basierend auf den Log-Daten des Autos automatisch und normiert die Kurven.")
-                detected_r_values = opt.get_auto_gear_ratios(selected_run_id)
-                if not detected_r_values:
-                    st.warning("Noch nicht genügend Telemetrie vorhanden (oder keine Volllast-Sektionen > 0.9 Throttle), um die Gänge automatisch zu erkennen. Bitte wechsle zur manuellen Eingabe.")
-                else:
-                    formatted_rs = ", ".join([f"G{i+1}: {r:.4f}" for i, r in enumerate(detected_r_values)])
-                    st.success(f"Erkannte Speed/RPM Ratio pro Gang: {formatted_rs}")
-                    # Mathematische Normierung: Ratio = 0.12 / R-Wert (entspricht dem alten Proxy in der Visualisierung)
-                    gear_ratios = [0.12 / r for r in detected_r_values]
-                    final_drive_input = 1.0 # Base factor
+                    if detection_mode == "Auto-Detect aus Telemetrie (Empfohlen)":
+                        st.info("Das Tool berechnet das Verhältnis von Speed zu RPM basierend auf den Log-Daten des Autos automatisch und normiert die Kurven.")
+                        detected_r_values = opt.get_auto_gear_ratios(selected_run_id)
+                        if not detected_r_values:
+                            st.warning("Noch nicht genügend Telemetrie vorhanden (oder keine Volllast-Sektionen > 0.9 Throttle), um die Gänge automatisch zu erkennen. Bitte wechsle zur manuellen Eingabe.")
+                        else:
+                            formatted_rs = ", ".join([f"G{i+1}: {r:.4f}" for i, r in enumerate(detected_r_values)])
+                            st.success(f"Erkannte Speed/RPM Ratio pro Gang: {formatted_rs}")
+                            # Mathematische Normierung: Ratio = 0.12 / R-Wert (entspricht dem alten Proxy in der Visualisierung)
+                            gear_ratios = [0.12 / r for r in detected_r_values]
+                            final_drive_input = 1.0 # Base factor
                     
-            else:
-                col1, col2 = st.columns(2)
-                ratios_input = col1.text_input("Gear Ratios (kommagetrennt, z.B. 2.50, 1.90, 1.45, 1.20, 1.0, 0.85)", "2.50, 1.90, 1.45, 1.20, 1.0, 0.85")
-                final_drive_input = col2.number_input("Final Drive Ratio", value=3.40, step=0.1)
-                try:
-                    gear_ratios = [float(r.strip()) for r in ratios_input.split(',')]
-                except:
-                    st.error("Bitte überprüfe das Format der Gear Ratios.")
+                    else:
+                        col1, col2 = st.columns(2)
+                        ratios_input = col1.text_input("Gear Ratios (kommagetrennt, z.B. 2.50, 1.90, 1.45, 1.20, 1.0, 0.85)", "2.50, 1.90, 1.45, 1.20, 1.0, 0.85")
+                        final_drive_input = col2.number_input("Final Drive Ratio", value=3.40, step=0.1)
+                        try:
+                            gear_ratios = [float(r.strip()) for r in ratios_input.split(',')]
+                        except:
+                            st.error("Bitte überprüfe das Format der Gear Ratios.")
             
-            st.subheader("Physikalische Fahrzeug-Parameter")
-            st.info("Du musst diese Werte nicht exakt wissen. Wähle einfach die ungefähre Fahrzeugklasse aus dem Dropdown, um realistische Standardwerte für Masse und Aerodynamik zu laden. Dies reicht für hochpräzise Schaltpunkte völlig aus!")
+                    st.subheader("Physikalische Fahrzeug-Parameter")
+                    st.info("Du musst diese Werte nicht exakt wissen. Wähle einfach die ungefähre Fahrzeugklasse aus dem Dropdown, um realistische Standardwerte für Masse und Aerodynamik zu laden. Dies reicht für hochpräzise Schaltpunkte völlig aus!")
             
-            presets = {
-                "GTE / LM GTE": {"mass": 1245.0, "radius": 0.35, "cwa": 1.60},
-                "Hypercar (LMH / LMDh)": {"mass": 1050.0, "radius": 0.35, "cwa": 1.35},
-                "LMP2": {"mass": 930.0, "radius": 0.33, "cwa": 1.25},
-                "GT3": {"mass": 1300.0, "radius": 0.34, "cwa": 1.55},
-                "Manuelle Eingabe": {"mass": 1200.0, "radius": 0.33, "cwa": 1.50}
-            }
+                    presets = {
+                        "GTE / LM GTE": {"mass": 1245.0, "radius": 0.35, "cwa": 1.60},
+                        "Hypercar (LMH / LMDh)": {"mass": 1050.0, "radius": 0.35, "cwa": 1.35},
+                        "LMP2": {"mass": 930.0, "radius": 0.33, "cwa": 1.25},
+                        "GT3": {"mass": 1300.0, "radius": 0.34, "cwa": 1.55},
+                        "Manuelle Eingabe": {"mass": 1200.0, "radius": 0.33, "cwa": 1.50}
+                    }
             
-            # Versuche eine smarte Vorauswahl basierend auf Fahrzeugnamen, falls möglich:
-            default_idx = 0 # GTE
-            try:
-                v_name_lower = runs_df[runs_df['id'] == selected_run_id]['vehicle_name'].values[0].lower()
-                if "hypercar" in v_name_lower or "lmdh" in v_name_lower or "lmh" in v_name_lower or "toyota" in v_name_lower or "ferrari_499" in v_name_lower or "porsche_963" in v_name_lower:
-                    default_idx = 1
-                elif "lmp2" in v_name_lower or "oreca" in v_name_lower:
-                    default_idx = 2
-                elif "gt3" in v_name_lower:
-                    default_idx = 3
-            except:
-                pass
+                    # Versuche eine smarte Vorauswahl basierend auf Fahrzeugnamen, falls möglich:
+                    default_idx = 0 # GTE
+                    try:
+                        v_name_lower = drag_runs[drag_runs['id'] == selected_run_id]['vehicle_name'].values[0].lower()
+                        if "hypercar" in v_name_lower or "lmdh" in v_name_lower or "lmh" in v_name_lower or "toyota" in v_name_lower or "ferrari_499" in v_name_lower or "porsche_963" in v_name_lower:
+                            default_idx = 1
+                        elif "lmp2" in v_name_lower or "oreca" in v_name_lower:
+                            default_idx = 2
+                        elif "gt3" in v_name_lower:
+                            default_idx = 3
+                    except:
+                        pass
                 
-            preset_choice = st.selectbox("Fahrzeugklasse (Preset)", list(presets.keys()), index=default_idx)
-            def_vals = presets[preset_choice]
+                    preset_choice = st.selectbox("Fahrzeugklasse (Preset)", list(presets.keys()), index=default_idx)
+                    def_vals = presets[preset_choice]
     
-            col_p1, col_p2, col_p3, col_p4 = st.columns(4)
-            c_mass = col_p1.number_input("Fahrzeugmasse (kg)", value=def_vals["mass"], step=10.0, help="Masse inkl. Fahrer und Kraftstoff")
-            c_radius = col_p2.number_input("Radradius (m)", value=def_vals["radius"], step=0.01, help="Statischer Radius der Reifen. GTE/LMH: ca. 0.35m")
-            c_cwa = col_p3.number_input("Luftwiderstand $C_w \\cdot A$", value=def_vals["cwa"], step=0.1, help="Widerstandsbeiwert × Stirnfläche")
-            c_rho = col_p4.number_input("Luftdichte (kg/m³)", value=1.23, step=0.01)
+                    col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+                    c_mass = col_p1.number_input("Fahrzeugmasse (kg)", value=def_vals["mass"], step=10.0, help="Masse inkl. Fahrer und Kraftstoff")
+                    c_radius = col_p2.number_input("Radradius (m)", value=def_vals["radius"], step=0.01, help="Statischer Radius der Reifen. GTE/LMH: ca. 0.35m")
+                    c_cwa = col_p3.number_input("Luftwiderstand $C_w \\cdot A$", value=def_vals["cwa"], step=0.1, help="Widerstandsbeiwert × Stirnfläche")
+                    c_rho = col_p4.number_input("Luftdichte (kg/m³)", value=1.23, step=0.01)
     
-            if st.button("Schaltpunkte berechnen"):
-                if not gear_ratios:
-                    st.stop()
+                    if st.button("Schaltpunkte berechnen"):
+                        if not gear_ratios:
+                            st.stop()
                     
-                token_curve = opt.get_torque_curve_from_run(
-                    selected_run_id, gear_ratios, final_drive_input,
-                    mass_kg=c_mass, wheel_radius_m=c_radius, c_w_a=c_cwa, rho=c_rho
-                )
+                        token_curve = opt.get_torque_curve_from_run(
+                            selected_run_id, gear_ratios, final_drive_input,
+                            mass_kg=c_mass, wheel_radius_m=c_radius, c_w_a=c_cwa, rho=c_rho
+                        )
                 
-                if token_curve is None or len(token_curve) < 5:
-                    st.error("Nicht genug valide Daten im ausgewählten Run oder die Telemetrie ist verschlüsselt (Torque=0).")
-                else:
-                    st.subheader("Berechnetes physikalisches Motor-Drehmoment")
-                    fig_engine = go.Figure()
-                    fig_engine.add_trace(go.Scatter(x=token_curve['rpm_rounded'], y=token_curve['torque_smoothed'], mode='lines', name='Torque Curve', line=dict(color='#ffaa00', width=3)))
-                    fig_engine.update_layout(xaxis_title="RPM", yaxis_title="Motor Drehmoment (Nm)", template="plotly_dark")
-                    st.plotly_chart(fig_engine, width='stretch')
+                        if token_curve is None or len(token_curve) < 5:
+                            st.error("Nicht genug valide Daten im ausgewählten Run oder die Telemetrie ist verschlüsselt (Torque=0).")
+                        else:
+                            st.subheader("Berechnetes physikalisches Motor-Drehmoment")
+                            fig_engine = go.Figure()
+                            fig_engine.add_trace(go.Scatter(x=token_curve['rpm_rounded'], y=token_curve['torque_smoothed'], mode='lines', name='Torque Curve', line=dict(color='#ffaa00', width=3)))
+                            fig_engine.update_layout(xaxis_title="RPM", yaxis_title="Motor Drehmoment (Nm)", template="plotly_dark")
+                            st.plotly_chart(fig_engine, width='stretch')
                     
-                    # Berechne Schaltpunkte
-                    shift_points, rpms, wheel_torques = opt.calculate_ideal_shift_points(token_curve, gear_ratios, final_drive_input, wheel_radius_m=c_radius)
+                            # Berechne Schaltpunkte
+                            shift_points, rpms, wheel_torques = opt.calculate_ideal_shift_points(token_curve, gear_ratios, final_drive_input, wheel_radius_m=c_radius)
                     
-                    # Speichere die Schaltpunkte ab für das Overlay
-                    import json
-                    try:
-                        conn_sp = sqlite3.connect(DB_PATH)
-                        cursor_sp = conn_sp.cursor()
-                        cursor_sp.execute('CREATE TABLE IF NOT EXISTS saved_profiles (run_id INTEGER PRIMARY KEY, vehicle_name TEXT, shift_points_json TEXT)')
+                            # Speichere die Schaltpunkte ab für das Overlay
+                            import json
+                            try:
+                                conn_sp = sqlite3.connect(DB_PATH)
+                                cursor_sp = conn_sp.cursor()
+                                cursor_sp.execute('CREATE TABLE IF NOT EXISTS saved_profiles (run_id INTEGER PRIMARY KEY, vehicle_name TEXT, shift_points_json TEXT)')
                         
-                        # Hole Fahrzeugnamen
-                        v_name = runs_df[runs_df['id'] == selected_run_id]['vehicle_name'].values[0]
+                                # Hole Fahrzeugnamen
+                                v_name = drag_runs[drag_runs['id'] == selected_run_id]['vehicle_name'].values[0]
                         
-                        cursor_sp.execute('''
-                            INSERT OR REPLACE INTO saved_profiles (run_id, vehicle_name, shift_points_json) 
-                            VALUES (?, ?, ?)
-                        ''', (selected_run_id, v_name, json.dumps(shift_points)))
-                        conn_sp.commit()
-                        conn_sp.close()
-                    except Exception as e:
-                        st.warning(f"Konnte Profile für Overlay nicht speichern: {e}")
+                                cursor_sp.execute('''
+                                    INSERT OR REPLACE INTO saved_profiles (run_id, vehicle_name, shift_points_json) 
+                                    VALUES (?, ?, ?)
+                                ''', (selected_run_id, v_name, json.dumps(shift_points)))
+                                conn_sp.commit()
+                                conn_sp.close()
+                            except Exception as e:
+                                st.warning(f"Konnte Profile für Overlay nicht speichern: {e}")
                     
-                    st.subheader("Brutto Radzugkraft vs Speed (Sägezahn-Schnittpunkte)")
-                    st.markdown("Hier siehst du die erzeugte Kraft am Rad in Newton. Der Schnittpunkt (Kraftverlust) erzwingt mathematisch den optimalen Schaltpunkt.")
-                    fig_wheel = go.Figure()
+                            st.subheader("Brutto Radzugkraft vs Speed (Sägezahn-Schnittpunkte)")
+                            st.markdown("Hier siehst du die erzeugte Kraft am Rad in Newton. Der Schnittpunkt (Kraftverlust) erzwingt mathematisch den optimalen Schaltpunkt.")
+                            fig_wheel = go.Figure()
                     
-                    for i, wt in enumerate(wheel_torques):
-                        # Berechne Proxy Geschwindgkeit, damit die Kurven sich auf der X-Achse überschneiden 
-                        # v_m/s = (RPM * 2 * pi / 60) * (wheel_radius) / (gear_ratio * final_drive)
-                        # v_km/h = v_m/s * 3.6
-                        try:
-                            ratio = gear_ratios[i]
-                        except:
-                            ratio = gear_ratios[-1]
-                            
-                        # Physisch korrekte Geschwindigkeit:
-                        v_mps = (rpms * 2 * np.pi / 60) * c_radius / (ratio * final_drive_input)
-                        speed_proxy = v_mps * 3.6
-                        
-                        fig_wheel.add_trace(go.Scatter(x=speed_proxy, y=wt, mode='lines', name=f'Gang {i+1}'))
+                            for i, wt in enumerate(wheel_torques):
+                                # Geschwindigkeit je Gang, damit die Kurven sich auf der X-Achse überschneiden
+                                speed_proxy = wheel_speed_kmh(rpms, gear_ratios[i], final_drive_input, c_radius)
+                                fig_wheel.add_trace(go.Scatter(x=speed_proxy, y=wt, mode='lines', name=f'Gang {i+1}'))
                     
-                    fig_wheel.update_layout(xaxis_title="Geschwindigkeit (km/h)", yaxis_title="Radzugkraft (F_wheel) [N]", template="plotly_dark")
-                    st.plotly_chart(fig_wheel, width='stretch')
+                            fig_wheel.update_layout(xaxis_title="Geschwindigkeit (km/h)", yaxis_title="Radzugkraft (F_wheel) [N]", template="plotly_dark")
+                            st.plotly_chart(fig_wheel, width='stretch')
                     
-                    st.subheader("✅ Empfohlene Schaltpunkte")
-                    for sp in shift_points:
-                        st.success(f"Schalte **Gang {sp['from_gear']} ➡️ {sp['to_gear']}** bei **{sp['shift_rpm']:.0f} RPM** (RPM fällt auf ca. {sp['rpm_drop_to']:.0f})")
+                            st.subheader("✅ Empfohlene Schaltpunkte")
+                            for sp in shift_points:
+                                st.success(f"Schalte **Gang {sp['from_gear']} ➡️ {sp['to_gear']}** bei **{sp['shift_rpm']:.0f} RPM** / {sp['shift_speed_kmh']:.1f} km/h (RPM fällt auf ca. {sp['rpm_drop_to']:.0f})")
+
+                            if shift_points:
+                                st.markdown("**Zugkraft-Verlust bei abweichender Schaltdrehzahl** (Fläche zwischen den Kurven oben, N·km/h):")
+                                loss_offsets = [-1000, -500, -250, 250]
+                                optimal_rpms = np.array([sp['shift_rpm'] for sp in shift_points])
+                                losses = opt.calculate_shift_losses(token_curve, gear_ratios, final_drive_input,
+                                                                    optimal_rpms[:, None] + np.array(loss_offsets, dtype=float), wheel_radius_m=c_radius)
+                                loss_df = pd.DataFrame(losses, columns=[f"{o:+d} RPM" for o in loss_offsets])
+                                loss_df.insert(0, "Gang", [f"{sp['from_gear']} ➡️ {sp['to_gear']}" for sp in shift_points])
+                                st.dataframe(loss_df.style.format(precision=0), width='stretch', hide_index=True)
     
     
 with tab_quer:
-    st.header("🏎️ Kurven & Grip")
-    st.markdown("Vergleiche das Fahrwerks- und Aerodynamik-Potenzial (Traktionskreis, Kurvenspeed, G-Kräfte) zwischen zwei Autos oder Setups.")
+    if tab_open(tab_quer, ["quer_search", "quer_car_a", "quer_car_b", "fuel_a", "fuel_b", "traction_vehicle_envelope", "track_zoom", "quer_math", "lap_reference"]):
+        st.header("🏎️ Kurven & Grip")
+        st.markdown("Vergleiche das Fahrwerks- und Aerodynamik-Potenzial (Traktionskreis, Kurvenspeed, G-Kräfte) zwischen zwei Autos oder Setups.")
     
-    handling_runs = runs_df[runs_df['run_type'] == 'HANDLING']
+        handling_runs, n_handling_found = get_run_choices(HANDLING_RUN_FILTERS, "quer_search", ["quer_car_a", "quer_car_b"])
     
-    if handling_runs.empty:
-        st.warning("Keine Handling-Daten zum Vergleichen vorhanden.")
-    else:
-        run_options = get_run_options(handling_runs)
+        if handling_runs.empty:
+            st.warning("Keine Handling-Daten zum Vergleichen vorhanden.")
+        else:
+            render_run_search("quer_search", n_handling_found)
+            run_options = get_run_options(handling_runs)
         
-        col1, col2 = st.columns(2)
-        idx_a_h = get_default_run_index(run_options.tolist(), st.session_state.car_a_name)
-        car_a_str_h = col1.selectbox("Auto A (Referenz)", run_options, index=idx_a_h, key="quer_car_a", on_change=on_car_change, args=("quer_car_a", "quer_car_b", handling_runs))
-        idx_b_h = get_default_run_index(run_options.tolist(), st.session_state.car_b_name)
-        if idx_b_h == 0 and len(run_options) > 1: idx_b_h = 1
-        car_b_str_h = col2.selectbox("Auto B (Vergleich)", run_options, index=idx_b_h, key="quer_car_b", on_change=on_car_change, args=("quer_car_a", "quer_car_b", handling_runs))
+            col1, col2 = st.columns(2)
+            idx_a_h = get_default_run_index(run_options.tolist(), st.session_state.car_a_name)
+            car_a_str_h = col1.selectbox("Auto A (Referenz)", run_options, index=idx_a_h, key="quer_car_a", on_change=on_car_change, args=("quer_car_a", "quer_car_b", handling_runs))
+            idx_b_h = get_default_run_index(run_options.tolist(), st.session_state.car_b_name)
+            if idx_b_h == 0 and len(run_options) > 1: idx_b_h = 1
+            car_b_str_h = col2.selectbox("Auto B (Vergleich)", run_options, index=idx_b_h, key="quer_car_b", on_change=on_car_change, args=("quer_car_a", "quer_car_b", handling_runs))
         
-        c1, c2 = st.columns(2)
-        fuel_a = c1.number_input("Fuel Load Auto A (Liters)", value=50, step=1, key="fuel_a")
-        fuel_b = c2.number_input("Fuel Load Auto B (Liters)", value=50, step=1, key="fuel_b")
+            c1, c2 = st.columns(2)
+            fuel_a = c1.number_input("Fuel Load Auto A (Liters)", value=50, step=1, key="fuel_a")
+            fuel_b = c2.number_input("Fuel Load Auto B (Liters)", value=50, step=1, key="fuel_b")
+            st.checkbox("Grip-Limit aus allen Handling-Runs des Fahrzeugs", value=False, key="traction_vehicle_envelope",
+                        help="Das Limit im G-G Diagramm wird aus den Punkten aller Handling-Runs des jeweiligen Fahrzeugs gebildet statt nur aus dem gewählten Run.")
+            st.slider("Zoom-Bereich Speed Heatmap (% der Streckenlänge)", min_value=0, max_value=100, value=(0, 100), step=1, key="track_zoom",
+                      help="Lädt für den gewählten Streckenabschnitt eine feinere Auflösung der Telemetrie.")
+            st.selectbox("🧮 Math-Kanal (Overlay)", math_channel_options(), key="quer_math",
+                         help="Zusätzlicher Chart mit einem Math-Kanal beider Runs, z.B. g_sum oder slip_proxy. Eigene Kanäle werden in der Garage definiert.")
+            st.radio("Referenz für das Runden-Delta", list(LAP_REFERENCES), key="lap_reference", horizontal=True,
+                     help="Rolling Best: jede Runde gegen die schnellste Runde davor (erst Auto A, dann Auto B). Schnellste Runde: alle gegen die beste Runde beider Autos.")
         
-        if st.button("🔧 Handling-Daten Analysieren", type="primary", width='stretch'):
-            run_a_id = int(car_a_str_h.split(" - ")[0])
-            run_b_id = int(car_b_str_h.split(" - ")[0])
+            if st.button("🔧 Handling-Daten Analysieren", type="primary", width='stretch'):
+                run_a_id = int(car_a_str_h.split(" - ")[0])
+                run_b_id = int(car_b_str_h.split(" - ")[0])
             
-            tele_a = load_telemetry(run_a_id)
-            tele_b = load_telemetry(run_b_id)
+                tele_a = load_channels(run_a_id, HANDLING_CHANNELS)
+                tele_b = load_channels(run_b_id, HANDLING_CHANNELS)
             
-            if 'lat_g' not in tele_a.columns or tele_a['lat_g'].sum() == 0:
-                st.error("Achtung: Diesem Run fehlen die G-Force-Daten! Bitte stelle sicher, dass du mit dem aktuellsten Data-Logger neue Runden aufzeichnest.")
-            else:
-                col_graph1, col_graph2 = st.columns(2)
+                if 'lat_g' not in tele_a.columns or tele_a['lat_g'].sum() == 0:
+                    st.error("Achtung: Diesem Run fehlen die G-Force-Daten! Bitte stelle sicher, dass du mit dem aktuellsten Data-Logger neue Runden aufzeichnest.")
+                else:
+                    col_graph1, col_graph2 = st.columns(2)
                 
-                with col_graph1:
-                    st.subheader("G-G Diagramm (Traction Circle)")
-                    st.markdown("Zeigt das absolute Limit der Reifen. Ein größerer Kreis bedeutet mehr mechanischen und aerodynamischen Grip.")
+                    with col_graph1:
+                        st.subheader("G-G Diagramm (Traction Circle)")
+                        st.markdown("Zeigt das absolute Limit der Reifen. Ein größerer Kreis bedeutet mehr mechanischen und aerodynamischen Grip.")
                     
-                    fig_gg = go.Figure()
+                        fig_gg = go.Figure()
                     
-                    def add_traction_circle(fig, df, name, color, color_fill):
-                        # Filtere sinnlose Steh-Punkte raus
-                        df_filt = df[df['speed_kmh'] > 20].copy()
-                        if df_filt.empty: return
-                        
-                        # Entferne krasse Outliers (z.B. Curbs/Unfälle) für ein sauberes Polygon
-                        q_lat_high = df_filt['lat_g'].quantile(0.999)
-                        q_lat_low = df_filt['lat_g'].quantile(0.001)
-                        q_lon_high = df_filt['lon_g'].quantile(0.999)
-                        q_lon_low = df_filt['lon_g'].quantile(0.001)
-                        
-                        df_filt = df_filt[
-                            (df_filt['lat_g'] >= q_lat_low) & (df_filt['lat_g'] <= q_lat_high) &
-                            (df_filt['lon_g'] >= q_lon_low) & (df_filt['lon_g'] <= q_lon_high)
-                        ]
-                        
-                        lat = df_filt['lat_g'].values
-                        lon = df_filt['lon_g'].values
-                        
-                        points = np.column_stack((lat, lon))
-
-                        # Erzeuge ein "runderes" Limit: Punkte in Winkel-Segmente gruppieren
-                        # und pro Segment das 95. Perzentil des Radius verwenden.
-                        try:
-                            # Polar-Koordinaten (theta vom x-axis, also lat)
-                            thetas = np.arctan2(lon, lat)
-                            radii = np.sqrt(lat**2 + lon**2)
-
-                            bin_deg = 5
-                            bins = int(360 / bin_deg)
-                            edges = np.linspace(-np.pi, np.pi, bins + 1)
-                            seg_points = []
-                            for i in range(len(edges) - 1):
-                                start, end = edges[i], edges[i+1]
-                                # Maske für Winkel in diesem Segment
-                                if start < end:
-                                    mask = (thetas >= start) & (thetas < end)
-                                else:
-                                    mask = (thetas >= start) | (thetas < end)
-
-                                if not np.any(mask):
-                                    continue
-
-                                r95 = np.nanpercentile(radii[mask], 95)
-                                if np.isnan(r95) or r95 <= 0:
-                                    continue
-
-                                angle_center = (start + end) / 2.0
-                                x = r95 * np.cos(angle_center)
-                                y = r95 * np.sin(angle_center)
-                                seg_points.append((angle_center, x, y))
-
-                            if len(seg_points) >= 3:
-                                # Sortiere nach Winkel und schließe das Polygon
-                                seg_points.sort(key=lambda t: t[0])
-                                hull_points = np.array([[p[1], p[2]] for p in seg_points])
-                                hull_points = np.vstack((hull_points, hull_points[0]))
-
-                                fig.add_trace(go.Scatter(
-                                    x=hull_points[:, 0], y=hull_points[:, 1],
-                                    mode='lines', fill='toself', name=f"Limit {name}",
-                                    line=dict(color=color, width=2),
-                                    fillcolor=color_fill,
-                                    opacity=0.8
-                                ))
-                            else:
-                                # Fallback auf ConvexHull falls zu wenige Segmente
-                                hull = ConvexHull(points)
-                                hull_points = points[hull.vertices]
-                                hull_points = np.vstack((hull_points, hull_points[0]))
+                        def add_traction_circle(fig, df, limit, name, color, color_fill):
+                            # Grip-Limit (Polygon aus telemetry_analysis, 95. Perzentil des Radius pro 5°-Segment)
+                            if not limit.empty:
                                 fig.add_trace(go.Scatter(
-                                    x=hull_points[:, 0], y=hull_points[:, 1],
+                                    x=limit['lat_g'], y=limit['lon_g'],
                                     mode='lines', fill='toself', name=f"Limit {name}",
                                     line=dict(color=color, width=2),
                                     fillcolor=color_fill,
                                     opacity=0.8
                                 ))
-                        except Exception:
-                            # Falls etwas schief geht, einfach die Rohpunkte anzeigen
-                            try:
-                                hull = ConvexHull(points)
-                                hull_points = points[hull.vertices]
-                                hull_points = np.vstack((hull_points, hull_points[0]))
-                                fig.add_trace(go.Scatter(
-                                    x=hull_points[:, 0], y=hull_points[:, 1],
-                                    mode='lines', fill='toself', name=f"Limit {name}",
-                                    line=dict(color=color, width=2),
-                                    fillcolor=color_fill,
-                                    opacity=0.8
-                                ))
-                            except Exception:
-                                pass
-                            
-                        # Rohdaten-Punkte schwach im Hintergrund
-                        fig.add_trace(go.Scatter(
-                            x=lat, y=lon,
-                            mode='markers', name=f"Data {name}",
-                            marker=dict(size=2, color=color, opacity=0.1),
-                            showlegend=False
-                        ))
+
+                            # Rohdaten-Punkte schwach im Hintergrund (extremwert-erhaltend ausgedünnt)
+                            lat, lon = traction_points(df)
+                            if len(lat) == 0: return
+                            fig.add_trace(telemetry_plot.make_trace(
+                                lat, lon, scatter=True,
+                                mode='markers', name=f"Data {name}",
+                                marker=dict(size=2, color=color, opacity=0.1),
+                                showlegend=False
+                            ))
                     
-                    # Rot für A und Cyan für B, semi-transparent
-                    add_traction_circle(fig_gg, tele_a, "A", "#00ff88", "rgba(0, 255, 136, 0.2)")
-                    add_traction_circle(fig_gg, tele_b, "B", "#ff0055", "rgba(255, 0, 85, 0.2)")
+                        if st.session_state.traction_vehicle_envelope:
+                            limit_a = get_vehicle_traction_envelope(handling_runs, run_a_id)
+                            limit_b = get_vehicle_traction_envelope(handling_runs, run_b_id)
+                        else:
+                            limits = telemetry_analysis.load_traction_envelopes([run_a_id, run_b_id], DB_PATH, cache=get_telemetry_cache())
+                            limit_a, limit_b = limits[run_a_id], limits[run_b_id]
                     
-                    fig_gg.update_layout(
-                        xaxis_title="Lateral G (Kurve)", 
-                        yaxis_title="Longitudinal G (Bremsen/Gas)",
-                        yaxis=dict(range=[-3.0, 1.5], scaleanchor="x", scaleratio=1),
-                        xaxis=dict(range=[-2.5, 2.5]),
-                        width=500, height=500,
-                        template="plotly_dark",
-                        showlegend=True,
-                        legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01)
-                    )
-                    # Gitter kreuz in die mitte
-                    fig_gg.add_vline(x=0, line_width=1, line_color="gray", opacity=0.5)
-                    fig_gg.add_hline(y=0, line_width=1, line_color="gray", opacity=0.5)
+                        # Rot für A und Cyan für B, semi-transparent
+                        add_traction_circle(fig_gg, tele_a, limit_a, "A", "#00ff88", "rgba(0, 255, 136, 0.2)")
+                        add_traction_circle(fig_gg, tele_b, limit_b, "B", "#ff0055", "rgba(255, 0, 85, 0.2)")
+                    
+                        fig_gg.update_layout(
+                            xaxis_title="Lateral G (Kurve)", 
+                            yaxis_title="Longitudinal G (Bremsen/Gas)",
+                            yaxis=dict(range=[-3.0, 1.5], scaleanchor="x", scaleratio=1),
+                            xaxis=dict(range=[-2.5, 2.5]),
+                            width=500, height=500,
+                            template="plotly_dark",
+                            showlegend=True,
+                            legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01)
+                        )
+                        # Gitter kreuz in die mitte
+                        fig_gg.add_vline(x=0, line_width=1, line_color="gray", opacity=0.5)
+                        fig_gg.add_hline(y=0, line_width=1, line_color="gray", opacity=0.5)
                     
-                    st.plotly_chart(fig_gg, width='stretch')
+                        st.plotly_chart(fig_gg, width='stretch')
                 
-                with col_graph2:
-                    st.subheader("🏁 Speed Heatmap über Track Distance")
-                    st.markdown("Direkter Vergleich der Kurvengeschwindigkeiten. Wer bremst später? Wer beschleunigt früher?")
+                    with col_graph2:
+                        st.subheader("🏁 Speed Heatmap über Track Distance")
+                        st.markdown("Direkter Vergleich der Kurvengeschwindigkeiten. Wer bremst später? Wer beschleunigt früher?")
                     
-                    fig_track = go.Figure()
+                        fig_track = go.Figure()
                     
-                    # Sort by lap distance
-                    tele_a_sorted = tele_a[tele_a['lap_distance'] > 0].sort_values('lap_distance')
-                    tele_b_sorted = tele_b[tele_b['lap_distance'] > 0].sort_values('lap_distance')
+                        lap_dist = tele_a.loc[tele_a['lap_distance'] > 0, 'lap_distance']
+                        zoom_d = telemetry_plot.zoom_window(float(lap_dist.min()), float(lap_dist.max()), st.session_state.track_zoom) if not lap_dist.empty else None
+                        grids_a, grids_b = load_lap_grids(run_a_id), load_lap_grids(run_b_id)
+                        best_a, best_b = lap_align.best_lap(grids_a), lap_align.best_lap(grids_b)
+                        if best_a is not None and best_b is not None:
+                            # Schnellste vollständige Runde je Auto auf dem Distanz-Raster (keine vermischten Runden)
+                            tele_a_sorted = telemetry_plot.clip_window(pd.DataFrame({'lap_distance': grids_a['distance'], 'speed_kmh': grids_a['speed_kmh'][best_a]}), 'lap_distance', zoom_d)
+                            tele_b_sorted = telemetry_plot.clip_window(pd.DataFrame({'lap_distance': grids_b['distance'], 'speed_kmh': grids_b['speed_kmh'][best_b]}), 'lap_distance', zoom_d)
+                        else:
+                            # Keine vollständige Runde: nach lap distance sortiert (Trace aus der LOD-Pyramide statt aller Rohpunkte)
+                            trace_a = load_trace(run_a_id, 'lap_distance', 'speed_kmh', window=zoom_d)
+                            trace_b = load_trace(run_b_id, 'lap_distance', 'speed_kmh', window=zoom_d)
+                            tele_a_sorted = trace_a[trace_a['lap_distance'] > 0].sort_values('lap_distance')
+                            tele_b_sorted = trace_b[trace_b['lap_distance'] > 0].sort_values('lap_distance')
                     
-                    if not tele_a_sorted.empty and not tele_b_sorted.empty:
-                        fig_track.add_trace(go.Scatter(
-                            x=tele_a_sorted['lap_distance'], y=tele_a_sorted['speed_kmh'], 
-                            name="Auto A", mode='lines', line=dict(color='#00ff88', width=2)
-                        ))
-                        fig_track.add_trace(go.Scatter(
-                            x=tele_b_sorted['lap_distance'], y=tele_b_sorted['speed_kmh'], 
-                            name="Auto B", mode='lines', line=dict(color='#ff0055', width=2)
-                        ))
+                        if not tele_a_sorted.empty and not tele_b_sorted.empty:
+                            fig_track.add_trace(telemetry_plot.make_trace(
+                                tele_a_sorted['lap_distance'], tele_a_sorted['speed_kmh'],
+                                name=f"Auto A (Runde {best_a + 1})" if best_a is not None and best_b is not None else "Auto A", mode='lines', line=dict(color='#00ff88', width=2)
+                            ))
+                            fig_track.add_trace(telemetry_plot.make_trace(
+                                tele_b_sorted['lap_distance'], tele_b_sorted['speed_kmh'],
+                                name=f"Auto B (Runde {best_b + 1})" if best_a is not None and best_b is not None else "Auto B", mode='lines', line=dict(color='#ff0055', width=2)
+                            ))
                         
-                        fig_track.update_layout(
-                            xaxis_title="Streckenposition (Lap Distance) [m]", 
-                            yaxis_title="Speed [km/h]",
-                            template="plotly_dark",
-                            height=500,
-                            legend=dict(yanchor="top", y=0.99, xanchor="right", x=0.99)
-                        )
-                        st.plotly_chart(fig_track, width='stretch')
-                    else:
-                        st.info("Keine Track-Distance Daten vorhanden. Bist du schon eine fliegende Runde gefahren?")
+                            fig_track.update_layout(
+                                xaxis_title="Streckenposition (Lap Distance) [m]", 
+                                yaxis_title="Speed [km/h]",
+                                template="plotly_dark",
+                                height=500,
+                                legend=dict(yanchor="top", y=0.99, xanchor="right", x=0.99)
+                            )
+                            st.plotly_chart(fig_track, width='stretch')
+                        else:
+                            st.info("Keine Track-Distance Daten vorhanden. Bist du schon eine fliegende Runde gefahren?")
                         
-                st.markdown("---")
-                st.subheader("📐 Sektor-Performance & Cornering KPIs")
+                    st.markdown("---")
+                    st.subheader("📐 Sektor-Performance & Cornering KPIs")
                 
-                # Sektoren extrahieren wenn vorhanden
-                sector_data = []
-                sectors_a = tele_a[tele_a['lap_distance'] > 0]['sector'].unique() if 'sector' in tele_a else []
+                    # Sektoren extrahieren wenn vorhanden
+                    sector_data = []
                 
-                def get_sector_kpi(df, s_id):
-                    s_df = df[df['sector'] == s_id].copy()
-                    if s_df.empty: return None, None, None, None
-                    
-                    # Finde Kurven in diesem Sektor (lat_g > 0.5)
-                    s_df['is_corner'] = s_df['lat_g'].abs() > 0.5
+                    for s in run_sectors(tele_a):
+                        dur_a, v_a, lat_a, brk_a = sector_kpi(tele_a, s)
+                        dur_b, v_b, lat_b, brk_b = sector_kpi(tele_b, s)
                     
-                    v_min_avg = s_df[s_df['is_corner']]['speed_kmh'].mean()
-                    max_lat_g = s_df['lat_g'].abs().max()
-                    max_brake_g = s_df['lon_g'].min() # negative G for braking
-                    duration = s_df['time_elapsed'].max() - s_df['time_elapsed'].min()
-                    return duration, v_min_avg, max_lat_g, max_brake_g
+                        if dur_a and dur_b:
+                            sector_data.append({
+                                "Sektor": f"Sektor {int(s)+1}",
+                                "Auto A Zeit": f"{dur_a:.2f}s",
+                                "Auto B Zeit": f"{dur_b:.2f}s",
+                                "Delta (A-B)": f"{dur_a-dur_b:+.2f}s",
+                                "V-Min (Avg) A": f"{v_a:.1f} km/h" if pd.notna(v_a) else "-",
+                                "V-Min (Avg) B": f"{v_b:.1f} km/h" if pd.notna(v_b) else "-",
+                                "Max Quer-G A": f"{lat_a:.2f}G" if pd.notna(lat_a) else "-",
+                                "Max Quer-G B": f"{lat_b:.2f}G" if pd.notna(lat_b) else "-",
+                                "Max Brems-G A": f"{abs(brk_a):.2f}G" if pd.notna(brk_a) else "-",
+                                "Max Brems-G B": f"{abs(brk_b):.2f}G" if pd.notna(brk_b) else "-"
+                            })
                 
-                for s in sorted(sectors_a):
-                    if s < 0: continue # ignore pit/invalid
-                    
-                    dur_a, v_a, lat_a, brk_a = get_sector_kpi(tele_a, s)
-                    dur_b, v_b, lat_b, brk_b = get_sector_kpi(tele_b, s)
-                    
-                    if dur_a and dur_b:
-                        sector_data.append({
-                            "Sektor": f"Sektor {int(s)+1}",
-                            "Auto A Zeit": f"{dur_a:.2f}s",
-                            "Auto B Zeit": f"{dur_b:.2f}s",
-                            "Delta (A-B)": f"{dur_a-dur_b:+.2f}s",
-                            "V-Min (Avg) A": f"{v_a:.1f} km/h" if pd.notna(v_a) else "-",
-                            "V-Min (Avg) B": f"{v_b:.1f} km/h" if pd.notna(v_b) else "-",
-                            "Max Quer-G A": f"{lat_a:.2f}G" if pd.notna(lat_a) else "-",
-                            "Max Quer-G B": f"{lat_b:.2f}G" if pd.notna(lat_b) else "-",
-                            "Max Brems-G A": f"{abs(brk_a):.2f}G" if pd.notna(brk_a) else "-",
-                            "Max Brems-G B": f"{abs(brk_b):.2f}G" if pd.notna(brk_b) else "-"
-                        })
-                
-                if sector_data:
-                    st.dataframe(pd.DataFrame(sector_data), width='stretch')
-                else:
-                    st.info("Keine vollständigen Sektor-Zeiten gefunden. Bitte fahre ganze Runden für die Sektor-Analyse.")
+                    if sector_data:
+                        st.dataframe(pd.DataFrame(sector_data), width='stretch')
+                    else:
+                        st.info("Keine vollständigen Sektor-Zeiten gefunden. Bitte fahre ganze Runden für die Sektor-Analyse.")
+
+                    st.markdown("---")
+                    st.subheader("⏱️ Runden-Vergleich (Delta über Distanz)")
+                    lap_cmp = lap_align.compare_laps([("A", grids_a), ("B", grids_b)], LAP_REFERENCES[st.session_state.lap_reference])
+                    if lap_cmp['laps'].empty:
+                        st.info("Keine vollständigen Runden gefunden. Bitte fahre ganze Runden für den Runden-Vergleich.")
+                    else:
+                        st.dataframe(lap_cmp['laps'].rename(columns={'label': 'Auto', 'lap': 'Runde', 'lap_time_s': 'Rundenzeit [s]',
+                                                                     'reference': 'Referenz', 'delta_s': 'Delta [s]'}),
+                                     width='stretch', hide_index=True)
+                        from plotly.subplots import make_subplots
+                        fig_laps = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.05, row_heights=[0.6, 0.4])
+                        for i, label in enumerate(lap_cmp['labels']):
+                            color = '#00ff88' if label.startswith("A ") else '#ff0055'
+                            fig_laps.add_trace(telemetry_plot.make_trace(lap_cmp['distance'], lap_cmp['delta_time'][i], name=label, legendgroup=label,
+                                                                         mode='lines', line=dict(color=color, width=1)), row=1, col=1)
+                            fig_laps.add_trace(telemetry_plot.make_trace(lap_cmp['distance'], lap_cmp['delta_speed'][i], name=label, legendgroup=label, showlegend=False,
+                                                                         mode='lines', line=dict(color=color, width=1)), row=2, col=1)
+                        fig_laps.update_layout(height=550, template="plotly_dark", hovermode="x unified")
+                        fig_laps.update_xaxes(title_text="Streckenposition (Lap Distance) [m]", range=zoom_d, row=2, col=1)
+                        fig_laps.update_yaxes(title_text="Delta-Zeit [s] (+ = langsamer)", row=1, col=1)
+                        fig_laps.update_yaxes(title_text="Delta km/h", row=2, col=1)
+                        st.plotly_chart(fig_laps, width='stretch')
+
+                    if st.session_state.quer_math != MATH_NONE:
+                        render_math_channel_chart(st.session_state.quer_math, [(run_a_id, "Auto A", '#00ff88'), (run_b_id, "Auto B", '#ff0055')])
 
 
 with tab_score:
-    st.header("⚖️ Head-to-Head Gesamt-Vergleich")
-    st.markdown("Vergleiche zwei Fahrzeuge head-to-head und generiere einen Track-spezifischen Overall Performance Index (OPI).")
+    if tab_open(tab_score, ["score_search", "score_a_drag", "score_a_hand", "score_b_drag", "score_b_hand", "fleet_vehicles"]):
+        st.header("⚖️ Head-to-Head Gesamt-Vergleich")
+        st.markdown("Vergleiche zwei Fahrzeuge head-to-head und generiere einen Track-spezifischen Overall Performance Index (OPI).")
     
-    drag_runs = runs_df[runs_df['run_type'] == 'DRAG']
-    handling_runs = runs_df[runs_df['run_type'] == 'HANDLING']
+        drag_runs, n_drag_found = get_run_choices(SCORE_DRAG_RUN_FILTERS, "score_search", ["score_a_drag", "score_b_drag"])
+        handling_runs, n_handling_found = get_run_choices(HANDLING_RUN_FILTERS, "score_search", ["score_a_hand", "score_b_hand"])
     
-    if drag_runs.empty or handling_runs.empty:
-        st.warning("Du brauchst sowohl Drag- als auch Handling-Daten in der Datenbank für einen kompletten Scoring-Vergleich.")
-    else:
-        drag_options = drag_runs['id'].astype(str) + " - [" + drag_runs['run_type'] + "] " + drag_runs['vehicle_name'] + " (" + drag_runs['timestamp'] + ")"
-        handling_options = handling_runs['id'].astype(str) + " - [" + handling_runs['run_type'] + "] " + handling_runs['vehicle_name'] + " (" + handling_runs['timestamp'] + ")"
+        if drag_runs.empty or handling_runs.empty:
+            st.warning("Du brauchst sowohl Drag- als auch Handling-Daten in der Datenbank für einen kompletten Scoring-Vergleich.")
+        else:
+            render_run_search("score_search", max(n_drag_found, n_handling_found))
+            drag_options = drag_runs['id'].astype(str) + " - [" + drag_runs['run_type'] + "] " + drag_runs['vehicle_name'] + " (" + drag_runs['timestamp'] + ")"
+            handling_options = handling_runs['id'].astype(str) + " - [" + handling_runs['run_type'] + "] " + handling_runs['vehicle_name'] + " (" + handling_runs['timestamp'] + ")"
         
-        col1, col2 = st.columns(2)
-        with col1:
-            st.subheader("Fahrzeug A (Referenz)")
-            idx_a_d = get_default_run_index(drag_options.tolist(), st.session_state.car_a_name)
-            a_drag_str = st.selectbox("Wähle Drag-Daten", drag_options, index=idx_a_d, key="score_a_drag", on_change=on_car_change, args=("score_a_drag", "score_b_drag", drag_runs))
-            idx_a_h = get_default_run_index(handling_options.tolist(), st.session_state.car_a_name)
-            a_handling_str = st.selectbox("Wähle Handling-Daten", handling_options, index=idx_a_h, key="score_a_hand", on_change=on_car_change, args=("score_a_hand", "score_b_hand", handling_runs))
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader("Fahrzeug A (Referenz)")
+                idx_a_d = get_default_run_index(drag_options.tolist(), st.session_state.car_a_name)
+                a_drag_str = st.selectbox("Wähle Drag-Daten", drag_options, index=idx_a_d, key="score_a_drag", on_change=on_car_change, args=("score_a_drag", "score_b_drag", drag_runs))
+                idx_a_h = get_default_run_index(handling_options.tolist(), st.session_state.car_a_name)
+                a_handling_str = st.selectbox("Wähle Handling-Daten", handling_options, index=idx_a_h, key="score_a_hand", on_change=on_car_change, args=("score_a_hand", "score_b_hand", handling_runs))
             
-        with col2:
-            st.subheader("Fahrzeug B (Vergleich)")
-            idx_b_d = get_default_run_index(drag_options.tolist(), st.session_state.car_b_name)
-            if idx_b_d == 0 and len(drag_options) > 1: idx_b_d = 1
-            b_drag_str = st.selectbox("Wähle Drag-Daten", drag_options, index=idx_b_d, key="score_b_drag", on_change=on_car_change, args=("score_a_drag", "score_b_drag", drag_runs))
-            idx_b_h = get_default_run_index(handling_options.tolist(), st.session_state.car_b_name)
-            if idx_b_h == 0 and len(handling_options) > 1: idx_b_h = 1
-            b_handling_str = st.selectbox("Wähle Handling-Daten", handling_options, index=idx_b_h, key="score_b_hand", on_change=on_car_change, args=("score_a_hand", "score_b_hand", handling_runs))
+            with col2:
+                st.subheader("Fahrzeug B (Vergleich)")
+                idx_b_d = get_default_run_index(drag_options.tolist(), st.session_state.car_b_name)
+                if idx_b_d == 0 and len(drag_options) > 1: idx_b_d = 1
+                b_drag_str = st.selectbox("Wähle Drag-Daten", drag_options, index=idx_b_d, key="score_b_drag", on_change=on_car_change, args=("score_a_drag", "score_b_drag", drag_runs))
+                idx_b_h = get_default_run_index(handling_options.tolist(), st.session_state.car_b_name)
+                if idx_b_h == 0 and len(handling_options) > 1: idx_b_h = 1
+                b_handling_str = st.selectbox("Wähle Handling-Daten", handling_options, index=idx_b_h, key="score_b_hand", on_change=on_car_change, args=("score_a_hand", "score_b_hand", handling_runs))
         
-        track_type = st.radio("Streckencharakteristik (Gewichtung):", 
-                              ["High Speed (z.B. Le Mans - Power & Aero)", 
-                               "Technical (z.B. Imola - Grip & Accel)", 
-                               "Endurance / Race Pace (Fokus auf Konsistenz)",
-                               "Balanced (Standard)"], horizontal=True)
+            track_type = st.radio("Streckencharakteristik (Gewichtung):", 
+                                  ["High Speed (z.B. Le Mans - Power & Aero)", 
+                                   "Technical (z.B. Imola - Grip & Accel)", 
+                                   "Endurance / Race Pace (Fokus auf Konsistenz)",
+                                   "Balanced (Standard)"], horizontal=True)
                                
-        if st.button("🏆 Performance Score berechnen", type="primary", width='stretch'):
+            if st.button("🏆 Performance Score berechnen", type="primary", width='stretch'):
             
-            run_a_drag_id = int(a_drag_str.split(" - ")[0])
-            run_a_hand_id = int(a_handling_str.split(" - ")[0])
-            run_b_drag_id = int(b_drag_str.split(" - ")[0])
-            run_b_hand_id = int(b_handling_str.split(" - ")[0])
+                run_a_drag_id = int(a_drag_str.split(" - ")[0])
+                run_a_hand_id = int(a_handling_str.split(" - ")[0])
+                run_b_drag_id = int(b_drag_str.split(" - ")[0])
+                run_b_hand_id = int(b_handling_str.split(" - ")[0])
             
-            # Display names for the charts
-            car_a_name_drag = drag_runs[drag_runs['id'] == run_a_drag_id]['vehicle_name'].iloc[0]
-            car_a_name_hand = handling_runs[handling_runs['id'] == run_a_hand_id]['vehicle_name'].iloc[0]
-            car_a_name = f"{car_a_name_drag} / {car_a_name_hand}" if car_a_name_drag != car_a_name_hand else car_a_name_drag
+                # Display names for the charts
+                car_a_name_drag = drag_runs[drag_runs['id'] == run_a_drag_id]['vehicle_name'].iloc[0]
+                car_a_name_hand = handling_runs[handling_runs['id'] == run_a_hand_id]['vehicle_name'].iloc[0]
+                car_a_name = f"{car_a_name_drag} / {car_a_name_hand}" if car_a_name_drag != car_a_name_hand else car_a_name_drag
             
-            car_b_name_drag = drag_runs[drag_runs['id'] == run_b_drag_id]['vehicle_name'].iloc[0]
-            car_b_name_hand = handling_runs[handling_runs['id'] == run_b_hand_id]['vehicle_name'].iloc[0]
-            car_b_name = f"{car_b_name_drag} / {car_b_name_hand}" if car_b_name_drag != car_b_name_hand else car_b_name_drag
+                car_b_name_drag = drag_runs[drag_runs['id'] == run_b_drag_id]['vehicle_name'].iloc[0]
+                car_b_name_hand = handling_runs[handling_runs['id'] == run_b_hand_id]['vehicle_name'].iloc[0]
+                car_b_name = f"{car_b_name_drag} / {car_b_name_hand}" if car_b_name_drag != car_b_name_hand else car_b_name_drag
             
-            # Helper funcs
-            def get_drag_metrics_for_run(rid):
-                t = load_telemetry(rid)
-                t, _, _ = analyze_run_quality(t)
-                if t.empty: return None, None, None
-                t_100 = t[t['speed_kmh'] >= 100]
-                t_200 = t[t['speed_kmh'] >= 200]
-                best_100 = t_100.iloc[0]['time_elapsed'] - t.iloc[0]['time_elapsed'] if not t_100.empty else None
-                best_200 = t_200.iloc[0]['time_elapsed'] - t.iloc[0]['time_elapsed'] if not t_200.empty else None
-                return best_100, best_200, t['speed_kmh'].max() if not t.empty else None
-                
-            def get_handling_metrics_for_run(rid):
-                t = load_telemetry(rid)
-                t, csi, crash = analyze_run_quality(t)
-                if t.empty or 'lat_g' not in t.columns: return None, None, 50.0, False
-                lat_col = 'lat_g_smooth' if 'lat_g_smooth' in t.columns else 'lat_g'
-                lon_col = 'lon_g_smooth' if 'lon_g_smooth' in t.columns else 'lon_g'
-                lat = t[lat_col].abs().max()
-                brake = t[lon_col].min()
-                return lat if lat > 0 else None, abs(brake) if brake < 0 else None, csi, crash
-                
-            with st.spinner("Scanne Datenbank nach globalen Bestwerten (für das 100er Score-Rating)..."):
-                a_100, a_200, a_vmax = get_drag_metrics_for_run(run_a_drag_id)
-                b_100, b_200, b_vmax = get_drag_metrics_for_run(run_b_drag_id)
-                
-                a_lat, a_brk, a_csi, a_crash = get_handling_metrics_for_run(run_a_hand_id)
-                b_lat, b_brk, b_csi, b_crash = get_handling_metrics_for_run(run_b_hand_id)
-                
+                # Kennzahlen aller Drag-/Handling-Runs: parallel im Prozess-Pool (scoring_engine),
+                # Ergebnisse kommen blockweise zurück und treiben die Fortschrittsanzeige
+                drag_ids = telemetry_store.query_run_values('id', filters=SCORE_DRAG_RUN_FILTERS, db_path=DB_PATH)
+                handling_ids = telemetry_store.query_run_values('id', filters=HANDLING_RUN_FILTERS, db_path=DB_PATH)
+                total_runs = len(drag_ids) + len(handling_ids)
+                score_progress = st.progress(0.0, text="Scanne Datenbank nach globalen Bestwerten (für das 100er Score-Rating)...")
+                metrics_by_run = {}
+                for kind, rid, metrics in scoring_engine.iter_run_metrics(drag_ids, handling_ids, DB_PATH, cache=get_telemetry_cache()):
+                    metrics_by_run[(kind, rid)] = metrics
+                    score_progress.progress(len(metrics_by_run) / total_runs, text=f"Scanne Datenbank nach globalen Bestwerten... {len(metrics_by_run)}/{total_runs} Runs")
+                score_progress.empty()
+
+                a_100, a_200, a_vmax = metrics_by_run[('DRAG', run_a_drag_id)]
+                b_100, b_200, b_vmax = metrics_by_run[('DRAG', run_b_drag_id)]
+
+                a_lat, a_brk, a_csi, a_crash = metrics_by_run[('HANDLING', run_a_hand_id)]
+                b_lat, b_brk, b_csi, b_crash = metrics_by_run[('HANDLING', run_b_hand_id)]
+
                 # Show Crash Warnings
                 if a_crash:
                     st.error(f"⚠️ **Crash/Impact detected** im Handling-Run von Fahrzeug A ({car_a_name})! (Extreme G-Kräfte > 4.0G). Peaks wurden gecleant, aber die Daten könnten verfälscht sein.")
                 if b_crash:
                     st.error(f"⚠️ **Crash/Impact detected** im Handling-Run von Fahrzeug B ({car_b_name})! (Extreme G-Kräfte > 4.0G). Peaks wurden gecleant, aber die Daten könnten verfälscht sein.")
-                
+
                 # Globale Bestwerte (alle Autos in der Datenbank)
-                global_best_100, global_best_200 = 999.0, 999.0
-                global_best_vmax, global_best_lat, global_best_brk = 0.0, 0.0, 0.0
-                
-                for rid in drag_runs['id'].values:
-                    c_100, c_200, c_vmax = get_drag_metrics_for_run(rid)
-                    if c_100 and c_100 < global_best_100: global_best_100 = c_100
-                    if c_200 and c_200 < global_best_200: global_best_200 = c_200
-                    if c_vmax and c_vmax > global_best_vmax: global_best_vmax = c_vmax
-                    
-                for rid in handling_runs['id'].values:
-                    c_lat, c_brk, _, _ = get_handling_metrics_for_run(rid)
-                    if c_lat and c_lat > global_best_lat: global_best_lat = c_lat
-                    if c_brk and c_brk > global_best_brk: global_best_brk = c_brk
-                    
-            missing_data = []
-            if not a_100 or not b_100: missing_data.append("Drag / Beschleunigung")
-            if not a_lat or not b_lat: missing_data.append("Handling / Grip")
+                bests = scoring_engine.global_bests((kind, rid, m) for (kind, rid), m in metrics_by_run.items())
+
+                missing_data = []
+                if not a_100 or not b_100: missing_data.append("Drag / Beschleunigung")
+                if not a_lat or not b_lat: missing_data.append("Handling / Grip")
             
-            if missing_data:
-                st.warning(f"Achtung: Unvollständiger Vergleich! Es fehlen Logs vom Typ: {', '.join(missing_data)} für eines der Autos. Diese Kategorien werden im Score mit 0 gewertet.")
-            if True:
-                # Calculate Base 100 Scores Global (Safe against None values)
-                def calc_score_lower_better(val, comp): 
-                    if val is None or comp is None or val <= 0: return 0
-                    return (comp / val) * 100
-                    
-                def calc_score_higher_better(val, comp): 
-                    if val is None or comp is None or comp <= 0: return 0
-                    return (val / comp) * 100
-                
-                scores_a = {
-                    "Accel Low (0-100)": calc_score_lower_better(a_100, global_best_100),
-                    "Accel High (0-200)": calc_score_lower_better(a_200, global_best_200),
-                    "Top Speed": calc_score_higher_better(a_vmax, global_best_vmax),
-                    "Kurvengrip (Lat G)": calc_score_higher_better(a_lat, global_best_lat),
-                    "Bremskraft": calc_score_higher_better(a_brk, global_best_brk),
-                    "Konsistenz / Stabilität": a_csi
-                }
+                if missing_data:
+                    st.warning(f"Achtung: Unvollständiger Vergleich! Es fehlen Logs vom Typ: {', '.join(missing_data)} für eines der Autos. Diese Kategorien werden im Score mit 0 gewertet.")
+                if True:
+                    # Base 100 Scores relativ zu den globalen Bestwerten (sicher gegen None-Werte)
+                    scores_a = fleet_compare.opi_scores((a_100, a_200, a_vmax), (a_lat, a_brk, a_csi, a_crash), bests)
+                    scores_b = fleet_compare.opi_scores((b_100, b_200, b_vmax), (b_lat, b_brk, b_csi, b_crash), bests)
                 
-                scores_b = {
-                    "Accel Low (0-100)": calc_score_lower_better(b_100, global_best_100),
-                    "Accel High (0-200)": calc_score_lower_better(b_200, global_best_200),
-                    "Top Speed": calc_score_higher_better(b_vmax, global_best_vmax),
-                    "Kurvengrip (Lat G)": calc_score_higher_better(b_lat, global_best_lat),
-                    "Bremskraft": calc_score_higher_better(b_brk, global_best_brk),
-                    "Konsistenz / Stabilität": b_csi
-                }
+                    # Weightings
+                    w = fleet_compare.track_weights(track_type)
+                    keys = fleet_compare.SCORE_KEYS
                 
-                # Weightings
-                if "High Speed" in track_type:
-                    w = [0.10, 0.20, 0.40, 0.10, 0.10, 0.10]
-                elif "Technical" in track_type:
-                    w = [0.20, 0.15, 0.10, 0.30, 0.15, 0.10]
-                elif "Endurance" in track_type:
-                    w = [0.05, 0.10, 0.15, 0.10, 0.10, 0.50]
-                else:
-                    w = [0.15, 0.15, 0.15, 0.20, 0.15, 0.20]
-                    
-                keys = list(scores_a.keys())
-                
-                opi_a = sum(scores_a[k] * w[i] for i, k in enumerate(keys))
-                opi_b = sum(scores_b[k] * w[i] for i, k in enumerate(keys))
+                    opi_a = fleet_compare.opi(scores_a, w)
+                    opi_b = fleet_compare.opi(scores_b, w)
                 
-                # Plot
-                c1, c2, c3 = st.columns([1, 2, 1])
-                c1.metric(f"Overall Score: {car_a_name}", f"{opi_a:.1f} / 100")
-                c3.metric(f"Overall Score: {car_b_name}", f"{opi_b:.1f} / 100", delta=f"{opi_b - opi_a:+.1f} vs A", delta_color="normal" if opi_b > opi_a else "inverse")
+                    # Plot
+                    c1, c2, c3 = st.columns([1, 2, 1])
+                    c1.metric(f"Overall Score: {car_a_name}", f"{opi_a:.1f} / 100")
+                    c3.metric(f"Overall Score: {car_b_name}", f"{opi_b:.1f} / 100", delta=f"{opi_b - opi_a:+.1f} vs A", delta_color="normal" if opi_b > opi_a else "inverse")
                 
-                with c2:
-                    fig_radar = go.Figure()
+                    with c2:
+                        fig_radar = go.Figure()
                     
-                    fig_radar.add_trace(go.Scatterpolar(
-                        r=[scores_a[k] for k in keys] + [scores_a[keys[0]]],
-                        theta=keys + [keys[0]],
-                        fill='toself',
-                        name=car_a_name,
-                        line_color='#00ff88',
-                        fillcolor='rgba(0, 255, 136, 0.4)',
-                        opacity=0.8
-                    ))
+                        fig_radar.add_trace(go.Scatterpolar(
+                            r=[scores_a[k] for k in keys] + [scores_a[keys[0]]],
+                            theta=keys + [keys[0]],
+                            fill='toself',
+                            name=car_a_name,
+                            line_color='#00ff88',
+                            fillcolor='rgba(0, 255, 136, 0.4)',
+                            opacity=0.8
+                        ))
                     
-                    fig_radar.add_trace(go.Scatterpolar(
-                        r=[scores_b[k] for k in keys] + [scores_b[keys[0]]],
-                        theta=keys + [keys[0]],
-                        fill='toself',
-                        name=car_b_name,
-                        line_color='#ff0055',
-                        fillcolor='rgba(255, 0, 85, 0.4)',
-                        opacity=0.8
-                    ))
+                        fig_radar.add_trace(go.Scatterpolar(
+                            r=[scores_b[k] for k in keys] + [scores_b[keys[0]]],
+                            theta=keys + [keys[0]],
+                            fill='toself',
+                            name=car_b_name,
+                            line_color='#ff0055',
+                            fillcolor='rgba(255, 0, 85, 0.4)',
+                            opacity=0.8
+                        ))
                     
-                    fig_radar.update_layout(
-                        polar=dict(radialaxis=dict(visible=True, range=[min(min(scores_a.values()), min(scores_b.values())) - 2, 100])),
-                        showlegend=True,
-                        template="plotly_dark",
-                        height=500
-                    )
+                        fig_radar.update_layout(
+                            polar=dict(radialaxis=dict(visible=True, range=[min(min(scores_a.values()), min(scores_b.values())) - 2, 100])),
+                            showlegend=True,
+                            template="plotly_dark",
+                            height=500
+                        )
                     
-                    st.plotly_chart(fig_radar, width='stretch')
+                        st.plotly_chart(fig_radar, width='stretch')
                     
-                st.markdown("---")
-                st.subheader("Raw Head-to-Head Data")
+                    st.markdown("---")
+                    st.subheader("Raw Head-to-Head Data")
                 
-                def render_row(label, val_a, val_b, format_str, lower_is_better):
-                    safe_a = val_a if val_a is not None else (999.0 if lower_is_better else 0.0)
-                    safe_b = val_b if val_b is not None else (999.0 if lower_is_better else 0.0)
+                    def render_row(label, val_a, val_b, format_str, lower_is_better):
+                        safe_a = val_a if val_a is not None else (999.0 if lower_is_better else 0.0)
+                        safe_b = val_b if val_b is not None else (999.0 if lower_is_better else 0.0)
                     
-                    best = min(safe_a, safe_b) if lower_is_better else max(safe_a, safe_b)
+                        best = min(safe_a, safe_b) if lower_is_better else max(safe_a, safe_b)
                     
-                    str_a = format_str.format(val_a) if val_a is not None else "N/A"
-                    str_b = format_str.format(val_b) if val_b is not None else "N/A"
+                        str_a = format_str.format(val_a) if val_a is not None else "N/A"
+                        str_b = format_str.format(val_b) if val_b is not None else "N/A"
                     
-                    color_a = "color: #00ff88; font-weight: bold;" if safe_a == best and val_a is not None else "color: #ffffff;"
-                    color_b = "color: #00ff88; font-weight: bold;" if safe_b == best and val_b is not None else "color: #ffffff;"
+                        color_a = "color: #00ff88; font-weight: bold;" if safe_a == best and val_a is not None else "color: #ffffff;"
+                        color_b = "color: #00ff88; font-weight: bold;" if safe_b == best and val_b is not None else "color: #ffffff;"
                     
-                    return f'<tr style="border-bottom: 1px solid #333; background-color: rgba(255,255,255,0.02);"><td style="padding: 12px 16px;">{label}</td><td style="padding: 12px 16px; {color_a}">{str_a}</td><td style="padding: 12px 16px; {color_b}">{str_b}</td></tr>'
+                        return f'<tr style="border-bottom: 1px solid #333; background-color: rgba(255,255,255,0.02);"><td style="padding: 12px 16px;">{label}</td><td style="padding: 12px 16px; {color_a}">{str_a}</td><td style="padding: 12px 16px; {color_b}">{str_b}</td></tr>'
                 
-                html = (
-                    f'<table style="width: 100%; text-align: left; border-collapse: collapse; margin-top: 10px; font-family: sans-serif;">'
-                    f'<thead><tr style="border-bottom: 2px solid #555; background-color: rgba(255,255,255,0.05);"><th style="padding: 12px 16px; color: #aaa;">Metrik</th>'
-                    f'<th style="padding: 12px 16px; color: #00ff88;">{car_a_name}</th><th style="padding: 12px 16px; color: #ff0055;">{car_b_name}</th></tr></thead><tbody>'
-                    f'{render_row("0-100 km/h", a_100, b_100, "{:.2f} s", True)}'
-                    f'{render_row("0-200 km/h", a_200, b_200, "{:.2f} s", True)}'
-                    f'{render_row("Top Speed", a_vmax, b_vmax, "{:.1f} km/h", False)}'
-                    f'{render_row("Max Lateral G (Clean)", a_lat, b_lat, "{:.2f} G", False)}'
-                    f'{render_row("Max Brake G (Clean)", a_brk, b_brk, "{:.2f} G", False)}'
-                    f'{render_row("Stability & Confidence (CSI)", a_csi, b_csi, "{:.1f} Pkt", False)}'
-                    f'</tbody></table>'
-                )
-                st.markdown(html, unsafe_allow_html=True)
+                    html = (
+                        f'<table style="width: 100%; text-align: left; border-collapse: collapse; margin-top: 10px; font-family: sans-serif;">'
+                        f'<thead><tr style="border-bottom: 2px solid #555; background-color: rgba(255,255,255,0.05);"><th style="padding: 12px 16px; color: #aaa;">Metrik</th>'
+                        f'<th style="padding: 12px 16px; color: #00ff88;">{car_a_name}</th><th style="padding: 12px 16px; color: #ff0055;">{car_b_name}</th></tr></thead><tbody>'
+                        f'{render_row("0-100 km/h", a_100, b_100, "{:.2f} s", True)}'
+                        f'{render_row("0-200 km/h", a_200, b_200, "{:.2f} s", True)}'
+                        f'{render_row("Top Speed", a_vmax, b_vmax, "{:.1f} km/h", False)}'
+                        f'{render_row("Max Lateral G (Clean)", a_lat, b_lat, "{:.2f} G", False)}'
+                        f'{render_row("Max Brake G (Clean)", a_brk, b_brk, "{:.2f} G", False)}'
+                        f'{render_row("Stability & Confidence (CSI)", a_csi, b_csi, "{:.1f} Pkt", False)}'
+                        f'</tbody></table>'
+                    )
+                    st.markdown(html, unsafe_allow_html=True)
+
+            st.markdown("---")
+            st.subheader("🏁 Flotten-Vergleich (N Fahrzeuge)")
+            st.markdown("Vergleicht ein ganzes Feld (z.B. alle Autos einer Klasse). Pro Fahrzeug zählen der schnellste Drag-Run und der Handling-Run mit dem höchsten Quer-G; jeder Run wird nur einmal geladen und analysiert.")
+            fleet_filters = {'run_type': ['DRAG', 'HANDLING'], 'selectable': True}
+            fleet_vehicles = telemetry_store.query_run_values('vehicle_name', filters=fleet_filters, db_path=DB_PATH)
+            fleet_selection = st.multiselect("Fahrzeuge", fleet_vehicles, key="fleet_vehicles")
+
+            if st.button("🏁 Flotte vergleichen", disabled=len(fleet_selection) < 2):
+                fleet_run_ids = telemetry_store.query_run_values('id', filters={**fleet_filters, 'vehicle_name': fleet_selection}, db_path=DB_PATH)
+                fleet_progress = st.progress(0.0, text="Analysiere Runs...")
+                fleet_results = {}
+                for rid, res in fleet_compare.iter_fleet(fleet_run_ids, DB_PATH, cache=get_telemetry_cache()):
+                    fleet_results[rid] = res
+                    fleet_progress.progress(len(fleet_results) / len(fleet_run_ids), text=f"Analysiere Runs... {len(fleet_results)}/{len(fleet_run_ids)}")
+                fleet_progress.empty()
+
+                ranking = fleet_compare.fleet_ranking(fleet_results, track_type)
+                for vehicle in ranking.loc[ranking['Crash'], 'Fahrzeug']:
+                    st.error(f"⚠️ **Crash/Impact detected** im Handling-Run von {vehicle}! Peaks wurden gecleant, aber die Daten könnten verfälscht sein.")
+                st.dataframe(ranking.drop(columns=['Crash']).style.format(precision=2), width='stretch')
+
+                entries = fleet_compare.fleet_entries(fleet_results)
+                col_fleet1, col_fleet2 = st.columns(2)
+                with col_fleet1:
+                    st.markdown(f"**Speed über Zeit (bester Drag-Run, ab {fleet_compare.DEFAULT_SYNC_SPEED} km/h synchronisiert)**")
+                    fig_fleet_speed = go.Figure()
+                    for i, (vehicle, entry) in enumerate(entries.items()):
+                        if entry['drag'] is not None and entry['drag']['trace'] is not None:
+                            trace = entry['drag']['trace']
+                            fig_fleet_speed.add_trace(telemetry_plot.make_trace(trace['time_elapsed'], trace['speed_kmh'], name=vehicle, mode='lines',
+                                                                                line=dict(color=FLEET_COLORS[i % len(FLEET_COLORS)])))
+                    fig_fleet_speed.update_layout(xaxis_title="Zeit (s)", yaxis_title="Speed (km/h)", template="plotly_dark", height=500)
+                    st.plotly_chart(fig_fleet_speed, width='stretch')
+                with col_fleet2:
+                    st.markdown("**G-G Grip-Limit (Handling-Run)**")
+                    fig_fleet_gg = go.Figure()
+                    for i, (vehicle, entry) in enumerate(entries.items()):
+                        if entry['handling'] is not None and entry['handling']['envelope'] is not None:
+                            polygon = entry['handling']['envelope']
+                            fig_fleet_gg.add_trace(go.Scatter(x=polygon[:, 0], y=polygon[:, 1], mode='lines', name=vehicle,
+                                                              line=dict(color=FLEET_COLORS[i % len(FLEET_COLORS)], width=2)))
+                    fig_fleet_gg.update_layout(xaxis_title="Lateral G (Kurve)", yaxis_title="Longitudinal G (Bremsen/Gas)",
+                                               yaxis=dict(range=[-3.0, 1.5], scaleanchor="x", scaleratio=1), xaxis=dict(range=[-2.5, 2.5]),
+                                               template="plotly_dark", height=500)
+                    st.plotly_chart(fig_fleet_gg, width='stretch')
+
+                # Sektor-KPIs aller Handling-Runs nebeneinander (Dauer pro Sektor)
+                sector_tables = [entry['handling']['tables']['sector_kpis'].assign(Fahrzeug=vehicle)
+                                 for vehicle, entry in entries.items() if entry['handling'] is not None]
+                sector_tables = [t for t in sector_tables if not t.empty]
+                if sector_tables:
+                    st.markdown("**Sektor-Zeiten (Handling-Run)**")
+                    sectors_all = pd.concat(sector_tables, ignore_index=True)
+                    st.dataframe(sectors_all.pivot_table(index='Fahrzeug', columns='sector', values='duration_s').add_prefix("Sektor ").style.format(precision=2),
+                                 width='stretch')
 
 with tab_garage:
-    st.header("📂 Garage (Daten & Logs)")
-    st.markdown("Hier kannst du alle gespeicherten Telemetrie-Aufzeichnungen sehen und endgültig aus der Datenbank löschen.")
+    if tab_open(tab_garage, ["garage_search", "garage_vehicle", "garage_class", "garage_track", "garage_type", "garage_dates", "garage_page",
+                          "export_scope", "export_selectbox", "export_format", "note_selectbox", "delete_selectbox", "archive_selectbox", "math_delete"]):
+        st.header("📂 Garage (Daten & Logs)")
+        st.markdown("Hier kannst du alle gespeicherten Telemetrie-Aufzeichnungen sehen und endgültig aus der Datenbank löschen.")
     
-    if runs_df.empty:
-        st.info("Die Datenbank ist derzeit leer.")
-    else:
-        st.dataframe(
-            runs_df[['id', 'run_type', 'vehicle_name', 'vehicle_class', 'track_name', 'timestamp', 'notes']], 
-            width='stretch',
-            hide_index=True
-        )
+        if telemetry_store.count_runs(db_path=DB_PATH) == 0:
+            st.info("Die Datenbank ist derzeit leer.")
+        else:
+            # Filter & Suche laufen in SQL (FTS5), geladen wird nur die aktuelle Seite
+            filter_values = telemetry_store.load_run_filter_values(DB_PATH, cache=get_telemetry_cache())
+            def filter_options(col):
+                return ["Alle"] + sorted(filter_values.loc[filter_values['col'] == col, 'value'].astype(str))
+        
+            garage_search = st.text_input("🔎 Suche (Fahrzeug, Strecke, Notizen)", key="garage_search", placeholder="z.B. porsche monza regen")
+            col_gf1, col_gf2, col_gf3, col_gf4, col_gf5 = st.columns(5)
+            garage_filters = {
+                'vehicle_name': col_gf1.selectbox("Fahrzeug", filter_options('vehicle_name'), key="garage_vehicle"),
+                'vehicle_class': col_gf2.selectbox("Klasse", filter_options('vehicle_class'), key="garage_class"),
+                'track_name': col_gf3.selectbox("Strecke", filter_options('track_name'), key="garage_track"),
+                'run_type': col_gf4.selectbox("Run-Typ", filter_options('run_type'), key="garage_type"),
+            }
+            garage_filters = {k: v for k, v in garage_filters.items() if v != "Alle"}
+            garage_dates = col_gf5.date_input("Zeitraum", value=(), key="garage_dates")
+            if len(garage_dates) >= 1:
+                garage_filters['date_from'] = garage_dates[0]
+                garage_filters['date_to'] = garage_dates[-1]
         
-        run_options_edit = get_run_options(runs_df)
+            garage_total = telemetry_store.count_runs(garage_search, garage_filters, db_path=DB_PATH)
+            n_pages = max(1, -(-garage_total // telemetry_store.RUN_PAGE_SIZE))
+            garage_page = st.selectbox("Seite", range(1, n_pages + 1), key="garage_page") if n_pages > 1 else 1
+            page_df, _ = telemetry_store.query_runs(garage_search, garage_filters, page=garage_page - 1, db_path=DB_PATH)
+            st.caption(f"{garage_total} Runs gefunden – Seite {garage_page} von {n_pages}. Die Auswahllisten unten enthalten die Runs dieser Seite.")
         
-        st.markdown("---")
-        st.subheader("💾 Backup (Export / Import)")
-        st.markdown("Hier kannst du die komplette Datenbank herunterladen oder ein existierendes Backup wiederherstellen.")
+            st.dataframe(
+                page_df[['id', 'run_type', 'vehicle_name', 'vehicle_class', 'track_name', 'timestamp', 'notes']], 
+                width='stretch',
+                hide_index=True
+            )
         
-        col_down, col_up = st.columns(2)
+            run_options_edit = get_run_options(page_df)
         
-        with col_down:
-            try:
-                with open(DB_PATH, "rb") as f:
-                    db_bytes = f.read()
+            st.markdown("---")
+            st.subheader("💾 Backup (Export / Import)")
+            st.markdown("Hier kannst du die komplette Datenbank herunterladen oder ein existierendes Backup wiederherstellen.")
+        
+            col_down, col_up = st.columns(2)
+        
+            with col_down:
+                # Backup wird erst beim Klick erzeugt (konsistenter Snapshot, auch während der Logger schreibt)
+                st.download_button(
+                    label="📥 Gesamte Datenbank (.db) herunterladen",
+                    data=lambda: db_backup.open_backup(DB_PATH),
+                    file_name=f"lmu_telemetry_backup_{time.strftime('%Y%m%d_%H%M%S')}.db",
+                    mime="application/octet-stream",
+                    width='stretch'
+                )
+                
+            with col_up:
+                uploaded_file = st.file_uploader("📤 Datenbank (.db) hochladen", type=["db"])
+                if uploaded_file is not None:
+                    restore_blocked = get_logger_state().startswith("RECORDING")
+                    if restore_blocked:
+                        st.warning("Während einer laufenden Aufzeichnung kann kein Backup eingespielt werden.")
+                    if st.button("⚠️ Backup einspielen (Überschreibt alle Daten!)", type="primary", width='stretch', disabled=restore_blocked):
+                        try:
+                            uploaded_file.seek(0)
+                            missing_archives = db_backup.restore_backup(uploaded_file, DB_PATH)
+                            get_telemetry_cache().clear()
+                            st.success("Backup erfolgreich eingespielt! Seite lädt neu...")
+                            if missing_archives:
+                                st.warning(f"{len(missing_archives)} archivierte Runs sind ohne ihren Archiv-Ordner '{telemetry_archive.ARCHIVE_DIR_NAME}' nicht verfügbar (siehe Archiv).")
+                            time.sleep(4 if missing_archives else 1.5)
+                            st.rerun()
+                        except ValueError as e:
+                            st.error(f"Ungültiges Backup: {e}")
+                        except Exception as e:
+                            st.error("Fehler beim Einspielen des Backups.")
+
+            st.markdown("---")
+
+            st.subheader("📊 Runs exportieren (Parquet / Arrow / CSV)")
+            st.caption("Der Export läuft im Hintergrund und schreibt die Daten chunkweise mit typisierten Spalten und Run-Metadaten – ideal für pandas, DuckDB oder Polars.")
+        
+            export_scope = st.radio("Umfang", ["Einzelner Run", "Gefilterte Runs", "Gesamte Datenbank"], horizontal=True, key="export_scope")
+            if export_scope == "Einzelner Run":
+                selected_export_str = st.selectbox("Wähle einen Run für den Export", run_options_edit, key="export_selectbox")
+                export_ids = [int(selected_export_str.split(" - ")[0])] if selected_export_str else []
+            elif export_scope == "Gefilterte Runs":
+                # Alle Treffer der Garage-Filter/Suche (nicht nur die aktuelle Seite)
+                export_sel, _ = telemetry_store.query_runs(garage_search, garage_filters, page_size=None, db_path=DB_PATH)
+                # Runs ohne Archiv-Datei (nach dem Einspielen eines Backups) lassen sich nicht exportieren
+                export_ids = export_sel.loc[export_sel['archive_missing'].fillna(0) == 0, 'id'].astype(int).tolist()
+                st.caption(f"{len(export_ids)} Runs ausgewählt (Filter und Suche von oben).")
+            else:
+                export_ids = None
+        
+            export_format = st.radio("Format", ["parquet", "arrow", "csv"], horizontal=True, key="export_format",
+                                     format_func=lambda f: {"parquet": "Parquet", "arrow": "Arrow IPC", "csv": "CSV"}[f])
+        
+            if st.button("📦 Export starten", disabled=(export_ids is not None and not export_ids)):
+                job = telemetry_export.ExportJob(export_ids, export_format, db_path=DB_PATH).start()
+                get_export_jobs()[job.id] = job
+                st.session_state.export_job_id = job.id
+                if job.fmt != export_format:
+                    st.info("pyarrow ist nicht installiert – Export erfolgt als CSV.")
+        
+            telemetry_export.prune_jobs(get_export_jobs())
+
+            @st.fragment(run_every=1.0)
+            def render_export_status():
+                job = get_export_jobs().get(st.session_state.get("export_job_id"))
+                if job is None:
+                    return
+                if job.status == 'running':
+                    st.progress(job.fraction, text=f"Export läuft... {job.rows_done:,} / {job.rows_total:,} Zeilen")
+                elif job.status == 'error':
+                    st.error(f"Export fehlgeschlagen: {job.error}")
+                elif job.status == 'done':
+                    st.success(f"Export fertig: {job.rows_done:,} Zeilen in {job.finished - job.started:.1f}s")
                     st.download_button(
-                        label="📥 Gesamte Datenbank (.db) herunterladen",
-                        data=db_bytes,
-                        file_name=f"lmu_telemetry_backup_{time.strftime('%Y%m%d_%H%M%S')}.db",
+                        label=f"📥 Export herunterladen (.{job.fmt})",
+                        data=job.read_download,
+                        file_name=f"lmu_export_{job.id}{telemetry_export.FORMAT_EXTENSIONS[job.fmt]}",
                         mime="application/octet-stream",
-                        width='stretch'
+                        key=f"export_download_{job.id}"
                     )
-            except Exception as e:
-                 st.error("Fehler beim Erstellen des Backups.")
+                elif job.status == 'downloaded':
+                    st.caption(f"Export {job.id} wurde heruntergeladen, die temporäre Datei ist gelöscht.")
+        
+            render_export_status()
+
+            st.markdown("---")
+        
+            st.subheader("📝 Notiz bearbeiten / hinzufügen")
+            selected_note_str = st.selectbox("Wähle einen Run, um eine Notiz zu bearbeiten", run_options_edit, key="note_selectbox")
+        
+            if selected_note_str:
+                note_id = int(selected_note_str.split(" - ")[0])
+                current_note = page_df[page_df['id'] == note_id].iloc[0].get('notes', '')
+                if pd.isna(current_note):
+                    current_note = ""
                 
-        with col_up:
-            uploaded_file = st.file_uploader("📤 Datenbank (.db) hochladen", type=["db"])
-            if uploaded_file is not None:
-                if st.button("⚠️ Backup einspielen (Überschreibt alle Daten!)", type="primary", width='stretch'):
+                new_note = st.text_area("Notiz (z.B. Setup-Vorgaben, Besonderheiten beim Launch, etc.):", value=current_note)
+            
+                if st.button("💾 Notiz speichern"):
                     try:
-                        with open(DB_PATH, "wb") as f:
-                            f.write(uploaded_file.getbuffer())
-                        st.success("Backup erfolgreich eingespielt! Seite lädt neu...")
-                        time.sleep(1.5)
+                        conn_note = sqlite3.connect(DB_PATH)
+                        c_note = conn_note.cursor()
+                        c_note.execute("UPDATE runs SET notes = ? WHERE id = ?", (new_note, note_id))
+                        conn_note.commit()
+                        conn_note.close()
+                        st.success("Notiz erfolgreich gespeichert!")
+                        time.sleep(1)
                         st.rerun()
                     except Exception as e:
-                        st.error("Fehler beim Einspielen des Backups.")
-
-        st.markdown("---")
+                        st.error(f"Fehler: {e}")
 
-        st.subheader("📊 Einzelnen Run exportieren")
-        selected_export_str = st.selectbox("Wähle einen Run für den CSV-Export", run_options_edit, key="export_selectbox")
+            st.markdown("---")
         
-        if selected_export_str:
-            export_id = int(selected_export_str.split(" - ")[0])
-            export_df = load_telemetry(export_id)
-            if not export_df.empty:
-                csv = export_df.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label=f"📥 Run {export_id} als CSV herunterladen",
-                    data=csv,
-                    file_name=f"lmu_run_{export_id}.csv",
-                    mime="text/csv",
-                )
-
-        st.markdown("---")
+            st.subheader("🗑️ Eintrag löschen")
+            st.warning("⚠️ Beim Löschen werden auch tausende Telemetrie-Datenpunkte aus der Datenbank entfernt. Dies kann nicht rückgängig gemacht werden.")
+            n_pending = db_maintenance.pending_purges(DB_PATH)
+            if n_pending:
+                st.caption(f"🧹 {n_pending} gelöschte Runs werden gerade im Hintergrund bereinigt.")
+            purge_error = get_purge_worker()['error']
+            if purge_error:
+                st.error(f"Bereinigung im Hintergrund fehlgeschlagen: {purge_error}")
+                if st.button("🔁 Bereinigung erneut starten"):
+                    purge_deleted_runs_in_background()
+                    st.rerun()
+            selected_del_str = st.selectbox("Wähle einen Run zum Löschen aus", run_options_edit, key="delete_selectbox")
         
-        st.subheader("📝 Notiz bearbeiten / hinzufügen")
-        selected_note_str = st.selectbox("Wähle einen Run, um eine Notiz zu bearbeiten", run_options_edit, key="note_selectbox")
+            if selected_del_str:
+                del_id = int(selected_del_str.split(" - ")[0])
+                del_info = page_df[page_df['id'] == del_id].iloc[0]
+                st.error(f"⚠️ **Folgender Eintrag wird gelöscht:**\n\n**ID:** `{del_id}` | **Typ:** `{del_info['run_type']}` | **Fahrzeug:** `{del_info['vehicle_name']}` | **Strecke:** `{del_info['track_name']}` | **Zeit:** `{del_info['timestamp']}`")
         
-        if selected_note_str:
-            note_id = int(selected_note_str.split(" - ")[0])
-            current_note = runs_df[runs_df['id'] == note_id].iloc[0].get('notes', '')
-            if pd.isna(current_note):
-                current_note = ""
-                
-            new_note = st.text_area("Notiz (z.B. Setup-Vorgaben, Besonderheiten beim Launch, etc.):", value=current_note)
-            
-            if st.button("💾 Notiz speichern"):
+            if st.button("🗑️ Run permanent löschen", type="primary", disabled=not selected_del_str):
+                del_id = int(selected_del_str.split(" - ")[0])
                 try:
-                    conn_note = sqlite3.connect(DB_PATH)
-                    c_note = conn_note.cursor()
-                    c_note.execute("UPDATE runs SET notes = ? WHERE id = ?", (new_note, note_id))
-                    conn_note.commit()
-                    conn_note.close()
-                    st.success("Notiz erfolgreich gespeichert!")
-                    time.sleep(1)
+                    # Sofortiger Tombstone, die Telemetrie wird im Hintergrund in Batches entfernt
+                    db_maintenance.tombstone_run(del_id, DB_PATH)
+                    get_telemetry_cache().invalidate_run(del_id)
+                    purge_deleted_runs_in_background()
+                
+                    st.success(f"Run {del_id} wurde gelöscht! Die Telemetriedaten werden im Hintergrund bereinigt.")
+                    time.sleep(1) # kurzes Delay für die Success-Nachricht
                     st.rerun()
                 except Exception as e:
-                    st.error(f"Fehler: {e}")
+                    st.error(f"Fehler beim Löschen: {e}")
 
-        st.markdown("---")
-        
-        st.subheader("🗑️ Eintrag löschen")
-        st.warning("⚠️ Beim Löschen werden auch tausende Telemetrie-Datenpunkte aus der Datenbank entfernt. Dies kann nicht rückgängig gemacht werden.")
-        selected_del_str = st.selectbox("Wähle einen Run zum Löschen aus", run_options_edit, key="delete_selectbox")
+            st.markdown("---")
         
-        if selected_del_str:
-            del_id = int(selected_del_str.split(" - ")[0])
-            del_info = runs_df[runs_df['id'] == del_id].iloc[0]
-            st.error(f"⚠️ **Folgender Eintrag wird gelöscht:**\n\n**ID:** `{del_id}` | **Typ:** `{del_info['run_type']}` | **Fahrzeug:** `{del_info['vehicle_name']}` | **Strecke:** `{del_info['track_name']}` | **Zeit:** `{del_info['timestamp']}`")
-        
-        if st.button("🗑️ Run permanent löschen", type="primary"):
-            del_id = int(selected_del_str.split(" - ")[0])
-            try:
-                conn_del = sqlite3.connect(DB_PATH)
-                c = conn_del.cursor()
-                # Lösche raw telemetry
-                c.execute(f"DELETE FROM telemetry_data WHERE run_id = {del_id}")
-                # Lösche run Metadaten
-                c.execute(f"DELETE FROM runs WHERE id = {del_id}")
-                # Lösche evtl. generierte Overlay-Profile
+            st.subheader("🧹 Aufbewahrung (Retention)")
+            st.caption("Optionale Regeln, die der Data Logger im Leerlauf automatisch anwendet. 0 = deaktiviert.")
+            retention = db_maintenance.get_retention_settings(DB_PATH)
+            col_r1, col_r2, col_r3 = st.columns(3)
+            keep_last = col_r1.number_input("Nur die letzten N Runs pro Fahrzeug behalten", min_value=0, step=1, value=retention['retention_keep_last_per_vehicle'] or 0)
+            delete_after = col_r2.number_input("Runs älter als X Tage löschen", min_value=0, step=1, value=retention['retention_delete_after_days'] or 0)
+            archive_after = col_r3.number_input("Runs älter als X Tage archivieren", min_value=0, step=1, value=retention['retention_archive_after_days'] or 0)
+            if st.button("💾 Retention speichern"):
+                db_maintenance.set_retention_settings({
+                    'retention_keep_last_per_vehicle': keep_last,
+                    'retention_delete_after_days': delete_after,
+                    'retention_archive_after_days': archive_after
+                }, DB_PATH)
+                st.success("Retention-Regeln gespeichert.")
+
+            if db_maintenance.needs_incremental_vacuum(DB_PATH):
+                st.info("Die Datenbank enthält viel freien Platz, kann ihn aber nur per vollständigem VACUUM zurückgeben. "
+                        "Nach der einmaligen Umstellung gibt der Data Logger freie Seiten im Leerlauf schrittweise frei. "
+                        "Die Umstellung schreibt die ganze Datei neu und kann bei großen Datenbanken einige Minuten dauern.")
+                vacuum_blocked = get_logger_state().startswith("RECORDING")
+                if st.button("🗜️ Datenbank kompaktieren und umstellen", disabled=vacuum_blocked):
+                    try:
+                        with st.spinner("VACUUM läuft..."):
+                            db_maintenance.enable_incremental_vacuum(DB_PATH)
+                        st.success("Datenbank kompaktiert, freier Platz wird künftig automatisch freigegeben.")
+                    except sqlite3.Error as e:
+                        st.error(f"Fehler beim Kompaktieren: {e}")
+
+            st.markdown("---")
+
+            st.subheader("🧮 Math-Kanäle")
+            st.caption("Eigene Kanäle als Ausdruck über die Telemetrie-Kanäle (z.B. `sqrt(lat_g**2 + lon_g**2)`). "
+                       f"Funktionen: {', '.join(channel_math.FUNCTIONS)}; Vergleiche und `&` / `|` ergeben 0/1. "
+                       "Verfügbar als Overlay in Längs- und Querdynamik sowie im Batch-Report (`--math`).")
+            math_channels = channel_math.load_math_channels(DB_PATH)
+            st.dataframe(pd.DataFrame([{'Name': name, 'Ausdruck': ch['expression'], 'Einheit': ch['unit'], 'Beschreibung': ch['description'],
+                                        'Eigener Kanal': not ch['builtin']} for name, ch in math_channels.items()]),
+                         width='stretch', hide_index=True)
+            col_m1, col_m2, col_m3 = st.columns([1, 2, 1])
+            math_name = col_m1.text_input("Name", placeholder="z.B. lat_load")
+            math_expr = col_m2.text_input("Ausdruck", placeholder="z.B. rolling(abs(lat_g), 25) * speed_kmh / 100")
+            math_unit = col_m3.text_input("Einheit")
+            math_desc = st.text_input("Beschreibung (optional)")
+            if st.button("💾 Math-Kanal speichern", disabled=not (math_name and math_expr)):
                 try:
-                     c.execute(f"DELETE FROM saved_profiles WHERE run_id = {del_id}")
-                except:
-                     pass
-                conn_del.commit()
-                conn_del.close()
-                
-                st.success(f"Run {del_id} und alle dazugehörigen Telemetriedaten wurden gelöscht!")
-                time.sleep(1) # kurzes Delay für die Success-Nachricht
-                st.rerun()
-            except Exception as e:
-                st.error(f"Fehler beim Löschen: {e}")
+                    channel_math.save_math_channel(math_name, math_expr, math_unit, math_desc, DB_PATH)
+                    st.success(f"Math-Kanal '{math_name.strip()}' gespeichert.")
+                    time.sleep(1)
+                    st.rerun()
+                except channel_math.ChannelExpressionError as e:
+                    st.error(f"Ungültiger Math-Kanal: {e}")
+            own_channels = [name for name, ch in math_channels.items() if not ch['builtin']]
+            if own_channels:
+                selected_math = st.selectbox("Eigenen Math-Kanal löschen", own_channels, key="math_delete")
+                if st.button("🗑️ Math-Kanal löschen"):
+                    channel_math.delete_math_channel(selected_math, DB_PATH)
+                    st.rerun()
 
+            st.markdown("---")
+        
+            st.subheader("🗄️ Archiv")
+            st.caption(f"Archivierte Runs bleiben in allen Analysen auswählbar, ihre Telemetrie liegt aber komprimiert im Ordner '{telemetry_archive.ARCHIVE_DIR_NAME}' neben der Datenbank (ein Archiv pro Fahrzeug und Monat). Das Datenbank-Backup enthält diesen Ordner nicht – beim Umzug den Ordner mitkopieren.")
+            hot_options = [opt for opt, archived in zip(run_options_edit, get_run_archived_flags(page_df)) if not archived]
+            selected_archive_str = st.selectbox("Wähle einen Run zum Archivieren", hot_options, key="archive_selectbox")
+            archive_blocked = get_logger_state().startswith("RECORDING")
+            if st.button("🗄️ Run archivieren", disabled=(not selected_archive_str or archive_blocked)):
+                try:
+                    archive_id = int(selected_archive_str.split(" - ")[0])
+                    telemetry_archive.archive_run(archive_id, DB_PATH)
+                    purge_deleted_runs_in_background()
+                    st.success(f"Run {archive_id} wurde archiviert.")
+                    time.sleep(1)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Fehler beim Archivieren: {e}")
+        
+            archived_df = telemetry_archive.load_summaries(DB_PATH)
+            if not archived_df.empty:
+                n_missing = int(archived_df['archive_missing'].fillna(0).sum())
+                if n_missing:
+                    st.warning(f"Bei {n_missing} archivierten Runs fehlt die Archiv-Datei. Sie sind in den Analysen ausgeblendet, bis der Ordner '{telemetry_archive.ARCHIVE_DIR_NAME}' wieder neben der Datenbank liegt.")
+                if st.button("🔍 Archive prüfen"):
+                    missing_archives = telemetry_archive.verify_archives(DB_PATH)
+                    get_telemetry_cache().clear()
+                    if missing_archives:
+                        st.warning(f"Archiv fehlt für Run(s): {', '.join(str(r) for r in missing_archives)}")
+                    else:
+                        st.success("Alle Archive vorhanden.")
+                    time.sleep(1)
+                    st.rerun()
+                st.dataframe(archived_df, width='stretch', hide_index=True)
@@ -0,0 +1,128 @@
+import argparse
+import os
+import sqlite3
+
+import pandas as pd
+
+import channel_math
+import telemetry_store
+from telemetry_derived import load_derived, QUALITY_DERIVED
+from scoring_engine import (map_chunks, run_report, DEFAULT_CHUNK_RUNS, MATH_TABLE, REPORT_CHANNELS,
+                            REPORT_TABLES)
+from telemetry_analysis import analyze_run_quality
+from telemetry_export import resolve_format
+from telemetry_store import DB_PATH
+
+# Flottenweiter Analyse-Report ohne Browser: rechnet die Kennzahlen der Dashboard-Tabs (Beschleunigung,
+# Schaltvorgänge, Gang-Beschleunigung, Sektoren, CSI) für ausgewählte oder alle Runs parallel und
+# schreibt pro Kennzahl eine Tabelle (Parquet/CSV-Dateien in einem Verzeichnis oder eine SQLite-Datei).
+# Die Tabellen eines Runs liefert scoring_engine.run_report (auch vom Flottenvergleich genutzt).
+
+REPORT_FORMATS = ('parquet', 'csv', 'sqlite')
+
+
+def report_runs(run_ids, db_path=DB_PATH, math=None, cache=None):
+    """
+    Report-Tabellen für mehrere Runs. Eine Arbeitseinheit des Prozess-Pools (siehe scoring_engine.map_chunks).
+    :param math: optional dict Math-Kanal -> Ausdruck (siehe channel_math.resolve_expressions)
+    :return: Liste von (run_id, dict Tabellenname -> DataFrame)
+    """
+    runs = telemetry_store.load_runs(db_path).set_index('id')
+    results = []
+    for run_id in run_ids:
+        df = telemetry_store.load_channels(run_id, REPORT_CHANNELS, db_path=db_path, cache=cache)
+        meta = runs.loc[run_id].to_dict() if run_id in runs.index else None
+        derived = load_derived(run_id, QUALITY_DERIVED, db_path=db_path, cache=cache)
+        math_values = channel_math.evaluate_run(run_id, math, db_path=db_path, cache=cache).drop(columns=['time_elapsed']) if math else None
+        results.append((int(run_id), run_report(run_id, df, meta, quality=analyze_run_quality(df, derived), math_values=math_values)))
+    return results
+
+
+def iter_reports(run_ids, db_path=DB_PATH, workers=None, chunk_runs=DEFAULT_CHUNK_RUNS, cache=None, math=None):
+    """Verteilt die Runs in Blöcken auf einen Prozess-Pool; liefert (run_id, Tabellen) in Fertigstellungs-Reihenfolge."""
+    run_ids = [int(r) for r in run_ids]
+    tasks = [(run_ids[i:i + chunk_runs], db_path, math) for i in range(0, len(run_ids), chunk_runs)]
+    yield from map_chunks(report_runs, tasks, workers, cache=cache)
+
+
+def collect_tables(reports):
+    """Fügt die Tabellen mehrerer Runs zusammen (sortiert nach run_id)."""
+    reports = sorted(reports, key=lambda item: item[0])
+    names = REPORT_TABLES + ((MATH_TABLE,) if any(MATH_TABLE in tables for _, tables in reports) else ())
+    parts = {name: [] for name in names}
+    for _, tables in reports:
+        for name in names:
+            if name in tables and not tables[name].empty:
+                parts[name].append(tables[name])
+    return {name: pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=['run_id'])
+            for name, dfs in parts.items()}
+
+
+def write_tables(tables, target, fmt='parquet'):
+    """
+    Schreibt die Report-Tabellen: 'sqlite' -> eine Tabelle pro Kennzahl in der Datei `target` (ersetzt
+    vorhandene Report-Tabellen), 'parquet'/'csv' -> eine Datei pro Tabelle im Verzeichnis `target`.
+    Ohne pyarrow wird Parquet durch CSV ersetzt.
+
+    :return: tatsächlich verwendetes Format
+    """
+    if fmt == 'sqlite':
+        conn = sqlite3.connect(target)
+        try:
+            for name, df in tables.items():
+                df.to_sql(name, conn, if_exists='replace', index=False)
+            conn.commit()
+        finally:
+            conn.close()
+        return fmt
+
+    fmt = resolve_format(fmt)
+    os.makedirs(target, exist_ok=True)
+    for name, df in tables.items():
+        path = os.path.join(target, f"{name}.{fmt}")
+        if fmt == 'parquet':
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+    return fmt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse-Report (Beschleunigung, Schaltvorgänge, Gänge, Sektoren, CSI) für viele Runs (parallel).")
+    parser.add_argument("target", help="Zielverzeichnis (parquet/csv) bzw. SQLite-Datei (sqlite)")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--runs", type=int, nargs="*", help="Run-IDs (Standard: alle Runs)")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="parquet")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--chunk-runs", type=int, default=DEFAULT_CHUNK_RUNS, help="Runs pro Arbeitseinheit")
+    parser.add_argument("--math", nargs="*", default=None, metavar="KANAL",
+                        help="Math-Kanäle als Name oder name=ausdruck (ohne Angabe: alle definierten), ergibt die Tabelle math_channels")
+    args = parser.parse_args()
+
+    # Ältere Datenbanken zuerst migrieren (wie scoring_engine)
+    telemetry_store.init_db(args.db)
+    run_ids = telemetry_store.load_runs(args.db)['id'].tolist()
+    if args.runs:
+        run_ids = [r for r in run_ids if r in set(args.runs)]
+
+    math = None
+    if args.math is not None:
+        try:
+            math = channel_math.resolve_expressions(args.math, args.db)
+        except channel_math.ChannelExpressionError as e:
+            parser.error(f"--math: {e}")
+
+    reports = []
+    for run_id, tables in iter_reports(run_ids, args.db, args.workers, args.chunk_runs, math=math):
+        reports.append((run_id, tables))
+        print(f"[Report] {len(reports)}/{len(run_ids)} Run {run_id}: {tables['run_summary'].iloc[0]['shifts']} Schaltvorgänge, "
+              f"{len(tables['sector_kpis'])} Sektoren")
+
+    fmt = write_tables(collect_tables(reports), args.target, args.format)
+    if fmt != args.format:
+        print("[Report] pyarrow nicht installiert -> Fallback auf CSV")
+    print(f"[Report] {len(reports)} Runs nach {args.target} geschrieben ({fmt}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import time
+
+from telemetry_analysis import analyze_run_quality
+from test_helpers import make_synthetic_run, reference_analyze_run_quality
+
+# Über dieser Größe dauert die zeilenweise Referenz Minuten -> nur mit --legacy-all messen
+LEGACY_MAX_SAMPLES = 200_000
+
+
+def _timed(fn, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        data = df.copy()
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Laufzeit von analyze_run_quality (vektorisiert vs. zeilenweise Referenz).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-all", action="store_true", help="Referenz auch für große Runs messen")
+    args = parser.parse_args()
+
+    print(f"{'Samples':>10s} {'vektorisiert [s]':>18s} {'Referenz [s]':>14s} {'Faktor':>8s}")
+    for n in args.sizes:
+        df = make_synthetic_run(n, seed=n)
+        fast = _timed(analyze_run_quality, df, args.repeat)
+        if n <= LEGACY_MAX_SAMPLES or args.legacy_all:
+            slow = _timed(reference_analyze_run_quality, df, 1)
+            print(f"{n:10d} {fast:18.4f} {slow:14.4f} {slow / fast:8.1f}")
+        else:
+            print(f"{n:10d} {fast:18.4f} {'-':>14s} {'-':>8s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Kaltstart des Dashboards: Import-Zeit der App-Module und erster Render pro Tab, jeweils in einem frischen
+# Python-Prozess (sonst misst man nur den Modul-Cache). Mit --budget-ms als Regressions-Check nutzbar.
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Module, die app.py beim Start importiert (ohne Streamlit selbst)
+APP_MODULES = ['telemetry_store', 'telemetry_lod', 'telemetry_derived', 'channel_math', 'lap_align', 'telemetry_plot', 'db_backup', 'telemetry_export', 'gear_ratios', 'db_maintenance',
+               'telemetry_archive', 'scoring_engine', 'fleet_compare', 'telemetry_analysis']
+
+# Diese Pakete dürfen beim Start nicht geladen werden (nur bei Bedarf in den jeweiligen Analysen)
+DEFERRED_MODULES = ['scipy']
+
+TAB_LABELS = ["🏁 Aufnahme", "🚀 Längsdynamik", "🏎️ Querdynamik", "⚖️ Gesamt-Vergleich", "📂 Garage"]
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import streamlit, pandas, numpy, plotly.graph_objects
+t1 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+t2 = time.perf_counter()
+print(json.dumps({{'base_s': t1 - t0, 'app_modules_s': t2 - t1,
+                  'deferred_loaded': sorted({{m.split('.')[0] for m in sys.modules}} & set({deferred!r}))}}))
+"""
+
+_RENDER_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=300)
+at.session_state['main_tab'] = {tab!r}
+t0 = time.perf_counter()
+at.run()
+t1 = time.perf_counter()
+at.run()
+t2 = time.perf_counter()
+# Syntaxfehler im Skript tauchen nicht in at.exception auf -> zusätzlich prüfen, ob der Titel gerendert wurde
+print(json.dumps({{'first_s': t1 - t0, 'rerun_s': t2 - t1, 'exception': [str(e.value) for e in at.exception], 'rendered': len(at.title) > 0,
+                  'deferred_loaded': sorted({{m.split('.')[0] for m in sys.modules}} & set({deferred!r}))}}))
+"""
+
+
+def _run_json(script, cwd):
+    out = subprocess.run([sys.executable, "-c", script], cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_imports():
+    """Import-Zeit der App-Module in einem frischen Prozess (Streamlit/pandas/numpy/plotly separat als Basis)."""
+    root = os.path.dirname(APP_PATH)
+    return _run_json(_IMPORT_SCRIPT.format(root=root, modules=APP_MODULES, deferred=DEFERRED_MODULES), root)
+
+
+def measure_first_render(tab, db_path=None):
+    """
+    Erster Render und Rerun von app.py mit geöffnetem Tab `tab` (AppTest, frischer Prozess).
+    Läuft in einem temporären Arbeitsverzeichnis mit einer Kopie von db_path (bzw. leerer Datenbank).
+    """
+    root = os.path.dirname(APP_PATH)
+    with tempfile.TemporaryDirectory() as work:
+        if db_path:
+            shutil.copy(db_path, os.path.join(work, "lmu_telemetry.db"))
+        return _run_json(_RENDER_SCRIPT.format(root=root, app=APP_PATH, tab=tab, deferred=DEFERRED_MODULES), work)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Misst den Kaltstart des Dashboards (Imports und erster Render pro Tab).")
+    parser.add_argument("--db", default=None, help="Datenbank für den Render (Standard: leere Datenbank)")
+    parser.add_argument("--tabs", nargs="*", default=TAB_LABELS, help="Zu messende Tabs (Label)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fehler (Exit-Code 1), wenn ein erster Render länger dauert")
+    args = parser.parse_args()
+
+    failed = False
+    imports = measure_imports()
+    print(f"[Startup] Basis-Imports (streamlit, pandas, numpy, plotly): {imports['base_s'] * 1000:8.1f} ms")
+    print(f"[Startup] App-Module:                                      {imports['app_modules_s'] * 1000:8.1f} ms")
+    if imports['deferred_loaded']:
+        print(f"[Startup] FEHLER: beim Import geladen: {', '.join(imports['deferred_loaded'])}")
+        failed = True
+
+    print(f"{'Tab':28s} {'erster Render [ms]':>20s} {'Rerun [ms]':>12s}  verzögert geladen")
+    for tab in args.tabs:
+        res = measure_first_render(tab, args.db)
+        print(f"{tab:28s} {res['first_s'] * 1000:20.1f} {res['rerun_s'] * 1000:12.1f}  {', '.join(res['deferred_loaded']) or '-'}")
+        if res['exception'] or not res['rendered']:
+            print(f"[Startup] FEHLER im Tab {tab}: {res['exception'] or 'nichts gerendert'}")
+            failed = True
+        if args.budget_ms is not None and res['first_s'] * 1000 > args.budget_ms:
+            print(f"[Startup] Budget überschritten: {tab} {res['first_s'] * 1000:.1f} ms > {args.budget_ms:.1f} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import gear_ratios
+import shift_optimizer
+import telemetry_store
+
+# Gleiche Batch-Größe wie der Data Logger (DataLogger._flush_buffer)
+INSERT_BATCH_ROWS = 50
+
+INSERT_SQL = ("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, gear, rpm, torque, speed_kmh, throttle, lat_g, lon_g, "
+              "steering_angle, lap_distance, sector) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def _make_rows(run_id, n_samples, rng):
+    t = np.arange(n_samples) * 0.02
+    rpm = 3000 + (t * 400) % 5500
+    throttle = np.where(rng.random(n_samples) < 0.6, 1.0, rng.random(n_samples))
+    return list(zip([run_id] * n_samples, range(n_samples), t.tolist(), (1 + (t // 8) % 6).astype(int).tolist(), rpm.tolist(),
+                    (rng.random(n_samples) * 8000).tolist(), (rpm / 40).tolist(), throttle.tolist(),
+                    rng.normal(0, 1, n_samples).tolist(), rng.normal(0, 0.5, n_samples).tolist(),
+                    rng.normal(0, 0.1, n_samples).tolist(), (t * 50).tolist(), ((t // 30) % 3).astype(int).tolist()))
+
+
+def _timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(n_runs=20, n_samples=20_000, repeat=3, db_path=None):
+    """
+    Misst Insert-Durchsatz (Logger-Batches) und die heißen Queries auf einer synthetischen Datenbank.
+    :return: dict {name: Sekunden bzw. Zeilen pro Sekunde}
+    """
+    rng = np.random.default_rng(0)
+    tmp = None
+    if db_path is None:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, "bench.db")
+    try:
+        telemetry_store.init_db(db_path)
+        conn = sqlite3.connect(db_path)
+        results = {}
+
+        insert_time = 0.0
+        for i in range(n_runs):
+            conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp) VALUES (?, 'Bench', ?)",
+                         (f"Car_{i % 4}", f"2026-01-{1 + i % 28:02d} 10:00:00"))
+            run_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            rows = _make_rows(run_id, n_samples, rng)
+            start = time.perf_counter()
+            for b in range(0, len(rows), INSERT_BATCH_ROWS):
+                conn.executemany(INSERT_SQL, rows[b:b + INSERT_BATCH_ROWS])
+                conn.commit()
+            insert_time += time.perf_counter() - start
+        results['insert_rows_per_s'] = n_runs * n_samples / insert_time
+        conn.close()
+
+        mid = n_runs // 2
+        optimizer = shift_optimizer.ShiftOptimizer(db_path)
+
+        def query(sql, params):
+            c = sqlite3.connect(db_path)
+            c.execute(sql, params).fetchall()
+            c.close()
+
+        results['load_run_s'] = _timed(lambda: query("SELECT * FROM telemetry_data WHERE run_id = ? ORDER BY sample_idx", (mid,)), repeat)
+        window_sql, window_params = telemetry_store._build_channel_query(['time_elapsed', 'speed_kmh'], (60.0, 120.0), 'time_elapsed', [])
+        results['load_window_s'] = _timed(lambda: query(window_sql, [mid] + window_params), repeat)
+        results['torque_curve_query_s'] = _timed(lambda: query(shift_optimizer.TORQUE_CURVE_QUERY, (mid,)), repeat)
+        results['torque_curve_s'] = _timed(lambda: optimizer.get_torque_curve_from_run(mid, [2.5, 1.9, 1.5, 1.2, 1.0, 0.85], 3.4), repeat)
+        results['gear_ratio_run_update_s'] = _timed(lambda: gear_ratios.run_sketch(mid, db_path), repeat)
+        results['auto_gear_ratios_s'] = _timed(lambda: optimizer.get_auto_gear_ratios(mid), repeat)
+        results['db_size_mb'] = os.path.getsize(db_path) / 1e6
+        return results
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+
+def compare(results, baseline, tolerance):
+    """Liefert die Messwerte, die um mehr als `tolerance` (Faktor) schlechter als die Baseline sind."""
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        # Durchsatz: größer ist besser, sonst (Zeit, Größe): kleiner ist besser
+        worse = value < baseline[name] / tolerance if name.endswith('_per_s') else value > baseline[name] * tolerance
+        if worse:
+            regressions.append((name, baseline[name], value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Insert-/Query-Benchmark für die Telemetrie-Datenbank.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=20_000, help="Samples pro Run (50 Hz -> 20.000 = ca. 6,5 Minuten)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Ergebnisse als JSON-Baseline speichern")
+    parser.add_argument("--compare", help="Mit JSON-Baseline vergleichen (Exit-Code 1 bei Regression)")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Erlaubter Faktor gegenüber der Baseline")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs, args.samples, args.repeat)
+    for name, value in results.items():
+        print(f"{name:24s} {value:12.4f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, old, new in regressions:
+            print(f"[Regression] {name}: {old:.4f} -> {new:.4f}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
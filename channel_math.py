@@ -0,0 +1,307 @@
+import ast
+import functools
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import telemetry_store
+from telemetry_derived import DERIVED_CHANNELS, load_with_derived
+from telemetry_store import DB_PATH, CHANNEL_DTYPES
+
+# Math-Kanäle: Ausdrücke über geloggte (und abgeleitete) Kanäle, z.B. "sqrt(lat_g**2 + lon_g**2)".
+# Ein Ausdruck wird einmal geparst (Python-AST, nur erlaubte Knoten) und zu verschachtelten NumPy-Funktionen
+# kompiliert; ausgewertet wird immer auf ganzen Spalten. Eigene Kanäle liegen in der Tabelle 'math_channels'
+# und stehen im Dashboard wie im Batch-Report zur Verfügung.
+
+# Mitgelieferte Kanäle: Name -> (Ausdruck, Einheit, Beschreibung)
+BUILTIN_CHANNELS = {
+    'g_sum': ('sqrt(lat_g**2 + lon_g**2)', 'G', 'Kombinierte Beschleunigung (Radius im G-G Diagramm)'),
+    'power_proxy': ('torque * rpm / 9549', 'kW', 'Motorleistung aus Drehmoment und Drehzahl'),
+    'brake_throttle_overlap': ('(throttle > 0.1) & (lon_g < -0.3)', '0/1', 'Gas trotz Verzögerung (Bremse/Gas-Überschneidung)'),
+    'slip_proxy': ('abs(steering_angle) / clip(abs(lat_g), 0.2, 5)', '1/G', 'Lenkbedarf pro Quer-G, steigt beim Untersteuern'),
+    'lon_jerk': ('diff(lon_g) / diff(time_elapsed)', 'G/s', 'Ruck in Längsrichtung'),
+    'distance_integrated': ('integrate(speed_kmh / 3.6)', 'm', 'Zurückgelegte Strecke (Integral der Geschwindigkeit)'),
+}
+
+# Kanäle, auf die sich Ausdrücke beziehen dürfen
+INPUT_CHANNELS = list(CHANNEL_DTYPES) + list(DERIVED_CHANNELS)
+
+NAME_PATTERN = re.compile(r'^[a-z][a-z0-9_]{0,39}$')
+
+
+class ChannelExpressionError(ValueError):
+    """Ungültiger Ausdruck oder Kanalname (Meldung für die Anzeige im Dashboard)."""
+
+
+def _diff(x):
+    out = np.full(len(x), np.nan)
+    out[1:] = x[1:] - x[:-1]
+    return out
+
+
+def _lag(x, n=1):
+    out = np.full(len(x), np.nan)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    return out
+
+
+def _rolling(x, n):
+    return pd.Series(x).rolling(n, min_periods=1).mean().to_numpy()
+
+
+def _integrate(x, t):
+    # Kumulatives Trapez-Integral über time_elapsed, beginnt bei 0 (NaN-Abschnitte zählen als 0)
+    out = np.zeros(len(x))
+    if len(x) > 1:
+        out[1:] = np.cumsum(np.nan_to_num((x[1:] + x[:-1]) * 0.5 * np.diff(t)))
+    return out
+
+
+# Funktionsname -> (min. Argumente, max. Argumente, Funktion, Positionen konstanter Integer-Argumente)
+FUNCTIONS = {
+    'abs': (1, 1, np.abs, ()),
+    'sqrt': (1, 1, np.sqrt, ()),
+    'min': (2, 2, np.fmin, ()),
+    'max': (2, 2, np.fmax, ()),
+    'clip': (3, 3, np.clip, ()),
+    'where': (3, 3, np.where, ()),
+    'diff': (1, 1, _diff, ()),
+    'lag': (1, 2, _lag, (1,)),
+    'rolling': (2, 2, _rolling, (1,)),
+    'integrate': (1, 1, _integrate, ()),
+}
+
+_BINARY_OPS = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide, ast.Pow: np.power,
+    ast.BitAnd: np.logical_and, ast.BitOr: np.logical_or,
+}
+_COMPARE_OPS = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+
+
+def _constant_int(node, func_name):
+    if isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool) and node.value >= 1:
+        return node.value
+    raise ChannelExpressionError(f"{func_name}(): Fenster/Versatz muss eine ganze Zahl >= 1 sein")
+
+
+def _compile(node, channels):
+    """Übersetzt einen AST-Knoten in eine Funktion env -> Array (oder Skalar); sammelt die benötigten Kanäle."""
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ChannelExpressionError(f"Nur Zahlen als Konstanten erlaubt: {node.value!r}")
+        value = float(node.value)
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in INPUT_CHANNELS:
+            raise ChannelExpressionError(f"Unbekannter Kanal '{node.id}'")
+        channels.add(node.id)
+        name = node.id
+        return lambda env: env[name]
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand, channels)
+        if isinstance(node.op, ast.USub):
+            return lambda env: np.negative(operand(env))
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if isinstance(node.op, (ast.Not, ast.Invert)):
+            return lambda env: np.logical_not(operand(env))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left, right = _compile(node.left, channels), _compile(node.right, channels)
+        return lambda env: op(left(env), right(env))
+
+    if isinstance(node, ast.BoolOp):
+        op = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        parts = [_compile(v, channels) for v in node.values]
+        return lambda env: functools.reduce(op, (p(env) for p in parts))
+
+    if isinstance(node, ast.Compare):
+        # Ketten wie 0.1 < throttle < 0.9 -> paarweise verknüpft
+        operands = [_compile(v, channels) for v in [node.left] + node.comparators]
+        ops = []
+        for op in node.ops:
+            if type(op) not in _COMPARE_OPS:
+                raise ChannelExpressionError("Nur Vergleiche mit <, <=, >, >=, ==, != erlaubt")
+            ops.append(_COMPARE_OPS[type(op)])
+        def compare(env):
+            values = [o(env) for o in operands]
+            return functools.reduce(np.logical_and, (op(values[i], values[i + 1]) for i, op in enumerate(ops)))
+        return compare
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise ChannelExpressionError(f"Unbekannte Funktion. Erlaubt: {', '.join(FUNCTIONS)}")
+        name = node.func.id
+        min_args, max_args, func, int_args = FUNCTIONS[name]
+        if not min_args <= len(node.args) <= max_args:
+            raise ChannelExpressionError(f"{name}() erwartet {min_args} bis {max_args} Argumente")
+        args = [(lambda env, v=_constant_int(a, name): v) if i in int_args else _compile(a, channels)
+                for i, a in enumerate(node.args)]
+        if name == 'integrate':
+            channels.add('time_elapsed')
+            return lambda env: _integrate(_as_array(args[0](env), env), env['time_elapsed'])
+        if name in ('diff', 'lag', 'rolling'):
+            return lambda env: func(_as_array(args[0](env), env), *(a(env) for a in args[1:]))
+        return lambda env: func(*(a(env) for a in args))
+
+    raise ChannelExpressionError(f"Nicht erlaubter Ausdruck: {type(node).__name__}")
+
+
+def _as_array(value, env):
+    # Skalare (Konstanten) auf die Run-Länge bringen, Wahrheitswerte als 0/1
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (env['__len__'],))
+
+
+class ChannelExpression:
+    """Ein geparster und kompilierter Ausdruck (siehe compile_expression)."""
+
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        try:
+            tree = ast.parse(self.expression, mode='eval')
+        except SyntaxError as e:
+            raise ChannelExpressionError(f"Syntaxfehler: {e.msg}") from None
+        channels = set()
+        self._func = _compile(tree.body, channels)
+        self.channels = sorted(channels)
+
+    def evaluate(self, df):
+        """Wertet den Ausdruck auf df aus (alle Kanäle müssen als Spalten vorhanden sein) -> float64-Array."""
+        missing = [ch for ch in self.channels if ch not in df.columns]
+        if missing:
+            raise ChannelExpressionError(f"Kanäle fehlen in den Daten: {', '.join(missing)}")
+        env = {ch: df[ch].to_numpy(dtype=np.float64, na_value=np.nan) for ch in self.channels}
+        env['__len__'] = len(df)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            values = _as_array(self._func(env), env).astype(np.float64)
+            # Division durch 0 etc. -> Lücke statt unendlich
+            values[~np.isfinite(values)] = np.nan
+        return values
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression):
+    """Parst und kompiliert einen Ausdruck einmal pro Prozess (ChannelExpressionError bei ungültigem Ausdruck)."""
+    return ChannelExpression(expression)
+
+
+def evaluate(df, expressions):
+    """
+    Wertet mehrere Ausdrücke auf einem geladenen Frame aus.
+    :param expressions: dict Kanalname -> Ausdruck
+    :return: DataFrame mit einer Spalte pro Kanal, gleicher Index wie df
+    """
+    return pd.DataFrame({name: compile_expression(expr).evaluate(df) for name, expr in expressions.items()}, index=df.index)
+
+
+def evaluate_run(run_id, expressions, db_path=DB_PATH, cache=None):
+    """
+    Lädt genau die benötigten Kanäle eines Runs (inkl. abgeleiteter Kanäle) und wertet die Ausdrücke aus.
+    Mit Cache wird das Ergebnis pro Run-Revision und Ausdrucks-Satz gehalten.
+
+    :return: DataFrame mit 'time_elapsed' und einer Spalte pro Kanal
+    """
+    expressions = dict(expressions)
+    compiled = {name: compile_expression(expr) for name, expr in expressions.items()}
+    key = None
+    if cache is not None:
+        conn = sqlite3.connect(db_path, timeout=5.0)
+        try:
+            key = ('math', telemetry_store.get_db_token(conn)[0], int(run_id), telemetry_store.get_run_revision(conn, run_id),
+                   tuple(sorted(expressions.items())))
+        finally:
+            conn.close()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.copy()
+
+    channels = sorted({'time_elapsed'}.union(*(c.channels for c in compiled.values())))
+    df = load_with_derived(run_id, channels, db_path=db_path, cache=cache)
+    result = pd.DataFrame({'time_elapsed': df['time_elapsed'].to_numpy()})
+    for name, expr in compiled.items():
+        result[name] = expr.evaluate(df)
+    if key is not None:
+        cache.put(key, result)
+        result = result.copy()
+    return result
+
+
+def summarize(values):
+    """Min/Mittel/Max je Math-Kanal (Spalten von values) als Tabelle channel, min, mean, max."""
+    return pd.DataFrame([{'channel': name, 'min': values[name].min(), 'mean': values[name].mean(), 'max': values[name].max()}
+                         for name in values.columns], columns=['channel', 'min', 'mean', 'max'])
+
+
+def load_math_channels(db_path=DB_PATH):
+    """
+    Alle verfügbaren Math-Kanäle: mitgelieferte und eigene (Tabelle 'math_channels').
+    :return: dict Name -> {'expression', 'unit', 'description', 'builtin'}
+    """
+    channels = {name: {'expression': expr, 'unit': unit, 'description': desc, 'builtin': True}
+                for name, (expr, unit, desc) in BUILTIN_CHANNELS.items()}
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        rows = conn.execute("SELECT name, expression, unit, description FROM math_channels ORDER BY name").fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # Datenbank noch nicht migriert
+    finally:
+        conn.close()
+    for name, expr, unit, desc in rows:
+        channels[name] = {'expression': expr, 'unit': unit or '', 'description': desc or '', 'builtin': False}
+    return channels
+
+
+def resolve_expressions(names, db_path=DB_PATH):
+    """
+    Namen ('g_sum') oder Definitionen ('name=ausdruck') -> dict Name -> Ausdruck. Ohne Namen: alle Kanäle.
+    """
+    available = load_math_channels(db_path)
+    if not names:
+        return {name: ch['expression'] for name, ch in available.items()}
+    expressions = {}
+    for item in names:
+        name, sep, expr = item.partition('=')
+        name = name.strip()
+        if sep:
+            compile_expression(expr)
+            expressions[name] = expr.strip()
+        elif name in available:
+            expressions[name] = available[name]['expression']
+        else:
+            raise ChannelExpressionError(f"Unbekannter Math-Kanal '{name}'")
+    return expressions
+
+
+def save_math_channel(name, expression, unit='', description='', db_path=DB_PATH):
+    """Speichert (oder ersetzt) einen eigenen Math-Kanal nach Prüfung von Name und Ausdruck."""
+    name = name.strip()
+    if not NAME_PATTERN.match(name):
+        raise ChannelExpressionError("Name: Kleinbuchstaben, Ziffern und _ (max. 40 Zeichen, beginnt mit Buchstabe)")
+    if name in BUILTIN_CHANNELS or name in INPUT_CHANNELS:
+        raise ChannelExpressionError(f"Name '{name}' ist bereits vergeben")
+    compile_expression(expression)
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        conn.execute("INSERT OR REPLACE INTO math_channels (name, expression, unit, description) VALUES (?, ?, ?, ?)",
+                     (name, expression.strip(), unit, description))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_math_channel(name, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        conn.execute("DELETE FROM math_channels WHERE name = ?", (name,))
+        conn.commit()
+    finally:
+        conn.close()
@@ -8,6 +8,9 @@ import datetime
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pyRfactor2SharedMemory'))
 
 from sharedMemoryAPI import SimInfoAPI
+import gear_ratios
+from telemetry_store import init_db
+from db_maintenance import MaintenanceScheduler
 
 DB_FILE = "lmu_telemetry.db"
 
@@ -17,79 +20,18 @@ class DataLogger:
         self.is_recording = False
         self.current_run_id = None
         self.start_time = 0
+        self.sample_idx = 0
         self.buffer = []  # Um Datenpunkte zwischenzuspeichern und Batch-Inserts auszuführen
         
     def _init_db(self):
         """Initialisiert die SQLite-Datenbank und die Tabellen."""
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Tabelle für aufgenommene Runs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS runs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                vehicle_name TEXT,
-                vehicle_class TEXT,
-                track_name TEXT,
-                timestamp DATETIME
-            )
-        ''')
-        
-        # Tabelle für die Telemetriedaten eines Runs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS telemetry_data (
-                run_id INTEGER,
-                time_elapsed REAL,
-                gear INTEGER,
-                rpm REAL,
-                torque REAL,
-                speed_kmh REAL,
-                throttle REAL,
-                FOREIGN KEY(run_id) REFERENCES runs(id)
-            )
-        ''')
-        
-        # Auto-Upgrade Schema for Handling Analytics
-        new_columns = [
-            ("lat_g", "REAL DEFAULT 0"),
-            ("lon_g", "REAL DEFAULT 0"),
-            ("steering_angle", "REAL DEFAULT 0"),
-            ("lap_distance", "REAL DEFAULT 0"),
-            ("sector", "INTEGER DEFAULT 0")
-        ]
-        
-        for col_name, col_type in new_columns:
-            try:
-                cursor.execute(f"ALTER TABLE telemetry_data ADD COLUMN {col_name} {col_type}")
-            except sqlite3.OperationalError:
-                pass # Column already exists
-                
-        try:
-            cursor.execute("ALTER TABLE runs ADD COLUMN run_type TEXT DEFAULT 'DRAG'")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE runs ADD COLUMN notes TEXT DEFAULT ''")
-        except sqlite3.OperationalError:
-            pass
-            
-        # Indexe für Performance bei großen Datensätzen
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_run_id ON telemetry_data (run_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_speed_kmh ON telemetry_data (speed_kmh)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_elapsed ON telemetry_data (time_elapsed)')
-
-        # In-DB State Management (statt fehleranfälliger Datei)
-        cursor.execute('CREATE TABLE IF NOT EXISTS logger_state (id INTEGER PRIMARY KEY, state TEXT)')
-        cursor.execute('INSERT OR IGNORE INTO logger_state (id, state) VALUES (1, "IDLE")')
-
-        conn.commit()
-        conn.close()
+        init_db(DB_FILE)
         
     def start_recording(self, vehicle_name, vehicle_class, track_name, run_type="DRAG"):
         """Startet eine neue Aufzeichnung."""
         self.is_recording = True
         self.start_time = time.time()
+        self.sample_idx = 0
         self.buffer = []
         try:
             conn = sqlite3.connect(DB_FILE)
@@ -115,6 +57,11 @@ class DataLogger:
         self.is_recording = False
         self._flush_buffer()
         print(f"\n[Logger] Aufzeichnung beendet -- Run ID: {self.current_run_id}")
+        try:
+            # Gang-Übersetzungen des Fahrzeugs um diesen Run ergänzen (O(Run), siehe gear_ratios.py)
+            gear_ratios.update_run(self.current_run_id, DB_FILE)
+        except Exception as e:
+            print(f"\n[Datenbankfehler in stop_recording]: {e}")
         self.current_run_id = None
 
     def log_data_point(self, gear, rpm, torque, speed_kmh, throttle, lat_g=0.0, lon_g=0.0, steering_angle=0.0, lap_distance=0.0, sector=0):
@@ -123,7 +70,9 @@ class DataLogger:
             return
             
         time_elapsed = time.time() - self.start_time
-        self.buffer.append((self.current_run_id, time_elapsed, gear, rpm, torque, speed_kmh, throttle, lat_g, lon_g, steering_angle, lap_distance, sector))
+        # Fortlaufende Sample-Nummer pro Run (Primärschlüssel zusammen mit run_id)
+        self.buffer.append((self.current_run_id, self.sample_idx, time_elapsed, gear, rpm, torque, speed_kmh, throttle, lat_g, lon_g, steering_angle, lap_distance, sector))
+        self.sample_idx += 1
         
         # Flush Buffer alle 50 Datenpunkte, um RAM zu schonen und Schreiboperationen zu bündeln
         if len(self.buffer) >= 50:
@@ -137,9 +86,11 @@ class DataLogger:
             conn = sqlite3.connect(DB_FILE)
             cursor = conn.cursor()
             cursor.executemany(
-                "INSERT INTO telemetry_data (run_id, time_elapsed, gear, rpm, torque, speed_kmh, throttle, lat_g, lon_g, steering_angle, lap_distance, sector) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                "INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, gear, rpm, torque, speed_kmh, throttle, lat_g, lon_g, steering_angle, lap_distance, sector) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 self.buffer
             )
+            # Revision hochzählen, damit Dashboard-Caches den wachsenden Run neu laden
+            cursor.execute("UPDATE runs SET revision = revision + 1 WHERE id = ?", (self.current_run_id,))
             conn.commit()
             conn.close()
             self.buffer = []
@@ -187,6 +138,8 @@ def main():
         return
 
     logger = DataLogger()
+    # Purge gelöschter Runs, Retention und Kompaktierung laufen nur im Leerlauf
+    maintenance = MaintenanceScheduler(DB_FILE)
 
     print("Verbinde mit Shared Memory...")
     print("Log-Algorithmus: Wenn Drosselklappe (Throttle) > 95% und Geschwindigkeit < 40 km/h, startet eine Messung.")
@@ -282,6 +235,8 @@ def main():
                     ema_lat_g = None
                     ema_lon_g = None
                     
+                    maintenance.tick()
+                    
                     sys.stdout.write(f"\r[Warte auf GUI] State: {current_cmd_state} | Geh ins Dashboard und druecke START!     ")
                     sys.stdout.flush()
                 
@@ -348,6 +303,8 @@ def main():
             else:
                 if logger.is_recording:
                      logger.stop_recording()
+                else:
+                    maintenance.tick()
                 sys.stdout.write("\rWarte auf Spiel / aktive Session...                    ")
                 sys.stdout.flush()
 
@@ -0,0 +1,168 @@
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import telemetry_archive
+from telemetry_store import DB_PATH, init_db
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Ohne diese Tabellen ist eine hochgeladene Datei kein LMU-Telemetrie-Backup
+REQUIRED_TABLES = ('runs', 'telemetry_data')
+
+
+def create_backup(db_path=DB_PATH, target_path=None):
+    """
+    Erstellt einen konsistenten Snapshot der Datenbank und liefert den Pfad der Backup-Datei.
+
+    Nutzt VACUUM INTO (liest in einer einzigen Lese-Transaktion, kompaktiert nebenbei).
+    Im WAL-Modus blockiert das den Logger nicht, er kann währenddessen weiter schreiben.
+    Fallback für alte SQLite-Versionen ist die Online-Backup-API.
+    """
+    if target_path is None:
+        # Eigene Datei pro Aufruf: parallele Downloads (Sessions, Reruns) überschreiben sich nicht gegenseitig
+        fd, target_path = tempfile.mkstemp(prefix="lmu_telemetry_backup_", suffix=".db")
+        os.close(fd)
+    if os.path.exists(target_path):
+        # VACUUM INTO verlangt eine nicht existierende (oder leere) Zieldatei
+        os.remove(target_path)
+
+    src = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        try:
+            src.execute("VACUUM INTO ?", (target_path,))
+        except sqlite3.OperationalError:
+            if os.path.exists(target_path):
+                os.remove(target_path)
+            dst = sqlite3.connect(target_path)
+            try:
+                # pages=-1: alles in einem Schritt, sonst startet die Kopie bei jedem Logger-Flush neu
+                src.backup(dst, pages=-1)
+            finally:
+                dst.close()
+    finally:
+        src.close()
+    return target_path
+
+
+class BackupReader(io.RawIOBase):
+    """
+    Liest eine temporäre Backup-Datei in Blöcken von CHUNK_SIZE und löscht sie, sobald sie vollständig
+    gelesen oder geschlossen wurde (z.B. als `data` für st.download_button).
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._file = open(path, "rb")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._file.readinto(memoryview(buffer)[:CHUNK_SIZE])
+        if not n:
+            self.close()
+        return n
+
+    def readall(self):
+        chunks = []
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        super().close()
+
+
+def open_backup(db_path=DB_PATH):
+    """
+    Erstellt ein Backup in einer eigenen temporären Datei und liefert einen blockweisen Leser darauf.
+    Die Datei wird nach dem Ausliefern (Ende erreicht oder Leser geschlossen) gelöscht.
+    """
+    return BackupReader(create_backup(db_path))
+
+
+def validate_database(path):
+    """Prüft, ob die Datei eine intakte SQLite-Datenbank mit den Telemetrie-Tabellen ist."""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()
+            if not result or result[0] != 'ok':
+                return False, f"Integritätsprüfung fehlgeschlagen: {result[0] if result else 'keine Antwort'}"
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        return False, f"Keine gültige SQLite-Datenbank: {e}"
+
+    missing = [t for t in REQUIRED_TABLES if t not in tables]
+    if missing:
+        return False, f"Tabellen fehlen: {', '.join(missing)}"
+    return True, "ok"
+
+
+def restore_backup(fileobj, db_path=DB_PATH):
+    """
+    Spielt ein Backup aus einem Datei-Objekt ein.
+
+    Der Upload wird in Blöcken in eine Nebendatei geschrieben und validiert. Erst dann ersetzt die
+    Online-Backup-API den Inhalt der Live-Datenbank in einer einzigen Schreib-Transaktion:
+    andere Verbindungen (Logger, weitere Sessions) sehen entweder den alten oder den neuen Stand.
+
+    Der Archiv-Ordner (telemetry_archive) ist nicht Teil des Backups. Archivierte Runs, deren Archiv
+    neben der Datenbank fehlt, werden markiert und nicht mehr zur Auswahl angeboten.
+    :return: IDs der archivierten Runs, deren Archiv fehlt
+    """
+    side_path = db_path + ".restore"
+    state = _read_logger_state(db_path)
+    try:
+        with open(side_path, "wb") as f:
+            shutil.copyfileobj(fileobj, f, CHUNK_SIZE)
+
+        ok, message = validate_database(side_path)
+        if not ok:
+            raise ValueError(message)
+
+        src = sqlite3.connect(side_path)
+        dst = sqlite3.connect(db_path, timeout=30.0)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        if os.path.exists(side_path):
+            os.remove(side_path)
+
+    # Ältere Backups auf das aktuelle Schema heben (Revisionen, Trigger, ...)
+    init_db(db_path)
+    # Der Logger-Status gehört zur laufenden Sitzung, nicht zum Backup
+    if state is not None:
+        conn = sqlite3.connect(db_path, timeout=5.0)
+        conn.execute("UPDATE logger_state SET state = ? WHERE id = 1", (state,))
+        conn.commit()
+        conn.close()
+    return telemetry_archive.verify_archives(db_path)
+
+
+def _read_logger_state(db_path):
+    try:
+        conn = sqlite3.connect(db_path, timeout=5.0)
+        row = conn.execute("SELECT state FROM logger_state WHERE id = 1").fetchone()
+        conn.close()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
@@ -0,0 +1,258 @@
+import datetime
+import sqlite3
+import time
+
+import gear_ratios
+import telemetry_archive
+from telemetry_store import DB_PATH
+
+# Zeilen pro DELETE-Batch beim Bereinigen gelöschter Runs (kurze Schreib-Transaktionen)
+PURGE_BATCH_ROWS = 5000
+
+# Ein Batch = zusammenhängender Bereich im Primärschlüssel (run_id, sample_idx)
+PURGE_BATCH_SQL = "DELETE FROM telemetry_data WHERE run_id = ? AND sample_idx < ?"
+
+# Seiten pro incremental_vacuum-Schritt (bei 4 KB Seiten = 8 MB)
+VACUUM_STEP_PAGES = 2048
+
+# Ab diesem Anteil freier Seiten empfiehlt die Garage die einmalige Umstellung auf auto_vacuum=INCREMENTAL
+FREELIST_VACUUM_RATIO = 0.1
+
+# Retention-Einstellungen (in db_meta, None/0 = deaktiviert)
+RETENTION_KEYS = ('retention_keep_last_per_vehicle', 'retention_delete_after_days', 'retention_archive_after_days')
+
+# Retention muss nicht bei jedem Idle-Tick laufen
+RETENTION_INTERVAL_S = 300
+
+
+def tombstone_run(run_id, db_path=DB_PATH):
+    """
+    Markiert einen Run als gelöscht (sofort, O(1)). Die Telemetrie wird später in Batches
+    durch purge_step() entfernt. Kleine Nebentabellen werden direkt bereinigt.
+    """
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        conn.execute("UPDATE runs SET deleted = 1 WHERE id = ?", (int(run_id),))
+        conn.execute("DELETE FROM telemetry_lod WHERE run_id = ?", (int(run_id),))
+        conn.execute("DELETE FROM telemetry_derived WHERE run_id = ?", (int(run_id),))
+        gear_ratios.forget_run(conn, run_id)
+        try:
+            conn.execute("DELETE FROM saved_profiles WHERE run_id = ?", (int(run_id),))
+        except sqlite3.OperationalError:
+            pass  # Tabelle existiert erst nach der ersten Schaltpunkt-Berechnung
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def pending_purges(db_path=DB_PATH):
+    """Anzahl der als gelöscht markierten Runs, deren Telemetrie noch nicht entfernt wurde."""
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM runs WHERE deleted = 1").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def runs_to_archive(db_path=DB_PATH, now=None):
+    """Run-IDs, die laut 'retention_archive_after_days' ins Archiv wandern (älteste zuerst)."""
+    max_age = get_retention_settings(db_path)['retention_archive_after_days']
+    if not max_age:
+        return []
+    cutoff = (now or datetime.datetime.now()) - datetime.timedelta(days=max_age)
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        rows = conn.execute("SELECT id FROM runs WHERE deleted = 0 AND archive_path IS NULL AND timestamp < ? ORDER BY timestamp",
+                            (cutoff.strftime('%Y-%m-%d %H:%M:%S'),)).fetchall()
+        return [r[0] for r in rows]
+    finally:
+        conn.close()
+
+
+def purge_step(db_path=DB_PATH, batch_rows=PURGE_BATCH_ROWS):
+    """
+    Entfernt einen Batch Telemetrie eines gelöschten oder archivierten Runs aus telemetry_data.
+    Ist ein gelöschter Run leer, wird die runs-Zeile (und ggf. sein Archiv-Eintrag) entfernt.
+    :return: Anzahl gelöschter Telemetrie-Zeilen (0 = nichts mehr zu tun)
+    """
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        row = conn.execute('''
+            SELECT id, deleted, archive_path FROM runs
+            WHERE deleted = 1
+               OR (archive_path IS NOT NULL AND EXISTS (SELECT 1 FROM telemetry_data t WHERE t.run_id = runs.id))
+            ORDER BY id LIMIT 1
+        ''').fetchone()
+        if row is None:
+            return 0
+        run_id, is_deleted, archive_path = row
+        first_idx = conn.execute("SELECT MIN(sample_idx) FROM telemetry_data WHERE run_id = ?", (run_id,)).fetchone()[0]
+        deleted = 0
+        if first_idx is not None:
+            deleted = conn.execute(PURGE_BATCH_SQL, (run_id, first_idx + batch_rows)).rowcount
+        if is_deleted and deleted < batch_rows:
+            if archive_path:
+                telemetry_archive.remove_run(run_id, archive_path, db_path)
+            conn.execute("DELETE FROM run_summary WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+        conn.commit()
+        return max(deleted, 1)
+    finally:
+        conn.close()
+
+
+def compact_step(db_path=DB_PATH, pages=VACUUM_STEP_PAGES):
+    """
+    Gibt freie Seiten schrittweise an das Dateisystem zurück (PRAGMA incremental_vacuum).
+    Ältere Datenbanken ohne auto_vacuum bleiben unverändert, die Umstellung ist ein eigener
+    Schritt in der Garage (siehe enable_incremental_vacuum), damit der Logger nie auf ein VACUUM wartet.
+    :return: True, falls noch freie Seiten übrig sind
+    """
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return False
+        if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+            return False
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+        return conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+    finally:
+        conn.close()
+
+
+def needs_incremental_vacuum(db_path=DB_PATH):
+    """True, wenn die Datenbank noch ohne auto_vacuum läuft und sich die Umstellung lohnt (viele freie Seiten)."""
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        return freelist > 0 and freelist >= page_count * FREELIST_VACUUM_RATIO
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum(db_path=DB_PATH):
+    """
+    Stellt eine ältere Datenbank einmalig auf auto_vacuum=INCREMENTAL um. Das nötige VACUUM schreibt die
+    ganze Datei neu und sperrt sie solange -> nur manuell und nicht während einer Aufzeichnung aufrufen.
+    Danach gibt compact_step() freie Seiten im Leerlauf schrittweise frei.
+    """
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def get_retention_settings(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        placeholders = ", ".join("?" for _ in RETENTION_KEYS)
+        rows = dict(conn.execute(f"SELECT key, value FROM db_meta WHERE key IN ({placeholders})", RETENTION_KEYS).fetchall())
+    finally:
+        conn.close()
+    return {k: (int(rows[k]) if rows.get(k) else None) for k in RETENTION_KEYS}
+
+
+def set_retention_settings(settings, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        for key in RETENTION_KEYS:
+            if key in settings:
+                value = settings[key]
+                conn.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", (key, int(value) if value else None))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def apply_retention(db_path=DB_PATH, now=None):
+    """
+    Markiert Runs gemäß den Retention-Regeln als gelöscht:
+    - retention_keep_last_per_vehicle: Nur die letzten N Runs pro Fahrzeug behalten
+    - retention_delete_after_days: Runs älter als X Tage löschen
+    (Das Archivieren über 'retention_archive_after_days' übernimmt runs_to_archive())
+    :return: Liste der markierten Run-IDs
+    """
+    settings = get_retention_settings(db_path)
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        doomed = set()
+        keep_last = settings['retention_keep_last_per_vehicle']
+        if keep_last:
+            rows = conn.execute('''
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY vehicle_name ORDER BY timestamp DESC, id DESC) AS rn
+                    FROM runs WHERE deleted = 0
+                ) WHERE rn > ?
+            ''', (keep_last,)).fetchall()
+            doomed.update(r[0] for r in rows)
+
+        max_age = settings['retention_delete_after_days']
+        if max_age:
+            cutoff = (now or datetime.datetime.now()) - datetime.timedelta(days=max_age)
+            rows = conn.execute("SELECT id FROM runs WHERE deleted = 0 AND timestamp < ?",
+                                (cutoff.strftime('%Y-%m-%d %H:%M:%S'),)).fetchall()
+            doomed.update(r[0] for r in rows)
+    finally:
+        conn.close()
+
+    for run_id in sorted(doomed):
+        tombstone_run(run_id, db_path)
+    return sorted(doomed)
+
+
+def is_recording(db_path=DB_PATH):
+    """True, solange der Logger laut logger_state aufzeichnet (dann ruht jede Wartung)."""
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        row = conn.execute("SELECT state FROM logger_state WHERE id = 1").fetchone()
+    finally:
+        conn.close()
+    return row is not None and str(row[0]).startswith("RECORDING")
+
+
+class MaintenanceScheduler:
+    """
+    Führt Bereinigung (Purge), Retention und Kompaktierung in kleinen Zeitscheiben aus.
+    Wird vom Logger aufgerufen, solange keine Aufzeichnung läuft.
+    """
+
+    def __init__(self, db_path=DB_PATH, interval_s=2.0, budget_s=0.2):
+        self.db_path = db_path
+        self.interval_s = interval_s
+        self.budget_s = budget_s
+        self._next_run = 0.0
+        self._next_retention = 0.0
+        self._archive_queue = []
+
+    def tick(self):
+        now = time.time()
+        if now < self._next_run:
+            return
+        self._next_run = now + self.interval_s
+        try:
+            # Zusätzlich zum Aufrufer (Logger-Leerlauf) abgesichert: nie während einer Aufzeichnung
+            if is_recording(self.db_path):
+                return
+            if now >= self._next_retention:
+                self._next_retention = now + RETENTION_INTERVAL_S
+                apply_retention(self.db_path)
+                self._archive_queue = runs_to_archive(self.db_path)
+
+            # Höchstens ein Run pro Tick ins Archiv, damit der Logger reaktionsfähig bleibt
+            if self._archive_queue:
+                telemetry_archive.archive_run(self._archive_queue.pop(0), self.db_path)
+
+            deadline = now + self.budget_s
+            while time.time() < deadline:
+                if purge_step(self.db_path) == 0:
+                    break
+            if time.time() < deadline:
+                compact_step(self.db_path)
+        except (sqlite3.Error, OSError) as e:
+            # Wartung ist optional – beim nächsten Idle-Tick wird es erneut versucht
+            print(f"\n[Wartung] übersprungen: {e}")
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+import telemetry_lod
+import telemetry_store
+from scoring_engine import (map_chunks, drag_metrics, handling_metrics, global_bests, run_report, _plain,
+                            REPORT_CHANNELS)
+from telemetry_derived import load_derived, QUALITY_DERIVED
+from telemetry_analysis import analyze_run_quality, sync_to_speed, traction_points, traction_envelope
+from telemetry_lod import DEFAULT_PIXEL_BUDGET
+from telemetry_store import DB_PATH
+
+# N-Wege-Vergleich (ganzes Klassen-Feld statt fest Auto A vs. B): jeder Run wird genau einmal geladen und
+# analysiert (Kennzahlen, Schaltvorgänge, Sektoren, G-G Hülle, Speed-Trace), die Drag-, Getriebe-,
+# Handling- und Scoring-Ansicht lesen nur noch aus diesem Ergebnis. Kosten ~ N Einzelanalysen.
+
+# Kleine Blöcke: bei 10-20 Autos sollen möglichst alle Kerne beschäftigt sein
+FLEET_CHUNK_RUNS = 2
+
+DEFAULT_SYNC_SPEED = 50
+
+SCORE_KEYS = ["Accel Low (0-100)", "Accel High (0-200)", "Top Speed", "Kurvengrip (Lat G)", "Bremskraft",
+              "Konsistenz / Stabilität"]
+
+# Gewichtung der SCORE_KEYS je Streckencharakteristik (Schlüssel = Anfang der Auswahl im Dashboard)
+TRACK_WEIGHTS = {
+    'High Speed': [0.10, 0.20, 0.40, 0.10, 0.10, 0.10],
+    'Technical': [0.20, 0.15, 0.10, 0.30, 0.15, 0.10],
+    'Endurance': [0.05, 0.10, 0.15, 0.10, 0.10, 0.50],
+    'Balanced': [0.15, 0.15, 0.15, 0.20, 0.15, 0.20],
+}
+
+
+def track_weights(track_type):
+    """Gewichte zur Streckencharakteristik (z.B. "High Speed (z.B. Le Mans - ...)"), sonst Balanced."""
+    for name, weights in TRACK_WEIGHTS.items():
+        if name in track_type:
+            return weights
+    return TRACK_WEIGHTS['Balanced']
+
+
+def score_lower_better(val, comp):
+    if val is None or comp is None or val <= 0: return 0
+    return (comp / val) * 100
+
+
+def score_higher_better(val, comp):
+    if val is None or comp is None or comp <= 0: return 0
+    return (val / comp) * 100
+
+
+def opi_scores(drag, handling, bests):
+    """
+    100er Scores (Referenz = Bestwerte, siehe scoring_engine.global_bests) in der Reihenfolge SCORE_KEYS.
+    :param drag: (best_100, best_200, vmax) oder None
+    :param handling: (lat, brake, csi, crash) oder None
+    """
+    best_100, best_200, vmax = drag or (None, None, None)
+    lat, brake, csi, _ = handling or (None, None, 0.0, False)
+    return {
+        SCORE_KEYS[0]: score_lower_better(best_100, bests['best_100']),
+        SCORE_KEYS[1]: score_lower_better(best_200, bests['best_200']),
+        SCORE_KEYS[2]: score_higher_better(vmax, bests['vmax']),
+        SCORE_KEYS[3]: score_higher_better(lat, bests['lat']),
+        SCORE_KEYS[4]: score_higher_better(brake, bests['brake']),
+        SCORE_KEYS[5]: csi,
+    }
+
+
+def opi(scores, weights):
+    """Overall Performance Index: gewichtete Summe der Scores."""
+    return sum(scores[k] * weights[i] for i, k in enumerate(SCORE_KEYS))
+
+
+def analyze_run(run_id, df, meta=None, sync_speed=DEFAULT_SYNC_SPEED, pixel_budget=DEFAULT_PIXEL_BUDGET, derived=None):
+    """
+    Alle abgeleiteten Daten eines Runs für die Vergleichsansichten, aus einem einzigen Load.
+    analyze_run_quality läuft genau einmal und speist Report, Drag- und Handling-Kennzahlen.
+
+    :return: dict mit 'run_id', 'meta', 'tables' (siehe scoring_engine.run_report), 'drag', 'handling'
+             (Kennzahl-Tupel wie scoring_engine), 'trace' (Speed über Zeit ab sync_speed, ausgedünnt)
+             und 'envelope' (G-G Hülle als geschlossenes Polygon oder None)
+    :param derived: gespeicherte abgeleitete Kanäle des Runs (telemetry_derived.QUALITY_DERIVED), optional
+    """
+    meta = meta or {}
+    quality = analyze_run_quality(df, derived)
+    result = {'run_id': int(run_id), 'meta': meta, 'tables': run_report(run_id, df, meta, quality=quality),
+              'drag': None, 'handling': None, 'trace': None, 'envelope': None}
+    if df.empty:
+        return result
+
+    result['drag'] = tuple(_plain(v) for v in drag_metrics(df, quality=quality))
+    result['handling'] = tuple(_plain(v) for v in handling_metrics(df, quality=quality))
+
+    synced = sync_to_speed(df, sync_speed)
+    if len(synced) > pixel_budget:
+        factor = int(np.ceil(2 * len(synced) / pixel_budget))
+        t, v = telemetry_lod.minmax_decimate(synced['time_elapsed'].to_numpy(), synced['speed_kmh'].to_numpy(), factor)
+    else:
+        t, v = synced['time_elapsed'].to_numpy(), synced['speed_kmh'].to_numpy()
+    result['trace'] = pd.DataFrame({'time_elapsed': t, 'speed_kmh': v})
+
+    lat, lon = traction_points(df)
+    result['envelope'] = traction_envelope(lat, lon)
+    return result
+
+
+def analyze_runs(run_ids, db_path=DB_PATH, sync_speed=DEFAULT_SYNC_SPEED, cache=None):
+    """
+    analyze_run() für mehrere Runs. Eine Arbeitseinheit des Prozess-Pools (siehe scoring_engine.map_chunks).
+    :return: Liste von (run_id, Ergebnis-dict)
+    """
+    runs = telemetry_store.load_runs(db_path).set_index('id')
+    results = []
+    for run_id in run_ids:
+        df = telemetry_store.load_channels(run_id, REPORT_CHANNELS, db_path=db_path, cache=cache)
+        meta = runs.loc[run_id].to_dict() if run_id in runs.index else None
+        derived = load_derived(run_id, QUALITY_DERIVED, db_path=db_path, cache=cache)
+        results.append((int(run_id), analyze_run(run_id, df, meta, sync_speed, derived=derived)))
+    return results
+
+
+def iter_fleet(run_ids, db_path=DB_PATH, workers=None, chunk_runs=FLEET_CHUNK_RUNS, cache=None, sync_speed=DEFAULT_SYNC_SPEED):
+    """Lädt und analysiert die Runs parallel; liefert (run_id, Ergebnis) in Fertigstellungs-Reihenfolge."""
+    run_ids = [int(r) for r in dict.fromkeys(run_ids)]
+    tasks = [(run_ids[i:i + chunk_runs], db_path, sync_speed) for i in range(0, len(run_ids), chunk_runs)]
+    yield from map_chunks(analyze_runs, tasks, workers, cache=cache)
+
+
+def fleet_entries(results):
+    """
+    Ordnet jedem Fahrzeug seinen besten Drag-Run (schnellste 0-100) und Handling-Run (höchstes Quer-G) zu.
+    :param results: dict run_id -> Ergebnis aus analyze_run()
+    :return: dict vehicle_name -> {'drag': Ergebnis oder None, 'handling': Ergebnis oder None}
+    """
+    entries = {}
+    for res in sorted(results.values(), key=lambda r: r['run_id']):
+        entry = entries.setdefault(res['meta'].get('vehicle_name') or f"Run {res['run_id']}", {'drag': None, 'handling': None})
+        run_type = res['meta'].get('run_type')
+        if run_type == 'DRAG' and res['drag'] is not None:
+            best = entry['drag']
+            if best is None or (res['drag'][0] or 999.0) < (best['drag'][0] or 999.0):
+                entry['drag'] = res
+        elif run_type == 'HANDLING' and res['handling'] is not None:
+            best = entry['handling']
+            if best is None or (res['handling'][0] or 0.0) > (best['handling'][0] or 0.0):
+                entry['handling'] = res
+    return entries
+
+
+def fleet_ranking(results, track_type="Balanced", bests=None):
+    """
+    OPI-Rangliste des Feldes: eine Zeile pro Fahrzeug mit Rohwerten, 100er Scores und OPI (absteigend).
+    :param bests: Referenz-Bestwerte (Standard: Bestwerte innerhalb des verglichenen Feldes)
+    """
+    entries = fleet_entries(results)
+    if bests is None:
+        metrics = [('DRAG', e['drag']['run_id'], e['drag']['drag']) for e in entries.values() if e['drag']]
+        metrics += [('HANDLING', e['handling']['run_id'], e['handling']['handling']) for e in entries.values() if e['handling']]
+        bests = global_bests(metrics)
+    weights = track_weights(track_type)
+    rows = []
+    for vehicle, entry in entries.items():
+        drag = entry['drag']['drag'] if entry['drag'] else None
+        handling = entry['handling']['handling'] if entry['handling'] else None
+        shifts = entry['drag']['tables']['run_summary'].iloc[0] if entry['drag'] else None
+        scores = opi_scores(drag, handling, bests)
+        rows.append({
+            'Fahrzeug': vehicle,
+            'Drag-Run': entry['drag']['run_id'] if entry['drag'] else None,
+            'Handling-Run': entry['handling']['run_id'] if entry['handling'] else None,
+            'OPI': opi(scores, weights),
+            **scores,
+            '0-100 km/h [s]': drag[0] if drag else None,
+            '0-200 km/h [s]': drag[1] if drag else None,
+            'Vmax [km/h]': drag[2] if drag else None,
+            'Max Lat G': handling[0] if handling else None,
+            'Max Brake G': handling[1] if handling else None,
+            'Schaltlatenz [ms]': shifts['shift_latency_ms'] if shifts is not None else None,
+            'Speed-Verlust [km/h]': shifts['shift_speed_loss_kmh'] if shifts is not None else None,
+            'Crash': bool(handling[3]) if handling else False,
+        })
+    if not rows:
+        return pd.DataFrame(columns=['Fahrzeug', 'OPI'])
+    return pd.DataFrame(rows).sort_values('OPI', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,196 @@
+import sqlite3
+
+import numpy as np
+
+import telemetry_store
+from telemetry_store import DB_PATH
+
+# Gang-Übersetzungen pro Fahrzeug (R = Speed / RPM je Gang), inkrementell gepflegt: Jeder Run wird genau einmal
+# (pro Daten-Revision) in ein Histogramm pro Fahrzeug und Gang einsortiert. Die Buckets sind logarithmisch mit
+# fester relativer Genauigkeit, Zählerstände lassen sich also beliebig addieren und wieder abziehen (mergebar).
+# Der Median je Gang liegt danach fertig in 'vehicle_gear_ratios'; Lesen ist eine Abfrage über die Gänge.
+#
+#   gear_ratio_sketch:   (Fahrzeug, Gang, Bucket) -> Anzahl Samples
+#   gear_ratio_runs:     eingerechnete Runs mit Revision und ihrem Beitrag (zum Abziehen bei Änderung/Löschung)
+#   vehicle_gear_ratios: (Fahrzeug, Gang) -> Median-R und Anzahl Samples
+
+# Volllast-Samples, aus denen R bestimmt wird
+SAMPLE_FILTERS = [('throttle', '>', 0.9), ('rpm', '>', 3000), ('speed_kmh', '>', 10), ('torque', '>', 0), ('gear', '>', 0)]
+
+# Gänge mit höchstens so vielen Samples gelten als Glitch (z.B. kurz eingelegter Gang beim Schalten)
+MIN_GEAR_SAMPLES = 20
+
+# Relative Genauigkeit des Medians: 0.05 % (R ~ 0.03 -> ca. 1.5e-5, angezeigt werden 4 Nachkommastellen)
+RELATIVE_ACCURACY = 0.0005
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+
+# Runs eines Fahrzeugs, die noch fehlen oder seit dem Einrechnen neue Daten bekommen haben (idx_runs_vehicle)
+STALE_RUNS_QUERY = """
+    SELECT r.id FROM runs r
+    LEFT JOIN gear_ratio_runs g ON g.run_id = r.id
+    WHERE r.vehicle_name = ? AND r.deleted = 0 AND r.archive_missing = 0
+      AND (g.run_id IS NULL OR g.revision != COALESCE(r.revision, 0))
+"""
+
+
+def sketch_buckets(values):
+    """Bucket-Index je Wert (> 0): Bucket i deckt (gamma^(i-1), gamma^i] ab."""
+    return np.ceil(np.log(np.asarray(values, dtype=np.float64)) / _LOG_GAMMA).astype(np.int64)
+
+
+def bucket_value(buckets):
+    """Repräsentant eines Buckets (relativer Fehler höchstens RELATIVE_ACCURACY)."""
+    return 2 * _GAMMA ** np.asarray(buckets, dtype=np.float64) / (_GAMMA + 1)
+
+
+def sketch_quantile(buckets, counts, q=0.5):
+    """Quantil aus (Bucket, Anzahl)-Paaren, None bei leerem Histogramm."""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.sum() <= 0:
+        return None
+    order = np.argsort(buckets)
+    cum = np.cumsum(counts[order])
+    rank = q * (cum[-1] - 1)
+    return float(bucket_value(buckets[order][np.searchsorted(cum, rank, side='right')]))
+
+
+def run_sketch(run_id, db_path=DB_PATH):
+    """
+    Beitrag eines Runs zur Gang-Statistik, O(Run).
+    :return: int64-Array (k, 3) mit Zeilen (Gang, Bucket, Anzahl)
+    """
+    df = telemetry_store.load_channels(run_id, ['gear', 'speed_kmh', 'rpm'], filters=SAMPLE_FILTERS, db_path=db_path)
+    if df.empty:
+        return np.zeros((0, 3), dtype=np.int64)
+    r_val = df['speed_kmh'].to_numpy(np.float64) / df['rpm'].to_numpy(np.float64)
+    pairs = np.column_stack((df['gear'].to_numpy(np.int64), sketch_buckets(r_val)))
+    keys, counts = np.unique(pairs, axis=0, return_counts=True)
+    return np.column_stack((keys, counts)).astype(np.int64)
+
+
+def _remove_run(conn, run_id):
+    # Zieht den gespeicherten Beitrag eines Runs wieder ab; liefert (Fahrzeug, betroffene Gänge)
+    row = conn.execute("SELECT vehicle_name, data FROM gear_ratio_runs WHERE run_id = ?", (int(run_id),)).fetchone()
+    if row is None:
+        return None, set()
+    vehicle_name, data = row
+    entries = np.frombuffer(data, dtype=np.int64).reshape(-1, 3)
+    conn.executemany("UPDATE gear_ratio_sketch SET count = count - ? WHERE vehicle_name = ? AND gear = ? AND bucket = ?",
+                     [(int(c), vehicle_name, int(g), int(b)) for g, b, c in entries])
+    conn.execute("DELETE FROM gear_ratio_sketch WHERE vehicle_name = ? AND count <= 0", (vehicle_name,))
+    conn.execute("DELETE FROM gear_ratio_runs WHERE run_id = ?", (int(run_id),))
+    return vehicle_name, {int(g) for g in entries[:, 0]}
+
+
+def _add_run(conn, run_id, vehicle_name, revision, entries):
+    conn.executemany('''
+        INSERT INTO gear_ratio_sketch (vehicle_name, gear, bucket, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT (vehicle_name, gear, bucket) DO UPDATE SET count = count + excluded.count
+    ''', [(vehicle_name, int(g), int(b), int(c)) for g, b, c in entries])
+    conn.execute("INSERT OR REPLACE INTO gear_ratio_runs (run_id, vehicle_name, revision, data) VALUES (?, ?, ?, ?)",
+                 (int(run_id), vehicle_name, revision, entries.tobytes()))
+    return {int(g) for g in entries[:, 0]}
+
+
+def _refresh_gears(conn, vehicle_name, gears):
+    # Median je geändertem Gang neu aus dem Histogramm (O(Buckets), unabhängig von der Historie)
+    for gear in sorted(gears):
+        rows = conn.execute("SELECT bucket, count FROM gear_ratio_sketch WHERE vehicle_name = ? AND gear = ?",
+                            (vehicle_name, gear)).fetchall()
+        n_samples = sum(c for _, c in rows)
+        if n_samples > MIN_GEAR_SAMPLES:
+            buckets, counts = zip(*rows)
+            conn.execute("INSERT OR REPLACE INTO vehicle_gear_ratios (vehicle_name, gear, ratio_r, n_samples) VALUES (?, ?, ?, ?)",
+                         (vehicle_name, gear, sketch_quantile(buckets, counts), n_samples))
+        else:
+            conn.execute("DELETE FROM vehicle_gear_ratios WHERE vehicle_name = ? AND gear = ?", (vehicle_name, gear))
+
+
+def forget_run(conn, run_id):
+    """Nimmt einen Run aus der Gang-Statistik seines Fahrzeugs (z.B. beim Löschen). Commit durch den Aufrufer."""
+    vehicle_name, gears = _remove_run(conn, run_id)
+    if vehicle_name is not None:
+        _refresh_gears(conn, vehicle_name, gears)
+
+
+def update_run(run_id, db_path=DB_PATH):
+    """
+    Rechnet einen Run in die Gang-Statistik seines Fahrzeugs ein, z.B. nach dem Ende der Aufzeichnung. Kosten O(Run).
+    Ein bereits eingerechneter Run mit neuer Daten-Revision ersetzt seinen alten Beitrag, gelöschte Runs werden entfernt.
+    :return: True, falls sich die Statistik geändert hat
+    """
+    run_id = int(run_id)
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        row = conn.execute("SELECT vehicle_name, revision, deleted FROM runs WHERE id = ?", (run_id,)).fetchone()
+        stored = conn.execute("SELECT revision FROM gear_ratio_runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None or row[2]:
+            if stored is None:
+                return False
+            forget_run(conn, run_id)
+            conn.commit()
+            return True
+        vehicle_name, revision = row[0], row[1] or 0
+        if stored is not None and stored[0] == revision:
+            return False
+
+        # Telemetrie außerhalb der Schreibsperre lesen; kommen währenddessen neue Daten dazu, ist die gespeicherte
+        # Revision älter als die des Runs und der nächste Abgleich rechnet ihn erneut ein
+        entries = run_sketch(run_id, db_path)
+
+        # IMMEDIATE: Logger und Dashboard dürfen denselben Run nicht gleichzeitig einrechnen
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = conn.execute("SELECT revision FROM gear_ratio_runs WHERE run_id = ?", (run_id,)).fetchone()
+            if stored is not None and stored[0] == revision:
+                conn.rollback()
+                return False
+            _, gears = _remove_run(conn, run_id)
+            gears |= _add_run(conn, run_id, vehicle_name, revision, entries)
+            _refresh_gears(conn, vehicle_name, gears)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return True
+    finally:
+        conn.close()
+
+
+def _recording_run_id(conn):
+    # Der Logger legt Runs erst beim Start der Aufzeichnung an: während 'RECORDING...' ist es der neueste Run
+    state = conn.execute("SELECT state FROM logger_state WHERE id = 1").fetchone()
+    if state is None or not str(state[0]).startswith("RECORDING"):
+        return None
+    return conn.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+
+
+def sync_vehicle(vehicle_name, db_path=DB_PATH):
+    """
+    Rechnet alle fehlenden oder geänderten Runs eines Fahrzeugs ein (Nachlauf für bestehende Datenbanken und
+    Runs, die ohne Logger-Hook entstanden sind). Ohne offene Runs nur eine Index-Abfrage über die Runs.
+    Der gerade aufgezeichnete Run bekommt bei jedem Flush eine neue Revision und wird übersprungen;
+    der Logger rechnet ihn beim Beenden der Aufzeichnung ein (update_run).
+    :return: Anzahl eingerechneter Runs
+    """
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        stale = [r[0] for r in conn.execute(STALE_RUNS_QUERY, (vehicle_name,))]
+        if stale:
+            recording = _recording_run_id(conn)
+            stale = [run_id for run_id in stale if run_id != recording]
+    finally:
+        conn.close()
+    return sum(update_run(run_id, db_path) for run_id in stale)
+
+
+def get_gear_ratios(vehicle_name, db_path=DB_PATH):
+    """R-Wert (Speed / RPM) je erkanntem Gang, aufsteigend nach Gang; leere Liste, wenn noch nichts erkannt wurde."""
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        rows = conn.execute("SELECT ratio_r FROM vehicle_gear_ratios WHERE vehicle_name = ? ORDER BY gear", (vehicle_name,)).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
@@ -0,0 +1,193 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import telemetry_store
+from telemetry_store import DB_PATH
+
+# Runden-Ausrichtung über die Streckenposition: Runs werden an den Rücksprüngen von lap_distance in Runden
+# geteilt, jede Runde wird per np.interp auf ein festes Distanz-Raster (Vielfache von `step`) gelegt.
+# Alle Runden (auch aus verschiedenen Runs) teilen sich damit dieselben Stützstellen; Zeit- und Speed-Deltas
+# gegen eine Referenzrunde sind reine 2D-Array-Operationen, auch bei Dutzenden Runden.
+
+LAP_CHANNELS = ['time_elapsed', 'speed_kmh', 'lap_distance']
+
+# Raster-Abstand in Metern
+DEFAULT_STEP_M = 2.0
+
+# Rücksprung von lap_distance um mehr als diesen Anteil der Streckenlänge = neue Runde
+LAP_RESET_FRACTION = 0.5
+
+# Eine Runde gilt als vollständig, wenn sie höchstens so weit nach der Linie beginnt und vor ihr endet
+LAP_EDGE_M = 50.0
+
+REFERENCES = ('rolling', 'best')
+
+
+def split_laps(lap_distance):
+    """
+    Rundennummer pro Sample (0, 1, ...): eine neue Runde beginnt, wenn lap_distance um mehr als
+    LAP_RESET_FRACTION der Streckenlänge zurückspringt (Überfahren der Start/Ziel-Linie).
+    """
+    d = np.asarray(lap_distance, dtype=np.float64)
+    if len(d) == 0:
+        return np.zeros(0, dtype=np.int64)
+    track_length = np.nanmax(d) if np.isfinite(d).any() else 0.0
+    resets = np.zeros(len(d), dtype=np.int64)
+    resets[1:] = np.diff(d) < -LAP_RESET_FRACTION * track_length
+    return np.cumsum(resets)
+
+
+def _edge_time(t, d, target):
+    # Lineare Extrapolation der Zeit, zu der die Runde die Distanz `target` erreicht (aus zwei Randpunkten)
+    if len(t) < 2 or d[1] == d[0]:
+        return t[0]
+    return t[0] + (target - d[0]) * (t[1] - t[0]) / (d[1] - d[0])
+
+
+def lap_grids(df, step=DEFAULT_STEP_M, channels=('speed_kmh',)):
+    """
+    Teilt einen Run in Runden und legt jede Runde auf das Distanz-Raster 0, step, 2*step, ... (<= Streckenlänge).
+
+    :param df: Telemetrie mit time_elapsed, lap_distance und `channels`
+    :return: dict mit 'laps' (DataFrame lap, start, end [Positionen, end exklusiv], lap_time_s, complete),
+             'distance' (Raster), 'time' (2D: Runden x Raster, Sekunden seit Rundenbeginn, NaN außerhalb
+             der gefahrenen Distanz), je Kanal ein 2D-Array und 'track_length'
+    """
+    channels = list(channels)
+    d_all = df['lap_distance'].to_numpy(dtype=np.float64)
+    t_all = df['time_elapsed'].to_numpy(dtype=np.float64)
+    valid = np.isfinite(d_all) & np.isfinite(t_all)
+    track_length = float(d_all[valid].max()) if valid.any() else 0.0
+    grid = np.arange(0.0, track_length + 1e-9, step) if track_length > 0 else np.zeros(0)
+
+    lap_ids = split_laps(d_all)
+    bounds = np.flatnonzero(np.diff(lap_ids)) + 1
+    starts = np.concatenate(([0], bounds)) if len(df) else np.zeros(0, dtype=np.int64)
+    ends = np.concatenate((bounds, [len(df)])) if len(df) else np.zeros(0, dtype=np.int64)
+
+    rows = []
+    time_grid = np.full((len(starts), len(grid)), np.nan)
+    channel_grids = {ch: np.full((len(starts), len(grid)), np.nan) for ch in channels}
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        sel = valid[start:end]
+        t = t_all[start:end][sel]
+        # Monoton steigende Distanz (Standzeiten/Rauschen), negative Werte vor der Linie = 0
+        d = np.maximum.accumulate(np.clip(d_all[start:end][sel], 0.0, None)) if sel.any() else np.zeros(0)
+        complete = len(d) > 1 and d[0] <= LAP_EDGE_M and d[-1] >= track_length - LAP_EDGE_M
+        lap_time = None
+        if len(d) > 1:
+            t_start = _edge_time(t, d, 0.0) if complete else t[0]
+            t_rel = t - t_start
+            if complete:
+                # Randpunkte an der Linie, damit das Raster bis 0 und bis zur Streckenlänge reicht
+                lap_time = float(_edge_time(t[::-1], d[::-1], track_length) - t_start)
+                d_ext = np.concatenate(([0.0], d, [track_length]))
+                t_ext = np.concatenate(([0.0], t_rel, [lap_time]))
+            else:
+                d_ext, t_ext = d, t_rel
+            covered = (grid >= d_ext[0]) & (grid <= d_ext[-1])
+            time_grid[i, covered] = np.interp(grid[covered], d_ext, t_ext)
+            for ch in channels:
+                v = df[ch].to_numpy(dtype=np.float64)[start:end][sel]
+                channel_grids[ch][i, covered] = np.interp(grid[covered], d, v)
+        rows.append({'lap': i, 'start': int(start), 'end': int(end), 'lap_time_s': lap_time, 'complete': bool(complete)})
+
+    laps = pd.DataFrame(rows, columns=['lap', 'start', 'end', 'lap_time_s', 'complete'])
+    return {'laps': laps, 'distance': grid, 'time': time_grid, **channel_grids, 'track_length': track_length}
+
+
+def load_lap_grids(run_id, step=DEFAULT_STEP_M, db_path=DB_PATH, cache=None):
+    """lap_grids() für einen gespeicherten Run (Speed-Kanal), mit Cache pro Run-Revision und Raster."""
+    key = None
+    if cache is not None:
+        conn = sqlite3.connect(db_path, timeout=5.0)
+        try:
+            key = ('lap_grids', telemetry_store.get_db_token(conn)[0], int(run_id), telemetry_store.get_run_revision(conn, run_id), float(step))
+        finally:
+            conn.close()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    result = lap_grids(telemetry_store.load_channels(run_id, LAP_CHANNELS, db_path=db_path, cache=cache), step)
+    if key is not None:
+        # Arrays werden von den Aufrufern nur gelesen
+        cache.put(key, result)
+    return result
+
+
+def _reference_index(lap_times, reference):
+    # Index der Referenzrunde je Runde: 'best' = schnellste vollständige Runde, 'rolling' = schnellste
+    # vollständige Runde davor (die erste Runde ist ihre eigene Referenz)
+    n = len(lap_times)
+    idx = np.arange(n)
+    times = np.where(np.isfinite(lap_times), lap_times, np.inf)
+    if reference == 'best':
+        return np.full(n, int(np.argmin(times))) if n else idx
+    running = np.minimum.accumulate(times) if n else times
+    # Neue Bestzeit nur bei echter Verbesserung (bei Gleichstand bleibt die frühere Runde Referenz)
+    is_best = np.isfinite(times) & (times < np.concatenate(([np.inf], running[:-1])))
+    best_so_far = np.maximum.accumulate(np.where(is_best, idx, -1)) if n else idx
+    ref = np.empty(n, dtype=np.int64)
+    ref[:1] = 0
+    ref[1:] = best_so_far[:-1]
+    return np.where(ref < 0, idx, ref)
+
+
+def compare_laps(runs, reference='rolling', complete_only=True):
+    """
+    Zeit- und Speed-Delta aller Runden mehrerer Runs gegen eine Referenzrunde, über der Distanz.
+
+    :param runs: Liste von (Label, Ergebnis aus lap_grids/load_lap_grids) in chronologischer Reihenfolge
+    :param reference: 'rolling' (schnellste vorherige Runde) oder 'best' (schnellste Runde insgesamt)
+    :return: dict mit 'laps' (DataFrame label, lap, lap_time_s, reference, delta_s), 'distance',
+             'delta_time' und 'delta_speed' (2D: Runden x Raster, positiv = langsamer als die Referenz)
+    """
+    if reference not in REFERENCES:
+        raise ValueError(f"reference muss einer von {REFERENCES} sein")
+    n_grid = min((len(g['distance']) for _, g in runs), default=0)
+    labels, lap_rows, times, speeds = [], [], [], []
+    for label, grids in runs:
+        laps = grids['laps']
+        keep = laps['complete'].to_numpy() if complete_only else np.ones(len(laps), dtype=bool)
+        for row in laps[keep].itertuples(index=False):
+            labels.append(f"{label} R{row.lap + 1}")
+            lap_rows.append({'label': label, 'lap': row.lap + 1, 'lap_time_s': row.lap_time_s})
+        times.append(grids['time'][keep, :n_grid])
+        speeds.append(grids['speed_kmh'][keep, :n_grid])
+    distance = runs[0][1]['distance'][:n_grid] if runs else np.zeros(0)
+    table = pd.DataFrame(lap_rows, columns=['label', 'lap', 'lap_time_s'])
+    if table.empty:
+        return {'laps': table.assign(reference=[], delta_s=[]), 'distance': distance, 'labels': [],
+                'delta_time': np.zeros((0, n_grid)), 'delta_speed': np.zeros((0, n_grid))}
+
+    time_grid, speed_grid = np.vstack(times), np.vstack(speeds)
+    lap_times = table['lap_time_s'].to_numpy(dtype=np.float64)
+    ref = _reference_index(lap_times, reference)
+    table['reference'] = [labels[r] for r in ref]
+    table['delta_s'] = lap_times - lap_times[ref]
+    return {'laps': table, 'distance': distance, 'labels': labels,
+            'delta_time': time_grid - time_grid[ref], 'delta_speed': speed_grid - speed_grid[ref]}
+
+
+def best_lap(grids):
+    """Index der schnellsten vollständigen Runde oder None."""
+    complete = grids['laps'][grids['laps']['complete']]
+    if complete.empty:
+        return None
+    return int(complete.loc[complete['lap_time_s'].idxmin(), 'lap'])
+
+
+def time_delta_over_distance(distance_a, time_a, distance_b, time_b, step=DEFAULT_STEP_M):
+    """
+    Zeitabstand zweier Fahrten über der gemeinsam gefahrenen Distanz (z.B. distance_cum aus normalize_run):
+    t_A(d) - t_B(d) auf dem Raster 0, step, ...; positiv = A braucht länger.
+    :return: (Distanz-Raster, Delta in Sekunden)
+    """
+    d_a = np.maximum.accumulate(np.asarray(distance_a, dtype=np.float64))
+    d_b = np.maximum.accumulate(np.asarray(distance_b, dtype=np.float64))
+    if len(d_a) < 2 or len(d_b) < 2:
+        return np.zeros(0), np.zeros(0)
+    grid = np.arange(max(d_a[0], d_b[0]), min(d_a[-1], d_b[-1]) + 1e-9, step)
+    return grid, np.interp(grid, d_a, np.asarray(time_a, dtype=np.float64)) - np.interp(grid, d_b, np.asarray(time_b, dtype=np.float64))
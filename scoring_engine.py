@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import channel_math
+import telemetry_store
+from telemetry_derived import load_derived, QUALITY_DERIVED
+from telemetry_analysis import (analyze_run_quality, extract_shift_events, gear_accel, sector_kpis,
+                                time_to_speed, interval_time, QUALITY_CHANNELS)
+from telemetry_store import DB_PATH, CHANNEL_DTYPES
+
+# Kennzahlen pro Run für den Overall Performance Index (OPI). Die Worker-Funktionen liegen auf
+# Modulebene und importieren kein Streamlit, damit sie auch unter Windows (spawn) in einem
+# Prozess-Pool laufen.
+
+DEFAULT_CHUNK_RUNS = 8
+
+DRAG_FIELDS = ('best_100', 'best_200', 'vmax')
+HANDLING_FIELDS = ('lat', 'brake', 'csi', 'crash')
+SHIFT_FIELDS = ('shifts', 'latency_ms', 'speed_loss_kmh')
+
+SHIFT_CHANNELS = ['time_elapsed', 'speed_kmh', 'gear', 'rpm', 'torque', 'throttle']
+
+
+def drag_metrics(df, quality=None):
+    """
+    0-100, 0-200 (Sekunden ab Run-Start nach dem Trimmen) und Vmax eines Drag-Runs.
+    :param quality: bereits berechnetes Ergebnis von analyze_run_quality(df) (wird sonst berechnet)
+    """
+    t, _, _ = quality if quality is not None else analyze_run_quality(df)
+    if t.empty:
+        return None, None, None
+    t_100 = t[t['speed_kmh'] >= 100]
+    t_200 = t[t['speed_kmh'] >= 200]
+    best_100 = t_100.iloc[0]['time_elapsed'] - t.iloc[0]['time_elapsed'] if not t_100.empty else None
+    best_200 = t_200.iloc[0]['time_elapsed'] - t.iloc[0]['time_elapsed'] if not t_200.empty else None
+    return best_100, best_200, t['speed_kmh'].max()
+
+
+def handling_metrics(df, quality=None):
+    """Max. Quer-G, max. Brems-G, CSI und Crash-Flag eines Handling-Runs (quality wie bei drag_metrics)."""
+    t, csi, crash = quality if quality is not None else analyze_run_quality(df)
+    if t.empty or 'lat_g' not in t.columns:
+        return None, None, 50.0, False
+    lat_col = 'lat_g_smooth' if 'lat_g_smooth' in t.columns else 'lat_g'
+    lon_col = 'lon_g_smooth' if 'lon_g_smooth' in t.columns else 'lon_g'
+    lat = t[lat_col].abs().max()
+    brake = t[lon_col].min()
+    return lat if lat > 0 else None, abs(brake) if brake < 0 else None, csi, crash
+
+
+def shift_metrics(df):
+    """Anzahl Hochschaltvorgänge, mittlere Latenz und mittlerer Speed-Verlust (siehe extract_shift_events)."""
+    events = extract_shift_events(df)
+    if events.empty:
+        return 0, None, None
+    return len(events), events['latency_ms'].mean(), events['speed_loss_kmh'].mean()
+
+
+METRIC_FUNCS = {'DRAG': drag_metrics, 'HANDLING': handling_metrics, 'SHIFT': shift_metrics}
+METRIC_CHANNELS = {'DRAG': QUALITY_CHANNELS, 'HANDLING': QUALITY_CHANNELS, 'SHIFT': SHIFT_CHANNELS}
+METRIC_FIELDS = {'DRAG': DRAG_FIELDS, 'HANDLING': HANDLING_FIELDS, 'SHIFT': SHIFT_FIELDS}
+
+
+# Report-Tabellen eines Runs, gemeinsam genutzt von batch_report.py und fleet_compare.py
+REPORT_CHANNELS = list(CHANNEL_DTYPES)
+
+REPORT_TABLES = ('run_summary', 'shift_events', 'gear_accel', 'sector_kpis')
+
+# Nur mit Math-Kanälen (--math): Min/Mittel/Max je Run und Kanal
+MATH_TABLE = 'math_channels'
+
+SUMMARY_META = ('vehicle_name', 'vehicle_class', 'track_name', 'run_type', 'timestamp')
+
+
+def run_report(run_id, df, meta=None, quality=None, math_values=None):
+    """
+    Report-Tabellen eines Runs (reine Funktion auf der geladenen Telemetrie).
+
+    :param meta: Run-Metadaten (dict, z.B. Zeile aus load_runs), landen in run_summary
+    :param quality: bereits berechnetes Ergebnis von analyze_run_quality(df) (wird sonst berechnet)
+    :param math_values: ausgewertete Math-Kanäle (eine Spalte pro Kanal, siehe channel_math), ergibt MATH_TABLE
+    :return: dict Tabellenname -> DataFrame (jeweils mit Spalte run_id)
+    """
+    meta = meta or {}
+    summary = {'run_id': int(run_id), **{k: meta.get(k) for k in SUMMARY_META}, 'samples': len(df)}
+    shifts = extract_shift_events(df) if not df.empty else pd.DataFrame()
+    if df.empty:
+        summary.update(duration_s=None, vmax_kmh=None, t_0_100_s=None, t_0_200_s=None, t_100_250_s=None,
+                       csi=None, crash=None)
+    else:
+        _, csi, crash = quality if quality is not None else analyze_run_quality(df)
+        summary.update(duration_s=float(df['time_elapsed'].max() - df['time_elapsed'].min()),
+                       vmax_kmh=float(df['speed_kmh'].max()),
+                       t_0_100_s=time_to_speed(df, 100), t_0_200_s=time_to_speed(df, 200),
+                       t_100_250_s=interval_time(df, 100, 250),
+                       csi=float(csi), crash=bool(crash))
+    summary.update(shifts=len(shifts),
+                   shift_latency_ms=shifts['latency_ms'].mean() if not shifts.empty else None,
+                   shift_speed_loss_kmh=shifts['speed_loss_kmh'].mean() if not shifts.empty else None)
+
+    tables = {
+        'run_summary': pd.DataFrame([summary]),
+        'shift_events': shifts,
+        'gear_accel': gear_accel(df) if not df.empty else pd.DataFrame(columns=['Gang', 'Accel']),
+        'sector_kpis': sector_kpis(df),
+    }
+    if math_values is not None:
+        tables[MATH_TABLE] = channel_math.summarize(math_values)
+    for name in [t for t in tables if t != 'run_summary']:
+        tables[name] = tables[name].copy()
+        tables[name].insert(0, 'run_id', int(run_id))
+    return tables
+
+
+def _plain(value):
+    # numpy-Skalare -> Python-Typen (klein beim Zurückschicken aus dem Worker, JSON-fähig)
+    return value.item() if hasattr(value, 'item') else value
+
+
+def score_runs(kind, run_ids, db_path=DB_PATH, cache=None):
+    """
+    Berechnet die Kennzahlen für mehrere Runs desselben Typs ('DRAG', 'HANDLING' oder 'SHIFT').
+    Eine Arbeitseinheit des Prozess-Pools; auch seriell direkt nutzbar.
+
+    :return: Liste von (kind, run_id, metrics-Tupel)
+    """
+    func = METRIC_FUNCS[kind]
+    results = []
+    for run_id in run_ids:
+        df = telemetry_store.load_channels(run_id, METRIC_CHANNELS[kind], db_path=db_path, cache=cache)
+        if kind == 'SHIFT':
+            metrics = func(df)
+        else:
+            # Gierrate und geglättete G-Kräfte aus dem Store statt pro Aufruf neu
+            derived = load_derived(run_id, QUALITY_DERIVED, db_path=db_path, cache=cache)
+            metrics = func(df, quality=analyze_run_quality(df, derived))
+        results.append((kind, int(run_id), tuple(_plain(v) for v in metrics)))
+    return results
+
+
+def _chunks(kind, run_ids, chunk_runs):
+    run_ids = [int(r) for r in run_ids]
+    for i in range(0, len(run_ids), chunk_runs):
+        yield kind, run_ids[i:i + chunk_runs]
+
+
+def map_chunks(func, tasks, workers=None, **serial_kwargs):
+    """
+    Führt func(*task) für alle Arbeitseinheiten in `tasks` auf einem Prozess-Pool aus und liefert die
+    Elemente der zurückgegebenen Listen, sobald eine Einheit fertig ist (Reihenfolge = Fertigstellung).
+    func muss auf Modulebene liegen (picklebar) und eine Liste zurückgeben.
+
+    Bei nur einer Einheit oder workers=1 wird seriell im aufrufenden Prozess gerechnet; nur dann werden
+    `serial_kwargs` (z.B. ein prozesslokaler cache) an func durchgereicht.
+
+    :param workers: Anzahl Prozesse (Standard: os.cpu_count())
+    """
+    tasks = list(tasks)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            yield from func(*task, **serial_kwargs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func, *task) for task in tasks]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # Abbruch (z.B. Generator nicht zu Ende gelesen): ausstehende Einheiten nicht mehr starten
+            for future in futures:
+                future.cancel()
+
+
+def iter_run_metrics(drag_ids=(), handling_ids=(), db_path=DB_PATH, workers=None, chunk_runs=DEFAULT_CHUNK_RUNS, cache=None, shift_ids=()):
+    """
+    Verteilt die Runs in Blöcken von `chunk_runs` auf einen Prozess-Pool (siehe map_chunks) und liefert
+    die Ergebnisse, sobald ein Block fertig ist. Seriell (ein Block oder workers=1) wird `cache` genutzt.
+
+    :param workers: Anzahl Prozesse (Standard: os.cpu_count())
+    :param shift_ids: Runs, für die zusätzlich die Schalt-Kennzahlen ('SHIFT') berechnet werden
+    :return: Generator von (kind, run_id, metrics-Tupel)
+    """
+    chunks = (list(_chunks('DRAG', drag_ids, chunk_runs)) + list(_chunks('HANDLING', handling_ids, chunk_runs))
+              + list(_chunks('SHIFT', shift_ids, chunk_runs)))
+    yield from map_chunks(score_runs, [(kind, ids, db_path) for kind, ids in chunks], workers, cache=cache)
+
+
+def global_bests(results):
+    """
+    Bestwerte über alle Runs (Referenz für das 100er Score-Rating).
+    :param results: Iterable von (kind, run_id, metrics-Tupel), z.B. aus iter_run_metrics()
+    """
+    bests = {'best_100': 999.0, 'best_200': 999.0, 'vmax': 0.0, 'lat': 0.0, 'brake': 0.0}
+    for kind, _, metrics in results:
+        if kind == 'SHIFT':
+            continue
+        if kind == 'DRAG':
+            c_100, c_200, c_vmax = metrics
+            if c_100 and c_100 < bests['best_100']: bests['best_100'] = c_100
+            if c_200 and c_200 < bests['best_200']: bests['best_200'] = c_200
+            if c_vmax and c_vmax > bests['vmax']: bests['vmax'] = c_vmax
+        else:
+            c_lat, c_brk, _, _ = metrics
+            if c_lat and c_lat > bests['lat']: bests['lat'] = c_lat
+            if c_brk and c_brk > bests['brake']: bests['brake'] = c_brk
+    return bests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Berechnet die OPI-Kennzahlen aller Drag- und Handling-Runs (parallel).")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--runs", type=int, nargs="*", help="Run-IDs (Standard: alle Drag- und Handling-Runs)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--chunk-runs", type=int, default=DEFAULT_CHUNK_RUNS, help="Runs pro Arbeitseinheit")
+    parser.add_argument("--shifts", action="store_true", help="Zusätzlich Schalt-Kennzahlen der Drag-Runs berechnen")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    # Ältere Datenbanken (ohne run_type/deleted, ungeclusterte Telemetrie) zuerst migrieren
+    telemetry_store.init_db(args.db)
+    runs = telemetry_store.load_runs(args.db)
+    if args.runs:
+        runs = runs[runs['id'].isin(args.runs)]
+    drag_ids = runs.loc[runs['run_type'] == 'DRAG', 'id'].tolist()
+    handling_ids = runs.loc[runs['run_type'] == 'HANDLING', 'id'].tolist()
+    shift_ids = drag_ids if args.shifts else []
+    total = len(drag_ids) + len(handling_ids) + len(shift_ids)
+
+    results = []
+    for kind, run_id, metrics in iter_run_metrics(drag_ids, handling_ids, args.db, args.workers, args.chunk_runs, shift_ids=shift_ids):
+        results.append((kind, run_id, metrics))
+        fields = METRIC_FIELDS[kind]
+        values = ", ".join(f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}" for name, value in zip(fields, metrics))
+        print(f"[Scoring] {len(results)}/{total} {kind:8s} Run {run_id}: {values}")
+
+    bests = global_bests(results)
+    print("[Scoring] Globale Bestwerte: " + ", ".join(f"{k}={v:.3f}" for k, v in bests.items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'runs': [{'kind': kind, 'run_id': run_id,
+                                 **dict(zip(METRIC_FIELDS[kind], metrics))}
+                                for kind, run_id, metrics in results],
+                       'global_bests': bests}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
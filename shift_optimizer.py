@@ -1,7 +1,178 @@
 import sqlite3
 import pandas as pd
 import numpy as np
-from scipy.interpolate import interp1d
+
+import gear_ratios as gear_ratio_store
+import telemetry_archive
+import telemetry_store
+
+# Volllast-Queries. 'throttle > 0.9' muss wörtlich enthalten sein, damit SQLite den partiellen
+# Index idx_telemetry_full_throttle nutzen kann (siehe telemetry_store.init_db / test_query_plans.py).
+TORQUE_CURVE_QUERY = """
+    SELECT rpm, torque, gear, speed_kmh FROM telemetry_data
+    WHERE run_id = ? AND throttle > 0.9 AND throttle > 0.95 AND rpm > 2000
+    ORDER BY rpm ASC
+"""
+
+# np.trapezoid gibt es erst ab NumPy 2.0 (requirements.txt: numpy>=1.24), davor heißt sie np.trapz
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+# Obere Hüllkurve der Motor-Drehmomente: Quantil je 50-RPM-Bin
+TORQUE_RPM_BIN = 50
+TORQUE_ENVELOPE_QUANTILE = 0.95
+
+
+def engine_torque(torque, gear, gear_ratios, final_drive, mass_kg=1200.0, wheel_radius_m=0.33):
+    """
+    Motor-Drehmoment-Proxy in Nm aus dem Beschleunigungs-Kanal ('torque' = accel_z * 1000), vektorisiert.
+
+    Gänge außerhalb 1..len(gear_ratios) (Leerlauf, Rückwärts, fehlend) nutzen die letzte Übersetzung.
+    """
+    ratios = np.asarray(gear_ratios, dtype=np.float64)
+    g = np.nan_to_num(np.asarray(gear, dtype=np.float64), nan=0.0).astype(np.int64)
+    # Gang -> Index in die Übersetzungstabelle; ungültige Gänge auf den letzten Eintrag geklemmt
+    idx = np.where((g >= 1) & (g <= len(ratios)), g - 1, len(ratios) - 1)
+    ratio = np.take(ratios, idx)
+    # Netto-Zugkraft am Rad (F = m * a) ohne Luftwiderstand: Das 95%-Quantil unten zieht sich ohnehin
+    # die "reinen" Motorwerte aus den niedrigen Gängen, Luftwiderstand würde Ungenauigkeiten in hohen
+    # Gängen rechnerisch "explodieren" lassen. Rad-Drehmoment = F * r, Motor = Rad / Gesamtübersetzung.
+    return mass_kg * (np.asarray(torque, dtype=np.float64) / 1000.0) * wheel_radius_m / (ratio * final_drive)
+
+
+def binned_quantile(codes, values, q):
+    """
+    Quantil (lineare Interpolation wie pandas/numpy) von `values` je ganzzahligem Bin-Code.
+
+    Sortierbasiert: einmal nach Wert, dann stabil nach Bin (Radix-Sort bei kleinem Code-Bereich),
+    damit liegen die Werte jedes Bins sortiert hintereinander und das Quantil ist ein Indexzugriff.
+    :return: (sortierte eindeutige Codes, Quantil je Code)
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return codes[:0], values[:0]
+    keys = codes - codes.min()
+    if keys.max() < 2 ** 16:
+        keys = keys.astype(np.uint16)
+    order = np.argsort(values)
+    order = order[np.argsort(keys[order], kind='stable')]
+    c, v = codes[order], values[order]
+    starts = np.flatnonzero(np.concatenate(([True], c[1:] != c[:-1])))
+    counts = np.diff(np.append(starts, len(c)))
+    pos = (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    frac = pos - lo
+    v_lo = v[starts + lo]
+    v_hi = v[starts + np.minimum(lo + 1, counts - 1)]
+    # Gleiche Interpolationsformel wie numpy (_lerp)
+    diff = v_hi - v_lo
+    return c[starts], np.where(frac >= 0.5, v_hi - diff * (1 - frac), v_lo + diff * frac)
+
+
+def engine_torque_envelope(df, gear_ratios, final_drive, mass_kg=1200.0, wheel_radius_m=0.33):
+    """
+    Obere Hüllkurve des Motor-Drehmoments: TORQUE_ENVELOPE_QUANTILE je auf TORQUE_RPM_BIN gerundeter Drehzahl.
+    quantile(0.95) fängt das reale Peak-Drehmoment robuster ab als max() (Hänger durch Auskuppeln/Schalten).
+
+    :param df: Volllast-Samples mit rpm, torque, gear
+    :return: DataFrame rpm_rounded, engine_torque (aufsteigend nach rpm_rounded)
+    """
+    torque = engine_torque(df['torque'].to_numpy(), df['gear'].to_numpy(), gear_ratios, final_drive, mass_kg, wheel_radius_m)
+    bins = np.round(df['rpm'].to_numpy(dtype=np.float64) / TORQUE_RPM_BIN).astype(np.int64)
+    codes, torques = binned_quantile(bins, torque, TORQUE_ENVELOPE_QUANTILE)
+    return pd.DataFrame({'rpm_rounded': codes * float(TORQUE_RPM_BIN), 'engine_torque': torques})
+
+
+# Raster der Radzugkraft-Kurven und der Schnittpunkt-Suche
+SHIFT_GRID_RPM = 10
+
+# Genauigkeit der Schaltdrehzahl nach der Verfeinerung (RPM)
+SHIFT_RPM_TOLERANCE = 1e-3
+
+# Schnittpunkt so knapp unter der Maximaldrehzahl -> bis zur Maximaldrehzahl ausdrehen
+SHIFT_LIMITER_MARGIN_RPM = 50
+
+
+def _torque_function(torque_curve_df):
+    # Interpolationsfunktion für das Drehmoment, um Werte exakt abzufragen
+    from scipy.interpolate import interp1d  # scipy erst bei Bedarf laden (Dashboard-Kaltstart)
+    return interp1d(torque_curve_df['rpm_rounded'].values, torque_curve_df['torque_smoothed'].values, kind='cubic', fill_value="extrapolate")
+
+
+def _shift_rpm_range(torque_curve_df):
+    rpms = torque_curve_df['rpm_rounded'].values
+    return max(rpms.min(), 3000), rpms.max()
+
+
+def wheel_speed_kmh(rpm, ratio, final_drive, wheel_radius_m):
+    """Geschwindigkeit in km/h bei Drehzahl `rpm` im Gang mit Übersetzung `ratio`: (RPM * 2 * pi / 60) * r / Übersetzung."""
+    return np.asarray(rpm) * 2 * np.pi / 60 * wheel_radius_m / (ratio * final_drive) * 3.6
+
+
+def _force_gap(torque_func, rpm, ratio_current, ratio_next):
+    # Radzugkraft Gang N minus Gang N+1 bei gleicher Geschwindigkeit, ohne den gemeinsamen Faktor
+    # Final_Drive / Radius (ändert das Vorzeichen nicht). rpm = Drehzahl in Gang N.
+    return torque_func(rpm) * ratio_current - torque_func(rpm * (ratio_next / ratio_current)) * ratio_next
+
+
+def solve_shift_rpms(torque_func, gear_ratios, min_rpm, max_rpm, step=SHIFT_GRID_RPM, tol=SHIFT_RPM_TOLERANCE):
+    """
+    Ideale Schaltdrehzahlen aller Gangpaare auf einmal: die höchste Drehzahl, bei der die Zugkraft von Gang N
+    auf die von Gang N+1 bei gleicher Geschwindigkeit fällt (Vorzeichenwechsel von F_N(rpm) - F_N+1(rpm * i_N+1 / i_N)).
+
+    Der letzte Vorzeichenwechsel wird auf dem Raster `step` eingeklammert und per vektorisierter Bisektion
+    (alle Gangpaare je Schritt in einem Aufruf) auf `tol` RPM verfeinert. Luftwiderstand ist bei gleicher
+    Geschwindigkeit in beiden Gängen gleich und fällt aus der Differenz heraus.
+    Ohne Schnittpunkt, mit Schnittpunkt am unteren Rand oder knapp unter max_rpm wird bis max_rpm ausgedreht.
+
+    :return: Array der Schaltdrehzahlen in Gang-N-Drehzahl (len(gear_ratios) - 1 Einträge)
+    """
+    ratios = np.asarray(gear_ratios, dtype=np.float64)
+    ratio_current, ratio_next = ratios[:-1, None], ratios[1:, None]
+    shift_rpms = np.full(len(ratio_current), float(max_rpm))
+    if len(shift_rpms) == 0:
+        return shift_rpms
+
+    grid = np.append(np.arange(min_rpm, max_rpm, step), max_rpm).astype(np.float64)
+    stronger = _force_gap(torque_func, grid[None, :], ratio_current, ratio_next) > 0
+    # Letzter Rasterpunkt, an dem Gang N noch stärker ist; der Schnittpunkt liegt zwischen ihm und dem nächsten
+    last = len(grid) - 1 - np.argmax(stronger[:, ::-1], axis=1)
+    found = stronger.any(axis=1) & (last > 0) & (last < len(grid) - 1)
+
+    lo, hi = grid[last[found]], grid[last[found] + 1]
+    ratio_current, ratio_next = ratio_current[found], ratio_next[found]
+    while len(lo) and np.max(hi - lo) > tol:
+        mid = 0.5 * (lo + hi)
+        mid_stronger = _force_gap(torque_func, mid[:, None], ratio_current, ratio_next)[:, 0] > 0
+        lo = np.where(mid_stronger, mid, lo)
+        hi = np.where(mid_stronger, hi, mid)
+
+    shift_rpms[found] = 0.5 * (lo + hi)
+    shift_rpms[shift_rpms > max_rpm - SHIFT_LIMITER_MARGIN_RPM] = max_rpm
+    return shift_rpms
+
+
+def shift_loss_area(torque_func, gear_ratios, final_drive, wheel_radius_m, optimal_rpms, shift_rpms, samples=64):
+    """
+    Fläche zwischen den Radzugkraft-Kurven von Gang N und N+1 (N * km/h) über dem Geschwindigkeitsbereich
+    zwischen tatsächlicher und idealer Schaltdrehzahl, also die Zugkraft, die im jeweils schwächeren Gang fehlt.
+
+    :param optimal_rpms: ideale Schaltdrehzahl je Gangpaar (solve_shift_rpms)
+    :param shift_rpms: tatsächliche Schaltdrehzahl je Gangpaar, Form (Gangpaare,) oder (Gangpaare, k)
+    :return: Verlustfläche in der Form von shift_rpms
+    """
+    ratios = np.asarray(gear_ratios, dtype=np.float64)
+    shift_rpms = np.asarray(shift_rpms, dtype=np.float64)
+    optimal = np.asarray(optimal_rpms, dtype=np.float64).reshape((-1,) + (1,) * (shift_rpms.ndim - 1))
+    extra = (1,) * shift_rpms.ndim
+    ratio_current = ratios[:-1].reshape((-1,) + extra)
+    ratio_next = ratios[1:].reshape((-1,) + extra)
+    # Stützstellen je Intervall (letzte Achse), von der tatsächlichen zur idealen Schaltdrehzahl
+    t = np.linspace(0.0, 1.0, samples + 1)
+    rpm = shift_rpms[..., None] + (optimal - shift_rpms)[..., None] * t
+    gap = np.abs(_force_gap(torque_func, rpm, ratio_current, ratio_next)) * final_drive / wheel_radius_m
+    return np.abs(_trapezoid(gap, wheel_speed_kmh(rpm, ratio_current, final_drive, wheel_radius_m), axis=-1))
+
 
 class ShiftOptimizer:
     def __init__(self, db_path="lmu_telemetry.db"):
@@ -14,49 +185,23 @@ class ShiftOptimizer:
         Berücksichtigung von Masse, Luft- und Rollwiderstand.
         """
         conn = sqlite3.connect(self.db_path)
-        # Hole alle Daten mit offener Drosselklappe (Volllast) über 2000 RPM
-        query = f"SELECT rpm, torque, gear, speed_kmh FROM telemetry_data WHERE run_id = {run_id} AND throttle > 0.95 AND rpm > 2000 ORDER BY rpm ASC"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        archive_path = telemetry_store.get_archive_path(conn, run_id)
+        if archive_path:
+            # Archivierter Run: gleiche Auswahl wie die SQL-Query, nur auf den Archiv-Spalten
+            conn.close()
+            df = telemetry_archive.read_run(run_id, archive_path, columns=['rpm', 'torque', 'gear', 'speed_kmh', 'throttle'], db_path=self.db_path)
+            df = df[(df['throttle'] > 0.95) & (df['rpm'] > 2000)].sort_values('rpm', kind='stable')[['rpm', 'torque', 'gear', 'speed_kmh']]
+        else:
+            # Hole alle Daten mit offener Drosselklappe (Volllast) über 2000 RPM
+            df = pd.read_sql_query(TORQUE_CURVE_QUERY, conn, params=(int(run_id),))
+            conn.close()
 
         if df.empty:
             return None
 
         # Filtern von ungültigen Daten (z.B. Schalt-Löcher mit negativer Beschleunigung/Torque)
-        df = df[df['torque'] > 0].copy()
-        
-        def calc_engine_torque(row):
-            g = int(row['gear'])
-            if 1 <= g <= len(gear_ratios):
-                ratio = gear_ratios[g - 1]
-            else:
-                ratio = gear_ratios[-1]
-                
-            # 'torque' ist aktuell accel_z * 1000
-            a = row['torque'] / 1000.0 # Beschleunigung in m/s^2
-            
-            # Netto-Zugkraft am Rad (F = m * a)
-            # Wir verzichten hier auf die Addition von Luftwiderstand (F_drag). 
-            # Warum? Der Algorithmus nimmt weiter unten das 95%-Quantil aller Datenpunkte. 
-            # Bei gleicher RPM hat der niedrigste Gang die höchste Beschleunigung (weil kaum Luftwiderstand).
-            # Das Quantil zieht sich also ohnehin automatisch die "reinen" Motorwerte aus Gang 1 & 2.
-            # Luftwiderstand würde bei Ungenauigkeiten in hohen Gängen die Kurve rechnerisch "explodieren" lassen.
-            F_wheel_net = mass_kg * a
-            
-            # Rad-Drehmoment
-            T_wheel_Nm = F_wheel_net * wheel_radius_m
-            
-            # Motor-Drehmoment Proxy
-            T_engine_Nm = T_wheel_Nm / (ratio * final_drive)
-            return T_engine_Nm
-        df['engine_torque'] = df.apply(calc_engine_torque, axis=1)
-        
-        # Runden der RPM auf 50er Schritte zur sauberen Gruppierung
-        df['rpm_rounded'] = (df['rpm'] / 50).round() * 50
-        
-        # Bilde die obere Hüllkurve (Um Hänger durch Auskuppeln/Schaltvorgänge zu ignorieren)
-        # quantile(0.95) fängt das reale Peak-Drehmoment robuster ab als max()
-        curve = df.groupby('rpm_rounded')['engine_torque'].quantile(0.95).reset_index()
+        df = df[df['torque'] > 0]
+        curve = engine_torque_envelope(df, gear_ratios, final_drive, mass_kg=mass_kg, wheel_radius_m=wheel_radius_m)
         
         # Daten glätten & interpolieren/extrapolieren, um Lücken in Gängen zu füllen
         rpms = curve['rpm_rounded'].values
@@ -88,127 +233,64 @@ class ShiftOptimizer:
         :param torque_curve_df: DataFrame mit 'rpm_rounded' und 'torque_smoothed' in Nm
         :param gear_ratios: Liste von Übersetzungen, z.B. [2.89, 2.10, 1.64, 1.31, 1.09, 0.93]
         :param final_drive: Achsübersetzung, z.B. 3.42
-        :return: Liste mit Schaltempfehlungen (Gang N -> N+1: at RPM)
+        :return: Liste mit Schaltempfehlungen (Gang N -> N+1: at RPM), RPM-Raster, Radzugkraft pro Gang auf dem Raster
         """
-        rpms = torque_curve_df['rpm_rounded'].values
-        torques = torque_curve_df['torque_smoothed'].values
+        torque_func = _torque_function(torque_curve_df)
+        min_rpm, max_rpm = _shift_rpm_range(torque_curve_df)
+        ratios = np.asarray(gear_ratios, dtype=np.float64)
         
-        # Interpolationsfunktion für das Drehmoment, um Werte exakt abzufragen
-        torque_func = interp1d(rpms, torques, kind='cubic', fill_value="extrapolate")
+        # RPM-Raster für die Diagramme
+        fine_rpms = np.arange(min_rpm, max_rpm, SHIFT_GRID_RPM)
         
-        min_rpm = max(rpms.min(), 3000)
-        max_rpm = rpms.max()
+        # F_wheel = T_engine * Ratio * Final_Drive / Radius
+        # Radzugkraft (ohne Abzug von Luftwiderstand, d.h. Bruttokraft), alle Gänge auf einmal
+        wheel_forces = list(torque_func(fine_rpms)[None, :] * ratios[:, None] * final_drive / wheel_radius_m)
         
-        # Feineres RPM-Array für präzise Berechnungen
-        fine_rpms = np.arange(min_rpm, max_rpm, 10)
-        
-        wheel_forces = []
-        for ratio in gear_ratios:
-            # F_wheel = T_engine * Ratio * Final_Drive / Radius
-            # Radzugkraft (ohne Abzug von Luftwiderstand, d.h. Bruttokraft)
-            wt = torque_func(fine_rpms) * ratio * final_drive / wheel_radius_m
-            wheel_forces.append(wt)
-            
+        shift_rpms = solve_shift_rpms(torque_func, ratios, min_rpm, max_rpm)
         shift_points = []
-        
-        # Schnittpunkte zwischen Gang N und N+1 finden
-        for i in range(len(gear_ratios) - 1):
-            wf_current_gear = wheel_forces[i]
-            
+        for i, shift_rpm in enumerate(shift_rpms):
             # Bei gleicher Geschwindigkeit (km/h) fällt die RPM im nächsten Gang ab.
-            ratio_next = gear_ratios[i+1]
-            ratio_current = gear_ratios[i]
-            
-            rpm_drop_factor = ratio_next / ratio_current
-            rpms_in_next_gear = fine_rpms * rpm_drop_factor
-            wf_next_gear = torque_func(rpms_in_next_gear) * ratio_next * final_drive / wheel_radius_m
-            
-            shift_rpm = max_rpm
-            for j in range(len(fine_rpms)-1, 0, -1):
-                if fine_rpms[j] >= max_rpm:
-                    shift_rpm = max_rpm
-                    continue
-                    
-                # Weil der Luftwiderstand in beiden Gängen bei derselben Geschwindigkeit exakt gleich groß ist, 
-                # genügt der Vergleich der Brutto-Radzugkräfte (wf_current vs wf_next):
-                if wf_current_gear[j] > wf_next_gear[j]:
-                    shift_rpm = fine_rpms[j]
-                    break
-                    
-            if shift_rpm == fine_rpms[0] or shift_rpm > max_rpm - 50:
-                 shift_rpm = max_rpm
-                 
+            rpm_drop_factor = ratios[i + 1] / ratios[i]
             shift_points.append({
                 'from_gear': i + 1,
                 'to_gear': i + 2,
-                'shift_rpm': shift_rpm,
-                'rpm_drop_to': shift_rpm * rpm_drop_factor
+                'shift_rpm': float(shift_rpm),
+                'rpm_drop_to': float(shift_rpm * rpm_drop_factor),
+                'shift_speed_kmh': float(wheel_speed_kmh(shift_rpm, ratios[i], final_drive, wheel_radius_m))
             })
             
         return shift_points, fine_rpms, wheel_forces
 
+    def calculate_shift_losses(self, torque_curve_df, gear_ratios, final_drive, shift_rpms, wheel_radius_m=0.33):
+        """
+        Zugkraft-Verlust beim Schalten abseits der idealen Schaltdrehzahl: Fläche zwischen den Zugkraftkurven
+        (N * km/h, wie im Diagramm über der Geschwindigkeit) zwischen tatsächlicher und idealer Schaltdrehzahl.
+
+        :param shift_rpms: Schaltdrehzahlen (Gang-N-Drehzahl) je Gangpaar, Form (Gangpaare,) oder (Gangpaare, k)
+        :return: Verlustfläche in derselben Form, 0 beim idealen Schaltpunkt
+        """
+        torque_func = _torque_function(torque_curve_df)
+        min_rpm, max_rpm = _shift_rpm_range(torque_curve_df)
+        optimal = solve_shift_rpms(torque_func, gear_ratios, min_rpm, max_rpm)
+        return shift_loss_area(torque_func, gear_ratios, final_drive, wheel_radius_m, optimal,
+                               np.clip(np.asarray(shift_rpms, dtype=np.float64), min_rpm, max_rpm))
+
     def get_auto_gear_ratios(self, run_id):
         """
-        Automatische Erkennung der Getriebeübersetzung basierend auf R = Speed / RPM.
-        Speichert die Durchschnittswerte pro Gang in der Datenbank.
+        Automatische Erkennung der Getriebeübersetzung basierend auf R = Speed / RPM (Median pro Gang über alle
+        Runs des Fahrzeugs). Die Statistik wird pro Run inkrementell gepflegt (siehe gear_ratios.py); hier werden
+        nur noch nicht eingerechnete Runs nachgezogen und die fertigen Werte gelesen.
         """
         conn = sqlite3.connect(self.db_path)
-        
-        # Fahrzeugnamen ermitteln
-        df_run = pd.read_sql_query(f"SELECT vehicle_name FROM runs WHERE id = {run_id}", conn)
-        if df_run.empty:
-            conn.close()
-            return None
-            
-        vehicle_name = df_run.iloc[0]['vehicle_name']
-        
         try:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS vehicle_gear_ratios (
-                    vehicle_name TEXT,
-                    gear INTEGER,
-                    ratio_r REAL,
-                    PRIMARY KEY (vehicle_name, gear)
-                )
-            ''')
-        except sqlite3.OperationalError:
-            pass
-            
-        # Zuerst alle jemals gefahrenen Gänge für dieses Auto auswerten
-        query = """
-            SELECT t.gear, t.speed_kmh, t.rpm, t.torque 
-            FROM telemetry_data t
-            JOIN runs r ON t.run_id = r.id
-            WHERE r.vehicle_name = ? 
-              AND t.throttle > 0.9 
-              AND t.rpm > 3000 
-              AND t.speed_kmh > 10
-        """
-        df_tele = pd.read_sql_query(query, conn, params=(vehicle_name,))
-        
-        if not df_tele.empty:
-            df_tele = df_tele[df_tele['torque'] > 0].copy()
-            if not df_tele.empty:
-                df_tele['r_val'] = df_tele['speed_kmh'] / df_tele['rpm']
-                # Berechne den Median (Durchschnittswert, stabil gegen Ausreißer) und ignoriere Gänge mit wenig Haltepunkten (Glitches)
-                detected = df_tele.groupby('gear')['r_val'].agg(['median', 'count']).reset_index()
-                detected = detected[(detected['count'] > 20) & (detected['gear'] > 0)]
-                
-                # In Datenbank abspeichern
-                conn.execute("DELETE FROM vehicle_gear_ratios WHERE vehicle_name = ?", (vehicle_name,))
-                for _, row in detected.iterrows():
-                    conn.execute("INSERT OR REPLACE INTO vehicle_gear_ratios (vehicle_name, gear, ratio_r) VALUES (?, ?, ?)", 
-                                 (vehicle_name, int(row['gear']), row['median']))
-                conn.commit()
-                
-        # Lese aktuellen Stand aus der DB
-        df_existing = pd.read_sql_query("SELECT gear, ratio_r FROM vehicle_gear_ratios WHERE vehicle_name = ? ORDER BY gear ASC", conn, params=(vehicle_name,))
-        conn.close()
-        
-        if df_existing.empty:
+            row = conn.execute("SELECT vehicle_name FROM runs WHERE id = ?", (int(run_id),)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
             return None
-            
-        return df_existing['ratio_r'].tolist()
+
+        gear_ratio_store.sync_vehicle(row[0], self.db_path)
+        return gear_ratio_store.get_gear_ratios(row[0], self.db_path) or None
 
 def test():
     print("Testing Shift Optimizer Algorithm...")
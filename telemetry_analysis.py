@@ -0,0 +1,661 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import telemetry_store
+from telemetry_store import DB_PATH
+
+# Auswertungen ohne Streamlit-Abhängigkeit (Dashboard, Tests, Benchmarks)
+
+QUALITY_CHANNELS = ['time_elapsed', 'speed_kmh', 'throttle', 'rpm', 'lat_g', 'lon_g', 'steering_angle']
+
+# Virtual Best-Run: Integrationsschritt und standardisierte Schaltzeit
+VIRTUAL_SPEED_STEP = 0.1
+VIRTUAL_SHIFT_DELAY = 0.08
+
+
+def _row_dtype(df):
+    """Datentyp, in dem pandas eine Zeile von df liefert (object-Zeilen enthalten Python-Floats = float64)."""
+    dtypes = list(df.dtypes)
+    if dtypes and all(isinstance(d, np.dtype) and d.kind in 'iuf' for d in dtypes):
+        return np.result_type(*dtypes)
+    return np.dtype(np.float64)
+
+
+def _compute_yaw_rate(df):
+    """
+    Yaw rate approximation from lat_g and speed (0 unter 10 km/h).
+    Gerechnet wird im selben Datentyp wie früher zeilenweise per df.apply(axis=1), damit die Werte bitgleich bleiben.
+    """
+    lat = df['lat_g'].to_numpy()
+    speed = df['speed_kmh'].to_numpy()
+    row_dtype = _row_dtype(df)
+    lat = lat.astype(row_dtype, copy=False)
+    speed = speed.astype(row_dtype, copy=False)
+    moving = speed > 10
+    if not moving.any():
+        # Nur Nullen -> Integer-Spalte (wie bei der zeilenweisen Berechnung)
+        return np.zeros(len(speed), dtype=np.int64)
+    yaw_rate = np.zeros(len(speed), dtype=np.float64)
+    yaw_rate[moving] = (lat[moving] * 9.81) / (speed[moving] / 3.6)
+    return yaw_rate
+
+
+def _event_starts(mask, index):
+    """Run-Length-Gruppierung: erste Index-Position jeder zusammenhängenden True-Sequenz (nach Index-Label)."""
+    labels = np.asarray(index)[np.asarray(mask, dtype=bool)]
+    if len(labels) == 0:
+        return np.array([], dtype=np.int64)
+    is_start = np.ones(len(labels), dtype=bool)
+    is_start[1:] = np.diff(labels) != 1
+    return np.flatnonzero(np.asarray(mask, dtype=bool))[is_start]
+
+
+def _window_bounds(t, start_pos):
+    """
+    Zeitfenster (t_start, t_start + 2s] je Event als Positionsbereiche [lo, hi) per searchsorted.
+    Bei nicht monoton steigender Zeit gelten die Bereiche für die Reihenfolge `order` (stabil nach Zeit sortiert,
+    NaN am Ende), sonst ist `order` None.
+    :return: (lo, hi, order)
+    """
+    start_t = t[start_pos]
+    order = None
+    if np.isnan(t).any() or (np.diff(t) < 0).any():
+        order = np.argsort(t, kind='stable')
+        t = t[order]
+    return np.searchsorted(t, start_t, side='right'), np.searchsorted(t, start_t + 2.0, side='right'), order
+
+
+def _window_reduce(ufunc, values, lo, hi):
+    """ufunc.reduceat über die Bereiche [lo, hi) (dürfen sich überlappen, aber nicht leer sein)."""
+    # Paare (lo, hi) hintereinander: jedes gerade Ergebnis ist die Reduktion eines Bereichs,
+    # ein angehängtes NaN macht hi == len(values) zu einem gültigen Index
+    values = np.append(values, np.nan)
+    return ufunc.reduceat(values, np.column_stack([lo, hi]).ravel())[::2]
+
+
+def _score_counter_steer_events(df_clean, start_pos):
+    """Bewertet jedes Gegenlenk-Event anhand der 2 Sekunden danach: (Bonus, Strafe, Spins)."""
+    if len(start_pos) == 0:
+        return 0.0, 0.0, 0
+
+    t = df_clean['time_elapsed'].to_numpy()
+    abs_yaw = np.abs(df_clean['yaw_rate'].to_numpy())
+    speed = df_clean['speed_kmh'].to_numpy()
+    brake = df_clean['brake'].to_numpy() if 'brake' in df_clean.columns else None
+    check_brake = brake is not None and 'throttle' in df_clean.columns
+
+    lo, hi, order = _window_bounds(t, start_pos)
+    # Events ohne Samples im Fenster zählen nicht
+    filled = hi > lo
+    lo, hi, start_speed = lo[filled], hi[filled], speed[start_pos][filled]
+
+    def window_reduce(ufunc, values):
+        return _window_reduce(ufunc, values if order is None else values[order], lo, hi)
+
+    # fmax/fmin ignorieren NaN wie pandas' max()/min()
+    spun = window_reduce(np.fmax, abs_yaw) > 2.0
+    if check_brake:
+        spun |= (window_reduce(np.fmin, speed) < start_speed * 0.7) & (window_reduce(np.fmax, brake) < 0.2)
+
+    spin_count = int(spun.sum())
+    return 2.0 * (len(spun) - spin_count), 10.0 * spin_count, spin_count
+
+
+def _derived_for(derived, df, df_clean, channels):
+    """
+    Gespeicherte abgeleitete Kanäle (telemetry_derived.load_derived, gleiche Länge wie df) auf die Zeilen von df_clean.
+    None, wenn nicht alle Kanäle vorhanden sind.
+    """
+    if derived is None or len(derived) != len(df) or not all(ch in derived.columns for ch in channels):
+        return None
+    return derived[channels].set_axis(df.index).loc[df_clean.index]
+
+
+def analyze_run_quality(df, derived=None):
+    """
+    :param derived: optional gespeicherte abgeleitete Kanäle des kompletten Runs (siehe telemetry_derived.QUALITY_DERIVED).
+                    Sie werden nur dort übernommen, wo das Ergebnis bitgleich zur Neuberechnung bleibt.
+    """
+    if df.empty:
+        return df, 50.0, False
+
+    # 1. Cleaning & Trimming
+    start_mask = (df['speed_kmh'] > 60) & (df['throttle'] > 0.8)
+    if start_mask.any():
+        start_idx = start_mask.idxmax()
+        df_clean = df.loc[start_idx:].copy()
+    else:
+        df_clean = df.copy()
+
+    end_mask = df_clean['speed_kmh'] < 10
+    if end_mask.any():
+        end_idx = end_mask.idxmax()
+        df_clean = df_clean.loc[:end_idx].copy()
+
+    if len(df_clean) < 10:
+        df_clean = df.copy()
+
+    # A. Fake Peaks & Crash Detection
+    if 'lat_g' in df_clean.columns and 'lon_g' in df_clean.columns:
+        # Rolling hängt nur von der Vorgeschichte ab: gespeicherte Werte passen, solange vorne nichts abgeschnitten wurde
+        stored = _derived_for(derived, df, df_clean, ['lat_g_smooth', 'lon_g_smooth']) if df_clean.index[0] == df.index[0] else None
+        if stored is not None:
+            df_clean['lat_g_smooth'] = stored['lat_g_smooth']
+            df_clean['lon_g_smooth'] = stored['lon_g_smooth']
+        else:
+            df_clean['lat_g_smooth'] = df_clean['lat_g'].rolling(10, min_periods=1).mean()
+            df_clean['lon_g_smooth'] = df_clean['lon_g'].rolling(10, min_periods=1).mean()
+
+        max_safe_g = 4.0
+        max_lat = df_clean['lat_g_smooth'].abs().max()
+        max_lon = df_clean['lon_g_smooth'].abs().max()
+        crash_detected = (max_lat > max_safe_g) or (max_lon > max_safe_g)
+
+        # Clip absurd peaks to avoid fake scores if we proceed
+        df_clean['lat_g_smooth'] = df_clean['lat_g_smooth'].clip(-max_safe_g, max_safe_g)
+        df_clean['lon_g_smooth'] = df_clean['lon_g_smooth'].clip(-max_safe_g, max_safe_g)
+    else:
+        crash_detected = False
+
+    # 3. Stability Metrics (CSI)
+    stability_score = 50.0
+    confidence_ratio = 50.0
+    counter_steer_bonus = 0.0
+    unrecoverable_spin_penalty = 0.0
+    spin_count = 0
+    max_yaw_accel = 0.0
+
+    if 'lat_g' in df_clean.columns and 'steering_angle' in df_clean.columns:
+        # Calculate derived metrics
+        # Gespeicherte Gierrate (in float64 gerechnet) nur bei gleichem Zeilen-Datentyp und wenn df_clean fährt (sonst Integer-Nullen)
+        stored = None
+        if _row_dtype(df_clean) == np.float64 and (df_clean['speed_kmh'] > 10).any():
+            stored = _derived_for(derived, df, df_clean, ['yaw_rate', 'yaw_accel'])
+        if stored is not None:
+            df_clean['yaw_rate'] = stored['yaw_rate']
+            df_clean['yaw_accel'] = stored['yaw_accel']
+            df_clean.iloc[0, df_clean.columns.get_loc('yaw_accel')] = np.nan  # diff() beginnt bei df_clean neu
+        else:
+            df_clean['yaw_rate'] = _compute_yaw_rate(df_clean)
+            df_clean['yaw_accel'] = df_clean['yaw_rate'].diff().abs() / df_clean['time_elapsed'].diff()
+
+        # Approximate Slip Angle: very rough proxy using steering vs actual lateral G curve
+        # A simple proxy: when steering angle changes faster than lat_g changes, or steering is opposite
+
+        corners = df_clean[df_clean['lat_g'].abs() > 0.5]
+        if not corners.empty:
+            steering_noise = corners['steering_angle'].diff().abs().mean()
+            # Factor heuristic: steering_noise of 0.05 is bad, 0.005 is good.
+            stability_score = max(0.0, 100.0 - (steering_noise * 1000.0))
+
+            max_yaw_accel = corners['yaw_accel'].max()
+
+        hard_corners = df_clean[df_clean['lat_g'].abs() > 0.8]
+        if not hard_corners.empty:
+            peak_g = hard_corners['lat_g'].abs().max()
+            avg_g = hard_corners['lat_g'].abs().mean()
+            if peak_g > 0:
+                confidence_ratio = (avg_g / peak_g) * 100.0
+
+        # Counter-steer detection
+        # lat_g is e.g., positive for left corner, negative for right corner
+        # steering is e.g., positive for left, negative for right
+        # We detect counter steer when lat_g and steering have opposite signs and both are somewhat significant
+        df_clean['is_counter_steering'] = (df_clean['lat_g'] * df_clean['steering_angle'] < 0) & (df_clean['lat_g'].abs() > 0.5) & (df_clean['steering_angle'].abs() > 0.05)
+
+        # For each counter steer event (contiguous frames), check if recovered within 2s:
+        # If yaw rate explodes (or speed drops > 30% without brake) = unrecoverable, else recovered = bonus
+        start_pos = _event_starts(df_clean['is_counter_steering'].to_numpy(), df_clean.index)
+        counter_steer_bonus, unrecoverable_spin_penalty, spin_count = _score_counter_steer_events(df_clean, start_pos)
+
+        # Hard slip angle proxy detection (Spins)
+        # Fast rotation + speed loss
+        potential_spins = df_clean[(df_clean['yaw_rate'].abs() > 2.5) & (df_clean['speed_kmh'].diff() < -10)]
+        spin_count += len(potential_spins) // 10 # very rough grouping
+
+    # Base CSI
+    csi = (stability_score * 0.6) + (confidence_ratio * 0.4)
+
+    # Apply Counter-steer modifiers
+    csi += min(15.0, counter_steer_bonus)  # Cap bonus at 15
+    csi -= unrecoverable_spin_penalty
+
+    # Critical failure penalty
+    csi -= (spin_count * 5.0)
+
+    # Yaw Accel Penalty
+    if max_yaw_accel > 5.0:
+        csi -= min(15.0, (max_yaw_accel - 5.0) * 2.0)
+
+    csi = max(0.0, min(100.0, csi))
+
+    # Over-Rev filter penalty
+    max_rpm = 9000
+    if 'rpm' in df_clean.columns:
+        over_rev_count = (df_clean['rpm'] > max_rpm).sum()
+        if over_rev_count > 10: # > 0.2s over rev
+            csi -= 10.0
+            csi = max(0.0, csi)
+
+    return df_clean, csi, crash_detected
+
+
+def torque_envelope(df):
+    """
+    Beschleunigungs-Envelope: 95%-Quantil des Drehmoments pro km/h (nur torque > 0), Lücken linear
+    interpoliert. `df` darf mehrere Runs desselben Fahrzeugs enthalten (pd.concat).
+
+    :return: (speed_bins, accels_m_s2) oder None bei zu wenig Daten (< 5 Speed-Bins)
+    """
+    df_valid = df[df['torque'] > 0].copy()
+    if df_valid.empty:
+        return None
+
+    df_valid['speed_bin'] = df_valid['speed_kmh'].round()
+    envelope = df_valid.groupby('speed_bin')['torque'].quantile(0.95).reset_index()
+    if len(envelope) < 5:
+        return None
+
+    min_bin = int(envelope['speed_bin'].min())
+    max_bin = int(envelope['speed_bin'].max())
+    envelope = envelope.set_index('speed_bin').reindex(range(min_bin, max_bin + 1)).interpolate(method='linear').reset_index()
+    return envelope['speed_bin'].values, np.maximum(envelope['torque'].values / 1000.0, 0.05)
+
+
+def upshift_speeds(df):
+    """Geschwindigkeiten, bei denen ein höherer Gang als alle bisherigen erreicht wird (in Fahrreihenfolge)."""
+    gears = df['gear'].to_numpy()
+    if len(gears) < 2:
+        return np.array([], dtype=np.float64)
+    # Zuletzt gezählter Gang = laufendes Maximum der vorherigen Samples
+    last_gear = np.maximum.accumulate(gears[:-1])
+    return df['speed_kmh'].to_numpy()[1:][gears[1:] > last_gear]
+
+
+def generate_virtual_run(df, envelope=None, shift_delay=VIRTUAL_SHIFT_DELAY):
+    """
+    Virtual Best-Run: integriert die Zeit von der Startgeschwindigkeit bis Vmax in 0,1-km/h-Schritten
+    über die Beschleunigungs-Envelope (dt = dv / a, kumuliert), jeder Hochschaltvorgang kostet `shift_delay`.
+
+    :param envelope: Optionale Envelope aus torque_envelope() (z.B. aus allen Runs des Fahrzeugs),
+                     sonst aus diesem Run
+    :return: DataFrame mit time_elapsed/speed_kmh; bei zu wenig Daten unverändert `df`
+    """
+    df_valid = df[df['torque'] > 0]
+    if df_valid.empty:
+        return df
+    if envelope is None:
+        envelope = torque_envelope(df_valid)
+        if envelope is None:
+            return df
+
+    start_speed = max(0.0, df['speed_kmh'].iloc[0])
+    max_speed = df['speed_kmh'].max()
+    sim_speeds = np.arange(start_speed, max_speed, VIRTUAL_SPEED_STEP)
+
+    from scipy.interpolate import interp1d  # scipy erst bei Bedarf laden (Dashboard-Kaltstart)
+    accel_interp = interp1d(envelope[0], envelope[1], kind='linear', fill_value="extrapolate")
+    accels = np.maximum(accel_interp(sim_speeds), 0.05)
+    dt = (VIRTUAL_SPEED_STEP / 3.6) / accels
+
+    # Schaltvorgänge werden der Reihe nach abgearbeitet (Zähler startet bei der Anzahl unterhalb der
+    # Startgeschwindigkeit): Schaltung j greift beim ersten Schritt mit v >= max(shift_speeds[..j])
+    shift_speeds = upshift_speeds(df_valid)
+    pending = np.maximum.accumulate(shift_speeds[np.count_nonzero(shift_speeds < start_speed):])
+    shift_steps = np.searchsorted(sim_speeds, pending, side='left')
+    shift_steps = shift_steps[shift_steps < len(sim_speeds)]
+
+    # Zeit-Inkremente in Rechenreihenfolge (Schaltzeit vor dem dt des Schritts), dann kumulieren
+    increments = np.insert(dt, shift_steps, shift_delay)
+    dt_pos = np.arange(len(dt)) + np.searchsorted(shift_steps, np.arange(len(dt)), side='right')
+    start_time = np.float64(df['time_elapsed'].iloc[0])
+    sim_times = np.cumsum(np.concatenate(([start_time], increments)))[1:][dt_pos]
+
+    return pd.DataFrame({
+        'time_elapsed': sim_times,
+        'speed_kmh': sim_speeds
+    })
+
+
+SHIFT_WINDOW_S = 0.4
+
+# Ereignistabelle von extract_shift_events(): eine Zeile pro Hochschaltvorgang
+SHIFT_EVENT_DTYPES = {'gear_from': 'int8', 'gear_to': 'int8', 'time': 'float32', 'latency_ms': 'float64',
+                      'rpm_land': 'float32', 'speed_loss_kmh': 'float32'}
+
+
+def _gear_reference_torque(df, gears):
+    """Referenz-Zugkraft je Zielgang: 80%-Quantil bei Volllast (throttle > 0.9), sonst 2000."""
+    full_throttle = df[df['throttle'] > 0.9]
+    reference = {}
+    for gear in np.unique(gears):
+        avg_torque = 2000
+        target_gear_data = full_throttle[full_throttle['gear'] == gear]
+        if not target_gear_data.empty:
+            avg_t = target_gear_data['torque'].quantile(0.8)
+            if avg_t > 0: avg_torque = avg_t
+        reference[gear] = avg_torque
+    return reference
+
+
+def _shift_windows(t, bounds_lo, bounds_hi):
+    """Fenster [lo, hi] (zeitlich) je Schaltvorgang als Positions-Arrays, per searchsorted bei sortierter Zeit."""
+    if len(t) and not np.isnan(t).any() and not (np.diff(t) < 0).any():
+        lo = np.searchsorted(t, bounds_lo, side='left')
+        hi = np.searchsorted(t, bounds_hi, side='right')
+        return [np.arange(a, b) for a, b in zip(lo, hi)]
+    # Zeit nicht sortiert: Fenster per Maske (langsamer, aber gleiche Semantik)
+    return [np.flatnonzero((t >= a) & (t <= b)) for a, b in zip(bounds_lo, bounds_hi)]
+
+
+def extract_shift_events(df):
+    """
+    Erkennt Hochschaltvorgänge und bewertet sie im Fenster ±0,4 s um den Gangwechsel.
+
+    - latency_ms: Dauer, in der das Drehmoment unter 40% der Referenz-Zugkraft des Zielgangs liegt
+    - rpm_land: Drehzahl beim ersten Sample danach mit wieder aufgebauter Zugkraft
+    - speed_loss_kmh: Geschwindigkeit vor dem Schalten minus Minimum im Fenster ab dem Schaltzeitpunkt (>= 0)
+
+    Die Fenster werden per searchsorted auf time_elapsed bestimmt, die Referenz-Zugkraft einmal pro Gang.
+    :return: DataFrame mit den Spalten aus SHIFT_EVENT_DTYPES (leer, falls keine Schaltvorgänge)
+    """
+    df = df.reset_index(drop=True)
+    gears = df['gear'].to_numpy()
+    shift_pos = np.flatnonzero(gears[1:] > gears[:-1]) + 1
+    events = {col: [] for col in SHIFT_EVENT_DTYPES}
+    if len(shift_pos) == 0:
+        return pd.DataFrame(events).astype(SHIFT_EVENT_DTYPES)
+
+    # Schaltzeitpunkt im Datentyp einer DataFrame-Zeile (wie früher per iterrows), Vergleiche entsprechend
+    t = df['time_elapsed'].to_numpy()
+    shift_time = t[shift_pos].astype(_row_dtype(df))
+    t_cmp = t.astype(np.result_type(t.dtype, shift_time.dtype), copy=False)
+    windows = _shift_windows(t_cmp, shift_time - SHIFT_WINDOW_S, shift_time + SHIFT_WINDOW_S)
+
+    torque = df['torque'].to_numpy()
+    rpm = df['rpm'].to_numpy()
+    speed = df['speed_kmh'].to_numpy()
+    reference = _gear_reference_torque(df, gears[shift_pos])
+
+    for pos, window in zip(shift_pos, windows):
+        if len(window) == 0:
+            continue
+        gear_to = gears[pos]
+        drop_threshold = reference[gear_to] * 0.4 # Einbruch unter 40% der Zugkraft = Shift Phase
+        win_t = t[window]
+        win_torque = torque[window]
+
+        dip = win_torque < drop_threshold
+        latency_ms = 0.0
+        rpm_land = rpm[pos]
+        if dip.any():
+            # fmax/fmin ignorieren NaN wie pandas' max()/min()
+            dip_end = np.fmax.reduce(win_t[dip])
+            latency_ms = (dip_end - np.fmin.reduce(win_t[dip])) * 1000
+            recover = np.flatnonzero((win_t > dip_end) & (win_torque >= drop_threshold))
+            if len(recover):
+                rpm_land = rpm[window[recover[0]]]
+
+        after = speed[window][win_t >= t[pos]]
+        min_after = np.fmin.reduce(after) if len(after) else speed[pos]
+        events['gear_from'].append(gears[pos - 1])
+        events['gear_to'].append(gear_to)
+        events['time'].append(t[pos])
+        events['latency_ms'].append(latency_ms)
+        events['rpm_land'].append(rpm_land)
+        events['speed_loss_kmh'].append(max(speed[pos - 1] - min_after, 0))
+    return pd.DataFrame(events).astype(SHIFT_EVENT_DTYPES)
+
+
+# Traktionskreis: Winkel-Segmente und Perzentil des Radius pro Segment
+TRACTION_BIN_DEG = 5
+TRACTION_PERCENTILE = 95
+TRACTION_CHANNELS = ['speed_kmh', 'lat_g', 'lon_g']
+
+
+def traction_points(df):
+    """G-G Punkte (lat, lon) ohne Steh-Phasen (< 20 km/h) und ohne krasse Outliers (Curbs/Unfälle)."""
+    df_filt = df[df['speed_kmh'] > 20]
+    if df_filt.empty:
+        return np.array([], dtype=np.float32), np.array([], dtype=np.float32)
+
+    q_lat_high = df_filt['lat_g'].quantile(0.999)
+    q_lat_low = df_filt['lat_g'].quantile(0.001)
+    q_lon_high = df_filt['lon_g'].quantile(0.999)
+    q_lon_low = df_filt['lon_g'].quantile(0.001)
+
+    df_filt = df_filt[
+        (df_filt['lat_g'] >= q_lat_low) & (df_filt['lat_g'] <= q_lat_high) &
+        (df_filt['lon_g'] >= q_lon_low) & (df_filt['lon_g'] <= q_lon_high)
+    ]
+    return df_filt['lat_g'].values, df_filt['lon_g'].values
+
+
+def _hull_polygon(lat, lon):
+    """Fallback bei zu wenigen Segmenten: konvexe Hülle (geschlossen) oder None."""
+    from scipy.spatial import ConvexHull, QhullError
+    points = np.column_stack((lat, lon))
+    try:
+        hull_points = points[ConvexHull(points).vertices]
+    except (QhullError, ValueError):
+        return None
+    return np.vstack((hull_points, hull_points[0]))
+
+
+def traction_envelopes(lat, lon, groups=None, bin_deg=TRACTION_BIN_DEG, percentile=TRACTION_PERCENTILE):
+    """
+    Grip-Limit (G-G Polygon) für eine oder mehrere Punktwolken in einem Durchgang: Punkte werden einmal
+    nach (Gruppe, Winkel-Segment, Radius) sortiert, das Perzentil des Radius pro Segment ergibt sich
+    dann direkt aus den Segmentgrenzen (lineare Interpolation wie np.percentile).
+
+    :param groups: Optionale Gruppen-Labels pro Punkt (z.B. run_id), sonst eine Gruppe 0
+    :return: dict {gruppe: geschlossenes Polygon als (n, 2) Array [lat, lon] oder None}
+    """
+    lat = np.asarray(lat)
+    lon = np.asarray(lon)
+    if groups is None:
+        group_labels, group_idx = np.array([0]), np.zeros(len(lat), dtype=np.int64)
+    else:
+        group_labels, group_idx = np.unique(np.asarray(groups), return_inverse=True)
+
+    # Polar-Koordinaten (theta von der x-Achse, also lat)
+    thetas = np.arctan2(lon, lat)
+    radii = np.sqrt(lat**2 + lon**2)
+    n_bins = int(360 / bin_deg)
+    edges = np.linspace(-np.pi, np.pi, n_bins + 1)
+    # Segment i = [edges[i], edges[i+1]): Index direkt berechnen, an den Kanten gegen edges korrigieren.
+    # theta == pi und NaN fallen heraus.
+    with np.errstate(invalid='ignore'):
+        bins = np.floor((thetas + np.pi) / (2 * np.pi / n_bins))
+    valid = ~np.isnan(radii)
+    bins = np.where(valid, bins, 0).astype(np.int64)
+    np.clip(bins, 0, n_bins - 1, out=bins)
+    bins -= thetas < edges[bins]
+    bins += thetas >= edges[bins + 1]
+    valid &= (bins >= 0) & (bins < n_bins)
+
+    r = radii[valid]
+    # Segment-Schlüssel (Gruppe, Winkel) als kleiner Integer: stabiles Sortieren ist dann ein Radix-Sort.
+    # Vorher nach Radius sortiert -> innerhalb jedes Segments bleiben die Radien aufsteigend.
+    segment = group_idx[valid] * n_bins + bins[valid]
+    segment = segment.astype(np.int16 if len(group_labels) * n_bins < 2**15 else np.int64)
+    by_radius = np.argsort(r)
+    order = by_radius[np.argsort(segment[by_radius], kind='stable')]
+    segment, r = segment[order], r[order].astype(np.float64)
+
+    envelopes = {}
+    if len(r):
+        new_segment = np.ones(len(r), dtype=bool)
+        new_segment[1:] = segment[1:] != segment[:-1]
+        starts = np.flatnonzero(new_segment)
+        counts = np.diff(np.append(starts, len(r)))
+
+        position = (counts - 1) * (percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts - 1)
+        r_lo, r_hi = r[starts + lower], r[starts + upper]
+        r_pct = r_lo + (r_hi - r_lo) * (position - lower)
+
+        seg_bin = segment[starts] % n_bins
+        keep = r_pct > 0
+        angle_center = (edges[seg_bin] + edges[seg_bin + 1]) / 2.0
+        x = r_pct * np.cos(angle_center)
+        y = r_pct * np.sin(angle_center)
+        # Segmente sind je Gruppe bereits nach Winkel sortiert
+        group_bounds = np.searchsorted(segment[starts] // n_bins, np.arange(len(group_labels) + 1))
+        for k, group in enumerate(group_labels):
+            seg = slice(group_bounds[k], group_bounds[k + 1])
+            sel = keep[seg]
+            if np.count_nonzero(sel) >= 3:
+                polygon = np.column_stack((x[seg][sel], y[seg][sel]))
+                envelopes[group.item()] = np.vstack((polygon, polygon[0]))
+
+    for k, group in enumerate(group_labels):
+        if group.item() not in envelopes:
+            in_group = group_idx == k
+            envelopes[group.item()] = _hull_polygon(lat[in_group], lon[in_group])
+    return envelopes
+
+
+def traction_envelope(lat, lon, bin_deg=TRACTION_BIN_DEG, percentile=TRACTION_PERCENTILE):
+    """Grip-Limit einer einzelnen Punktwolke (siehe traction_envelopes), None bei zu wenig Punkten."""
+    if len(lat) == 0:
+        return None
+    return traction_envelopes(lat, lon, bin_deg=bin_deg, percentile=percentile)[0]
+
+
+def load_traction_envelopes(run_ids, db_path=DB_PATH, cache=None):
+    """
+    Grip-Limit pro Run, zwischengespeichert im TelemetryCache (Key inkl. Revision des Runs).
+    Fehlende Runs werden gemeinsam in einem Durchgang von traction_envelopes() berechnet.
+
+    :return: dict {run_id: DataFrame mit lat_g/lon_g (geschlossenes Polygon, leer falls kein Limit)}
+    """
+    run_ids = [int(r) for r in run_ids]
+    result, keys = {}, {}
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        db_uid, _ = telemetry_store.get_db_token(conn)
+        for run_id in run_ids:
+            keys[run_id] = ('traction', db_uid, run_id, telemetry_store.get_run_revision(conn, run_id),
+                            TRACTION_BIN_DEG, TRACTION_PERCENTILE)
+    finally:
+        conn.close()
+
+    missing = []
+    for run_id in run_ids:
+        cached = cache.get(keys[run_id]) if cache is not None else None
+        if cached is not None:
+            result[run_id] = cached.copy()
+        else:
+            missing.append(run_id)
+    if not missing:
+        return result
+
+    lats, lons, groups = [], [], []
+    for run_id in missing:
+        df = telemetry_store.load_channels(run_id, TRACTION_CHANNELS, db_path=db_path, cache=cache)
+        lat, lon = traction_points(df)
+        lats.append(lat)
+        lons.append(lon)
+        groups.append(np.full(len(lat), run_id, dtype=np.int64))
+    envelopes = traction_envelopes(np.concatenate(lats), np.concatenate(lons), np.concatenate(groups))
+
+    for run_id in missing:
+        polygon = envelopes.get(run_id)
+        df = pd.DataFrame(polygon if polygon is not None else np.empty((0, 2)), columns=['lat_g', 'lon_g'])
+        if cache is not None and keys[run_id][3] is not None:
+            cache.put(keys[run_id], df)
+        result[run_id] = df
+    return result
+
+
+# --- Beschleunigung, Gänge, Sektoren (Drag Benchmarker, Getriebe-Analyse, Kurven & Grip) ---
+
+def sync_to_speed(df, target_sync_speed):
+    """
+    Richtet einen Run an der Sync-Geschwindigkeit aus: Zeit = 0 beim ersten Sample >= target_sync_speed,
+    frühere Samples entfallen. Wird die Geschwindigkeit nie erreicht, bleibt df unverändert.
+    """
+    df_start = df[df['speed_kmh'] >= target_sync_speed]
+    if not df_start.empty:
+        t0 = df_start.iloc[0]['time_elapsed']
+        df_norm = df[df['time_elapsed'] >= t0].copy()
+        df_norm['time_elapsed'] = df_norm['time_elapsed'] - t0
+        return df_norm
+    return df
+
+
+def normalize_run(df, target_sync_speed, derived=None):
+    """
+    Wie sync_to_speed() (immer als Kopie), zusätzlich mit zurückgelegter Strecke distance_m / distance_cum (ds = v * dt).
+    :param derived: optional gespeicherte Kanäle des kompletten Runs mit 'distance_m' (telemetry_derived.load_derived)
+    """
+    df_norm = sync_to_speed(df, target_sync_speed).copy()
+    contiguous = not df_norm.empty and df.index.get_loc(df_norm.index[-1]) - df.index.get_loc(df_norm.index[0]) + 1 == len(df_norm)
+    stored = _derived_for(derived, df, df_norm, ['distance_m']) if contiguous else None
+    if stored is not None:
+        # Erstes Sample nach dem Sync startet bei 0 (diff() beginnt neu)
+        df_norm['distance_m'] = stored['distance_m']
+        df_norm.iloc[0, df_norm.columns.get_loc('distance_m')] = 0.0
+    else:
+        df_norm['distance_m'] = (df_norm['speed_kmh'] / 3.6) * df_norm['time_elapsed'].diff().fillna(0)
+    df_norm['distance_cum'] = df_norm['distance_m'].cumsum()
+    return df_norm
+
+
+def time_to_speed(df, target_speed):
+    """Sekunden vom ersten Sample bis zum Erreichen von target_speed (None, falls nie erreicht)."""
+    filtered = df[df['speed_kmh'] >= target_speed]
+    if filtered.empty:
+        return None
+    return filtered.iloc[0]['time_elapsed'] - df.iloc[0]['time_elapsed']
+
+
+def interval_time(df, speed_start, speed_target):
+    """Sekunden zwischen dem ersten Erreichen von speed_start und speed_target (z.B. 100-250 km/h), sonst None."""
+    df_start = df[df['speed_kmh'] >= speed_start]
+    df_end = df[df['speed_kmh'] >= speed_target]
+    if df_end.empty or df_start.empty:
+        return None
+    return df_end.iloc[0]['time_elapsed'] - df_start.iloc[0]['time_elapsed']
+
+
+def gear_accel(df):
+    """Mittlere Beschleunigung [m/s²] pro Gang bei Volllast (throttle > 0.9, torque > 0): Spalten Gang, Accel."""
+    res = []
+    for g in sorted(df['gear'].unique()):
+        if g < 1: continue
+        d = df[(df['gear'] == g) & (df['throttle'] > 0.9) & (df['torque'] > 0)]
+        if not d.empty:
+            res.append({'Gang': int(g), 'Accel': d['torque'].mean() / 1000.0})
+    return pd.DataFrame(res)
+
+
+def sector_kpi(df, s_id):
+    """(Dauer, V-Min Ø in Kurven, max. Quer-G, max. Brems-G als negativer Wert) eines Sektors, sonst 4x None."""
+    s_df = df[df['sector'] == s_id]
+    if s_df.empty: return None, None, None, None
+
+    # Kurven in diesem Sektor (lat_g > 0.5)
+    is_corner = s_df['lat_g'].abs() > 0.5
+    v_min_avg = s_df[is_corner]['speed_kmh'].mean()
+    max_lat_g = s_df['lat_g'].abs().max()
+    max_brake_g = s_df['lon_g'].min() # negative G for braking
+    duration = s_df['time_elapsed'].max() - s_df['time_elapsed'].min()
+    return duration, v_min_avg, max_lat_g, max_brake_g
+
+
+def run_sectors(df):
+    """Gültige Sektoren eines Runs (nur Samples mit lap_distance > 0, ohne Pit/ungültig < 0), sortiert."""
+    if 'sector' not in df:
+        return []
+    return [s for s in sorted(df[df['lap_distance'] > 0]['sector'].unique()) if s >= 0]
+
+
+def sector_kpis(df):
+    """Tabelle der Sektor-KPIs (siehe sector_kpi) für alle gültigen Sektoren eines Runs."""
+    rows = [(int(s), *sector_kpi(df, s)) for s in run_sectors(df)]
+    return pd.DataFrame(rows, columns=['sector', 'duration_s', 'v_min_avg_kmh', 'max_lat_g', 'max_brake_g'])
@@ -0,0 +1,258 @@
+import contextlib
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from telemetry_store import DB_PATH
+
+# Archiv-Ordner neben der Datenbank: ein komprimiertes ZIP pro Fahrzeug und Monat,
+# darin ein .npz (zlib) pro Run mit allen Spalten aus telemetry_data.
+ARCHIVE_DIR_NAME = "lmu_archive"
+
+# Warten auf die Sperre einer Archiv-Datei; ältere Sperrdateien stammen von abgestürzten Prozessen
+ARCHIVE_LOCK_TIMEOUT_S = 30.0
+ARCHIVE_LOCK_STALE_S = 120.0
+
+SUMMARY_COLUMNS = ['run_id', 'n_samples', 'duration_s', 'max_speed_kmh', 'max_rpm', 'max_lat_g', 'max_lon_g', 'distance_m']
+
+
+def archive_dir(db_path=DB_PATH):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_DIR_NAME)
+
+
+def archive_file_name(vehicle_name, timestamp):
+    """z.B. 'Porsche_911_RSR_2026-10.zip'"""
+    safe_vehicle = re.sub(r'[^A-Za-z0-9_.-]+', '_', vehicle_name or 'unknown').strip('_') or 'unknown'
+    return f"{safe_vehicle}_{str(timestamp)[:7]}.zip"
+
+
+def _member(run_id):
+    return f"run_{int(run_id)}.npz"
+
+
+@contextlib.contextmanager
+def _archive_lock(path, timeout=ARCHIVE_LOCK_TIMEOUT_S):
+    """
+    Exklusive Sperre pro Archiv-Datei (Sperrdatei '<archiv>.lock', plattformunabhängig über O_EXCL).
+    Schreiber (Logger, Dashboard) und Leser greifen nur darunter auf die ZIP-Datei zu: kein Leser sieht ein
+    halb angehängtes Archiv, und unter Windows ist die Datei beim Ersetzen nirgends geöffnet.
+    """
+    lock_path = path + ".lock"
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except (FileExistsError, PermissionError):
+            # PermissionError: Windows, während ein anderer Prozess die Sperrdatei gerade löscht
+            try:
+                stale = time.time() - os.path.getmtime(lock_path) > ARCHIVE_LOCK_STALE_S
+            except OSError:
+                stale = False  # gerade freigegeben
+            if stale:
+                # Übrig gebliebene Sperre eines abgestürzten Prozesses
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Archiv ist gesperrt: {os.path.basename(path)}")
+            time.sleep(0.05)
+    try:
+        os.close(fd)
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+def _append_member(path, member, data):
+    """Hängt einen Run an das Archiv an (ZIP-Modus 'a', der Rest der Datei bleibt unverändert). Nur unter _archive_lock."""
+    if os.path.exists(path):
+        with zipfile.ZipFile(path, "r") as zf:
+            exists = member in zf.namelist()
+        if exists:
+            # z.B. Abbruch zwischen Archiv und Datenbank-Commit beim letzten Versuch
+            _remove_member(path, member)
+    with zipfile.ZipFile(path, "a", zipfile.ZIP_STORED) as zf:
+        # Die .npz sind bereits komprimiert -> im ZIP nur noch ablegen
+        zf.writestr(member, data)
+
+
+def _remove_member(path, member):
+    """
+    Entfernt einen Run aus dem Archiv. ZIP kann nicht in-place löschen: Die übrigen Einträge werden in eine
+    eigene temporäre Datei im selben Ordner kopiert, die danach das Archiv ersetzt. Nur unter _archive_lock.
+    """
+    with zipfile.ZipFile(path, "r") as src:
+        infos = src.infolist()
+        keep = [info for info in infos if info.filename != member]
+        if len(keep) == len(infos):
+            return
+        if keep:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as dst:
+                    for info in keep:
+                        dst.writestr(info, src.read(info.filename))
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+    if keep:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(path)
+
+
+def _summarize(run_id, df):
+    def col_max(col, absolute=False):
+        if col not in df or df[col].dropna().empty:
+            return None
+        values = df[col].abs() if absolute else df[col]
+        return float(values.max())
+
+    duration = None
+    if 'time_elapsed' in df and not df['time_elapsed'].dropna().empty:
+        duration = float(df['time_elapsed'].max() - df['time_elapsed'].min())
+    distance = None
+    if 'lap_distance' in df and not df['lap_distance'].dropna().empty:
+        distance = float(df['lap_distance'].max() - df['lap_distance'].min())
+    return (int(run_id), len(df), duration, col_max('speed_kmh'), col_max('rpm'),
+            col_max('lat_g', absolute=True), col_max('lon_g', absolute=True), distance)
+
+
+def archive_run(run_id, db_path=DB_PATH):
+    """
+    Verschiebt die Telemetrie eines Runs in das Archiv. In der Datenbank bleiben die runs-Zeile
+    (mit archive_path) und die Kennzahlen in 'run_summary'. Die Zeilen in telemetry_data werden
+    anschließend von db_maintenance.purge_step() in Batches entfernt.
+
+    :return: Dateiname des Archivs oder None, falls der Run nicht (mehr) existiert oder schon archiviert ist
+    """
+    run_id = int(run_id)
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        # Lesen, Komprimieren und Anhängen ohne Schreibsperre (ein Lese-Snapshot reicht, WAL blockiert niemanden)
+        conn.execute("BEGIN")
+        row = conn.execute("SELECT vehicle_name, timestamp, archive_path, revision FROM runs WHERE id = ? AND deleted = 0",
+                           (run_id,)).fetchone()
+        if row is None or row[2]:
+            conn.rollback()
+            return None
+        vehicle_name, timestamp, _, revision = row
+        df = pd.read_sql_query("SELECT * FROM telemetry_data WHERE run_id = ? ORDER BY sample_idx", conn, params=(run_id,))
+        conn.rollback()
+
+        buffer = io.BytesIO()
+        # Komplett leere Kanäle kommen als object-Spalte (None) -> als float (NaN) ablegen, sonst bräuchte np.load Pickle
+        np.savez_compressed(buffer, **{col: df[col].to_numpy(dtype=np.float64 if df[col].dtype == object else None)
+                                       for col in df.columns})
+        file_name = archive_file_name(vehicle_name, timestamp)
+        os.makedirs(archive_dir(db_path), exist_ok=True)
+        path = os.path.join(archive_dir(db_path), file_name)
+        with _archive_lock(path):
+            _append_member(path, _member(run_id), buffer.getvalue())
+
+        # Die Schreibsperre nur für die Prüfung und den Commit: Logger-Wartung und Dashboard archivieren denselben
+        # Run nicht doppelt, und zwischenzeitlich gelöschte oder geänderte Runs werden nicht umgehängt
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT deleted, archive_path, revision FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None or row[0]:
+            # Gelöscht: den eben angehängten Eintrag wieder entfernen (archiviert wird ein gelöschter Run nie mehr)
+            remove_run(run_id, file_name, db_path)
+            conn.rollback()
+            return None
+        if row[1] or row[2] != revision:
+            # Schon von anderer Seite archiviert (gleicher Eintrag) bzw. neue Daten: ein neuer Versuch überschreibt ihn
+            conn.rollback()
+            return None
+        conn.execute(f"INSERT OR REPLACE INTO run_summary ({', '.join(SUMMARY_COLUMNS)}) VALUES ({', '.join('?' for _ in SUMMARY_COLUMNS)})",
+                     _summarize(run_id, df))
+        # Ab hier lesen load_telemetry/load_channels aus dem Archiv (die Revision bleibt gleich -> Caches bleiben gültig)
+        conn.execute("UPDATE runs SET archive_path = ? WHERE id = ?", (file_name, run_id))
+        conn.commit()
+        return file_name
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def read_run(run_id, archive_path, columns=None, db_path=DB_PATH):
+    """
+    Lädt einen archivierten Run. Mit `columns` werden nur diese Spalten entpackt.
+    :return: DataFrame mit denselben Spalten wie telemetry_data
+    """
+    path = os.path.join(archive_dir(db_path), archive_path)
+    with _archive_lock(path):
+        with zipfile.ZipFile(path, "r") as zf:
+            data_bytes = zf.read(_member(run_id))
+    with np.load(io.BytesIO(data_bytes)) as data:
+        names = data.files if columns is None else [c for c in columns if c in data.files]
+        return pd.DataFrame({name: data[name] for name in names})
+
+
+def remove_run(run_id, archive_path, db_path=DB_PATH):
+    """Entfernt einen gelöschten Run aus seiner Archiv-Datei."""
+    path = os.path.join(archive_dir(db_path), archive_path)
+    if not os.path.exists(path):
+        return
+    with _archive_lock(path):
+        if os.path.exists(path):
+            _remove_member(path, _member(run_id))
+
+
+def load_summaries(db_path=DB_PATH):
+    """Liefert die archivierten Runs inkl. Kennzahlen (für die Garage)."""
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        return pd.read_sql_query('''
+            SELECT r.id, r.run_type, r.vehicle_name, r.track_name, r.timestamp, r.archive_path, r.archive_missing,
+                   s.n_samples, s.duration_s, s.max_speed_kmh, s.max_rpm, s.max_lat_g, s.max_lon_g, s.distance_m
+            FROM runs r LEFT JOIN run_summary s ON s.run_id = r.id
+            WHERE r.deleted = 0 AND r.archive_path IS NOT NULL
+            ORDER BY r.timestamp DESC
+        ''', conn)
+    finally:
+        conn.close()
+
+
+def verify_archives(db_path=DB_PATH):
+    """
+    Prüft für alle archivierten Runs, ob Archiv-Datei und Eintrag vorhanden sind (z.B. nach dem Einspielen
+    eines Backups ohne den Archiv-Ordner) und setzt 'archive_missing' entsprechend. Runs mit fehlendem
+    Archiv sind in den Analysen nicht auswählbar, bis der Ordner wieder neben der Datenbank liegt.
+
+    :return: IDs der Runs, deren Archiv fehlt
+    """
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        rows = conn.execute("SELECT id, archive_path, archive_missing FROM runs WHERE deleted = 0 AND archive_path IS NOT NULL").fetchall()
+        members = {}
+        for _, archive_path, _ in rows:
+            if archive_path in members:
+                continue
+            path = os.path.join(archive_dir(db_path), archive_path)
+            try:
+                with _archive_lock(path), zipfile.ZipFile(path, "r") as zf:
+                    members[archive_path] = set(zf.namelist())
+            except (OSError, zipfile.BadZipFile):
+                members[archive_path] = set()
+
+        missing = [run_id for run_id, archive_path, _ in rows if _member(run_id) not in members[archive_path]]
+        missing_ids = set(missing)
+        changed = [(int(run_id in missing_ids), run_id) for run_id, _, flag in rows if bool(flag) != (run_id in missing_ids)]
+        if changed:
+            conn.executemany("UPDATE runs SET archive_missing = ? WHERE id = ?", changed)
+            conn.commit()
+        return missing
+    finally:
+        conn.close()
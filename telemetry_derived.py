@@ -0,0 +1,172 @@
+import functools
+import hashlib
+import inspect
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import telemetry_store
+from telemetry_analysis import _compute_yaw_rate
+from telemetry_store import DB_PATH
+
+# Abgeleitete Kanäle pro Run (Strecke, Gierrate, geglättete G-Kräfte, Speed/RPM-Verhältnis): einmal pro Run
+# vektorisiert berechnet und in 'telemetry_derived' neben den Rohdaten persistiert. Ein Eintrag ist gültig,
+# solange die Daten-Revision des Runs und die Algorithmus-Revision (Hash des Kernel-Quelltexts) passen.
+# Ändert sich der Code eines Kernels, wird automatisch neu berechnet.
+
+# Rolling-Fenster der G-Glättung (wie analyze_run_quality)
+G_SMOOTH_WINDOW = 10
+
+
+def _distance_kernel(df):
+    # Zurückgelegte Strecke ds = v * dt (erstes Sample 0) und kumuliert ab Run-Start
+    distance_m = (df['speed_kmh'] / 3.6) * df['time_elapsed'].diff().fillna(0)
+    return {'distance_m': distance_m.to_numpy(), 'distance_cum': distance_m.cumsum().to_numpy()}
+
+
+def _yaw_kernel(df):
+    # Gierrate aus lat_g und Speed (0 unter 10 km/h) und deren Änderungsrate, wie in analyze_run_quality.
+    # Dort enthält df_clean bereits die float64-Glättungsspalten -> Zeilen-Datentyp float64
+    yaw_rate = pd.Series(_compute_yaw_rate(df[['speed_kmh', 'lat_g']].astype('float64')), index=df.index)
+    yaw_accel = yaw_rate.diff().abs() / df['time_elapsed'].diff()
+    return {'yaw_rate': yaw_rate.to_numpy(), 'yaw_accel': yaw_accel.to_numpy()}
+
+
+def _g_smooth_kernel(df):
+    # Gleitender Mittelwert über G_SMOOTH_WINDOW Samples (ungeclippt)
+    return {'lat_g_smooth': df['lat_g'].rolling(G_SMOOTH_WINDOW, min_periods=1).mean().to_numpy(),
+            'lon_g_smooth': df['lon_g'].rolling(G_SMOOTH_WINDOW, min_periods=1).mean().to_numpy()}
+
+
+def _gear_ratio_kernel(df):
+    # R = Speed / RPM (Basis der Getriebe-Erkennung), NaN ohne Drehzahl
+    rpm = df['rpm'].to_numpy()
+    r_val = np.full(len(rpm), np.nan, dtype=np.float64)
+    np.divide(df['speed_kmh'].to_numpy(), rpm, out=r_val, where=rpm > 0)
+    return {'r_val': r_val}
+
+
+# Kernel-Name -> (Rohkanäle, abgeleitete Kanäle, Funktion, Hilfsfunktionen für die Algorithmus-Revision)
+DERIVED_KERNELS = {
+    'distance': (['time_elapsed', 'speed_kmh'], ['distance_m', 'distance_cum'], _distance_kernel, ()),
+    'yaw': (['time_elapsed', 'speed_kmh', 'lat_g'], ['yaw_rate', 'yaw_accel'], _yaw_kernel, (_compute_yaw_rate,)),
+    'g_smooth': (['lat_g', 'lon_g'], ['lat_g_smooth', 'lon_g_smooth'], _g_smooth_kernel, ()),
+    'gear_ratio': (['speed_kmh', 'rpm'], ['r_val'], _gear_ratio_kernel, ()),
+}
+
+# Abgeleiteter Kanal -> Kernel
+DERIVED_CHANNELS = {ch: name for name, (_, outputs, _, _) in DERIVED_KERNELS.items() for ch in outputs}
+
+# Kanäle, die analyze_run_quality wiederverwenden kann
+QUALITY_DERIVED = ['yaw_rate', 'yaw_accel', 'lat_g_smooth', 'lon_g_smooth']
+
+
+@functools.lru_cache(maxsize=None)
+def kernel_revision(name):
+    """Algorithmus-Revision eines Kernels: Hash über den Quelltext von Kernel, Hilfsfunktionen und Fenstergröße."""
+    _, _, func, deps = DERIVED_KERNELS[name]
+    digest = hashlib.sha1()
+    for f in (func,) + tuple(deps):
+        try:
+            digest.update(inspect.getsource(f).encode('utf-8'))
+        except (OSError, TypeError):
+            digest.update(f.__code__.co_code)
+    digest.update(str(G_SMOOTH_WINDOW).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _kernels_for(channels):
+    unknown = [ch for ch in channels if ch not in DERIVED_CHANNELS]
+    if unknown:
+        raise ValueError(f"Unbekannte abgeleitete Kanäle: {unknown}")
+    return list(dict.fromkeys(DERIVED_CHANNELS[ch] for ch in channels))
+
+
+def compute_derived(df, channels):
+    """
+    Berechnet abgeleitete Kanäle direkt auf einem Telemetrie-Frame (ohne Persistenz).
+    :return: DataFrame mit den angefragten Kanälen, gleicher Index wie df
+    """
+    values = {}
+    for name in _kernels_for(channels):
+        values.update(DERIVED_KERNELS[name][2](df))
+    return pd.DataFrame({ch: values[ch] for ch in channels}, index=df.index)
+
+
+def _store(conn, run_id, revision, name, values):
+    rows = [(run_id, ch, revision, kernel_revision(name), arr.dtype.str, len(arr), np.ascontiguousarray(arr).tobytes())
+            for ch, arr in values.items()]
+    conn.executemany(
+        "INSERT OR REPLACE INTO telemetry_derived (run_id, channel, revision, algo_revision, dtype, n_samples, data) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def load_derived(run_id, channels, db_path=DB_PATH, cache=None):
+    """
+    Lädt abgeleitete Kanäle eines Runs (Reihenfolge wie load_channels ohne Fenster). Fehlende oder veraltete
+    Kanäle (andere Daten- oder Algorithmus-Revision) werden berechnet und in 'telemetry_derived' gespeichert.
+
+    :return: DataFrame mit den angefragten Kanälen (RangeIndex)
+    """
+    run_id = int(run_id)
+    channels = list(channels)
+    kernels = _kernels_for(channels)
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        revision = telemetry_store.get_run_revision(conn, run_id)
+        if revision is None:
+            return pd.DataFrame(columns=channels)
+        key = None
+        if cache is not None:
+            key = ('derived', telemetry_store.get_db_token(conn)[0], run_id, revision,
+                   tuple(kernel_revision(name) for name in kernels), tuple(channels))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached.copy()
+
+        placeholders = ", ".join("?" for _ in channels)
+        stored = {ch: (algo, dtype, data) for ch, algo, dtype, data in conn.execute(
+            f"SELECT channel, algo_revision, dtype, data FROM telemetry_derived "
+            f"WHERE run_id = ? AND revision = ? AND channel IN ({placeholders})", (run_id, revision, *channels))}
+
+        values = {}
+        stale = [name for name in kernels
+                 if any(ch not in stored or stored[ch][0] != kernel_revision(name)
+                        for ch in DERIVED_KERNELS[name][1] if ch in channels)]
+        if stale:
+            raw_channels = list(dict.fromkeys(ch for name in stale for ch in DERIVED_KERNELS[name][0]))
+            df = telemetry_store.load_channels(run_id, raw_channels, db_path=db_path, cache=cache)
+            for name in stale:
+                computed = DERIVED_KERNELS[name][2](df)
+                _store(conn, run_id, revision, name, computed)
+                values.update(computed)
+            conn.commit()
+        for ch in channels:
+            if ch not in values:
+                _, dtype, data = stored[ch]
+                values[ch] = np.frombuffer(data, dtype=np.dtype(dtype))
+    finally:
+        conn.close()
+
+    result = pd.DataFrame({ch: values[ch] for ch in channels})
+    if key is not None:
+        cache.put(key, result)
+        result = result.copy()
+    return result
+
+
+def load_with_derived(run_id, channels, db_path=DB_PATH, cache=None):
+    """Wie telemetry_store.load_channels, abgeleitete Kanäle (DERIVED_CHANNELS) werden aus dem Store ergänzt."""
+    raw = [ch for ch in channels if ch not in DERIVED_CHANNELS]
+    derived = [ch for ch in channels if ch in DERIVED_CHANNELS]
+    df = telemetry_store.load_channels(run_id, raw, db_path=db_path, cache=cache)
+    if not derived:
+        return df
+    extra = load_derived(run_id, derived, db_path=db_path, cache=cache)
+    if len(extra) != len(df):
+        # Kein Run / gelöscht: nur die Rohkanäle zurückgeben, abgeleitete Spalten leer
+        return df.assign(**{ch: np.nan for ch in derived})[list(channels)]
+    for ch in derived:
+        df[ch] = extra[ch].to_numpy()
+    return df[list(channels)]
@@ -0,0 +1,259 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+import telemetry_archive
+from telemetry_store import DB_PATH, CHANNEL_DTYPES
+
+# Zeilen pro Chunk (= eine Parquet Row-Group bzw. ein Arrow Record-Batch)
+DEFAULT_CHUNK_ROWS = 100_000
+
+EXPORT_COLUMNS = ['run_id'] + list(CHANNEL_DTYPES.keys())
+
+# Nicht heruntergeladene Exporte (temporäre Dateien) werden nach einer Stunde gelöscht
+EXPORT_JOB_TTL_S = 3600
+
+FORMAT_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+def _arrow_schema(pa, runs_meta):
+    types = {'float32': pa.float32(), 'int8': pa.int8()}
+    fields = [pa.field('run_id', pa.int32())] + [pa.field(ch, types[dt]) for ch, dt in CHANNEL_DTYPES.items()]
+    # Run-Metadaten (Fahrzeug, Strecke, Typ, Notizen, ...) reisen im Schema mit
+    return pa.schema(fields, metadata={b'lmu_runs': json.dumps(runs_meta, default=str).encode('utf-8')})
+
+
+def _load_runs_meta(conn, run_ids):
+    # Gelöschte Runs und archivierte Runs ohne Archiv-Datei (archive_missing) lassen sich nicht exportieren
+    conn.row_factory = sqlite3.Row
+    placeholders = ", ".join("?" for _ in run_ids)
+    rows = conn.execute(f"SELECT * FROM runs WHERE id IN ({placeholders}) AND deleted = 0 AND archive_missing = 0 ORDER BY id",
+                        run_ids).fetchall()
+    conn.row_factory = None
+    return [dict(r) for r in rows]
+
+
+def resolve_format(fmt):
+    """Liefert das tatsächlich nutzbare Format: ohne pyarrow wird auf CSV zurückgefallen."""
+    if fmt == 'csv':
+        return 'csv'
+    try:
+        import pyarrow  # noqa: F401
+        return fmt
+    except ImportError:
+        return 'csv'
+
+
+def export_runs(target_path, run_ids=None, fmt='parquet', chunk_rows=DEFAULT_CHUNK_ROWS, db_path=DB_PATH, progress=None):
+    """
+    Exportiert Runs chunkweise nach Parquet, Arrow IPC oder CSV, ohne den Datensatz komplett im RAM zu halten.
+
+    :param run_ids: Liste von Run-IDs, None = gesamte Datenbank
+    :param fmt: 'parquet', 'arrow' oder 'csv' (Fallback, falls pyarrow fehlt)
+    :param progress: Optionaler Callback progress(rows_done, rows_total)
+    :return: Anzahl der exportierten Zeilen
+    """
+    fmt = resolve_format(fmt)
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        if run_ids is None:
+            run_ids = [r[0] for r in conn.execute("SELECT id FROM runs WHERE deleted = 0 AND archive_missing = 0 ORDER BY id")]
+        run_ids = [int(r) for r in run_ids]
+        runs_meta = _load_runs_meta(conn, run_ids) if run_ids else []
+        run_ids = [m['id'] for m in runs_meta]
+        if not run_ids:
+            raise ValueError("Keine Runs für den Export ausgewählt.")
+
+        placeholders = ", ".join("?" for _ in run_ids)
+        archived = {m['id']: m['archive_path'] for m in runs_meta if m.get('archive_path')}
+        rows_total = conn.execute(f"SELECT COUNT(*) FROM telemetry_data WHERE run_id IN ({placeholders})", run_ids).fetchone()[0]
+        if archived:
+            rows_total += conn.execute(
+                f"SELECT COALESCE(SUM(n_samples), 0) FROM run_summary WHERE run_id IN ({', '.join('?' for _ in archived)})",
+                list(archived)).fetchone()[0]
+
+        writer = _open_writer(target_path, fmt, runs_meta)
+        rows_done = 0
+        try:
+            for run_id in run_ids:
+                if run_id in archived:
+                    # Archivierte Runs liegen nicht mehr in telemetry_data
+                    cursor = _ArchiveCursor(run_id, archived[run_id], db_path)
+                else:
+                    cursor = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM telemetry_data WHERE run_id = ? ORDER BY sample_idx", (run_id,))
+                while True:
+                    chunk = cursor.fetchmany(chunk_rows)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    rows_done += len(chunk)
+                    if progress is not None:
+                        progress(rows_done, rows_total)
+        finally:
+            writer.close()
+    finally:
+        conn.close()
+    return rows_done
+
+
+class _ArchiveCursor:
+    """Liefert einen archivierten Run in Chunks mit derselben Schnittstelle wie ein sqlite3-Cursor."""
+
+    def __init__(self, run_id, archive_path, db_path):
+        df = telemetry_archive.read_run(run_id, archive_path, columns=EXPORT_COLUMNS, db_path=db_path)
+        df = df.reindex(columns=EXPORT_COLUMNS)
+        df = df.astype(object).where(df.notna(), None)
+        self._rows = list(df.itertuples(index=False, name=None))
+        self._pos = 0
+
+    def fetchmany(self, size):
+        chunk = self._rows[self._pos:self._pos + size]
+        self._pos += size
+        return chunk
+
+
+def _open_writer(target_path, fmt, runs_meta):
+    if fmt == 'csv':
+        return _CsvChunkWriter(target_path)
+    return _ArrowChunkWriter(target_path, fmt, runs_meta)
+
+
+class _CsvChunkWriter:
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowChunkWriter:
+    def __init__(self, path, fmt, runs_meta):
+        import pyarrow as pa
+        self._pa = pa
+        self.schema = _arrow_schema(pa, runs_meta)
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            import pyarrow.ipc
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pyarrow.ipc.new_file(self._sink, self.schema)
+
+    def write(self, rows):
+        pa = self._pa
+        columns = list(zip(*rows))
+        # None (NULL) bleibt None; safe=False erlaubt das Verkleinern auf float32/int8
+        arrays = [pa.array(columns[i], type=field.type, from_pandas=True, safe=False)
+                  for i, field in enumerate(self.schema)]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+        if hasattr(self, '_sink'):
+            self._sink.close()
+
+
+class ExportJob:
+    """Export im Hintergrund-Thread mit abfragbarem Fortschritt (für das Dashboard)."""
+
+    def __init__(self, run_ids, fmt='parquet', db_path=DB_PATH, target_dir=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.run_ids = run_ids
+        self.fmt = resolve_format(fmt)
+        self.db_path = db_path
+        self.path = os.path.join(target_dir or tempfile.gettempdir(), f"lmu_export_{self.id}{FORMAT_EXTENSIONS[self.fmt]}")
+        self.rows_done = 0
+        self.rows_total = 0
+        self.status = 'pending'
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started = time.time()
+        self.status = 'running'
+        self._thread.start()
+        return self
+
+    @property
+    def fraction(self):
+        if self.status in ('done', 'downloaded'):
+            return 1.0
+        return self.rows_done / self.rows_total if self.rows_total else 0.0
+
+    def _progress(self, rows_done, rows_total):
+        self.rows_done = rows_done
+        self.rows_total = rows_total
+
+    def _run(self):
+        try:
+            export_runs(self.path, self.run_ids, self.fmt, db_path=self.db_path, progress=self._progress)
+            self.status = 'done'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'error'
+            self.remove_file()
+        finally:
+            self.finished = time.time()
+
+    def read_download(self):
+        """Liest die Exportdatei für den Download und löscht sie danach (Status 'downloaded')."""
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.remove_file()
+        self.status = 'downloaded'
+        return data
+
+    def remove_file(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def prune_jobs(jobs, ttl_s=EXPORT_JOB_TTL_S, now=None):
+    """
+    Entfernt abgeschlossene Jobs (fertig, fehlgeschlagen oder heruntergeladen) aus `jobs` (dict id -> ExportJob),
+    sobald sie älter als ttl_s sind, und löscht nicht abgeholte Exportdateien.
+    :return: IDs der entfernten Jobs
+    """
+    now = time.time() if now is None else now
+    expired = [job_id for job_id, job in list(jobs.items())
+               if job.finished is not None and now - job.finished > ttl_s]
+    for job_id in expired:
+        jobs.pop(job_id).remove_file()
+    return expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportiert LMU Telemetrie-Runs nach Parquet / Arrow IPC / CSV.")
+    parser.add_argument("target", help="Zieldatei")
+    parser.add_argument("--runs", type=int, nargs="*", help="Run-IDs (Standard: gesamte Datenbank)")
+    parser.add_argument("--format", choices=list(FORMAT_EXTENSIONS), default="parquet")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    fmt = resolve_format(args.format)
+    if fmt != args.format:
+        print("[Export] pyarrow nicht installiert -> Fallback auf CSV")
+
+    def report(done, total):
+        print(f"\r[Export] {done}/{total} Zeilen", end="")
+
+    rows = export_runs(args.target, args.runs or None, fmt, chunk_rows=args.chunk_rows, db_path=args.db, progress=report)
+    print(f"\n[Export] {rows} Zeilen nach {args.target} geschrieben ({fmt}).")
+
+
+if __name__ == "__main__":
+    main()
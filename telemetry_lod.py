@@ -0,0 +1,141 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import telemetry_store
+from telemetry_store import DB_PATH
+
+# Verfügbare Downsampling-Stufen (Faktor gegenüber den Rohdaten). Stufe 1 = Rohdaten aus telemetry_data.
+LOD_LEVELS = (1, 4, 16, 64, 256)
+
+# Ziel-Auflösung eines Charts in Pixeln (ca. Breite eines Plotly-Charts im Wide-Layout)
+DEFAULT_PIXEL_BUDGET = 2000
+
+
+def minmax_decimate(x, y, factor, scatter=False):
+    """
+    Min/Max-erhaltendes Downsampling: Pro Bucket von `factor` Samples bleiben die Samples
+    mit minimalem und maximalem y (in Originalreihenfolge) erhalten, Peaks gehen also nie verloren.
+    Mit scatter=True werden zusätzlich die Extremwerte von x behalten (für Punktwolken wie G-G).
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if factor <= 1 or n <= 2 * factor:
+        return x.copy(), y.copy()
+
+    n_full = (n // factor) * factor
+    offsets = np.arange(0, n_full, factor)
+    parts = [y[:n_full].reshape(-1, factor).argmin(axis=1) + offsets,
+             y[:n_full].reshape(-1, factor).argmax(axis=1) + offsets]
+    if scatter:
+        parts.append(x[:n_full].reshape(-1, factor).argmin(axis=1) + offsets)
+        parts.append(x[:n_full].reshape(-1, factor).argmax(axis=1) + offsets)
+    if n_full < n:
+        tail = np.arange(n_full, n)
+        parts.append(np.array([tail[np.argmin(y[n_full:])], tail[np.argmax(y[n_full:])]]))
+        if scatter:
+            parts.append(np.array([tail[np.argmin(x[n_full:])], tail[np.argmax(x[n_full:])]]))
+
+    idx = np.unique(np.concatenate(parts))
+    return x[idx], y[idx]
+
+
+def pick_level(n_samples, visible_fraction=1.0, pixel_budget=DEFAULT_PIXEL_BUDGET):
+    """Wählt die gröbste Stufe, die für den sichtbaren Bereich noch >= 1 Punkt pro Pixel liefert."""
+    visible = n_samples * min(max(visible_fraction, 0.0), 1.0)
+    level = LOD_LEVELS[0]
+    for candidate in LOD_LEVELS:
+        # Jede Stufe liefert ca. 2 Punkte (min + max) pro Bucket
+        if 2 * visible / candidate >= pixel_budget:
+            level = candidate
+    return level
+
+
+def _build_pyramid(conn, run_id, revision, x_channel, y_channel, mode, db_path):
+    df = telemetry_store.load_channels(run_id, [x_channel, y_channel], db_path=db_path)
+    x = df[x_channel].to_numpy(np.float32)
+    y = df[y_channel].to_numpy(np.float32)
+    x_min = float(np.nanmin(x)) if len(x) else 0.0
+    x_max = float(np.nanmax(x)) if len(x) else 0.0
+
+    rows = []
+    for level in LOD_LEVELS:
+        if level == 1:
+            # Rohdaten liegen bereits in telemetry_data, gespeichert werden nur die Meta-Infos
+            rows.append((run_id, revision, level, x_channel, y_channel, mode, len(x), x_min, x_max, None))
+            continue
+        lx, ly = minmax_decimate(x, y, level, scatter=(mode == 'scatter'))
+        blob = np.vstack((lx, ly)).astype(np.float32).tobytes()
+        rows.append((run_id, revision, level, x_channel, y_channel, mode, len(lx), x_min, x_max, blob))
+
+    conn.execute("DELETE FROM telemetry_lod WHERE run_id = ? AND x_channel = ? AND y_channel = ? AND mode = ?",
+                 (run_id, x_channel, y_channel, mode))
+    conn.executemany(
+        "INSERT INTO telemetry_lod (run_id, revision, level, x_channel, y_channel, mode, n_points, x_min, x_max, data) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return len(x), x_min, x_max
+
+
+def load_trace(run_id, x_channel, y_channel, window=None, scatter=False, pixel_budget=DEFAULT_PIXEL_BUDGET,
+               db_path=DB_PATH, cache=None):
+    """
+    Lädt einen (x, y) Trace in der zum Pixel-Budget passenden Auflösung.
+    Die Stufen werden beim ersten Zugriff berechnet und in 'telemetry_lod' persistiert
+    (neu berechnet, sobald sich die Revision des Runs ändert).
+
+    :param window: Optionaler (start, end) Zoom-Bereich auf der x-Achse
+    :return: DataFrame mit den Spalten x_channel und y_channel
+    """
+    run_id = int(run_id)
+    mode = 'scatter' if scatter else 'line'
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        revision = telemetry_store.get_run_revision(conn, run_id)
+        if revision is None:
+            return pd.DataFrame(columns=[x_channel, y_channel])
+
+        meta = conn.execute(
+            "SELECT revision, n_points, x_min, x_max FROM telemetry_lod "
+            "WHERE run_id = ? AND level = 1 AND x_channel = ? AND y_channel = ? AND mode = ?",
+            (run_id, x_channel, y_channel, mode)).fetchone()
+        if meta is None or meta[0] != revision:
+            n_samples, x_min, x_max = _build_pyramid(conn, run_id, revision, x_channel, y_channel, mode, db_path)
+        else:
+            _, n_samples, x_min, x_max = meta
+
+        visible_fraction = 1.0
+        if window is not None and x_max > x_min:
+            lo = x_min if window[0] is None else max(window[0], x_min)
+            hi = x_max if window[1] is None else min(window[1], x_max)
+            visible_fraction = max(hi - lo, 0.0) / (x_max - x_min)
+        level = pick_level(n_samples, visible_fraction, pixel_budget)
+
+        if level == 1:
+            window_arg = window if x_channel in ('time_elapsed', 'lap_distance') else None
+            df = telemetry_store.load_channels(run_id, [x_channel, y_channel], window=window_arg,
+                                               window_channel=x_channel, db_path=db_path, cache=cache)
+        else:
+            key = ('lod', telemetry_store.get_db_token(conn)[0], run_id, revision, x_channel, y_channel, mode, level)
+            df = cache.get(key) if cache is not None else None
+            if df is None:
+                row = conn.execute(
+                    "SELECT data FROM telemetry_lod WHERE run_id = ? AND level = ? AND x_channel = ? AND y_channel = ? AND mode = ?",
+                    (run_id, level, x_channel, y_channel, mode)).fetchone()
+                data = np.frombuffer(row[0], dtype=np.float32).reshape(2, -1)
+                df = pd.DataFrame({x_channel: data[0], y_channel: data[1]})
+                if cache is not None:
+                    cache.put(key, df)
+    finally:
+        conn.close()
+
+    if window is not None:
+        mask = np.ones(len(df), dtype=bool)
+        if window[0] is not None:
+            mask &= df[x_channel].to_numpy() >= window[0]
+        if window[1] is not None:
+            mask &= df[x_channel].to_numpy() <= window[1]
+        df = df[mask]
+    return df.reset_index(drop=True)
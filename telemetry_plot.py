@@ -0,0 +1,51 @@
+import numpy as np
+import plotly.graph_objects as go
+
+import telemetry_lod
+from telemetry_lod import DEFAULT_PIXEL_BUDGET
+
+# Ab dieser Punktzahl (nach dem Ausdünnen) rendert der Browser per WebGL statt SVG
+WEBGL_POINT_THRESHOLD = 1000
+
+
+def decimate(x, y, pixel_budget=DEFAULT_PIXEL_BUDGET, scatter=False):
+    """
+    Dünnt (x, y) min/max-erhaltend auf ca. `pixel_budget` Punkte aus (siehe telemetry_lod.minmax_decimate).
+    Kurze Traces bleiben unverändert.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    # minmax_decimate liefert ca. 2 Punkte (bzw. 4 bei scatter) pro Bucket
+    factor = int(np.ceil(2 * len(y) / pixel_budget)) if len(y) > pixel_budget else 1
+    return telemetry_lod.minmax_decimate(x, y, factor, scatter=scatter)
+
+
+def make_trace(x, y, scatter=False, pixel_budget=DEFAULT_PIXEL_BUDGET, **kwargs):
+    """
+    Plotly-Trace mit begrenzter Payload: ausgedünnt auf das Pixel-Budget, oberhalb von
+    WEBGL_POINT_THRESHOLD Punkten als Scattergl. kwargs gehen unverändert an go.Scatter(gl).
+
+    :param scatter: Punktwolke (z.B. G-G) statt Linie -> auch Extremwerte von x behalten
+    """
+    x, y = decimate(x, y, pixel_budget, scatter=scatter)
+    trace_cls = go.Scattergl if len(x) > WEBGL_POINT_THRESHOLD else go.Scatter
+    return trace_cls(x=x, y=y, **kwargs)
+
+
+def zoom_window(x_min, x_max, zoom_pct):
+    """
+    Wandelt einen Zoom-Bereich in Prozent (z.B. aus einem Range-Slider) in ein (start, end) Fenster um.
+    :return: None für den vollen Bereich (0-100 %)
+    """
+    lo_pct, hi_pct = zoom_pct
+    if lo_pct <= 0 and hi_pct >= 100:
+        return None
+    span = x_max - x_min
+    return x_min + span * lo_pct / 100.0, x_min + span * hi_pct / 100.0
+
+
+def clip_window(df, x_channel, window):
+    """Zeilen von df innerhalb des Fensters (None = alles)."""
+    if window is None:
+        return df
+    return df[(df[x_channel] >= window[0]) & (df[x_channel] <= window[1])]
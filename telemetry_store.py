@@ -0,0 +1,689 @@
+import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+DB_PATH = "lmu_telemetry.db"
+
+RUN_COLUMNS = ['id', 'vehicle_name', 'vehicle_class', 'track_name', 'timestamp', 'run_type', 'notes']
+
+# Spalten, nach denen die Garage filtern kann (exakter Vergleich)
+RUN_FILTER_COLUMNS = ('vehicle_name', 'vehicle_class', 'track_name', 'run_type')
+
+RUN_PAGE_SIZE = 50
+
+# Kompakte Datentypen pro Kanal für projizierte Loads (float32 / int8 statt float64 / int64).
+# Gang und Sektor sind kategorisch und passen in int8.
+CHANNEL_DTYPES = {
+    'time_elapsed': 'float32',
+    'gear': 'int8',
+    'rpm': 'float32',
+    'torque': 'float32',
+    'speed_kmh': 'float32',
+    'throttle': 'float32',
+    'lat_g': 'float32',
+    'lon_g': 'float32',
+    'steering_angle': 'float32',
+    'lap_distance': 'float32',
+    'sector': 'int8',
+}
+
+FILTER_OPS = ('>', '>=', '<', '<=', '=', '!=')
+
+# Standard-Budget für den Query-Cache des Dashboards (geteilt über alle Sessions)
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+# Telemetrie geclustert nach (run_id, sample_idx): Ein Run liegt zusammenhängend in der B-Tree
+# und ein kompletter Run ist ein einziger Range-Scan, der bereits in zeitlicher Reihenfolge zurückkommt.
+TELEMETRY_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        run_id INTEGER NOT NULL,
+        sample_idx INTEGER NOT NULL,
+        time_elapsed REAL,
+        gear INTEGER,
+        rpm REAL,
+        torque REAL,
+        speed_kmh REAL,
+        throttle REAL,
+        lat_g REAL DEFAULT 0,
+        lon_g REAL DEFAULT 0,
+        steering_angle REAL DEFAULT 0,
+        lap_distance REAL DEFAULT 0,
+        sector INTEGER DEFAULT 0,
+        PRIMARY KEY (run_id, sample_idx),
+        FOREIGN KEY(run_id) REFERENCES runs(id)
+    ) WITHOUT ROWID
+'''
+
+TELEMETRY_VALUE_COLUMNS = ['time_elapsed', 'gear', 'rpm', 'torque', 'speed_kmh', 'throttle',
+                           'lat_g', 'lon_g', 'steering_angle', 'lap_distance', 'sector']
+
+
+def _migrate_clustered_telemetry(conn):
+    """
+    Einmalige Migration alter Datenbanken: rowid-Tabelle -> WITHOUT ROWID Tabelle mit (run_id, sample_idx).
+    sample_idx wird aus der Einfüge-Reihenfolge (rowid) pro Run vergeben.
+    """
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(telemetry_data)")]
+    if 'sample_idx' in columns:
+        return
+    # IMMEDIATE: Logger und Dashboard dürfen nicht gleichzeitig migrieren
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(telemetry_data)")]
+        if 'sample_idx' in columns:
+            conn.rollback()
+            return
+        n_rows = conn.execute("SELECT COUNT(*) FROM telemetry_data").fetchone()[0]
+        print(f"[DB] Migriere {n_rows} Telemetrie-Zeilen in die geclusterte Tabelle (einmalig)...")
+        value_columns = ', '.join(TELEMETRY_VALUE_COLUMNS)
+        conn.execute("DROP TABLE IF EXISTS telemetry_data_clustered")
+        conn.execute(TELEMETRY_TABLE_SQL.format(name='telemetry_data_clustered'))
+        conn.execute(f'''
+            INSERT INTO telemetry_data_clustered (run_id, sample_idx, {value_columns})
+            SELECT run_id, ROW_NUMBER() OVER (PARTITION BY run_id ORDER BY rowid) - 1, {value_columns}
+            FROM telemetry_data WHERE run_id IS NOT NULL
+            ORDER BY run_id, rowid
+        ''')
+        conn.execute("DROP TABLE telemetry_data")
+        conn.execute("ALTER TABLE telemetry_data_clustered RENAME TO telemetry_data")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _init_runs_fts(cursor):
+    """
+    Volltext-Index (FTS5) über Fahrzeug, Strecke und Notizen für die Garage-Suche.
+    External Content: Der Index speichert keine Kopie der Texte, Trigger halten ihn synchron.
+    Ohne FTS5 (ältere SQLite-Builds) sucht query_runs() per LIKE.
+    """
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'runs_fts'").fetchone() is not None
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts
+            USING fts5(vehicle_name, track_name, notes, content='runs', content_rowid='id')
+        ''')
+    except sqlite3.OperationalError:
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_runs_fts_insert AFTER INSERT ON runs BEGIN
+            INSERT INTO runs_fts (rowid, vehicle_name, track_name, notes) VALUES (new.id, new.vehicle_name, new.track_name, new.notes);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_runs_fts_delete AFTER DELETE ON runs BEGIN
+            INSERT INTO runs_fts (runs_fts, rowid, vehicle_name, track_name, notes) VALUES ('delete', old.id, old.vehicle_name, old.track_name, old.notes);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_runs_fts_update AFTER UPDATE OF vehicle_name, track_name, notes ON runs BEGIN
+            INSERT INTO runs_fts (runs_fts, rowid, vehicle_name, track_name, notes) VALUES ('delete', old.id, old.vehicle_name, old.track_name, old.notes);
+            INSERT INTO runs_fts (rowid, vehicle_name, track_name, notes) VALUES (new.id, new.vehicle_name, new.track_name, new.notes);
+        END
+    ''')
+    if not exists:
+        # Bestehende Runs (Upgrade oder eingespieltes Backup) einmalig indizieren
+        cursor.execute("INSERT INTO runs_fts (runs_fts) VALUES ('rebuild')")
+
+
+def init_db(db_path=DB_PATH):
+    """Initialisiert die SQLite-Datenbank, die Tabellen und die Revisions-Trigger."""
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    cursor = conn.cursor()
+
+    # Nur bei neuen Datenbanken wirksam: freie Seiten können später schrittweise freigegeben werden
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    # WAL: Leser (Dashboard, Backups) blockieren den schreibenden Logger nicht mehr
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError:
+        pass
+
+    # Tabelle für aufgenommene Runs
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vehicle_name TEXT,
+            vehicle_class TEXT,
+            track_name TEXT,
+            timestamp DATETIME
+        )
+    ''')
+
+    # Tabelle für die Telemetriedaten eines Runs
+    cursor.execute(TELEMETRY_TABLE_SQL.format(name='telemetry_data'))
+
+    # Auto-Upgrade Schema for Handling Analytics
+    new_columns = [
+        ("lat_g", "REAL DEFAULT 0"),
+        ("lon_g", "REAL DEFAULT 0"),
+        ("steering_angle", "REAL DEFAULT 0"),
+        ("lap_distance", "REAL DEFAULT 0"),
+        ("sector", "INTEGER DEFAULT 0")
+    ]
+
+    for col_name, col_type in new_columns:
+        try:
+            cursor.execute(f"ALTER TABLE telemetry_data ADD COLUMN {col_name} {col_type}")
+        except sqlite3.OperationalError:
+            pass # Column already exists
+
+    conn.commit()
+    _migrate_clustered_telemetry(conn)
+
+    run_columns = [
+        ("run_type", "TEXT DEFAULT 'DRAG'"),
+        ("notes", "TEXT DEFAULT ''"),
+        # Daten-Revision des Runs: Wird bei jedem Telemetrie-Flush hochgezählt (Cache-Key)
+        ("revision", "INTEGER DEFAULT 0"),
+        # Tombstone: gelöschte Runs werden im Hintergrund bereinigt (siehe db_maintenance.py)
+        ("deleted", "INTEGER DEFAULT 0"),
+        # Archiv-Datei (relativ zum Archiv-Ordner), NULL = Telemetrie liegt in telemetry_data (siehe telemetry_archive.py)
+        ("archive_path", "TEXT"),
+        # 1 = Archiv-Datei oder Eintrag fehlt (z.B. Backup ohne Archiv-Ordner eingespielt), siehe telemetry_archive.verify_archives
+        ("archive_missing", "INTEGER DEFAULT 0")
+    ]
+
+    for col_name, col_type in run_columns:
+        try:
+            cursor.execute(f"ALTER TABLE runs ADD COLUMN {col_name} {col_type}")
+        except sqlite3.OperationalError:
+            pass
+
+    # Indexe passend zu den tatsächlichen Queries (geprüft in test_query_plans.py).
+    # Die alten Einzel-Indexe auf speed_kmh / time_elapsed wurden nie selektiv genutzt und kosteten nur Insert-Zeit.
+    # Run laden / Zeitfenster laufen über den Primärschlüssel (run_id, sample_idx), siehe TELEMETRY_TABLE_SQL.
+    for old_index in ('idx_run_id', 'idx_speed_kmh', 'idx_time_elapsed', 'idx_telemetry_run_time'):
+        cursor.execute(f'DROP INDEX IF EXISTS {old_index}')
+    # Volllast-Auswertung der Drehmomentkurve: partieller, abdeckender Index,
+    # enthält nur Volllast-Samples und liefert sie bereits nach rpm sortiert
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_telemetry_full_throttle
+        ON telemetry_data (run_id, rpm, throttle, torque, gear, speed_kmh) WHERE throttle > 0.9
+    ''')
+    # Gang-Übersetzungen und Retention suchen Runs pro Fahrzeug
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_runs_vehicle ON runs (vehicle_name, timestamp)')
+    # Garage-Liste: neueste zuerst, seitenweise
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs (timestamp)')
+
+    # In-DB State Management (statt fehleranfälliger Datei)
+    cursor.execute('CREATE TABLE IF NOT EXISTS logger_state (id INTEGER PRIMARY KEY, state TEXT)')
+    cursor.execute("INSERT OR IGNORE INTO logger_state (id, state) VALUES (1, 'IDLE')")
+
+    # Vorberechnete Downsampling-Stufen (siehe telemetry_lod.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS telemetry_lod (
+            run_id INTEGER,
+            revision INTEGER,
+            level INTEGER,
+            x_channel TEXT,
+            y_channel TEXT,
+            mode TEXT,
+            n_points INTEGER,
+            x_min REAL,
+            x_max REAL,
+            data BLOB,
+            PRIMARY KEY (run_id, x_channel, y_channel, mode, level)
+        )
+    ''')
+
+    # Persistierte abgeleitete Kanäle pro Run (siehe telemetry_derived.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS telemetry_derived (
+            run_id INTEGER,
+            channel TEXT,
+            revision INTEGER,
+            algo_revision TEXT,
+            dtype TEXT,
+            n_samples INTEGER,
+            data BLOB,
+            PRIMARY KEY (run_id, channel)
+        )
+    ''')
+
+    # Eigene Math-Kanäle (Ausdrücke über Telemetrie-Kanäle, siehe channel_math.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS math_channels (
+            name TEXT PRIMARY KEY,
+            expression TEXT NOT NULL,
+            unit TEXT,
+            description TEXT
+        )
+    ''')
+
+    # Gang-Übersetzungen pro Fahrzeug, inkrementell pro Run gepflegt (siehe gear_ratios.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vehicle_gear_ratios (
+            vehicle_name TEXT,
+            gear INTEGER,
+            ratio_r REAL,
+            PRIMARY KEY (vehicle_name, gear)
+        )
+    ''')
+    try:
+        cursor.execute("ALTER TABLE vehicle_gear_ratios ADD COLUMN n_samples INTEGER DEFAULT 0")
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gear_ratio_sketch (
+            vehicle_name TEXT,
+            gear INTEGER,
+            bucket INTEGER,
+            count INTEGER,
+            PRIMARY KEY (vehicle_name, gear, bucket)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gear_ratio_runs (
+            run_id INTEGER PRIMARY KEY,
+            vehicle_name TEXT,
+            revision INTEGER,
+            data BLOB
+        )
+    ''')
+
+    # Kennzahlen archivierter Runs (bleiben in der Datenbank, wenn die Telemetrie ins Archiv wandert)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS run_summary (
+            run_id INTEGER PRIMARY KEY,
+            n_samples INTEGER,
+            duration_s REAL,
+            max_speed_kmh REAL,
+            max_rpm REAL,
+            max_lat_g REAL,
+            max_lon_g REAL,
+            distance_m REAL
+        )
+    ''')
+
+    # Änderungs-Token für Caches: 'runs_revision' ändert sich bei jeder Änderung der Run-Liste,
+    # 'db_uid' identifiziert die Datenbank-Datei (z.B. nach dem Einspielen eines Backups).
+    cursor.execute('CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value)')
+    cursor.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('runs_revision', 0)")
+    cursor.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('db_uid', ?)", (uuid.uuid4().hex,))
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_runs_insert AFTER INSERT ON runs BEGIN
+            UPDATE db_meta SET value = value + 1 WHERE key = 'runs_revision';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_runs_delete AFTER DELETE ON runs BEGIN
+            UPDATE db_meta SET value = value + 1 WHERE key = 'runs_revision';
+        END
+    ''')
+    # Nur Metadaten-Änderungen (z.B. Notizen) invalidieren die Run-Liste, nicht der Telemetrie-Flush
+    cursor.execute('DROP TRIGGER IF EXISTS trg_runs_update')
+    cursor.execute('''
+        CREATE TRIGGER trg_runs_update
+        AFTER UPDATE OF vehicle_name, vehicle_class, track_name, timestamp, run_type, notes, deleted, archive_path, archive_missing ON runs BEGIN
+            UPDATE db_meta SET value = value + 1 WHERE key = 'runs_revision';
+        END
+    ''')
+
+    _init_runs_fts(cursor)
+
+    conn.commit()
+    conn.close()
+
+
+def get_db_token(conn):
+    """Liefert (db_uid, runs_revision) als Änderungs-Token für die Run-Liste."""
+    rows = dict(conn.execute("SELECT key, value FROM db_meta WHERE key IN ('db_uid', 'runs_revision')").fetchall())
+    return rows.get('db_uid'), rows.get('runs_revision')
+
+
+def get_run_revision(conn, run_id):
+    """Liefert die Daten-Revision eines Runs oder None, falls der Run nicht existiert oder gelöscht ist."""
+    row = conn.execute("SELECT revision FROM runs WHERE id = ? AND deleted = 0", (int(run_id),)).fetchone()
+    if row is None:
+        return None
+    return row[0] or 0
+
+
+def get_archive_path(conn, run_id):
+    """Liefert die Archiv-Datei eines Runs oder None, falls seine Telemetrie in telemetry_data liegt."""
+    row = conn.execute("SELECT archive_path FROM runs WHERE id = ?", (int(run_id),)).fetchone()
+    return row[0] if row else None
+
+
+def _entry_bytes(value):
+    # Speicherbedarf eines Cache-Eintrags: DataFrame oder dict aus DataFrames/Arrays (z.B. lap_align)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sum(_entry_bytes(v) for v in value.values())
+    return int(getattr(value, 'nbytes', 64))
+
+
+class TelemetryCache:
+    """
+    Thread-sicherer LRU-Cache für Query-Ergebnisse (DataFrames, auch dicts aus DataFrames/Arrays).
+    Die Größe wird über den Speicherverbrauch der DataFrames begrenzt, nicht über die Anzahl.
+    Keys haben die Form (art, db_uid, run_id, revision, ...).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df):
+        size = _entry_bytes(df)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            # Ältere Revisionen desselben Runs werden nie wieder gelesen -> sofort freigeben
+            stale = [k for k in self._entries if k[1:3] == key[1:3] and k[3] != key[3]]
+            for k in stale:
+                self._drop(k)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_run(self, run_id):
+        """Entfernt alle Einträge eines Runs (z.B. nach Löschen in der Garage)."""
+        with self._lock:
+            for k in [k for k in self._entries if k[2] == run_id]:
+                self._drop(k)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.current_bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+def _empty_runs():
+    return pd.DataFrame(columns=RUN_COLUMNS)
+
+
+def load_runs(db_path=DB_PATH, cache=None):
+    """
+    Lädt die Run-Liste (neueste zuerst). Mit Cache nur bei geändertem 'runs_revision'.
+    Archivierte Runs, deren Archiv fehlt (archive_missing), sind nicht auswählbar; die Garage zeigt sie weiterhin.
+    """
+    try:
+        conn = sqlite3.connect(db_path, timeout=5.0)
+        try:
+            key = None
+            if cache is not None:
+                db_uid, runs_revision = get_db_token(conn)
+                key = ('runs', db_uid, None, runs_revision)
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached.copy()
+            df = pd.read_sql_query("SELECT * FROM runs WHERE deleted = 0 AND archive_missing = 0 ORDER BY timestamp DESC, id ASC", conn)
+        finally:
+            conn.close()
+        if df.empty:
+            return _empty_runs()
+        if key is not None:
+            cache.put(key, df)
+            df = df.copy()
+        return df
+    except Exception:
+        return _empty_runs()
+
+
+def _fts_query(text):
+    """Macht aus einer Benutzereingabe eine FTS5-Query: jedes Wort als Präfix, alle Wörter müssen passen."""
+    tokens = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def _run_filter_sql(conn, search, filters):
+    where = ["deleted = 0"]
+    params = []
+    for col in RUN_FILTER_COLUMNS:
+        value = (filters or {}).get(col)
+        if isinstance(value, (list, tuple)):
+            # Mehrere Werte: einer muss passen, ein abschließendes '%' macht den Wert zum Präfix
+            where.append("(" + " OR ".join(f"{col} LIKE ?" if v.endswith('%') else f"{col} = ?" for v in value) + ")"
+                         if value else "0")
+            params.extend(value)
+        elif value:
+            where.append(f"{col} = ?")
+            params.append(value)
+    if (filters or {}).get('ids') is not None:
+        ids = [int(i) for i in filters['ids']]
+        where.append(f"id IN ({', '.join('?' for _ in ids)})" if ids else "0")
+        params.extend(ids)
+    if (filters or {}).get('selectable'):
+        # Wie load_runs(): archivierte Runs ohne Archiv-Datei sind nicht analysierbar
+        where.append("archive_missing = 0")
+    if (filters or {}).get('date_from'):
+        where.append("timestamp >= ?")
+        params.append(str(filters['date_from']))
+    if (filters or {}).get('date_to'):
+        # Bis einschließlich des End-Tages
+        where.append("timestamp < date(?, '+1 day')")
+        params.append(str(filters['date_to']))
+
+    fts_query = _fts_query(search)
+    if fts_query:
+        has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'runs_fts'").fetchone() is not None
+        if has_fts:
+            where.append("id IN (SELECT rowid FROM runs_fts WHERE runs_fts MATCH ?)")
+            params.append(fts_query)
+        else:
+            for token in fts_query.replace('"', '').replace('*', '').split():
+                where.append("(vehicle_name LIKE ? OR track_name LIKE ? OR notes LIKE ?)")
+                params.extend([f"%{token}%"] * 3)
+    return " AND ".join(where), params
+
+
+def query_runs(search=None, filters=None, page=0, page_size=RUN_PAGE_SIZE, db_path=DB_PATH):
+    """
+    Seitenweise, gefilterte Run-Liste für die Garage (neueste zuerst).
+
+    :param search: Freitext, durchsucht Fahrzeug, Strecke und Notizen (FTS5, Präfix-Suche)
+    :param filters: Optionales dict mit vehicle_name, vehicle_class, track_name, run_type (Wert oder Liste von Werten),
+                    date_from, date_to, ids (Liste von Run-IDs) und selectable (nur analysierbare Runs)
+    :param page_size: Runs pro Seite, None = alle Treffer, 0 = nur zählen
+    :return: (DataFrame der Seite, Gesamtzahl der Treffer)
+    """
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        where, params = _run_filter_sql(conn, search, filters)
+        total = conn.execute(f"SELECT COUNT(*) FROM runs WHERE {where}", params).fetchone()[0]
+        if page_size == 0:
+            return _empty_runs(), total
+        sql = f"SELECT * FROM runs WHERE {where} ORDER BY timestamp DESC, id ASC"
+        if page_size is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [int(page_size), int(page) * int(page_size)]
+        df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+    return df, total
+
+
+def count_runs(search=None, filters=None, db_path=DB_PATH):
+    """Anzahl der Treffer für query_runs() (z.B. für die Seitenzahl)."""
+    return query_runs(search, filters, page_size=0, db_path=db_path)[1]
+
+
+def query_run_values(column, search=None, filters=None, db_path=DB_PATH):
+    """
+    Werte einer Spalte für alle Treffer von query_runs(), ohne die Runs selbst zu laden.
+    'id' liefert die Run-IDs (neueste zuerst), Filter-Spalten ihre distinkten Werte (sortiert).
+    """
+    if column != 'id' and column not in RUN_FILTER_COLUMNS:
+        raise ValueError(f"Unbekannte Run-Spalte: {column}")
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        where, params = _run_filter_sql(conn, search, filters)
+        if column == 'id':
+            sql = f"SELECT id FROM runs WHERE {where} ORDER BY timestamp DESC, id ASC"
+        else:
+            sql = f"SELECT DISTINCT {column} FROM runs WHERE {where} AND {column} IS NOT NULL ORDER BY {column}"
+        return [r[0] for r in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def load_run_filter_values(db_path=DB_PATH, cache=None):
+    """Liefert die vorhandenen Werte je Filter-Spalte (für die Dropdowns der Garage)."""
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        key = None
+        if cache is not None:
+            db_uid, runs_revision = get_db_token(conn)
+            key = ('run_filter_values', db_uid, None, runs_revision)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached.copy()
+        df = pd.read_sql_query(
+            " UNION ALL ".join(f"SELECT DISTINCT '{col}' AS col, {col} AS value FROM runs WHERE deleted = 0 AND {col} IS NOT NULL"
+                               for col in RUN_FILTER_COLUMNS), conn)
+    finally:
+        conn.close()
+    if key is not None:
+        cache.put(key, df)
+        df = df.copy()
+    return df
+
+
+def load_telemetry(run_id, db_path=DB_PATH, cache=None):
+    """Lädt die komplette Telemetrie eines Runs. Mit Cache keyed auf (Run-ID, Daten-Revision)."""
+    run_id = int(run_id)
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        key = None
+        if cache is not None:
+            db_uid, _ = get_db_token(conn)
+            key = ('telemetry', db_uid, run_id, get_run_revision(conn, run_id))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached.copy()
+        archive_path = get_archive_path(conn, run_id)
+        if archive_path:
+            import telemetry_archive
+            df = telemetry_archive.read_run(run_id, archive_path, db_path=db_path)
+        else:
+            df = pd.read_sql_query("SELECT * FROM telemetry_data WHERE run_id = ? ORDER BY sample_idx", conn, params=(run_id,))
+    finally:
+        conn.close()
+    if key is not None and key[3] is not None:
+        cache.put(key, df)
+        df = df.copy()
+    return df
+
+
+def _build_channel_query(channels, window, window_channel, filters):
+    for ch in list(channels) + [window_channel] + [f[0] for f in filters]:
+        if ch not in CHANNEL_DTYPES:
+            raise ValueError(f"Unbekannter Telemetrie-Kanal: {ch}")
+    sql = f"SELECT {', '.join(channels)} FROM telemetry_data WHERE run_id = ?"
+    params = []
+    if window is not None:
+        start, end = window
+        if start is not None:
+            sql += f" AND {window_channel} >= ?"
+            params.append(float(start))
+        if end is not None:
+            sql += f" AND {window_channel} <= ?"
+            params.append(float(end))
+    for ch, op, value in filters:
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unbekannter Filter-Operator: {op}")
+        sql += f" AND {ch} {op} ?"
+        params.append(value)
+    # Primärschlüssel-Reihenfolge = zeitliche Reihenfolge, kostet also keine Sortierung
+    sql += " ORDER BY sample_idx"
+    return sql, params
+
+
+_PANDAS_OPS = {'>': 'gt', '>=': 'ge', '<': 'lt', '<=': 'le', '=': 'eq', '!=': 'ne'}
+
+
+def _load_archived_channels(run_id, archive_path, channels, window, window_channel, filters, db_path):
+    """Wie die SQL-Query aus _build_channel_query, nur auf den entpackten Archiv-Spalten."""
+    import telemetry_archive
+    needed = list(dict.fromkeys(list(channels) + ([window_channel] if window is not None else []) + [f[0] for f in filters]))
+    df = telemetry_archive.read_run(run_id, archive_path, columns=needed, db_path=db_path)
+    mask = pd.Series(True, index=df.index)
+    if window is not None:
+        if window[0] is not None:
+            mask &= df[window_channel] >= float(window[0])
+        if window[1] is not None:
+            mask &= df[window_channel] <= float(window[1])
+    for ch, op, value in filters:
+        # NULL-Werte erfüllen in SQL keinen Vergleich (auch nicht !=)
+        mask &= getattr(df[ch], _PANDAS_OPS[op])(value) & df[ch].notna()
+    return df.loc[mask, list(channels)].reset_index(drop=True)
+
+
+def load_channels(run_id, channels, window=None, window_channel='time_elapsed', filters=None, db_path=DB_PATH, cache=None):
+    """
+    Lädt nur die angeforderten Kanäle eines Runs in kompakten Datentypen (siehe CHANNEL_DTYPES).
+
+    :param channels: Liste der benötigten Kanäle, z.B. ['time_elapsed', 'speed_kmh', 'gear']
+    :param window: Optionales (start, end) Fenster auf window_channel ('time_elapsed' oder 'lap_distance')
+    :param filters: Optionale Liste von (kanal, operator, wert), z.B. [('throttle', '>', 0.95)].
+                    Die Filter werden direkt in der SQL-Query ausgewertet.
+    """
+    run_id = int(run_id)
+    channels = list(dict.fromkeys(channels))
+    filters = [tuple(f) for f in (filters or [])]
+    sql, params = _build_channel_query(channels, window, window_channel, filters)
+
+    conn = sqlite3.connect(db_path, timeout=5.0)
+    try:
+        key = None
+        if cache is not None:
+            db_uid, _ = get_db_token(conn)
+            key = ('channels', db_uid, run_id, get_run_revision(conn, run_id),
+                   tuple(channels), tuple(window) if window is not None else None, window_channel, tuple(filters))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached.copy()
+        archive_path = get_archive_path(conn, run_id)
+        if archive_path:
+            df = _load_archived_channels(run_id, archive_path, channels, window, window_channel, filters, db_path)
+        else:
+            df = pd.read_sql_query(sql, conn, params=[run_id] + params)
+    finally:
+        conn.close()
+
+    for ch in channels:
+        if CHANNEL_DTYPES[ch].startswith('int'):
+            df[ch] = df[ch].fillna(0).astype(CHANNEL_DTYPES[ch])
+        else:
+            df[ch] = df[ch].astype(CHANNEL_DTYPES[ch])
+
+    if key is not None and key[3] is not None:
+        cache.put(key, df)
+        df = df.copy()
+    return df
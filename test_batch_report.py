@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import pandas as pd
+
+import batch_report
+import telemetry_store
+from telemetry_analysis import interval_time, sector_kpis, time_to_speed
+from test_helpers import make_report_run
+
+
+class Test_batch_report(unittest.TestCase):
+    """Batch-Report: Pool = seriell, Kennzahlen wie die Einzelfunktionen, Ausgabe als SQLite/CSV."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "report.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        self.runs = {}
+        for i in range(3):
+            conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp, run_type) VALUES (?, 'Track', '2026-01-01 10:00:00', 'DRAG')",
+                         (f"Car_{i}",))
+            df = make_report_run(seed=i)
+            cols = list(df.columns)
+            conn.executemany(f"INSERT INTO telemetry_data (run_id, sample_idx, {', '.join(cols)}) VALUES ({', '.join('?' * (len(cols) + 2))})",
+                             [(i + 1, k, *row) for k, row in enumerate(df.astype(object).itertuples(index=False))])
+            self.runs[i + 1] = df
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pool_matches_serial(self):
+        serial = batch_report.collect_tables(batch_report.iter_reports([1, 2, 3], self.db_path, workers=1))
+        pooled = batch_report.collect_tables(batch_report.iter_reports([1, 2, 3], self.db_path, workers=2, chunk_runs=1))
+        for name in batch_report.REPORT_TABLES:
+            pd.testing.assert_frame_equal(serial[name], pooled[name], obj=name)
+        self.assertEqual(serial['run_summary']['run_id'].tolist(), [1, 2, 3])
+        self.assertTrue((serial['run_summary']['shifts'] > 0).all())
+
+    def test_matches_analysis_functions(self):
+        df = telemetry_store.load_channels(2, batch_report.REPORT_CHANNELS, db_path=self.db_path)
+        (run_id, tables), = batch_report.report_runs([2], self.db_path)
+        summary = tables['run_summary'].iloc[0]
+        self.assertEqual(run_id, 2)
+        self.assertEqual(summary['vehicle_name'], 'Car_1')
+        self.assertEqual(summary['t_0_100_s'], time_to_speed(df, 100))
+        self.assertEqual(summary['t_100_250_s'], interval_time(df, 100, 250))
+        pd.testing.assert_frame_equal(tables['sector_kpis'].drop(columns=['run_id']), sector_kpis(df))
+        # Sektor 0 beginnt mit lap_distance <= 0 -> trotzdem gültig, solange Samples > 0 existieren
+        self.assertEqual(tables['sector_kpis']['sector'].tolist(), [0, 1, 2])
+
+    def test_write_sqlite_and_csv(self):
+        tables = batch_report.collect_tables(batch_report.iter_reports([1, 3], self.db_path, workers=1))
+        target = os.path.join(self.tmp.name, "out.db")
+        self.assertEqual(batch_report.write_tables(tables, target, 'sqlite'), 'sqlite')
+        conn = sqlite3.connect(target)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM run_summary").fetchone()[0], 2)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM shift_events").fetchone()[0], len(tables['shift_events']))
+        conn.close()
+
+        out_dir = os.path.join(self.tmp.name, "csv")
+        self.assertEqual(batch_report.write_tables(tables, out_dir, 'csv'), 'csv')
+        self.assertEqual(sorted(os.listdir(out_dir)), sorted(f"{name}.csv" for name in batch_report.REPORT_TABLES))
+        self.assertEqual(len(pd.read_csv(os.path.join(out_dir, "gear_accel.csv"))), len(tables['gear_accel']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import batch_report
+import channel_math
+import telemetry_store
+from channel_math import ChannelExpressionError, compile_expression
+from telemetry_store import TelemetryCache
+from test_helpers import make_report_run
+
+
+class Test_channel_math(unittest.TestCase):
+    """Math-Kanäle: sichere Ausdrücke, vektorisierte Auswertung wie die entsprechenden pandas-Operationen, Cache pro Run."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "math.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp, run_type) VALUES ('Car', 'Track', '2026-01-01 10:00:00', 'DRAG')")
+        self.df = make_report_run(seed=3)
+        cols = list(self.df.columns)
+        conn.executemany(f"INSERT INTO telemetry_data (run_id, sample_idx, {', '.join(cols)}) VALUES ({', '.join('?' * (len(cols) + 2))})",
+                         [(1, k, *row) for k, row in enumerate(self.df.astype(object).itertuples(index=False))])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_primitives_match_pandas(self):
+        df = self.df.astype({c: 'float64' for c in self.df.columns})
+        values = channel_math.evaluate(df, {
+            'g_sum': 'sqrt(lat_g**2 + lon_g**2)',
+            'd_speed': 'diff(speed_kmh)',
+            'lagged': 'lag(rpm, 3)',
+            'smooth': 'rolling(lat_g, 25)',
+            'clipped': 'clip(lat_g, -0.5, 0.5)',
+            'overlap': '(throttle > 0.5) & (lon_g < 0)',
+            'dist': 'integrate(speed_kmh / 3.6)',
+        })
+        np.testing.assert_allclose(values['g_sum'], np.hypot(df['lat_g'], df['lon_g']))
+        pd.testing.assert_series_equal(values['d_speed'], df['speed_kmh'].diff(), check_names=False)
+        pd.testing.assert_series_equal(values['lagged'], df['rpm'].shift(3), check_names=False)
+        pd.testing.assert_series_equal(values['smooth'], df['lat_g'].rolling(25, min_periods=1).mean(), check_names=False)
+        pd.testing.assert_series_equal(values['clipped'], df['lat_g'].clip(-0.5, 0.5), check_names=False)
+        np.testing.assert_array_equal(values['overlap'], ((df['throttle'] > 0.5) & (df['lon_g'] < 0)).astype(float))
+        ds = (df['speed_kmh'] / 3.6 + df['speed_kmh'].shift() / 3.6) / 2 * df['time_elapsed'].diff()
+        np.testing.assert_allclose(values['dist'], ds.fillna(0).cumsum())
+
+    def test_division_by_zero_gives_gaps(self):
+        values = channel_math.evaluate(pd.DataFrame({'rpm': [0.0, 2.0], 'speed_kmh': [10.0, 20.0]}), {'r': 'speed_kmh / rpm'})
+        self.assertTrue(np.isnan(values['r'].iloc[0]))
+        self.assertEqual(values['r'].iloc[1], 10.0)
+
+    def test_rejects_unsafe_or_unknown(self):
+        for expression in ['__import__("os").system("x")', 'lat_g.real', 'foo + 1', 'rolling(lat_g, 0)', 'lat_g[0]',
+                           'lambda: 1', '"text"', 'lat_g +', 'sqrt(lat_g, 2)']:
+            with self.subTest(expression=expression):
+                with self.assertRaises(ChannelExpressionError):
+                    compile_expression(expression)
+
+    def test_builtin_channels_compile(self):
+        for name, (expression, _, _) in channel_math.BUILTIN_CHANNELS.items():
+            with self.subTest(name=name):
+                self.assertTrue(compile_expression(expression).channels)
+
+    def test_evaluate_run_uses_derived_channels_and_cache(self):
+        cache = TelemetryCache()
+        expressions = {'yaw_abs': 'abs(yaw_rate)', 'power': 'torque * rpm / 9549'}
+        first = channel_math.evaluate_run(1, expressions, self.db_path, cache=cache)
+        self.assertEqual(list(first.columns), ['time_elapsed', 'yaw_abs', 'power'])
+        self.assertEqual(len(first), len(self.df))
+        first['power'] = 0.0  # Ergebnis ist eine Kopie, der Cache bleibt unverändert
+        second = channel_math.evaluate_run(1, expressions, self.db_path, cache=cache)
+        np.testing.assert_allclose(second['power'], self.df['torque'].astype(float) * self.df['rpm'].astype(float) / 9549, rtol=1e-6)
+
+    def test_saved_channels_and_batch_report(self):
+        channel_math.save_math_channel('lat_load', 'abs(lat_g) * speed_kmh', 'G km/h', db_path=self.db_path)
+        with self.assertRaises(ChannelExpressionError):
+            channel_math.save_math_channel('g_sum', 'lat_g', db_path=self.db_path)
+        with self.assertRaises(ChannelExpressionError):
+            channel_math.save_math_channel('bad name', 'lat_g', db_path=self.db_path)
+        self.assertFalse(channel_math.load_math_channels(self.db_path)['lat_load']['builtin'])
+
+        math = channel_math.resolve_expressions(['lat_load', 'g_sum', 'twice=2 * rpm'], self.db_path)
+        self.assertEqual(math['twice'], '2 * rpm')
+        tables = batch_report.collect_tables(batch_report.iter_reports([1], self.db_path, workers=1, math=math))
+        stats = tables[batch_report.MATH_TABLE].set_index('channel')
+        self.assertEqual(sorted(stats.index), ['g_sum', 'lat_load', 'twice'])
+        self.assertAlmostEqual(stats.loc['twice', 'max'], 2 * float(self.df['rpm'].max()), places=2)
+
+        channel_math.delete_math_channel('lat_load', self.db_path)
+        self.assertNotIn('lat_load', channel_math.load_math_channels(self.db_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import db_backup
+import telemetry_archive
+import telemetry_store
+
+
+class Test_db_backup(unittest.TestCase):
+    """Backup/Restore: eigene temporäre Datei pro Backup, nichts bleibt im Temp-Ordner liegen."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "live.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp) VALUES ('Car', 'Track', '2026-01-01 10:00:00')")
+        conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh) VALUES (1, ?, ?, ?)",
+                         [(i, i * 0.02, 100.0 + i) for i in range(100)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_backups_use_unique_files(self):
+        first = db_backup.create_backup(self.db_path)
+        second = db_backup.create_backup(self.db_path)
+        try:
+            self.assertNotEqual(first, second)
+            self.assertEqual(db_backup.validate_database(first), (True, "ok"))
+        finally:
+            os.remove(first)
+            os.remove(second)
+
+    def test_backup_is_streamed_and_removed(self):
+        reader = db_backup.open_backup(self.db_path)
+        self.assertTrue(os.path.exists(reader.path))
+        with mock.patch.object(db_backup, 'CHUNK_SIZE', 4096):
+            chunks = []
+            while True:
+                chunk = reader.read(1 << 20)
+                if not chunk:
+                    break
+                self.assertLessEqual(len(chunk), 4096)
+                chunks.append(chunk)
+        data = b"".join(chunks)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(data.startswith(b"SQLite format 3"))
+        # Nach dem vollständigen Lesen ist die temporäre Datei weg
+        self.assertTrue(reader.closed)
+        self.assertFalse(os.path.exists(reader.path))
+
+        # Abgebrochener Download: Schließen räumt ebenfalls auf
+        aborted = db_backup.open_backup(self.db_path)
+        aborted.read(100)
+        aborted.close()
+        self.assertFalse(os.path.exists(aborted.path))
+
+        restored_path = os.path.join(self.tmp.name, "restored.db")
+        telemetry_store.init_db(restored_path)
+        with open(os.path.join(self.tmp.name, "upload.db"), "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.tmp.name, "upload.db"), "rb") as f:
+            db_backup.restore_backup(f, restored_path)
+        conn = sqlite3.connect(restored_path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM telemetry_data").fetchone()[0], 100)
+        conn.close()
+
+    def test_restore_flags_runs_without_archive(self):
+        telemetry_archive.archive_run(1, self.db_path)
+        data = db_backup.open_backup(self.db_path).read()
+
+        # Backup auf einem anderen Rechner einspielen: der Archiv-Ordner fehlt dort
+        other_dir = os.path.join(self.tmp.name, "other")
+        os.makedirs(other_dir)
+        restored_path = os.path.join(other_dir, "restored.db")
+        telemetry_store.init_db(restored_path)
+        with open(os.path.join(self.tmp.name, "upload.db"), "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.tmp.name, "upload.db"), "rb") as f:
+            self.assertEqual(db_backup.restore_backup(f, restored_path), [1])
+        self.assertTrue(telemetry_store.load_runs(restored_path).empty)
+        self.assertEqual(telemetry_archive.load_summaries(restored_path)['archive_missing'].tolist(), [1])
+
+        shutil.copytree(telemetry_archive.archive_dir(self.db_path), telemetry_archive.archive_dir(restored_path))
+        self.assertEqual(telemetry_archive.verify_archives(restored_path), [])
+        self.assertEqual(telemetry_store.load_runs(restored_path)['id'].tolist(), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import tempfile
+import datetime
+import unittest
+from unittest import mock
+
+import db_maintenance
+import telemetry_store
+
+
+class Test_compaction(unittest.TestCase):
+    """Kompaktierung: der Leerlauf-Tick gibt nur inkrementell frei, die Umstellung alter Datenbanken ist manuell."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "legacy.db")
+        # Alte Datenbank ohne auto_vacuum, danach viel freier Platz durch gelöschte Telemetrie
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("VACUUM")
+        conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp) VALUES ('Car', 'Track', '2026-01-01 10:00:00')")
+        conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh) VALUES (1, ?, ?, ?)",
+                         [(i, i * 0.02, 100.0) for i in range(20_000)])
+        conn.commit()
+        conn.execute("DELETE FROM telemetry_data")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def pragma(self, name):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(f"PRAGMA {name}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_compact_step_never_vacuums_legacy_database(self):
+        freelist = self.pragma("freelist_count")
+        self.assertGreater(freelist, 0)
+        self.assertFalse(db_maintenance.compact_step(self.db_path))
+        self.assertEqual(self.pragma("freelist_count"), freelist)
+        self.assertTrue(db_maintenance.needs_incremental_vacuum(self.db_path))
+
+    def test_manual_conversion_enables_incremental_vacuum(self):
+        db_maintenance.enable_incremental_vacuum(self.db_path)
+        self.assertEqual(self.pragma("auto_vacuum"), 2)
+        self.assertEqual(self.pragma("freelist_count"), 0)
+        self.assertFalse(db_maintenance.needs_incremental_vacuum(self.db_path))
+
+
+class Test_purge_and_retention(unittest.TestCase):
+    """Tombstones, batchweise Bereinigung, Retention-Regeln und Wartung nur im Logger-Leerlauf."""
+
+    # (Fahrzeug, Zeitstempel, Samples)
+    RUNS = [('Car', '2026-01-01 10:00:00', 1_200), ('Car', '2026-02-01 10:00:00', 300), ('Car', '2026-03-01 10:00:00', 300),
+            ('Other', '2026-01-15 10:00:00', 300), ('Other', '2026-03-15 10:00:00', 300)]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "maintenance.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for run_id, (vehicle, timestamp, n) in enumerate(self.RUNS, start=1):
+            conn.execute("INSERT INTO runs (id, vehicle_name, track_name, timestamp) VALUES (?, ?, 'Track', ?)", (run_id, vehicle, timestamp))
+            conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh) VALUES (?, ?, ?, ?)",
+                             [(run_id, i, i * 0.02, 100.0) for i in range(n)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def query(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def set_logger_state(self, state):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE logger_state SET state = ? WHERE id = 1", (state,))
+        conn.commit()
+        conn.close()
+
+    def test_tombstone_hides_run_immediately(self):
+        db_maintenance.tombstone_run(1, self.db_path)
+        self.assertNotIn(1, telemetry_store.load_runs(self.db_path)['id'].tolist())
+        page, total = telemetry_store.query_runs(db_path=self.db_path)
+        self.assertNotIn(1, page['id'].tolist())
+        self.assertEqual(total, len(self.RUNS) - 1)
+        # Die Telemetrie selbst ist noch da, sie wird erst von purge_step() entfernt
+        self.assertEqual(self.query("SELECT COUNT(*) FROM telemetry_data WHERE run_id = 1")[0][0], 1_200)
+        self.assertEqual(db_maintenance.pending_purges(self.db_path), 1)
+
+    def test_purge_runs_in_bounded_batches(self):
+        db_maintenance.tombstone_run(1, self.db_path)
+        batches = []
+        while True:
+            before = self.query("SELECT MIN(sample_idx) FROM telemetry_data WHERE run_id = 1")[0][0]
+            deleted = db_maintenance.purge_step(self.db_path, batch_rows=500)
+            if deleted == 0:
+                break
+            after = self.query("SELECT MIN(sample_idx) FROM telemetry_data WHERE run_id = 1")[0][0]
+            batches.append((before, after, deleted))
+            self.assertLessEqual(deleted, 500)
+        # Zusammenhängende PK-Bereiche ab dem kleinsten sample_idx, danach verschwindet die runs-Zeile
+        self.assertEqual([(before, after) for before, after, _ in batches], [(0, 500), (500, 1_000), (1_000, None)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM runs WHERE id = 1")[0][0], 0)
+        self.assertEqual(db_maintenance.pending_purges(self.db_path), 0)
+        # Andere Runs bleiben unberührt
+        self.assertEqual(self.query("SELECT COUNT(*) FROM telemetry_data")[0][0], 4 * 300)
+
+    def test_retention_keep_last_per_vehicle(self):
+        db_maintenance.set_retention_settings({'retention_keep_last_per_vehicle': 1}, self.db_path)
+        self.assertEqual(db_maintenance.apply_retention(self.db_path), [1, 2, 4])
+        self.assertEqual(sorted(telemetry_store.load_runs(self.db_path)['id'].tolist()), [3, 5])
+
+    def test_retention_by_age(self):
+        now = datetime.datetime(2026, 3, 20)
+        db_maintenance.set_retention_settings({'retention_delete_after_days': 60, 'retention_archive_after_days': 30}, self.db_path)
+        self.assertEqual(db_maintenance.runs_to_archive(self.db_path, now=now), [1, 4, 2])
+        self.assertEqual(db_maintenance.apply_retention(self.db_path, now=now), [1, 4])
+        # Gelöschte Runs werden nicht mehr archiviert
+        self.assertEqual(db_maintenance.runs_to_archive(self.db_path, now=now), [2])
+        db_maintenance.set_retention_settings({'retention_delete_after_days': 0, 'retention_archive_after_days': 0}, self.db_path)
+        self.assertEqual(db_maintenance.runs_to_archive(self.db_path, now=now), [])
+
+    def test_scheduler_waits_for_idle_logger(self):
+        db_maintenance.tombstone_run(2, self.db_path)
+        scheduler = db_maintenance.MaintenanceScheduler(self.db_path, interval_s=0.0, budget_s=1.0)
+        self.set_logger_state("RECORDING_DRAG")
+        with mock.patch.object(db_maintenance, 'apply_retention') as retention:
+            scheduler.tick()
+        retention.assert_not_called()
+        self.assertEqual(self.query("SELECT COUNT(*) FROM telemetry_data WHERE run_id = 2")[0][0], 300)
+
+        self.set_logger_state("IDLE")
+        scheduler.tick()
+        self.assertEqual(db_maintenance.pending_purges(self.db_path), 0)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM telemetry_data WHERE run_id = 2")[0][0], 0)
+
+    def test_scheduler_respects_interval(self):
+        scheduler = db_maintenance.MaintenanceScheduler(self.db_path, interval_s=60.0)
+        with mock.patch.object(db_maintenance, 'purge_step', return_value=0) as purge:
+            scheduler.tick()
+            scheduler.tick()
+        self.assertEqual(purge.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import db_maintenance
+import telemetry_derived
+import telemetry_store
+from telemetry_analysis import analyze_run_quality, normalize_run, QUALITY_CHANNELS
+from telemetry_derived import load_derived, QUALITY_DERIVED
+from test_helpers import make_synthetic_run, reference_analyze_run_quality
+
+
+class Test_derived_channels(unittest.TestCase):
+    """Abgeleitete Kanäle: einmal berechnet und gespeichert, bei neuer Daten- oder Algorithmus-Revision neu."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "derived.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for i in range(2):
+            conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp, run_type) VALUES ('Car', 'Track', '2026-01-01 10:00:00', 'HANDLING')")
+            df = make_synthetic_run(6_000, seed=20 + i)
+            if i == 1:
+                # Start ohne Vollgas über 60 km/h -> kein Trimmen am Anfang
+                df['throttle'] = np.float32(0.5)
+            cols = list(df.columns)
+            conn.executemany(f"INSERT INTO telemetry_data (run_id, sample_idx, {', '.join(cols)}) VALUES ({', '.join('?' * (len(cols) + 2))})",
+                             [(i + 1, k, *row) for k, row in enumerate(df.astype(object).itertuples(index=False))])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stored_rows(self, run_id):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return dict(conn.execute("SELECT channel, algo_revision FROM telemetry_derived WHERE run_id = ?", (run_id,)).fetchall())
+        finally:
+            conn.close()
+
+    def test_quality_with_stored_channels_is_exact(self):
+        for run_id in (1, 2):
+            with self.subTest(run_id=run_id):
+                df = telemetry_store.load_channels(run_id, QUALITY_CHANNELS, db_path=self.db_path)
+                load_derived(run_id, QUALITY_DERIVED, db_path=self.db_path)  # berechnet und speichert
+                derived = load_derived(run_id, QUALITY_DERIVED, db_path=self.db_path)  # aus der Datenbank
+                expected_df, expected_csi, expected_crash = reference_analyze_run_quality(df.copy())
+                actual_df, actual_csi, actual_crash = analyze_run_quality(df.copy(), derived)
+                pd.testing.assert_frame_equal(actual_df, expected_df, check_exact=True)
+                self.assertEqual(actual_csi, expected_csi)
+                self.assertEqual(actual_crash, expected_crash)
+
+    def test_normalize_run_with_stored_distance(self):
+        df = telemetry_store.load_channels(1, ['time_elapsed', 'speed_kmh'], db_path=self.db_path)
+        derived = load_derived(1, ['distance_m', 'distance_cum'], db_path=self.db_path)
+        self.assertEqual(derived['distance_m'].iloc[0], 0.0)
+        np.testing.assert_allclose(derived['distance_cum'].iloc[-1], derived['distance_m'].sum(), rtol=1e-5)
+        expected = normalize_run(df, 80)
+        actual = normalize_run(df, 80, derived)
+        self.assertEqual(actual['distance_m'].iloc[0], 0.0)
+        np.testing.assert_allclose(actual['distance_cum'], expected['distance_cum'], rtol=1e-5)
+
+    def test_computed_once_and_reused(self):
+        load_derived(1, QUALITY_DERIVED, db_path=self.db_path)
+        self.assertEqual(sorted(self.stored_rows(1)), sorted(QUALITY_DERIVED))
+        with mock.patch.object(telemetry_derived.telemetry_store, 'load_channels', side_effect=AssertionError("neu berechnet")):
+            again = load_derived(1, QUALITY_DERIVED, db_path=self.db_path)
+        self.assertEqual(list(again.columns), QUALITY_DERIVED)
+        self.assertEqual(len(again), 6_000)
+
+    def test_recomputed_after_new_data_revision(self):
+        load_derived(1, ['yaw_rate'], db_path=self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE telemetry_data SET lat_g = lat_g * 2 WHERE run_id = 1")
+        conn.execute("UPDATE runs SET revision = revision + 1 WHERE id = 1")
+        conn.commit()
+        conn.close()
+        df = telemetry_store.load_channels(1, ['time_elapsed', 'speed_kmh', 'lat_g'], db_path=self.db_path)
+        expected = telemetry_derived.compute_derived(df, ['yaw_rate'])
+        np.testing.assert_array_equal(load_derived(1, ['yaw_rate'], db_path=self.db_path)['yaw_rate'], expected['yaw_rate'])
+
+    def test_recomputed_after_algorithm_change(self):
+        load_derived(1, ['r_val'], db_path=self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE telemetry_derived SET algo_revision = 'alt', data = zeroblob(length(data)) WHERE run_id = 1")
+        conn.commit()
+        conn.close()
+        r_val = load_derived(1, ['r_val'], db_path=self.db_path)['r_val']
+        self.assertEqual(self.stored_rows(1)['r_val'], telemetry_derived.kernel_revision('gear_ratio'))
+        self.assertTrue((r_val > 0).all())
+
+    def test_tombstone_removes_derived_channels(self):
+        load_derived(2, ['distance_m'], db_path=self.db_path)
+        db_maintenance.tombstone_run(2, self.db_path)
+        self.assertEqual(self.stored_rows(2), {})
+        self.assertTrue(load_derived(2, ['distance_m'], db_path=self.db_path).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
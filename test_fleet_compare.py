@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import pandas as pd
+
+import fleet_compare
+import scoring_engine
+import telemetry_store
+from test_helpers import make_report_run
+
+
+class Test_fleet_compare(unittest.TestCase):
+    """N-Wege-Vergleich: ein Load pro Run, dieselben Kennzahlen wie scoring_engine, Rangliste pro Fahrzeug."""
+
+    VEHICLES = ['Car_A', 'Car_A', 'Car_B', 'Car_B', 'Car_C', 'Car_C']
+    TYPES = ['DRAG', 'HANDLING', 'DRAG', 'HANDLING', 'DRAG', 'DRAG']
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "fleet.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for i, (vehicle, run_type) in enumerate(zip(self.VEHICLES, self.TYPES)):
+            conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp, run_type) VALUES (?, 'Track', '2026-01-01 10:00:00', ?)",
+                         (vehicle, run_type))
+            df = make_report_run(seed=i)
+            cols = list(df.columns)
+            conn.executemany(f"INSERT INTO telemetry_data (run_id, sample_idx, {', '.join(cols)}) VALUES ({', '.join('?' * (len(cols) + 2))})",
+                             [(i + 1, k, *row) for k, row in enumerate(df.astype(object).itertuples(index=False))])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fleet(self, **kwargs):
+        return dict(fleet_compare.iter_fleet(range(1, len(self.VEHICLES) + 1), self.db_path, **kwargs))
+
+    def test_pool_matches_serial(self):
+        serial = self.fleet(workers=1)
+        pooled = self.fleet(workers=3)
+        self.assertEqual(sorted(serial), sorted(pooled))
+        for run_id in serial:
+            self.assertEqual(serial[run_id]['drag'], pooled[run_id]['drag'])
+            self.assertEqual(serial[run_id]['handling'], pooled[run_id]['handling'])
+            pd.testing.assert_frame_equal(serial[run_id]['trace'], pooled[run_id]['trace'])
+        pd.testing.assert_frame_equal(fleet_compare.fleet_ranking(serial), fleet_compare.fleet_ranking(pooled))
+
+    def test_metrics_match_scoring_engine(self):
+        results = self.fleet(workers=1)
+        expected = dict(((kind, rid), m) for kind, rid, m in scoring_engine.iter_run_metrics([1, 3, 5, 6], [2, 4], self.db_path, workers=1))
+        for run_id, res in results.items():
+            kind = self.TYPES[run_id - 1]
+            self.assertEqual(res[kind.lower()], expected[(kind, run_id)])
+
+    def test_ranking_one_row_per_vehicle(self):
+        results = self.fleet(workers=1)
+        ranking = fleet_compare.fleet_ranking(results, "Technical (z.B. Imola - Grip & Accel)")
+        self.assertEqual(sorted(ranking['Fahrzeug']), ['Car_A', 'Car_B', 'Car_C'])
+        self.assertTrue(ranking['OPI'].is_monotonic_decreasing)
+        car_c = ranking.set_index('Fahrzeug').loc['Car_C']
+        # Zwei Drag-Runs: der mit der schnelleren 0-100 zählt, kein Handling-Run
+        best_drag = min((5, 6), key=lambda rid: results[rid]['drag'][0])
+        self.assertEqual(car_c['Drag-Run'], best_drag)
+        self.assertTrue(pd.isna(car_c['Handling-Run']))
+        self.assertEqual(car_c['Kurvengrip (Lat G)'], 0)
+
+    def test_opi_scores_and_weights(self):
+        bests = {'best_100': 3.0, 'best_200': 8.0, 'vmax': 300.0, 'lat': 2.0, 'brake': 2.5}
+        scores = fleet_compare.opi_scores((3.5, None, 290.0), (2.0, 0.0, 80.0, False), bests)
+        self.assertAlmostEqual(scores["Accel Low (0-100)"], 3.0 / 3.5 * 100)
+        self.assertEqual(scores["Accel High (0-200)"], 0)
+        self.assertEqual(scores["Kurvengrip (Lat G)"], 100.0)
+        self.assertEqual(scores["Konsistenz / Stabilität"], 80.0)
+        self.assertEqual(fleet_compare.track_weights("Balanced (Standard)"), fleet_compare.TRACK_WEIGHTS['Balanced'])
+        self.assertEqual(fleet_compare.track_weights("High Speed (z.B. Le Mans - Power & Aero)"), fleet_compare.TRACK_WEIGHTS['High Speed'])
+        for weights in fleet_compare.TRACK_WEIGHTS.values():
+            self.assertAlmostEqual(sum(weights), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
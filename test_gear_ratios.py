@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import db_maintenance
+import gear_ratios
+import telemetry_store
+from shift_optimizer import ShiftOptimizer
+
+# Speed / RPM je Gang des Testfahrzeugs
+CAR_R = [0.0125, 0.0165, 0.021, 0.026, 0.031, 0.036]
+
+
+def make_gear_samples(n, r_values, seed=0):
+    """Volllast-Samples über alle Gänge (R mit etwas Rauschen), dazu Teillast- und Leerlauf-Samples, die nicht zählen."""
+    rng = np.random.default_rng(seed)
+    gear = rng.integers(1, len(r_values) + 1, n)
+    rpm = rng.uniform(3500, 8000, n)
+    speed = rpm * np.asarray(r_values)[gear - 1] * (1 + rng.normal(0, 0.004, n))
+    throttle = np.where(rng.random(n) < 0.8, 1.0, 0.5)
+    gear = np.where(rng.random(n) < 0.05, 0, gear)
+    return pd.DataFrame({'time_elapsed': np.arange(n) * 0.02, 'gear': gear, 'rpm': rpm, 'torque': 500.0,
+                         'speed_kmh': speed, 'throttle': throttle})
+
+
+def reference_gear_ratios(db_path, vehicle_name):
+    """Bisherige Berechnung: Median von Speed/RPM pro Gang über alle Samples des Fahrzeugs."""
+    conn = sqlite3.connect(db_path)
+    df = pd.read_sql_query('''
+        SELECT t.gear, t.speed_kmh, t.rpm, t.torque FROM telemetry_data t JOIN runs r ON t.run_id = r.id
+        WHERE r.vehicle_name = ? AND r.deleted = 0 AND t.throttle > 0.9 AND t.rpm > 3000 AND t.speed_kmh > 10
+    ''', conn, params=(vehicle_name,))
+    conn.close()
+    df = df[df['torque'] > 0]
+    detected = (df['speed_kmh'] / df['rpm']).groupby(df['gear']).agg(['median', 'count'])
+    return detected[(detected['count'] > 20) & (detected.index > 0)]['median'].tolist()
+
+
+class Test_gear_ratios(unittest.TestCase):
+    """Gang-Übersetzungen: inkrementelle Statistik pro Fahrzeug, gleiche Werte wie der Median über die ganze Historie."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "gears.db")
+        telemetry_store.init_db(self.db_path)
+        for i, vehicle in enumerate(['Car', 'Car', 'Other']):
+            self.add_run(vehicle, make_gear_samples(4_000, CAR_R if vehicle == 'Car' else [0.02, 0.03], seed=i))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_run(self, vehicle, df, run_id=None):
+        conn = sqlite3.connect(self.db_path)
+        if run_id is None:
+            run_id = conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp) VALUES (?, 'Track', '2026-01-01 10:00:00')",
+                                  (vehicle,)).lastrowid
+        start = conn.execute("SELECT COALESCE(MAX(sample_idx) + 1, 0) FROM telemetry_data WHERE run_id = ?", (run_id,)).fetchone()[0]
+        cols = list(df.columns)
+        conn.executemany(f"INSERT INTO telemetry_data (run_id, sample_idx, {', '.join(cols)}) VALUES ({', '.join('?' * (len(cols) + 2))})",
+                         [(run_id, start + k, *row) for k, row in enumerate(df.astype(object).itertuples(index=False))])
+        conn.execute("UPDATE runs SET revision = revision + 1 WHERE id = ?", (run_id,))
+        conn.commit()
+        conn.close()
+        return run_id
+
+    def sketch_rows(self, vehicle):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT gear, bucket, count FROM gear_ratio_sketch WHERE vehicle_name = ? ORDER BY gear, bucket",
+                                (vehicle,)).fetchall()
+        finally:
+            conn.close()
+
+    def assert_matches_reference(self, vehicle):
+        expected = reference_gear_ratios(self.db_path, vehicle)
+        actual = gear_ratios.get_gear_ratios(vehicle, self.db_path)
+        self.assertEqual(len(actual), len(expected))
+        np.testing.assert_allclose(actual, expected, rtol=2 * gear_ratios.RELATIVE_ACCURACY)
+
+    def test_auto_gear_ratios_match_full_history_median(self):
+        ratios = ShiftOptimizer(self.db_path).get_auto_gear_ratios(1)
+        np.testing.assert_allclose(ratios, CAR_R, rtol=0.002)
+        self.assert_matches_reference('Car')
+        self.assertEqual(gear_ratios.get_gear_ratios('Other', self.db_path), [])
+        self.assertIsNone(ShiftOptimizer(self.db_path).get_auto_gear_ratios(99))
+
+    def test_new_run_costs_only_that_run(self):
+        gear_ratios.sync_vehicle('Car', self.db_path)
+        run_id = self.add_run('Car', make_gear_samples(3_000, CAR_R, seed=7))
+        with mock.patch.object(gear_ratios, 'run_sketch', wraps=gear_ratios.run_sketch) as sketch:
+            self.assertTrue(gear_ratios.update_run(run_id, self.db_path))
+            self.assertEqual(gear_ratios.sync_vehicle('Car', self.db_path), 0)
+            ShiftOptimizer(self.db_path).get_auto_gear_ratios(run_id)
+        self.assertEqual([c.args[0] for c in sketch.call_args_list], [run_id])
+        self.assert_matches_reference('Car')
+
+    def test_sketch_is_mergeable(self):
+        gear_ratios.sync_vehicle('Car', self.db_path)
+        merged = self.sketch_rows('Car')
+        parts = np.vstack([gear_ratios.run_sketch(run_id, self.db_path) for run_id in (1, 2)])
+        totals = pd.DataFrame(parts, columns=['gear', 'bucket', 'count']).groupby(['gear', 'bucket'])['count'].sum()
+        self.assertEqual(merged, [(g, b, c) for (g, b), c in totals.items()])
+
+    def test_grown_run_replaces_its_contribution(self):
+        gear_ratios.sync_vehicle('Car', self.db_path)
+        # Weitere Daten für Run 2 (z.B. Aufzeichnung lief beim ersten Abgleich noch), andere Übersetzung im 6. Gang
+        self.add_run('Car', make_gear_samples(6_000, CAR_R[:5] + [0.04], seed=9), run_id=2)
+        self.assertEqual(gear_ratios.sync_vehicle('Car', self.db_path), 1)
+        self.assert_matches_reference('Car')
+        n_total = sum(c for _, _, c in self.sketch_rows('Car'))
+        self.assertEqual(n_total, sum(gear_ratios.run_sketch(r, self.db_path)[:, 2].sum() for r in (1, 2)))
+
+    def test_tombstone_removes_run(self):
+        gear_ratios.sync_vehicle('Car', self.db_path)
+        before_second = self.sketch_rows('Car')
+        run_id = self.add_run('Car', make_gear_samples(3_000, [r * 1.05 for r in CAR_R], seed=11))
+        gear_ratios.update_run(run_id, self.db_path)
+        db_maintenance.tombstone_run(run_id, self.db_path)
+        self.assertEqual(self.sketch_rows('Car'), before_second)
+        self.assert_matches_reference('Car')
+        self.assertFalse(gear_ratios.update_run(run_id, self.db_path))
+
+    def test_run_without_full_throttle_is_not_reread(self):
+        df = make_gear_samples(500, CAR_R, seed=3).assign(throttle=0.2)
+        run_id = self.add_run('Car', df)
+        gear_ratios.sync_vehicle('Car', self.db_path)
+        with mock.patch.object(gear_ratios, 'run_sketch', side_effect=AssertionError("erneut gelesen")):
+            self.assertEqual(gear_ratios.sync_vehicle('Car', self.db_path), 0)
+        self.assertFalse(gear_ratios.update_run(run_id, self.db_path))
+
+    def test_recording_run_is_skipped(self):
+        gear_ratios.sync_vehicle('Car', self.db_path)
+        run_id = self.add_run('Car', make_gear_samples(3_000, CAR_R, seed=13))
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE logger_state SET state = 'RECORDING_DRAG' WHERE id = 1")
+        conn.commit()
+        with mock.patch.object(gear_ratios, 'run_sketch', side_effect=AssertionError("laufende Aufzeichnung gelesen")):
+            self.assertEqual(gear_ratios.sync_vehicle('Car', self.db_path), 0)
+        conn.execute("UPDATE logger_state SET state = 'IDLE' WHERE id = 1")
+        conn.commit()
+        conn.close()
+        self.assertEqual(gear_ratios.sync_vehicle('Car', self.db_path), 1)
+        self.assertFalse(gear_ratios.update_run(run_id, self.db_path))
+        self.assert_matches_reference('Car')
+
+    def test_sketch_quantile_accuracy(self):
+        rng = np.random.default_rng(5)
+        values = rng.lognormal(-3.5, 0.3, 10_001)
+        buckets, counts = np.unique(gear_ratios.sketch_buckets(values), return_counts=True)
+        self.assertAlmostEqual(gear_ratios.sketch_quantile(buckets, counts), np.median(values),
+                               delta=np.median(values) * gear_ratios.RELATIVE_ACCURACY)
+        self.assertIsNone(gear_ratios.sketch_quantile([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import lap_align
+import telemetry_store
+
+TRACK_M = 1000.0
+
+
+def make_lap_session(lap_speeds_kmh, start_m=600.0, hz=50.0):
+    """
+    Run über mehrere Runden mit konstanter Geschwindigkeit je Runde. Startet mitten in einer Runde (Out-Lap
+    ab start_m mit der ersten Geschwindigkeit), danach je eine Runde pro Eintrag in lap_speeds_kmh und eine
+    angefangene In-Lap bis 300 m.
+    """
+    segments = [(start_m, TRACK_M, lap_speeds_kmh[0])] + [(0.0, TRACK_M, v) for v in lap_speeds_kmh] + [(0.0, 300.0, lap_speeds_kmh[-1])]
+    t, d, v = [], [], []
+    clock = 0.0
+    for d0, d1, speed in segments:
+        step = speed / 3.6 / hz
+        # Erstes Sample je Runde knapp hinter der Linie (wie beim echten Logger)
+        dist = d0 + (0.3 * step if d0 == 0 else 0.0)
+        while dist < d1:
+            t.append(clock)
+            d.append(dist)
+            v.append(speed)
+            clock += 1.0 / hz
+            dist += step
+        clock += (d1 - (dist - step)) / (speed / 3.6) - 1.0 / hz + (0.3 * step) / (speed / 3.6)
+    return pd.DataFrame({'time_elapsed': t, 'speed_kmh': v, 'lap_distance': d}).astype('float32')
+
+
+class Test_lap_align(unittest.TestCase):
+    """Runden-Ausrichtung: Aufteilung an der Linie, Rundenzeiten, Deltas über Distanz und Referenzrunden."""
+
+    SPEEDS = [180.0, 200.0, 190.0, 210.0]
+
+    def test_split_and_lap_times(self):
+        grids = lap_align.lap_grids(make_lap_session(self.SPEEDS))
+        laps = grids['laps']
+        self.assertEqual(len(laps), len(self.SPEEDS) + 2)
+        self.assertEqual(laps['complete'].tolist(), [False] + [True] * len(self.SPEEDS) + [False])
+        expected = [TRACK_M / (v / 3.6) for v in self.SPEEDS]
+        np.testing.assert_allclose(laps.loc[laps['complete'], 'lap_time_s'], expected, atol=0.02)
+        self.assertEqual(grids['time'].shape, (len(laps), len(grids['distance'])))
+        # Out-Lap nur ab 600 m belegt, In-Lap nur bis 300 m
+        self.assertTrue(np.isnan(grids['time'][0, grids['distance'] < 590]).all())
+        self.assertTrue(np.isnan(grids['time'][-1, grids['distance'] > 310]).all())
+        self.assertEqual(lap_align.best_lap(grids), 4)
+
+    def test_delta_time_and_speed_against_references(self):
+        grids = lap_align.lap_grids(make_lap_session(self.SPEEDS))
+        rolling = lap_align.compare_laps([("A", grids)], 'rolling')
+        # Runde 1 gegen sich selbst, Runde 2 gegen 1, Runde 3 gegen 2 (schneller als 1), Runde 4 gegen 2
+        self.assertEqual(rolling['laps']['reference'].tolist(), ["A R2", "A R2", "A R3", "A R3"])
+        self.assertEqual(rolling['laps']['lap'].tolist(), [2, 3, 4, 5])
+        d = rolling['distance']
+        mid = np.searchsorted(d, 500.0)
+        # Konstante Geschwindigkeiten -> Delta wächst linear mit der Distanz
+        expected_mid = 500.0 / (190.0 / 3.6) - 500.0 / (200.0 / 3.6)
+        self.assertAlmostEqual(rolling['delta_time'][2, mid], expected_mid, delta=0.01)
+        np.testing.assert_allclose(rolling['delta_speed'][2], -10.0, atol=1e-3)
+        np.testing.assert_allclose(rolling['delta_time'][0], 0.0)
+
+        best = lap_align.compare_laps([("A", grids)], 'best')
+        self.assertEqual(set(best['laps']['reference']), {"A R5"})
+        self.assertTrue((best['laps']['delta_s'] >= 0).all())
+        self.assertAlmostEqual(best['laps']['delta_s'].iloc[0], TRACK_M / 50.0 - TRACK_M / (210.0 / 3.6), delta=0.02)
+
+    def test_compare_across_runs_uses_common_grid(self):
+        grids_a = lap_align.lap_grids(make_lap_session([200.0, 205.0]))
+        grids_b = lap_align.lap_grids(make_lap_session([190.0]))
+        cmp = lap_align.compare_laps([("A", grids_a), ("B", grids_b)], 'best')
+        self.assertEqual(cmp['delta_time'].shape, (3, len(cmp['distance'])))
+        self.assertEqual(cmp['laps']['label'].tolist(), ["A", "A", "B"])
+        self.assertEqual(cmp['labels'][2], "B R2")
+        self.assertTrue(lap_align.compare_laps([("X", lap_align.lap_grids(make_lap_session([200.0]).iloc[:10]))])['laps'].empty)
+
+    def test_time_delta_over_distance(self):
+        t = np.arange(0, 20, 0.02)
+        dist_a = 30.0 * t
+        dist_b = 25.0 * t
+        grid, delta = lap_align.time_delta_over_distance(dist_a, t, dist_b, t, step=5.0)
+        self.assertAlmostEqual(grid[-1], dist_b[-1], delta=5.0)
+        np.testing.assert_allclose(delta, grid / 30.0 - grid / 25.0, atol=1e-9)
+
+    def test_cached_per_run_revision(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "laps.db")
+            telemetry_store.init_db(db_path)
+            conn = sqlite3.connect(db_path)
+            conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp, run_type) VALUES ('Car', 'Track', '2026-01-01 10:00:00', 'HANDLING')")
+            df = make_lap_session([200.0, 210.0])
+            conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh, lap_distance) VALUES (1, ?, ?, ?, ?)",
+                             [(k, *row) for k, row in enumerate(df.astype(object).itertuples(index=False))])
+            conn.commit()
+            conn.close()
+
+            cache = telemetry_store.TelemetryCache()
+            first = lap_align.load_lap_grids(1, db_path=db_path, cache=cache)
+            self.assertIs(lap_align.load_lap_grids(1, db_path=db_path, cache=cache), first)
+            self.assertGreater(cache.current_bytes, first['time'].nbytes)
+            pd.testing.assert_frame_equal(first['laps'], lap_align.lap_grids(df)['laps'])
+
+
+if __name__ == '__main__':
+    unittest.main()
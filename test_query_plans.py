@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import db_maintenance
+import gear_ratios
+import shift_optimizer
+import telemetry_store
+
+
+def explain(conn, sql, params=()):
+    """Liefert den Query-Plan als einen String (eine Zeile pro Schritt)."""
+    return "\n".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+class Test_query_plans(unittest.TestCase):
+    """Stellt sicher, dass die heißen Queries Primärschlüssel bzw. Indexe nutzen (kein SCAN über telemetry_data)."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "plans.db")
+        telemetry_store.init_db(self.db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp) VALUES ('Car', 'Track', '2026-01-01 10:00:00')")
+        self.conn.executemany(
+            "INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, gear, rpm, torque, speed_kmh, throttle) VALUES (1, ?, ?, 3, ?, 500, ?, 1.0)",
+            [(i, i * 0.02, 4000 + i, 100 + i * 0.1) for i in range(200)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_legacy_single_column_indexes_dropped(self):
+        indexes = {r[0] for r in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertNotIn('idx_speed_kmh', indexes)
+        self.assertNotIn('idx_time_elapsed', indexes)
+        self.assertNotIn('idx_telemetry_run_time', indexes)
+        self.assertIn('idx_runs_vehicle', indexes)
+
+    def test_telemetry_table_is_clustered(self):
+        sql = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'telemetry_data'").fetchone()[0]
+        self.assertIn("WITHOUT ROWID", sql)
+
+    def test_load_telemetry_is_ordered_primary_key_scan(self):
+        plan = explain(self.conn, "SELECT * FROM telemetry_data WHERE run_id = ? ORDER BY sample_idx", (1,))
+        self.assertIn("USING PRIMARY KEY (run_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_load_channels_window_stays_within_run(self):
+        sql, params = telemetry_store._build_channel_query(['time_elapsed', 'speed_kmh'], (10.0, 20.0), 'time_elapsed', [])
+        plan = explain(self.conn, sql, [1] + params)
+        self.assertIn("USING PRIMARY KEY (run_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_torque_curve_uses_covering_full_throttle_index(self):
+        plan = explain(self.conn, shift_optimizer.TORQUE_CURVE_QUERY, (1,))
+        self.assertIn("COVERING INDEX idx_telemetry_full_throttle (run_id=? AND rpm>?)", plan)
+        # Das Index-Layout liefert die Daten bereits nach rpm sortiert
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_gear_ratio_sync_uses_vehicle_index(self):
+        plan = explain(self.conn, gear_ratios.STALE_RUNS_QUERY, ('Car',))
+        self.assertIn("idx_runs_vehicle (vehicle_name=?)", plan)
+        self.assertIn("SEARCH g USING INTEGER PRIMARY KEY", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_purge_batch_is_primary_key_range(self):
+        plan = explain(self.conn, db_maintenance.PURGE_BATCH_SQL, (1, db_maintenance.PURGE_BATCH_ROWS))
+        self.assertIn("USING PRIMARY KEY (run_id=? AND sample_idx<?)", plan)
+
+
+class Test_clustered_migration(unittest.TestCase):
+    """Alte rowid-Tabellen werden beim Start in die geclusterte Tabelle überführt."""
+
+    def test_legacy_table_is_migrated_in_insert_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "legacy.db")
+            conn = sqlite3.connect(db_path)
+            conn.execute("CREATE TABLE runs (id INTEGER PRIMARY KEY AUTOINCREMENT, vehicle_name TEXT, vehicle_class TEXT, track_name TEXT, timestamp DATETIME)")
+            conn.execute("CREATE TABLE telemetry_data (run_id INTEGER, time_elapsed REAL, gear INTEGER, rpm REAL, torque REAL, speed_kmh REAL, throttle REAL)")
+            conn.execute("INSERT INTO runs (vehicle_name) VALUES ('A'), ('B')")
+            # Zwei Runs verschränkt geschrieben
+            conn.executemany("INSERT INTO telemetry_data (run_id, time_elapsed, rpm) VALUES (?, ?, ?)",
+                             [(1 + i % 2, i // 2 * 0.02, 1000 + i) for i in range(10)])
+            conn.commit()
+            conn.close()
+
+            telemetry_store.init_db(db_path)
+            df = telemetry_store.load_telemetry(2, db_path=db_path)
+            self.assertEqual(df['sample_idx'].tolist(), [0, 1, 2, 3, 4])
+            self.assertEqual(df['rpm'].tolist(), [1001, 1003, 1005, 1007, 1009])
+            conn = sqlite3.connect(db_path)
+            self.assertIn("WITHOUT ROWID", conn.execute("SELECT sql FROM sqlite_master WHERE name = 'telemetry_data'").fetchone()[0])
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM telemetry_data").fetchone()[0], 10)
+            conn.close()
+
+
+class Test_run_search(unittest.TestCase):
+    """Garage-Liste: FTS-Index bleibt über Trigger synchron, Seiten werden in SQL geschnitten."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "search.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany("INSERT INTO runs (vehicle_name, vehicle_class, track_name, timestamp, run_type) VALUES (?, 'GT3', ?, ?, 'DRAG')",
+                         [(f"Car_{i % 2}", "Spa" if i % 3 else "Monza", f"2026-01-{1 + i:02d} 10:00:00") for i in range(25)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_paging_and_filters(self):
+        page, total = telemetry_store.query_runs(filters={'vehicle_name': 'Car_1'}, page=1, page_size=5, db_path=self.db_path)
+        self.assertEqual(total, 12)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(page['timestamp'].tolist(), sorted(page['timestamp'], reverse=True))
+        _, total = telemetry_store.query_runs(filters={'date_from': '2026-01-10', 'date_to': '2026-01-11'}, db_path=self.db_path)
+        self.assertEqual(total, 2)
+
+    def test_run_type_lists_ids_and_values(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE runs SET run_type = 'QUICK_SHIFT_TEST' WHERE id = 1")
+        conn.execute("UPDATE runs SET run_type = 'HANDLING' WHERE id = 2")
+        conn.execute("UPDATE runs SET archive_missing = 1 WHERE id = 4")
+        conn.commit()
+        conn.close()
+        drag = {'run_type': ['DRAG', 'QUICK_SHIFT%']}
+        self.assertEqual(telemetry_store.count_runs(filters=drag, db_path=self.db_path), 24)
+        self.assertEqual(telemetry_store.count_runs(filters={**drag, 'selectable': True}, db_path=self.db_path), 23)
+        self.assertEqual(telemetry_store.count_runs(filters={'run_type': []}, db_path=self.db_path), 0)
+        page, _ = telemetry_store.query_runs(filters={'ids': [2, 7, 99]}, page_size=None, db_path=self.db_path)
+        self.assertEqual(sorted(page['id']), [2, 7])
+
+        ids = telemetry_store.query_run_values('id', filters={**drag, 'vehicle_name': 'Car_0'}, db_path=self.db_path)
+        self.assertEqual(ids, list(range(25, 0, -2)))
+        self.assertEqual(telemetry_store.query_run_values('vehicle_name', "monza", db_path=self.db_path), ['Car_0', 'Car_1'])
+        self.assertEqual(telemetry_store.query_run_values('vehicle_name', filters={'vehicle_name': ['Car_1']}, db_path=self.db_path), ['Car_1'])
+        with self.assertRaises(ValueError):
+            telemetry_store.query_run_values('notes', db_path=self.db_path)
+
+    def test_fts_follows_updates_and_deletes(self):
+        self.assertEqual(telemetry_store.count_runs("mon", db_path=self.db_path), 9)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE runs SET notes = 'Regen, weiches Setup' WHERE id = 3")
+        conn.commit()
+        self.assertEqual(telemetry_store.query_runs("regen setup", db_path=self.db_path)[0]['id'].tolist(), [3])
+        conn.execute("DELETE FROM runs WHERE id = 3")
+        conn.commit()
+        conn.close()
+        self.assertEqual(telemetry_store.count_runs("regen", db_path=self.db_path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
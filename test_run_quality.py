@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from telemetry_analysis import analyze_run_quality
+from test_helpers import make_synthetic_run, reference_analyze_run_quality
+
+
+class Test_analyze_run_quality_golden(unittest.TestCase):
+    """Die vektorisierte Version muss exakt dieselben Ergebnisse liefern wie die zeilenweise Referenz."""
+
+    def assert_same(self, df):
+        expected_df, expected_csi, expected_crash = reference_analyze_run_quality(df.copy())
+        actual_df, actual_csi, actual_crash = analyze_run_quality(df.copy())
+        pd.testing.assert_frame_equal(actual_df, expected_df, check_exact=True)
+        self.assertEqual(actual_csi, expected_csi)
+        self.assertEqual(actual_crash, expected_crash)
+
+    def test_compact_float32_runs(self):
+        for seed, n in [(0, 3_000), (1, 10_000), (2, 25_000), (3, 700)]:
+            with self.subTest(seed=seed, n=n):
+                self.assert_same(make_synthetic_run(n, seed))
+
+    def test_full_float64_frame_with_extra_columns(self):
+        df = make_synthetic_run(8_000, seed=4, dtype='float64')
+        df.insert(0, 'run_id', 7)
+        df.insert(1, 'sample_idx', np.arange(len(df)))
+        df['gear'] = 3
+        df['sector'] = 1
+        self.assert_same(df)
+
+    def test_without_lon_g(self):
+        self.assert_same(make_synthetic_run(6_000, seed=5).drop(columns=['lon_g']))
+
+    def test_with_brake_channel(self):
+        df = make_synthetic_run(6_000, seed=6)
+        df['brake'] = np.where(np.arange(len(df)) % 700 < 100, 0.8, 0.0).astype('float32')
+        self.assert_same(df)
+
+    def test_object_rows(self):
+        df = make_synthetic_run(3_000, seed=7)
+        df['vehicle_name'] = 'Car'
+        self.assert_same(df)
+
+    def test_unsorted_time_and_nan(self):
+        df = make_synthetic_run(5_000, seed=8)
+        df.loc[2_000:2_100, 'time_elapsed'] -= 3.0
+        df.loc[3_000:3_010, 'lat_g'] = np.nan
+        self.assert_same(df)
+
+    def test_non_contiguous_index(self):
+        df = make_synthetic_run(5_000, seed=9)
+        df.index = df.index * 2 + 100
+        self.assert_same(df)
+
+    def test_standing_and_short_runs(self):
+        standing = make_synthetic_run(2_000, seed=10)
+        standing['speed_kmh'] = np.float32(5.0)
+        self.assert_same(standing)
+        self.assert_same(make_synthetic_run(8, seed=11))
+        self.assert_same(make_synthetic_run(8, seed=11).iloc[:0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import scoring_engine
+import telemetry_store
+from test_helpers import make_synthetic_run
+
+
+class Test_scoring_engine(unittest.TestCase):
+    """Prozess-Pool und serieller Pfad liefern dieselben Kennzahlen."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "scoring.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for i, run_type in enumerate(['DRAG', 'DRAG', 'HANDLING', 'HANDLING', 'HANDLING']):
+            conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp, run_type) VALUES (?, 'Track', '2026-01-01 10:00:00', ?)",
+                         (f"Car_{i}", run_type))
+            df = make_synthetic_run(3_000, seed=i, dtype='float64')
+            conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh, throttle, rpm, lat_g, lon_g, steering_angle) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             [(i + 1, k, *row) for k, row in enumerate(df.itertuples(index=False))])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pool_matches_serial(self):
+        serial = list(scoring_engine.iter_run_metrics([1, 2], [3, 4, 5], self.db_path, workers=1))
+        pooled = list(scoring_engine.iter_run_metrics([1, 2], [3, 4, 5], self.db_path, workers=2, chunk_runs=1))
+        self.assertEqual(len(serial), 5)
+        self.assertEqual(sorted(serial), sorted(pooled))
+        self.assertEqual(scoring_engine.global_bests(serial), scoring_engine.global_bests(pooled))
+
+    def test_matches_direct_metrics(self):
+        df = telemetry_store.load_channels(3, scoring_engine.QUALITY_CHANNELS, db_path=self.db_path)
+        expected = scoring_engine.handling_metrics(df)
+        (_, run_id, metrics), = scoring_engine.iter_run_metrics(handling_ids=[3], db_path=self.db_path)
+        self.assertEqual(run_id, 3)
+        self.assertEqual(metrics, tuple(v.item() if hasattr(v, 'item') else v for v in expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
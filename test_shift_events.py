@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from telemetry_analysis import extract_shift_events, SHIFT_EVENT_DTYPES
+from test_helpers import make_shift_run
+
+
+def reference_extract_shift_metrics(df):
+    """Frühere iterrows-Implementierung aus der Getriebe-Analyse (Referenz, unverändert übernommen)."""
+    metrics = []
+    df = df.reset_index(drop=True)
+    gear_changes = df[df['gear'].diff() > 0]
+
+    for idx, row in gear_changes.iterrows():
+        if idx == 0: continue
+        gear_from = df.loc[idx-1, 'gear']
+        gear_to = row['gear']
+        shift_time = row['time_elapsed']
+
+        window = df[(df['time_elapsed'] >= shift_time - 0.4) & (df['time_elapsed'] <= shift_time + 0.4)]
+        if window.empty: continue
+
+        avg_torque = 2000
+        target_gear_data = df[(df['gear'] == gear_to) & (df['throttle'] > 0.9)]
+        if not target_gear_data.empty:
+            avg_t = target_gear_data['torque'].quantile(0.8)
+            if avg_t > 0: avg_torque = avg_t
+
+        drop_threshold = avg_torque * 0.4
+
+        dip_window = window[window['torque'] < drop_threshold]
+
+        if not dip_window.empty:
+            latency = dip_window['time_elapsed'].max() - dip_window['time_elapsed'].min()
+            latency_ms = latency * 1000
+            recover_df = window[(window['time_elapsed'] > dip_window['time_elapsed'].max()) & (window['torque'] >= drop_threshold)]
+            rpm_land = recover_df.iloc[0]['rpm'] if not recover_df.empty else row['rpm']
+        else:
+            latency_ms = 0.0
+            rpm_land = row['rpm']
+
+        metrics.append({
+            'gear_from': int(gear_from),
+            'gear_to': int(gear_to),
+            'time': shift_time,
+            'latency_ms': latency_ms,
+            'rpm_land': rpm_land
+        })
+    return metrics
+
+
+class Test_extract_shift_events(unittest.TestCase):
+    """Die searchsorted-Fenster liefern dieselben Schaltkennzahlen wie die frühere Schleife."""
+
+    def assert_same(self, df):
+        expected = pd.DataFrame(reference_extract_shift_metrics(df.copy()), columns=['gear_from', 'gear_to', 'time', 'latency_ms', 'rpm_land'])
+        actual = extract_shift_events(df.copy())
+        self.assertEqual(dict(actual.dtypes.astype(str)), SHIFT_EVENT_DTYPES)
+        self.assertEqual(actual['gear_from'].tolist(), expected['gear_from'].tolist())
+        self.assertEqual(actual['gear_to'].tolist(), expected['gear_to'].tolist())
+        for col in ('time', 'latency_ms', 'rpm_land'):
+            np.testing.assert_array_equal(actual[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float), err_msg=col)
+        self.assertTrue((actual['speed_loss_kmh'] >= 0).all())
+
+    def test_matches_reference(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.assert_same(make_shift_run(seed=seed))
+
+    def test_normalized_run_with_float64_columns(self):
+        df = make_shift_run(seed=3)
+        df = df[df['speed_kmh'] >= 50].copy()
+        df['time_elapsed'] -= df['time_elapsed'].iloc[0]
+        df['distance_cum'] = (df['speed_kmh'].astype('float64') / 3.6 * 0.02).cumsum()
+        self.assert_same(df)
+
+    def test_unsorted_time_and_downshifts(self):
+        df = make_shift_run(seed=4)
+        df.loc[1_000:1_050, 'gear'] -= 1
+        df.loc[1_500:1_520, 'time_elapsed'] -= 1.0
+        self.assert_same(df)
+
+    def test_no_shifts(self):
+        df = make_shift_run(seed=5).assign(gear=np.int8(3))
+        events = extract_shift_events(df)
+        self.assertTrue(events.empty)
+        self.assertEqual(dict(events.dtypes.astype(str)), SHIFT_EVENT_DTYPES)
+
+
+if __name__ == '__main__':
+    unittest.main()
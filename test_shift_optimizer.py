@@ -0,0 +1,165 @@
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import shift_optimizer
+from shift_optimizer import binned_quantile, engine_torque_envelope, ShiftOptimizer
+
+GEAR_RATIOS = [2.5, 1.9, 1.5, 1.2, 1.0, 0.85]
+FINAL_DRIVE = 3.4
+
+
+def make_full_throttle_samples(n, seed=0):
+    """Volllast-Samples wie aus TORQUE_CURVE_QUERY: rpm aufsteigend, Gänge inkl. Leerlauf/Rückwärts/ungültig."""
+    rng = np.random.default_rng(seed)
+    rpm = np.sort(rng.uniform(2000, 8500, n))
+    return pd.DataFrame({
+        'rpm': rpm,
+        'torque': (rng.random(n) * 8000).astype('float32'),
+        'gear': rng.integers(-1, 9, n),
+        'speed_kmh': (rpm / 40).astype('float32'),
+    })
+
+
+def reference_torque_envelope(df, gear_ratios, final_drive, mass_kg=1200.0, wheel_radius_m=0.33):
+    """Bisherige Implementierung (zeilenweise apply + groupby-Quantil) als Referenz."""
+    df = df.copy()
+
+    def calc_engine_torque(row):
+        g = int(row['gear'])
+        ratio = gear_ratios[g - 1] if 1 <= g <= len(gear_ratios) else gear_ratios[-1]
+        a = row['torque'] / 1000.0
+        return mass_kg * a * wheel_radius_m / (ratio * final_drive)
+
+    df['engine_torque'] = df.apply(calc_engine_torque, axis=1)
+    df['rpm_rounded'] = (df['rpm'] / 50).round() * 50
+    return df.groupby('rpm_rounded')['engine_torque'].quantile(0.95).reset_index()
+
+
+def make_torque_curve():
+    """Parabolische Drehmomentkurve mit Peak bei 6000 RPM (wie shift_optimizer.test)."""
+    rpm = np.arange(3000, 8500, 100)
+    return pd.DataFrame({'rpm_rounded': rpm, 'torque_smoothed': 400 - ((rpm - 6000) / 100) ** 2 * 0.5})
+
+
+def reference_shift_rpms(torque_curve_df, gear_ratios):
+    """Bisherige Rastersuche (10-RPM-Schritte, Schleife von oben) als Referenz."""
+    from scipy.interpolate import interp1d
+    rpms = torque_curve_df['rpm_rounded'].values
+    torque_func = interp1d(rpms, torque_curve_df['torque_smoothed'].values, kind='cubic', fill_value="extrapolate")
+    min_rpm, max_rpm = max(rpms.min(), 3000), rpms.max()
+    fine_rpms = np.arange(min_rpm, max_rpm, 10)
+    result = []
+    for i in range(len(gear_ratios) - 1):
+        wf_current = torque_func(fine_rpms) * gear_ratios[i]
+        wf_next = torque_func(fine_rpms * gear_ratios[i + 1] / gear_ratios[i]) * gear_ratios[i + 1]
+        shift_rpm = max_rpm
+        for j in range(len(fine_rpms) - 1, 0, -1):
+            if wf_current[j] > wf_next[j]:
+                shift_rpm = fine_rpms[j]
+                break
+        if shift_rpm == fine_rpms[0] or shift_rpm > max_rpm - 50:
+            shift_rpm = max_rpm
+        result.append(shift_rpm)
+    return np.array(result, dtype=float)
+
+
+class Test_shift_optimizer(unittest.TestCase):
+    """Drehmoment-Rekonstruktion: vektorisiert identisch zur zeilenweisen Berechnung und schnell auf langen Historien."""
+
+    def test_envelope_matches_row_wise_reference(self):
+        df = make_full_throttle_samples(20_000)
+        expected = reference_torque_envelope(df, GEAR_RATIOS, FINAL_DRIVE, mass_kg=1245.0, wheel_radius_m=0.35)
+        actual = engine_torque_envelope(df, GEAR_RATIOS, FINAL_DRIVE, mass_kg=1245.0, wheel_radius_m=0.35)
+        np.testing.assert_array_equal(actual['rpm_rounded'], expected['rpm_rounded'])
+        np.testing.assert_allclose(actual['engine_torque'], expected['engine_torque'], rtol=1e-12)
+
+    def test_invalid_gears_use_last_ratio(self):
+        torque = shift_optimizer.engine_torque([1000.0] * 5, [0, -1, 7, np.nan, 2], GEAR_RATIOS, FINAL_DRIVE, mass_kg=1000.0, wheel_radius_m=1.0)
+        expected_last = 1000.0 / (GEAR_RATIOS[-1] * FINAL_DRIVE)
+        np.testing.assert_allclose(torque, [expected_last] * 4 + [1000.0 / (GEAR_RATIOS[1] * FINAL_DRIVE)])
+
+    def test_gear_ratios_keyword(self):
+        # Öffentliche Schnittstelle: Aufrufer übergeben die Übersetzungen auch per Keyword
+        curve = make_torque_curve()
+        optimizer = ShiftOptimizer()
+        points, _, _ = optimizer.calculate_ideal_shift_points(curve, gear_ratios=GEAR_RATIOS, final_drive=FINAL_DRIVE)
+        self.assertEqual(points, optimizer.calculate_ideal_shift_points(curve, GEAR_RATIOS, FINAL_DRIVE)[0])
+        shift_rpms = np.array([p['shift_rpm'] for p in points])
+        losses = optimizer.calculate_shift_losses(curve, gear_ratios=GEAR_RATIOS, final_drive=FINAL_DRIVE, shift_rpms=shift_rpms)
+        np.testing.assert_allclose(losses, 0.0, atol=1e-6)
+        df = make_full_throttle_samples(1_000)
+        pd.testing.assert_frame_equal(engine_torque_envelope(df, gear_ratios=GEAR_RATIOS, final_drive=FINAL_DRIVE),
+                                      engine_torque_envelope(df, GEAR_RATIOS, FINAL_DRIVE))
+
+    def test_binned_quantile_matches_pandas(self):
+        rng = np.random.default_rng(1)
+        bins = rng.integers(-5, 30, 5_000)
+        values = rng.normal(size=5_000)
+        values[::7] = values[3]  # Duplikate
+        for q in (0.0, 0.3, 0.5, 0.95, 1.0):
+            with self.subTest(q=q):
+                expected = pd.Series(values).groupby(bins).quantile(q)
+                keys, actual = binned_quantile(bins, values, q)
+                np.testing.assert_array_equal(keys, expected.index)
+                np.testing.assert_allclose(actual, expected.to_numpy(), rtol=1e-12)
+        keys, actual = binned_quantile(np.zeros(0), np.zeros(0), 0.95)
+        self.assertEqual((len(keys), len(actual)), (0, 0))
+
+    def test_envelope_on_long_history_is_fast(self):
+        df = make_full_throttle_samples(3_000_000, seed=2)
+        start = time.perf_counter()
+        curve = engine_torque_envelope(df, GEAR_RATIOS, FINAL_DRIVE)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(len(curve), 131)
+
+    def test_shift_points_refine_grid_search(self):
+        curve = make_torque_curve()
+        points, rpms, forces = ShiftOptimizer().calculate_ideal_shift_points(curve, GEAR_RATIOS, FINAL_DRIVE, wheel_radius_m=0.35)
+        shift = np.array([p['shift_rpm'] for p in points])
+        grid_shift = reference_shift_rpms(curve, GEAR_RATIOS)
+        # Exakter Schnittpunkt liegt im 10-RPM-Intervall über dem letzten Rasterpunkt der alten Suche
+        self.assertTrue(((shift >= grid_shift) & (shift <= grid_shift + 10)).all())
+        torque_func = shift_optimizer._torque_function(curve)
+        ratios = np.array(GEAR_RATIOS)
+        f_current = torque_func(shift) * ratios[:-1]
+        f_next = torque_func(shift * ratios[1:] / ratios[:-1]) * ratios[1:]
+        np.testing.assert_allclose(f_current, f_next, rtol=1e-5)
+        self.assertEqual(len(forces), len(GEAR_RATIOS))
+        np.testing.assert_allclose(forces[2], torque_func(rpms) * GEAR_RATIOS[2] * FINAL_DRIVE / 0.35)
+        self.assertAlmostEqual(points[0]['shift_speed_kmh'], shift[0] * 2 * np.pi / 60 * 0.35 / (GEAR_RATIOS[0] * FINAL_DRIVE) * 3.6)
+        self.assertAlmostEqual(points[0]['rpm_drop_to'], shift[0] * GEAR_RATIOS[1] / GEAR_RATIOS[0])
+
+    def test_no_crossover_revs_to_max(self):
+        # Monoton steigendes Drehmoment: der niedrigere Gang bleibt bis zum Ende stärker
+        rpm = np.arange(3000, 8000, 100)
+        curve = pd.DataFrame({'rpm_rounded': rpm, 'torque_smoothed': 100 + rpm * 0.05})
+        points, _, _ = ShiftOptimizer().calculate_ideal_shift_points(curve, GEAR_RATIOS, FINAL_DRIVE)
+        self.assertEqual([p['shift_rpm'] for p in points], [7900.0] * (len(GEAR_RATIOS) - 1))
+        np.testing.assert_array_equal(reference_shift_rpms(curve, GEAR_RATIOS), [7900.0] * (len(GEAR_RATIOS) - 1))
+        self.assertEqual(len(ShiftOptimizer().calculate_ideal_shift_points(curve, [3.0], FINAL_DRIVE)[0]), 0)
+
+    def test_shift_losses(self):
+        curve = make_torque_curve()
+        optimizer = ShiftOptimizer()
+        points, _, _ = optimizer.calculate_ideal_shift_points(curve, GEAR_RATIOS, FINAL_DRIVE)
+        optimal = np.array([p['shift_rpm'] for p in points])
+        offsets = np.array([-1000.0, -500.0, -250.0, 0.0, 250.0])
+        losses = optimizer.calculate_shift_losses(curve, GEAR_RATIOS, FINAL_DRIVE, optimal[:, None] + offsets)
+        self.assertEqual(losses.shape, (len(optimal), len(offsets)))
+        np.testing.assert_allclose(losses[:, 3], 0.0, atol=1e-6)
+        # Je weiter vom idealen Punkt entfernt, desto größer der Verlust
+        self.assertTrue((np.diff(losses[:, :4], axis=1) < 0).all())
+        self.assertTrue((losses[:, 4] > 0).all())
+        # Numerisch gegen eine feine Trapez-Integration über der Geschwindigkeit
+        torque_func = shift_optimizer._torque_function(curve)
+        rpm = np.linspace(optimal[0] - 500, optimal[0], 20_001)
+        gap = np.abs(torque_func(rpm) * GEAR_RATIOS[0] - torque_func(rpm * GEAR_RATIOS[1] / GEAR_RATIOS[0]) * GEAR_RATIOS[1]) * FINAL_DRIVE / 0.33
+        expected = shift_optimizer._trapezoid(gap, shift_optimizer.wheel_speed_kmh(rpm, GEAR_RATIOS[0], FINAL_DRIVE, 0.33))
+        self.assertAlmostEqual(losses[0, 1], expected, delta=expected * 1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+
+import bench_startup
+
+
+class Test_startup(unittest.TestCase):
+    """Kaltstart: scipy wird erst bei Bedarf geladen, der Start-Tab rendert ohne Fehler."""
+
+    def test_app_modules_defer_scipy(self):
+        imports = bench_startup.measure_imports()
+        self.assertEqual(imports['deferred_loaded'], [])
+
+    def test_first_render_of_start_tab(self):
+        res = bench_startup.measure_first_render(bench_startup.TAB_LABELS[0])
+        self.assertTrue(res['rendered'])
+        self.assertEqual(res['exception'], [])
+        self.assertEqual(res['deferred_loaded'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
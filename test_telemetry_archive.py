@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+import zipfile
+from unittest import mock
+
+import numpy as np
+
+import telemetry_archive
+import telemetry_store
+
+
+class Test_telemetry_archive(unittest.TestCase):
+    """Archiv: parallele Schreiber verlieren keine Runs, Entfernen ersetzt die Datei atomar."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "archive.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for run_id in range(1, 7):
+            conn.execute("INSERT INTO runs (id, vehicle_name, track_name, timestamp) VALUES (?, 'Car', 'Track', '2026-01-01 10:00:00')",
+                         (run_id,))
+            conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh) VALUES (?, ?, ?, ?)",
+                             [(run_id, i, i * 0.02, float(run_id * 100 + i)) for i in range(500)])
+        conn.commit()
+        conn.close()
+        self.path = os.path.join(telemetry_archive.archive_dir(self.db_path), telemetry_archive.archive_file_name('Car', '2026-01-01'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def members(self):
+        with zipfile.ZipFile(self.path) as zf:
+            return sorted(zf.namelist())
+
+    def test_parallel_writers_keep_every_run(self):
+        # Zwei Schreiber (Logger-Wartung + Dashboard) archivieren dieselben Runs desselben Monats-Archivs
+        errors = []
+
+        def worker(order):
+            try:
+                for run_id in order:
+                    telemetry_archive.archive_run(run_id, self.db_path)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(order,)) for order in ([1, 2, 3, 4, 5, 6], [6, 5, 4, 3, 2, 1])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.members(), [f"run_{i}.npz" for i in range(1, 7)])
+        self.assertEqual(telemetry_archive.verify_archives(self.db_path), [])
+        df = telemetry_archive.read_run(4, os.path.basename(self.path), db_path=self.db_path)
+        np.testing.assert_array_equal(df['speed_kmh'].to_numpy(), 400.0 + np.arange(500))
+        self.assertIsNone(telemetry_archive.archive_run(4, self.db_path))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [os.path.basename(self.path)])
+
+    def test_archive_is_written_without_holding_the_write_lock(self):
+        def append_while_others_write(path, member, data):
+            # Während Archiv-Eintrag geschrieben wird, kann der Logger ohne Wartezeit schreiben
+            conn = sqlite3.connect(self.db_path, timeout=0)
+            conn.execute("UPDATE runs SET notes = 'live' WHERE id = 2")
+            conn.commit()
+            conn.close()
+            append_member(path, member, data)
+
+        append_member = telemetry_archive._append_member
+        with mock.patch.object(telemetry_archive, '_append_member', side_effect=append_while_others_write):
+            self.assertEqual(telemetry_archive.archive_run(1, self.db_path), os.path.basename(self.path))
+        self.assertEqual(self.members(), ["run_1.npz"])
+
+    def test_run_changed_while_archiving_is_not_committed(self):
+        def change_run(sql):
+            def append(path, member, data):
+                append_member(path, member, data)
+                conn = sqlite3.connect(self.db_path)
+                conn.execute(sql)
+                conn.commit()
+                conn.close()
+            return append
+
+        append_member = telemetry_archive._append_member
+        with mock.patch.object(telemetry_archive, '_append_member', side_effect=change_run("UPDATE runs SET deleted = 1 WHERE id = 1")):
+            self.assertIsNone(telemetry_archive.archive_run(1, self.db_path))
+        self.assertFalse(os.path.exists(self.path))
+
+        with mock.patch.object(telemetry_archive, '_append_member', side_effect=change_run("UPDATE runs SET revision = revision + 1 WHERE id = 2")):
+            self.assertIsNone(telemetry_archive.archive_run(2, self.db_path))
+        conn = sqlite3.connect(self.db_path)
+        self.assertIsNone(conn.execute("SELECT archive_path FROM runs WHERE id = 2").fetchone()[0])
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM run_summary").fetchone()[0], 0)
+        conn.close()
+        # Ein neuer Versuch archiviert die aktuelle Revision
+        self.assertEqual(telemetry_archive.archive_run(2, self.db_path), os.path.basename(self.path))
+        self.assertEqual(self.members(), ["run_2.npz"])
+
+    def test_remove_run_replaces_archive(self):
+        for run_id in (1, 2):
+            telemetry_archive.archive_run(run_id, self.db_path)
+        file_name = os.path.basename(self.path)
+        telemetry_archive.remove_run(1, file_name, self.db_path)
+        self.assertEqual(self.members(), ["run_2.npz"])
+        telemetry_archive.remove_run(2, file_name, self.db_path)
+        # Leeres Archiv wird gelöscht, keine Sperr- oder Temp-Dateien bleiben liegen
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import telemetry_store
+from telemetry_store import TelemetryCache
+
+
+def frame(n, value=0.0):
+    return pd.DataFrame({'speed_kmh': np.full(n, value, dtype=np.float64)})
+
+
+class Test_TelemetryCache(unittest.TestCase):
+    """Query-Cache: LRU nach Byte-Budget, Verwerfen alter Revisionen und Trennung nach db_uid."""
+
+    def test_lru_eviction_by_byte_budget(self):
+        size = telemetry_store._entry_bytes(frame(1_000))
+        cache = TelemetryCache(max_bytes=3 * size)
+        for run_id in (1, 2, 3):
+            cache.put(('telemetry', 'db', run_id, 0), frame(1_000))
+        self.assertEqual(cache.stats()['bytes'], 3 * size)
+
+        # Zugriff auf Run 1 macht Run 2 zum ältesten Eintrag
+        self.assertIsNotNone(cache.get(('telemetry', 'db', 1, 0)))
+        cache.put(('telemetry', 'db', 4, 0), frame(1_000))
+        self.assertIsNone(cache.get(('telemetry', 'db', 2, 0)))
+        for run_id in (1, 3, 4):
+            self.assertIsNotNone(cache.get(('telemetry', 'db', run_id, 0)))
+        self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+
+        # Ein großer Eintrag verdrängt so viele alte wie nötig
+        cache.put(('telemetry', 'db', 5, 0), frame(2_500))
+        self.assertEqual(cache.stats()['entries'], 1)
+        # Größer als das ganze Budget: wird nicht gecacht
+        cache.put(('telemetry', 'db', 6, 0), frame(10_000))
+        self.assertIsNone(cache.get(('telemetry', 'db', 6, 0)))
+        self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+
+    def test_new_revision_drops_stale_entries(self):
+        cache = TelemetryCache()
+        cache.put(('telemetry', 'db', 1, 0), frame(10))
+        cache.put(('lod', 'db', 1, 0, 'time_elapsed', 'speed_kmh', 'lines', 16), frame(10))
+        cache.put(('telemetry', 'db', 2, 0), frame(10))
+        cache.put(('runs', 'db', None, 7), frame(10))
+
+        cache.put(('telemetry', 'db', 1, 1), frame(10, 1.0))
+        self.assertIsNone(cache.get(('telemetry', 'db', 1, 0)))
+        self.assertIsNone(cache.get(('lod', 'db', 1, 0, 'time_elapsed', 'speed_kmh', 'lines', 16)))
+        self.assertIsNotNone(cache.get(('telemetry', 'db', 2, 0)))
+        self.assertIsNotNone(cache.get(('runs', 'db', None, 7)))
+        self.assertEqual(cache.stats()['entries'], 3)
+
+        cache.invalidate_run(2)
+        self.assertIsNone(cache.get(('telemetry', 'db', 2, 0)))
+        self.assertEqual(cache.stats()['bytes'], sum(telemetry_store._entry_bytes(frame(10)) for _ in range(2)))
+
+    def test_entries_are_isolated_by_db_uid(self):
+        cache = TelemetryCache()
+        cache.put(('telemetry', 'db_a', 1, 0), frame(10, 1.0))
+        # Gleiche Run-ID und andere Revision in einer anderen Datenbank verdrängt nichts
+        cache.put(('telemetry', 'db_b', 1, 5), frame(10, 2.0))
+        self.assertEqual(cache.get(('telemetry', 'db_a', 1, 0))['speed_kmh'].iloc[0], 1.0)
+        self.assertEqual(cache.get(('telemetry', 'db_b', 1, 5))['speed_kmh'].iloc[0], 2.0)
+        self.assertIsNone(cache.get(('telemetry', 'db_b', 1, 0)))
+
+
+class Test_cached_loads(unittest.TestCase):
+    """load_telemetry / load_runs mit geteiltem Cache über zwei Datenbanken mit denselben Run-IDs."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_paths = []
+        for name, speed in (("a.db", 100.0), ("b.db", 200.0)):
+            db_path = os.path.join(self.tmp.name, name)
+            telemetry_store.init_db(db_path)
+            conn = sqlite3.connect(db_path)
+            conn.execute("INSERT INTO runs (id, vehicle_name, track_name, timestamp) VALUES (1, ?, 'Track', '2026-01-01 10:00:00')", (name,))
+            conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh) VALUES (1, ?, ?, ?)",
+                             [(i, i * 0.02, speed) for i in range(100)])
+            conn.commit()
+            conn.close()
+            self.db_paths.append(db_path)
+        self.cache = TelemetryCache()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_run_id_in_two_databases(self):
+        db_a, db_b = self.db_paths
+        for _ in range(2):
+            self.assertEqual(telemetry_store.load_telemetry(1, db_a, cache=self.cache)['speed_kmh'].iloc[0], 100.0)
+            self.assertEqual(telemetry_store.load_telemetry(1, db_b, cache=self.cache)['speed_kmh'].iloc[0], 200.0)
+            self.assertEqual(telemetry_store.load_runs(db_a, cache=self.cache)['vehicle_name'].tolist(), ["a.db"])
+            self.assertEqual(telemetry_store.load_runs(db_b, cache=self.cache)['vehicle_name'].tolist(), ["b.db"])
+        self.assertEqual(self.cache.stats()['entries'], 4)
+        self.assertEqual(self.cache.hits, 4)
+
+    def test_revision_change_reloads_and_evicts(self):
+        db_a, db_b = self.db_paths
+        telemetry_store.load_telemetry(1, db_a, cache=self.cache)
+        telemetry_store.load_telemetry(1, db_b, cache=self.cache)
+        conn = sqlite3.connect(db_a)
+        conn.execute("UPDATE telemetry_data SET speed_kmh = 150.0 WHERE run_id = 1")
+        conn.execute("UPDATE runs SET revision = revision + 1 WHERE id = 1")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(telemetry_store.load_telemetry(1, db_a, cache=self.cache)['speed_kmh'].iloc[0], 150.0)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.assertEqual(telemetry_store.load_telemetry(1, db_b, cache=self.cache)['speed_kmh'].iloc[0], 200.0)
+        self.assertEqual(self.cache.hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
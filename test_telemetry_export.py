@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import telemetry_archive
+import telemetry_export
+import telemetry_store
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def load_arrow(path, fmt):
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    if fmt == 'parquet':
+        return pq.read_table(path)
+    with pyarrow.ipc.open_file(path) as reader:
+        return reader.read_all()
+
+
+class Test_telemetry_export(unittest.TestCase):
+    """Export: gleiche Zeilen in allen Formaten, typisierte Spalten, Run-Metadaten, Fortschritt und Aufräumen."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "export.db")
+        telemetry_store.init_db(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        for run_id, n in [(1, 1_200), (2, 800), (3, 500)]:
+            conn.execute("INSERT INTO runs (id, vehicle_name, track_name, timestamp, run_type, notes) VALUES (?, 'Car', 'Track', '2026-01-01 10:00:00', 'DRAG', ?)",
+                         (run_id, f"Notiz {run_id}"))
+            conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh, gear) VALUES (?, ?, ?, ?, ?)",
+                             [(run_id, i, i * 0.02, 100.0 + i, 1 + i % 6) for i in range(n)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def target(self, fmt):
+        return os.path.join(self.tmp.name, f"out{telemetry_export.FORMAT_EXTENSIONS[fmt]}")
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow nicht installiert")
+    def test_formats_export_same_rows(self):
+        counts = {}
+        for fmt in ('parquet', 'arrow', 'csv'):
+            with self.subTest(fmt=fmt):
+                counts[fmt] = telemetry_export.export_runs(self.target(fmt), [1, 3], fmt, chunk_rows=300, db_path=self.db_path)
+        self.assertEqual(counts, {'parquet': 1_700, 'arrow': 1_700, 'csv': 1_700})
+
+        with open(self.target('csv'), newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], telemetry_export.EXPORT_COLUMNS)
+        self.assertEqual(len(rows) - 1, 1_700)
+        for fmt in ('parquet', 'arrow'):
+            table = load_arrow(self.target(fmt), fmt)
+            self.assertEqual(table.num_rows, 1_700)
+            np.testing.assert_array_equal(table.column('speed_kmh').to_numpy()[:3], [100.0, 101.0, 102.0])
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow nicht installiert")
+    def test_typed_columns_and_run_metadata(self):
+        telemetry_export.export_runs(self.target('parquet'), None, 'parquet', db_path=self.db_path)
+        table = load_arrow(self.target('parquet'), 'parquet')
+        self.assertEqual(table.schema.names, telemetry_export.EXPORT_COLUMNS)
+        self.assertEqual(str(table.schema.field('run_id').type), 'int32')
+        for channel, dtype in telemetry_store.CHANNEL_DTYPES.items():
+            self.assertEqual(str(table.schema.field(channel).type), {'float32': 'float', 'int8': 'int8'}[dtype], channel)
+        meta = json.loads(table.schema.metadata[b'lmu_runs'])
+        self.assertEqual([m['id'] for m in meta], [1, 2, 3])
+        self.assertEqual(meta[1]['notes'], "Notiz 2")
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow nicht installiert")
+    def test_progress_is_reported(self):
+        calls = []
+        telemetry_export.export_runs(self.target('csv'), [1, 2], 'csv', chunk_rows=500, db_path=self.db_path,
+                                     progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(calls, [(500, 2_000), (1_000, 2_000), (1_200, 2_000), (1_700, 2_000), (2_000, 2_000)])
+
+        job = telemetry_export.ExportJob([2], 'arrow', db_path=self.db_path, target_dir=self.tmp.name)
+        self.assertEqual(job.fraction, 0.0)
+        job.start()._thread.join()
+        self.assertEqual((job.status, job.rows_done, job.rows_total, job.fraction), ('done', 800, 800, 1.0))
+
+    def test_csv_fallback_without_pyarrow(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None}):
+            self.assertEqual(telemetry_export.resolve_format('parquet'), 'csv')
+            job = telemetry_export.ExportJob([3], 'parquet', db_path=self.db_path, target_dir=self.tmp.name)
+            job.start()._thread.join()
+        self.assertEqual((job.fmt, job.status), ('csv', 'done'))
+        self.assertTrue(job.path.endswith('.csv'))
+
+    def test_archived_and_missing_runs(self):
+        telemetry_archive.archive_run(2, self.db_path)
+        self.assertEqual(telemetry_export.export_runs(self.target('csv'), [2], 'csv', db_path=self.db_path), 800)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE runs SET archive_missing = 1 WHERE id = 2")
+        conn.commit()
+        conn.close()
+        self.assertEqual(telemetry_export.export_runs(self.target('csv'), None, 'csv', db_path=self.db_path), 1_700)
+        self.assertEqual(telemetry_export.export_runs(self.target('csv'), [1, 2], 'csv', db_path=self.db_path), 1_200)
+        with self.assertRaises(ValueError):
+            telemetry_export.export_runs(self.target('csv'), [2], 'csv', db_path=self.db_path)
+
+    def test_job_files_are_removed(self):
+        jobs = {}
+        for run_ids in ([1], [2], [99]):
+            job = telemetry_export.ExportJob(run_ids, 'csv', db_path=self.db_path, target_dir=self.tmp.name).start()
+            job._thread.join()
+            jobs[job.id] = job
+        downloaded, pending, failed = jobs.values()
+        self.assertEqual(failed.status, 'error')
+        self.assertFalse(os.path.exists(failed.path))
+
+        data = downloaded.read_download()
+        self.assertTrue(data.startswith(b"run_id,"))
+        self.assertEqual(downloaded.status, 'downloaded')
+        self.assertFalse(os.path.exists(downloaded.path))
+
+        self.assertEqual(telemetry_export.prune_jobs(jobs, now=pending.finished + 10), [])
+        self.assertTrue(os.path.exists(pending.path))
+        removed = telemetry_export.prune_jobs(jobs, now=pending.finished + telemetry_export.EXPORT_JOB_TTL_S + 10)
+        self.assertEqual(sorted(removed), sorted(j.id for j in (downloaded, pending, failed)))
+        self.assertEqual(jobs, {})
+        self.assertFalse(os.path.exists(pending.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import telemetry_lod
+import telemetry_store
+from telemetry_lod import LOD_LEVELS
+
+
+class Test_minmax_decimate(unittest.TestCase):
+    """Min/Max-Downsampling: Peaks jedes Buckets bleiben auf allen Stufen erhalten."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.n = 100_003  # kein Vielfaches der Stufen -> Rest-Bucket am Ende
+        self.x = np.arange(self.n, dtype=np.float64) * 0.02
+        self.y = rng.normal(0, 1, self.n)
+        # Einzelne Spitzen, die beim simplen Ausdünnen (jedes k-te Sample) verloren gingen
+        self.spikes = rng.choice(self.n, 40, replace=False)
+        self.y[self.spikes] = rng.choice([-25.0, 25.0], 40)
+
+    def test_bucket_extremes_survive_every_level(self):
+        for level in LOD_LEVELS[1:]:
+            with self.subTest(level=level):
+                lx, ly = telemetry_lod.minmax_decimate(self.x, self.y, level)
+                self.assertTrue((np.diff(lx) > 0).all())
+                self.assertLessEqual(len(ly), 2 * (-(-self.n // level)))
+                # Extremwerte je Bucket: Original vs. behaltene Punkte desselben Buckets
+                starts = np.arange(0, self.n, level)
+                bucket = (lx / 0.02).round().astype(np.int64) // level
+                kept = np.searchsorted(bucket, np.arange(len(starts)))
+                np.testing.assert_array_equal(np.maximum.reduceat(ly, kept), np.maximum.reduceat(self.y, starts))
+                np.testing.assert_array_equal(np.minimum.reduceat(ly, kept), np.minimum.reduceat(self.y, starts))
+                self.assertTrue(set(self.x[self.spikes]) <= set(lx))
+
+    def test_scatter_keeps_x_extremes(self):
+        x = np.random.default_rng(1).normal(0, 1, 10_000)
+        lx, _ = telemetry_lod.minmax_decimate(x, self.y[:10_000], 64, scatter=True)
+        starts = np.arange(0, 10_000, 64)
+        self.assertTrue(set(np.maximum.reduceat(x, starts)) <= set(lx))
+        self.assertTrue(set(np.minimum.reduceat(x, starts)) <= set(lx))
+
+    def test_short_input_is_returned_unchanged(self):
+        lx, ly = telemetry_lod.minmax_decimate(self.x[:10], self.y[:10], 16)
+        np.testing.assert_array_equal(ly, self.y[:10])
+
+
+class Test_pick_level(unittest.TestCase):
+    """Stufenwahl: gröbste Stufe mit mindestens einem Punkt pro Pixel im sichtbaren Bereich."""
+
+    def test_respects_pixel_budget(self):
+        for n in (500, 5_000, 50_000, 500_000, 5_000_000):
+            for fraction in (1.0, 0.5, 0.1, 0.01):
+                with self.subTest(n=n, fraction=fraction):
+                    level = telemetry_lod.pick_level(n, fraction, pixel_budget=2_000)
+                    points = 2 * n * fraction / level
+                    self.assertTrue(level == 1 or points >= 2_000)
+                    coarser = [lv for lv in LOD_LEVELS if lv > level]
+                    if coarser:
+                        self.assertLess(2 * n * fraction / coarser[0], 2_000)
+
+    def test_zoom_selects_finer_level(self):
+        self.assertEqual(telemetry_lod.pick_level(1_000_000, 1.0), 256)
+        self.assertEqual(telemetry_lod.pick_level(1_000_000, 0.01), 4)
+        self.assertEqual(telemetry_lod.pick_level(1_000_000, 0.001), 1)
+        # Fenster außerhalb [0, 1] werden geklemmt
+        self.assertEqual(telemetry_lod.pick_level(1_000_000, 3.0), 256)
+        self.assertEqual(telemetry_lod.pick_level(1_000_000, -1.0), 1)
+
+
+class Test_load_trace(unittest.TestCase):
+    """Gespeicherte Pyramide in telemetry_lod: gebaut beim ersten Zugriff, neu nur bei geänderter Revision."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "lod.db")
+        telemetry_store.init_db(self.db_path)
+        self.n = 200_000
+        self.speed = 150 + 50 * np.sin(np.arange(self.n) / 500.0)
+        self.speed[123_457] = 400.0
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO runs (id, vehicle_name, track_name, timestamp) VALUES (1, 'Car', 'Track', '2026-01-01 10:00:00')")
+        conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, time_elapsed, speed_kmh) VALUES (1, ?, ?, ?)",
+                         [(i, i * 0.02, float(v)) for i, v in enumerate(self.speed)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self, window=None):
+        return telemetry_lod.load_trace(1, 'time_elapsed', 'speed_kmh', window=window, db_path=self.db_path)
+
+    def test_pyramid_rebuilt_only_on_new_revision(self):
+        with mock.patch.object(telemetry_lod, '_build_pyramid', wraps=telemetry_lod._build_pyramid) as build:
+            full = self.load()
+            self.load()
+            self.load(window=(100.0, 200.0))
+            self.assertEqual(build.call_count, 1)
+
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("UPDATE telemetry_data SET speed_kmh = 500.0 WHERE run_id = 1 AND sample_idx = 1000")
+            conn.execute("UPDATE runs SET revision = revision + 1 WHERE id = 1")
+            conn.commit()
+            levels = conn.execute("SELECT DISTINCT revision FROM telemetry_lod WHERE run_id = 1").fetchall()
+            conn.close()
+            self.assertEqual(levels, [(0,)])
+
+            updated = self.load()
+            self.assertEqual(build.call_count, 2)
+        self.assertEqual(full['speed_kmh'].max(), 400.0)
+        self.assertEqual(updated['speed_kmh'].max(), 500.0)
+        self.assertLessEqual(len(full), 2 * self.n // telemetry_lod.pick_level(self.n))
+
+    def test_zoom_window_uses_finer_level(self):
+        full = self.load()
+        medium = self.load(window=(2_400.0, 2_500.0))
+        zoom = self.load(window=(2_450.0, 2_500.0))
+        for df, lo in ((medium, 2_400.0), (zoom, 2_450.0)):
+            self.assertTrue(df['time_elapsed'].between(lo, 2_500.0).all())
+            self.assertIn(400.0, df['speed_kmh'].tolist())
+        # 100 s bei 50 Hz -> Stufe 4 (ca. 2 Punkte je 4 Samples), 50 s -> Rohdaten (Stufe 1)
+        self.assertAlmostEqual(len(medium), 2_500, delta=2)
+        self.assertAlmostEqual(len(zoom), 2_500, delta=2)
+        np.testing.assert_allclose(zoom['time_elapsed'].diff().dropna(), 0.02, atol=1e-3)
+        self.assertGreater(medium['time_elapsed'].diff().max(), 0.03)
+        self.assertLess(len(full), self.n)
+
+
+if __name__ == '__main__':
+    unittest.main()
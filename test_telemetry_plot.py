@@ -0,0 +1,33 @@
+import unittest
+
+import numpy as np
+import plotly.graph_objects as go
+
+import telemetry_plot
+
+
+class Test_make_trace(unittest.TestCase):
+    """Payload bleibt unabhängig von der Run-Länge begrenzt, Peaks bleiben erhalten."""
+
+    def test_long_trace_is_decimated_webgl(self):
+        x = np.arange(1_000_000) * 0.02
+        y = np.sin(x).astype('float32')
+        y[654_321] = 9.0
+        trace = telemetry_plot.make_trace(x, y, mode='lines', name='Speed')
+        self.assertIsInstance(trace, go.Scattergl)
+        self.assertLessEqual(len(trace.x), 2 * telemetry_plot.DEFAULT_PIXEL_BUDGET + 2)
+        self.assertEqual(max(trace.y), 9.0)
+        self.assertEqual(trace.name, 'Speed')
+
+    def test_short_trace_stays_svg(self):
+        trace = telemetry_plot.make_trace([0, 1, 2], [3, 4, 5], mode='lines')
+        self.assertIsInstance(trace, go.Scatter)
+        self.assertEqual(list(trace.y), [3, 4, 5])
+
+    def test_zoom_window(self):
+        self.assertIsNone(telemetry_plot.zoom_window(0.0, 80.0, (0, 100)))
+        self.assertEqual(telemetry_plot.zoom_window(100.0, 300.0, (25, 50)), (150.0, 200.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
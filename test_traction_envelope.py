@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import telemetry_store
+from telemetry_analysis import load_traction_envelopes, traction_envelope, traction_envelopes, traction_points
+from test_helpers import make_synthetic_run
+
+
+def reference_limit_polygon(lat, lon):
+    """Frühere Segment-Schleife aus dem G-G Diagramm (Referenz, ohne ConvexHull-Fallback)."""
+    thetas = np.arctan2(lon, lat)
+    radii = np.sqrt(lat**2 + lon**2)
+
+    bin_deg = 5
+    bins = int(360 / bin_deg)
+    edges = np.linspace(-np.pi, np.pi, bins + 1)
+    seg_points = []
+    for i in range(len(edges) - 1):
+        start, end = edges[i], edges[i+1]
+        if start < end:
+            mask = (thetas >= start) & (thetas < end)
+        else:
+            mask = (thetas >= start) | (thetas < end)
+
+        if not np.any(mask):
+            continue
+
+        r95 = np.nanpercentile(radii[mask], 95)
+        if np.isnan(r95) or r95 <= 0:
+            continue
+
+        angle_center = (start + end) / 2.0
+        x = r95 * np.cos(angle_center)
+        y = r95 * np.sin(angle_center)
+        seg_points.append((angle_center, x, y))
+
+    if len(seg_points) < 3:
+        return None
+    seg_points.sort(key=lambda t: t[0])
+    hull_points = np.array([[p[1], p[2]] for p in seg_points])
+    return np.vstack((hull_points, hull_points[0]))
+
+
+class Test_traction_envelope(unittest.TestCase):
+    """Das sortierte Segment-Perzentil entspricht der früheren Schleife mit np.nanpercentile."""
+
+    def test_matches_reference(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                lat, lon = traction_points(make_synthetic_run(20_000, seed=seed))
+                np.testing.assert_allclose(traction_envelope(lat, lon), reference_limit_polygon(lat, lon), rtol=1e-6, atol=1e-7)
+
+    def test_sparse_and_nan_points(self):
+        rng = np.random.default_rng(3)
+        lat = rng.normal(0, 1, 300).astype('float32')
+        lon = rng.normal(0, 0.5, 300).astype('float32')
+        lat[::7] = np.nan
+        lon[5] = 0.0
+        lat[5] = -1.0  # theta == pi liegt in keinem Segment
+        np.testing.assert_allclose(traction_envelope(lat, lon), reference_limit_polygon(lat, lon), rtol=1e-6, atol=1e-7)
+
+    def test_stacked_runs_in_one_pass(self):
+        runs = {run_id: traction_points(make_synthetic_run(5_000, seed=run_id)) for run_id in (4, 9, 17)}
+        lat = np.concatenate([p[0] for p in runs.values()])
+        lon = np.concatenate([p[1] for p in runs.values()])
+        groups = np.concatenate([np.full(len(p[0]), run_id) for run_id, p in runs.items()])
+        envelopes = traction_envelopes(lat, lon, groups)
+        self.assertEqual(sorted(envelopes), [4, 9, 17])
+        for run_id, (run_lat, run_lon) in runs.items():
+            np.testing.assert_allclose(envelopes[run_id], traction_envelope(run_lat, run_lon))
+
+    def test_few_segments_fall_back_to_hull(self):
+        lat = np.array([1.0, 1.1, 1.2, 1.05], dtype='float32')
+        lon = np.array([0.01, 0.02, 0.015, 0.03], dtype='float32')
+        polygon = traction_envelope(lat, lon)
+        self.assertEqual(polygon[0].tolist(), polygon[-1].tolist())
+        self.assertIsNone(traction_envelope(lat[:2], lon[:2]))
+
+
+class Test_load_traction_envelopes(unittest.TestCase):
+
+    def test_cached_per_run_revision(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "gg.db")
+            telemetry_store.init_db(db_path)
+            conn = sqlite3.connect(db_path)
+            conn.execute("INSERT INTO runs (vehicle_name, track_name, timestamp, run_type) VALUES ('Car', 'Track', '2026-01-01 10:00:00', 'HANDLING')")
+            df = make_synthetic_run(3_000, seed=5, dtype='float64')
+            conn.executemany("INSERT INTO telemetry_data (run_id, sample_idx, speed_kmh, lat_g, lon_g) VALUES (1, ?, ?, ?, ?)",
+                             [(k, *row) for k, row in enumerate(df[['speed_kmh', 'lat_g', 'lon_g']].itertuples(index=False))])
+            conn.commit()
+            conn.close()
+
+            cache = telemetry_store.TelemetryCache()
+            first = load_traction_envelopes([1], db_path, cache=cache)[1]
+            hits = cache.stats()['hits']
+            second = load_traction_envelopes([1], db_path, cache=cache)[1]
+            self.assertEqual(cache.stats()['hits'], hits + 1)
+            pd.testing.assert_frame_equal(first, second)
+            self.assertGreater(len(first), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d
+
+from telemetry_analysis import generate_virtual_run, torque_envelope
+from test_helpers import make_drag_run
+
+
+def reference_generate_virtual_run(df):
+    """Frühere Schleifen-Implementierung aus dem Dashboard (Referenz, unverändert übernommen)."""
+    df_valid = df[df['torque'] > 0].copy()
+    if df_valid.empty: return df
+
+    df_valid['speed_bin'] = df_valid['speed_kmh'].round()
+    envelope = df_valid.groupby('speed_bin')['torque'].quantile(0.95).reset_index()
+    if len(envelope) < 5: return df
+
+    min_bin = int(envelope['speed_bin'].min())
+    max_bin = int(envelope['speed_bin'].max())
+    envelope = envelope.set_index('speed_bin').reindex(range(min_bin, max_bin + 1)).interpolate(method='linear').reset_index()
+
+    start_speed = max(0.0, df['speed_kmh'].iloc[0])
+    max_speed = df['speed_kmh'].max()
+
+    accels_m_s2 = np.maximum(envelope['torque'].values / 1000.0, 0.05)
+    accel_interp = interp1d(envelope['speed_bin'].values, accels_m_s2, kind='linear', fill_value="extrapolate")
+
+    sim_speeds = np.arange(start_speed, max_speed, 0.1)
+    sim_times = []
+    current_time = df['time_elapsed'].iloc[0]
+
+    shift_speeds = []
+    last_gear = df_valid['gear'].iloc[0]
+    for i in range(1, len(df_valid)):
+        if df_valid['gear'].iloc[i] > last_gear:
+            shift_speeds.append(df_valid['speed_kmh'].iloc[i])
+            last_gear = df_valid['gear'].iloc[i]
+
+    shift_delay = 0.08
+    shifts_applied = sum(1 for s in shift_speeds if s < start_speed)
+
+    for v in sim_speeds:
+        a = accel_interp(v)
+        if a < 0.05: a = 0.05
+        dt = (0.1 / 3.6) / a
+
+        while shifts_applied < len(shift_speeds) and v >= shift_speeds[shifts_applied]:
+            current_time += shift_delay
+            shifts_applied += 1
+
+        current_time += dt
+        sim_times.append(current_time)
+
+    return pd.DataFrame({
+        'time_elapsed': sim_times,
+        'speed_kmh': sim_speeds
+    })
+
+
+class Test_generate_virtual_run(unittest.TestCase):
+    """Die vektorisierte Integration liefert dieselben Zeiten wie die Schritt-für-Schritt-Schleife."""
+
+    def assert_same(self, df):
+        expected = reference_generate_virtual_run(df.copy())
+        actual = generate_virtual_run(df.copy())
+        np.testing.assert_array_equal(actual['speed_kmh'].to_numpy(), expected['speed_kmh'].to_numpy())
+        np.testing.assert_allclose(actual['time_elapsed'].to_numpy(dtype=float), expected['time_elapsed'].to_numpy(dtype=float),
+                                   rtol=1e-12, atol=0)
+
+    def test_standing_and_rolling_start(self):
+        for seed, start in [(0, 0.0), (1, 40.0), (2, 120.0)]:
+            with self.subTest(seed=seed, start=start):
+                self.assert_same(make_drag_run(seed=seed, start_speed=start))
+
+    def test_downshift_and_regained_gear(self):
+        df = make_drag_run(seed=3)
+        # Kurzer Rückschalter mitten im Run: darf nicht als neuer Hochschaltvorgang zählen
+        df.loc[1_200:1_260, 'gear'] -= 1
+        self.assert_same(df)
+
+    def test_too_little_data_returns_input(self):
+        df = make_drag_run(200, seed=4).iloc[:3]
+        self.assertIs(generate_virtual_run(df), df)
+        no_torque = make_drag_run(seed=5).assign(torque=np.float32(0.0))
+        self.assertIs(generate_virtual_run(no_torque), no_torque)
+
+    def test_vehicle_envelope_from_several_runs(self):
+        runs = [make_drag_run(seed=s) for s in range(4)]
+        envelope = torque_envelope(pd.concat(runs, ignore_index=True))
+        virtual = generate_virtual_run(runs[0], envelope=envelope)
+        self.assertTrue((np.diff(virtual['time_elapsed']) > 0).all())
+        # Envelope über mehrere Runs ist mindestens so stark wie die des schwächsten Einzel-Runs
+        single = [generate_virtual_run(r)['time_elapsed'].iloc[-1] - r['time_elapsed'].iloc[0] for r in runs]
+        self.assertLessEqual(virtual['time_elapsed'].iloc[-1] - runs[0]['time_elapsed'].iloc[0], max(single) + 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()